@@ -0,0 +1,9 @@
+# comun/__init__.py
+"""
+Código compartido por los dos proyectos del repositorio (`mi_sitio` en la
+raíz y `trabajo/mi_sitio`).
+
+Ambos tienen su propia app con etiqueta `zara`; los módulos de aquí importan
+`zara.models` y resuelven a la app del proyecto que esté corriendo. Por eso
+solo pueden usar modelos y campos que existan en las dos.
+"""
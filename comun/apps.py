@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class ComunConfig(AppConfig):
+    name = 'comun'
+
+    def ready(self):
+        from . import comentarios  # noqa: F401 (registra receivers)
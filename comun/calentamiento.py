@@ -0,0 +1,115 @@
+# comun/calentamiento.py
+"""
+Calentamiento de cachés antes del fork de workers (ambos proyectos).
+
+Con gunicorn `--preload` (o cualquier servidor prefork) `mi_sitio.wsgi`
+se importa en el master: si DJANGO_WARMUP=true se llama a `calentar()`,
+que resuelve URLs, compila plantillas y corre los pasos propios de cada
+proyecto, y luego hace `gc.freeze()` para que los workers compartan esas
+páginas por copy-on-write en vez de recrearlas en la primera petición.
+
+Cada app suma sus pasos en su módulo `calentamiento` con el decorador
+`@calentador("nombre")`; `calentar()` los descubre como el admin de Django.
+"""
+from __future__ import annotations
+
+import gc
+import logging
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from django.db import connections
+from django.utils.module_loading import autodiscover_modules
+
+logger = logging.getLogger(__name__)
+
+_CALENTADORES: List[Tuple[str, Callable[[], object]]] = []
+
+
+def calentador(nombre: str):
+    """Registra una función sin argumentos como paso de calentamiento."""
+    def decorador(fn):
+        _CALENTADORES.append((nombre, fn))
+        return fn
+    return decorador
+
+
+# =============================
+#  PASOS COMUNES
+# =============================
+
+@calentador("urls")
+def _urls():
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    resolver.reverse_dict
+    for _prefijo, sub in resolver.namespace_dict.values():
+        sub.reverse_dict
+
+
+@calentador("plantillas")
+def _plantillas():
+    from django.template import TemplateSyntaxError, engines
+    from django.template.backends.django import DjangoTemplates
+
+    total = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for base in engine.template_dirs:
+            base = Path(base)
+            for ruta in base.rglob("*.html"):
+                try:
+                    engine.get_template(ruta.relative_to(base).as_posix())
+                    total += 1
+                except TemplateSyntaxError as exc:
+                    logger.warning("Plantilla %s no compila: %s", ruta, exc)
+    return total
+
+
+# =============================
+#  API
+# =============================
+
+def calentar(congelar: bool = True) -> Dict[str, float]:
+    """Ejecuta todos los pasos registrados. Retorna {paso: milisegundos}."""
+    autodiscover_modules("calentamiento")
+    tiempos: Dict[str, float] = {}
+    for nombre, fn in _CALENTADORES:
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception as exc:  # p. ej. BD sin migrar: el worker lo construirá solo
+            logger.warning("Calentamiento '%s' omitido: %s", nombre, exc)
+        tiempos[nombre] = round((time.perf_counter() - t0) * 1000, 2)
+
+    # Los workers no deben heredar conexiones abiertas del master
+    connections.close_all()
+    if congelar:
+        gc.collect()
+        gc.freeze()
+    logger.info("Calentamiento listo: %s", tiempos)
+    return tiempos
+
+
+def memoria_proceso(pid: str = "self") -> Dict[str, int]:
+    """
+    RSS, PSS y USS (memoria única) en kB según /proc/<pid>/smaps_rollup.
+    USS = Private_Clean + Private_Dirty: lo que se liberaría al matar el proceso.
+    """
+    campos = {"Rss": 0, "Pss": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fh:
+            for linea in fh:
+                clave, _, resto = linea.partition(":")
+                if clave in campos:
+                    campos[clave] = int(resto.split()[0])
+    except OSError:
+        return {}
+    return {
+        "rss_kb": campos["Rss"],
+        "pss_kb": campos["Pss"],
+        "uss_kb": campos["Private_Clean"] + campos["Private_Dirty"],
+    }
@@ -0,0 +1,283 @@
+# comun/comentarios.py
+"""
+Analítica de texto libre sobre `RespuestaEncuesta.comentario`.
+
+Índice incremental (nunca se reconstruye completo):
+- `TerminoComentario`: índice invertido (término → respuestas).
+- `FrecuenciaTermino`: respuestas por (campaña, término).
+- `CoocurrenciaTermino`: respuestas por (campaña, par de términos).
+
+`indexar_pendientes()` reclama las respuestas con `comentario_indexado=False`
+por lotes (UPDATE … RETURNING: cada una la indexa un solo proceso), las
+tokeniza (`comun.texto`) y suma sus conteos con un upsert
+`documentos = documentos + excluded.documentos`. Se llama tras cada
+respuesta guardada, con `manage.py indexar_comentarios` y, en el proyecto
+raíz, tras cada lote de ingesta.
+
+Lo usan los dos proyectos: las tablas del índice las crea la migración de
+cada uno con `comun.migraciones.indice_comentarios()`.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from zara.models import (
+    CoocurrenciaTermino,
+    FrecuenciaTermino,
+    RespuestaEncuesta,
+    TerminoComentario,
+)
+from .texto import tokenizar
+
+logger = logging.getLogger(__name__)
+
+LOTE = 2000
+# Solo los primeros N términos distintos de cada comentario generan pares
+# (N=12 → máx. 66 pares por respuesta)
+MAX_TERMINOS_PAR = 12
+TTL_GRAFICOS = 60.0
+
+
+def terminos_de(texto: str) -> List[str]:
+    """Términos distintos del comentario, en orden de aparición."""
+    return list(dict.fromkeys(tokenizar(texto)))
+
+
+def _pares(terminos: List[str]) -> Iterable[Tuple[str, str]]:
+    return combinations(sorted(terminos[:MAX_TERMINOS_PAR]), 2)
+
+
+# =============================
+#  INDEXACIÓN INCREMENTAL
+# =============================
+
+def _insertar_postings(filas: List[Tuple[int, int, str]]) -> None:
+    """INSERT … ON CONFLICT DO NOTHING vía executemany (bulk_create cuesta ~3x en Python)."""
+    if not filas:
+        return
+    qn = connection.ops.quote_name
+    meta = TerminoComentario._meta
+    columnas = ", ".join(qn(meta.get_field(c).column) for c in ("respuesta", "campania", "termino"))
+    sql = f"INSERT INTO {qn(meta.db_table)} ({columnas}) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING"
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, filas)
+
+
+def _sumar(modelo, claves: Tuple[str, ...], conteos: Counter) -> None:
+    """Upsert que suma `documentos` (SQLite ≥ 3.24 y PostgreSQL)."""
+    if not conteos:
+        return
+    qn = connection.ops.quote_name
+    columnas = [modelo._meta.get_field(c).column for c in claves]
+    tabla = qn(modelo._meta.db_table)
+    lista = ", ".join(qn(c) for c in columnas)
+    marcas = ", ".join(["%s"] * (len(columnas) + 1))
+    sql = (
+        f"INSERT INTO {tabla} ({lista}, {qn('documentos')}) VALUES ({marcas}) "
+        f"ON CONFLICT ({lista}) DO UPDATE SET "
+        f"{qn('documentos')} = {tabla}.{qn('documentos')} + excluded.{qn('documentos')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(*clave, n) for clave, n in conteos.items()])
+
+
+def _pendientes(lote: int) -> List[int]:
+    return list(
+        RespuestaEncuesta.objects.filter(comentario_indexado=False).order_by("id").values_list("id", flat=True)[:lote]
+    )
+
+
+def _reclamar(candidatos: List[int]) -> List[Tuple[int, int, str]]:
+    """
+    Marca como indexadas las candidatas aún pendientes y retorna solo las
+    que marcó esta transacción (UPDATE condicional). Otro indexador
+    concurrente (hook de otro worker, hilo de ingesta, comando) espera el
+    lock de escritura y, al confirmarse este, ya no las ve pendientes.
+    """
+    if connection.features.can_return_columns_from_insert:
+        # SQLite ≥ 3.35 y PostgreSQL: UPDATE … RETURNING
+        qn = connection.ops.quote_name
+        meta = RespuestaEncuesta._meta
+        col = {c: qn(meta.get_field(c).column) for c in ("id", "campania", "comentario", "comentario_indexado")}
+        marcas = ", ".join(["%s"] * len(candidatos))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {qn(meta.db_table)} SET {col['comentario_indexado']} = %s "
+                f"WHERE {col['comentario_indexado']} = %s AND {col['id']} IN ({marcas}) "
+                f"RETURNING {col['id']}, {col['campania']}, {col['comentario']}",
+                [True, False, *candidatos],
+            )
+            return sorted(cursor.fetchall())
+    filas = list(
+        RespuestaEncuesta.objects.select_for_update().filter(pk__in=candidatos, comentario_indexado=False)
+        .order_by("id").values_list("id", "campania_id", "comentario")
+    )
+    RespuestaEncuesta.objects.filter(id__in=[f[0] for f in filas]).update(comentario_indexado=True)
+    return filas
+
+
+def _indexar_lote(lote: int) -> int:
+    # Candidatas fuera de la transacción: el UPDATE vuelve a exigir el flag, y
+    # en SQLite la transacción empieza escribiendo (espera el lock en vez de
+    # fallar al promover una lectura).
+    candidatos = _pendientes(lote)
+    if not candidatos:
+        return 0
+    with transaction.atomic():
+        # si algo falla más abajo, el rollback devuelve las filas a pendientes
+        filas = _reclamar(candidatos)
+        if not filas:
+            return 0
+
+        postings: List[Tuple[int, int, str]] = []
+        frecuencias: Counter = Counter()
+        pares: Counter = Counter()
+        for respuesta_id, campania_id, comentario in filas:
+            terminos = terminos_de(comentario)
+            for t in terminos:
+                postings.append((respuesta_id, campania_id, t))
+                frecuencias[(campania_id, t)] += 1
+            for a, b in _pares(terminos):
+                pares[(campania_id, a, b)] += 1
+
+        _insertar_postings(postings)
+        _sumar(FrecuenciaTermino, ("campania", "termino"), frecuencias)
+        _sumar(CoocurrenciaTermino, ("campania", "termino_a", "termino_b"), pares)
+    return len(filas)
+
+
+def indexar_pendientes(lote: int = LOTE, max_lotes: Optional[int] = None) -> int:
+    """Indexa respuestas nuevas por lotes. Retorna cuántas se procesaron."""
+    total = lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        n = _indexar_lote(lote)
+        if not n:
+            break
+        total += n
+        lotes += 1
+    if total:
+        _graficos_cache.clear()
+    return total
+
+
+def indexar_sin_fallar(max_lotes: Optional[int] = 1) -> int:
+    """Para hooks que corren tras un commit ya hecho: un error se registra y la respuesta queda pendiente."""
+    try:
+        return indexar_pendientes(max_lotes=max_lotes)
+    except Exception:
+        logger.exception("No se pudieron indexar comentarios; quedan para el próximo lote.")
+        return 0
+
+
+@receiver(post_save, sender=RespuestaEncuesta)
+def _indexar_respuesta(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(indexar_sin_fallar)
+
+
+@receiver(pre_delete, sender=RespuestaEncuesta)
+def _descontar_respuesta(sender, instance, **kwargs):
+    """Los postings se borran en cascada; aquí se restan los conteos."""
+    # La instancia en memoria puede no reflejar el flag (se marca con UPDATE)
+    if not RespuestaEncuesta.objects.filter(pk=instance.pk, comentario_indexado=True).exists():
+        return
+    terminos = terminos_de(instance.comentario)
+    c = instance.campania_id
+    FrecuenciaTermino.objects.filter(campania_id=c, termino__in=terminos).update(documentos=F("documentos") - 1)
+    # Con a < b, todo par dentro de los primeros N términos es justo uno de `_pares`
+    con_pares = terminos[:MAX_TERMINOS_PAR]
+    CoocurrenciaTermino.objects.filter(
+        campania_id=c, termino_a__in=con_pares, termino_b__in=con_pares,
+    ).update(documentos=F("documentos") - 1)
+    _graficos_cache.clear()
+
+
+# =============================
+#  CONSULTAS
+# =============================
+
+_graficos_cache: Dict[Optional[int], Tuple[float, Dict[str, dict]]] = {}
+
+
+def top_terminos(campania_id: Optional[int] = None, limite: int = 20) -> List[Tuple[str, int]]:
+    qs = FrecuenciaTermino.objects.filter(documentos__gt=0)
+    if campania_id is not None:
+        return list(
+            qs.filter(campania_id=campania_id).order_by("-documentos", "termino")
+            .values_list("termino", "documentos")[:limite]
+        )
+    return list(
+        qs.values("termino").annotate(n=Sum("documentos")).order_by("-n", "termino")
+        .values_list("termino", "n")[:limite]
+    )
+
+
+def top_coocurrencias(campania_id: Optional[int] = None, limite: int = 15) -> List[Tuple[str, int]]:
+    qs = CoocurrenciaTermino.objects.filter(documentos__gt=0)
+    if campania_id is not None:
+        filas = (
+            qs.filter(campania_id=campania_id).order_by("-documentos", "termino_a", "termino_b")
+            .values_list("termino_a", "termino_b", "documentos")[:limite]
+        )
+    else:
+        filas = (
+            qs.values("termino_a", "termino_b").annotate(n=Sum("documentos"))
+            .order_by("-n", "termino_a", "termino_b")
+            .values_list("termino_a", "termino_b", "n")[:limite]
+        )
+    return [(f"{a} + {b}", n) for a, b, n in filas]
+
+
+def graficos_comentarios(campania_id: Optional[int] = None, ttl: float = TTL_GRAFICOS) -> Dict[str, dict]:
+    """Payload Chart.js (mismo formato que los gráficos del informe), cacheado `ttl` segundos."""
+    ahora = time.monotonic()
+    en_cache = _graficos_cache.get(campania_id)
+    if en_cache and ahora - en_cache[0] < ttl:
+        return en_cache[1]
+    terminos = top_terminos(campania_id)
+    pares = top_coocurrencias(campania_id)
+    datos = {
+        "terminos": {"type": "bar", "labels": [t for t, _ in terminos], "data": [n for _, n in terminos]},
+        "pares": {"type": "bar", "labels": [p for p, _ in pares], "data": [n for _, n in pares]},
+    }
+    _graficos_cache[campania_id] = (ahora, datos)
+    return datos
+
+
+def buscar_comentarios(q: str, campania_id: Optional[int] = None, limite: int = 20) -> List[Dict[str, object]]:
+    """
+    Respuestas cuyo comentario contiene TODOS los términos de `q` (más nuevas primero).
+    Se recorre la lista del término más raro y se exige el resto por índice.
+    """
+    terminos = terminos_de(q)
+    if not terminos:
+        return []
+    df = dict(
+        FrecuenciaTermino.objects.filter(termino__in=terminos)
+        .values("termino").annotate(n=Sum("documentos")).values_list("termino", "n")
+    )
+    if any(not df.get(t) for t in terminos):
+        return []
+    terminos.sort(key=lambda t: df[t])
+
+    qs = TerminoComentario.objects.filter(termino=terminos[0])
+    if campania_id is not None:
+        qs = qs.filter(campania_id=campania_id)
+    for t in terminos[1:]:
+        qs = qs.filter(respuesta__terminos__termino=t)
+    ids = list(qs.order_by("-respuesta_id").values_list("respuesta_id", flat=True)[:limite])
+
+    filas = RespuestaEncuesta.objects.filter(id__in=ids).values(
+        "id", "campania__nombre", "comentario", "rating_sustentabilidad", "rating_calidad", "enviado_en",
+    )
+    por_id = {f["id"]: f for f in filas}
+    return [por_id[i] for i in ids if i in por_id]
@@ -0,0 +1,19 @@
+# comun/management/commands/indexar_comentarios.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from comun.comentarios import LOTE, indexar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Pasa al índice de términos los comentarios de encuesta aún no indexados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=LOTE)
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        total = indexar_pendientes(lote=opts["lote"])
+        dt = time.perf_counter() - t0
+        self.stdout.write(f"{total} respuesta(s) indexadas en {dt:.2f}s ({total / max(dt, 1e-9):,.0f} filas/s).")
@@ -0,0 +1,94 @@
+# comun/migraciones.py
+"""
+Operaciones de migración compartidas.
+
+Cada proyecto conserva su propio archivo de migración (sus dependencias
+difieren), pero el esquema del índice de comentarios se define una sola vez
+aquí. No cambiar estas operaciones: para modificar el esquema, agregar una
+migración nueva en cada proyecto.
+"""
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def indice_comentarios():
+    """Tablas e índices de `comun.comentarios` sobre la app `zara`."""
+    return [
+        migrations.CreateModel(
+            name='CoocurrenciaTermino',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino_a', models.CharField(max_length=40)),
+                ('termino_b', models.CharField(max_length=40)),
+                ('documentos', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FrecuenciaTermino',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=40)),
+                ('documentos', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TerminoComentario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=40)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='respuestaencuesta',
+            name='comentario_indexado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='respuestaencuesta',
+            index=models.Index(condition=models.Q(('comentario_indexado', False)), fields=['id'], name='respuesta_por_indexar'),
+        ),
+        migrations.AddField(
+            model_name='terminocomentario',
+            name='campania',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='zara.campaniaencuesta'),
+        ),
+        migrations.AddField(
+            model_name='terminocomentario',
+            name='respuesta',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='zara.respuestaencuesta'),
+        ),
+        migrations.AddField(
+            model_name='frecuenciatermino',
+            name='campania',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='zara.campaniaencuesta'),
+        ),
+        migrations.AddField(
+            model_name='coocurrenciatermino',
+            name='campania',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='zara.campaniaencuesta'),
+        ),
+        migrations.AddIndex(
+            model_name='terminocomentario',
+            index=models.Index(fields=['campania', 'termino'], name='zara_termin_campani_2f72a2_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='terminocomentario',
+            constraint=models.UniqueConstraint(fields=('termino', 'respuesta'), name='termino_unico_por_respuesta'),
+        ),
+        migrations.AddIndex(
+            model_name='frecuenciatermino',
+            index=models.Index(fields=['campania', '-documentos'], name='zara_frecue_campani_ffe11b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='frecuenciatermino',
+            constraint=models.UniqueConstraint(fields=('campania', 'termino'), name='frecuencia_unica_por_campania'),
+        ),
+        migrations.AddIndex(
+            model_name='coocurrenciatermino',
+            index=models.Index(fields=['campania', '-documentos'], name='zara_coocur_campani_48f2ac_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='coocurrenciatermino',
+            constraint=models.UniqueConstraint(fields=('campania', 'termino_a', 'termino_b'), name='coocurrencia_unica_por_campania'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# comun/texto.py
+"""
+Tokenización de texto libre en español (comentarios de encuesta).
+
+- minúsculas + plegado de acentos ("Algodón" → "algodon"),
+- solo palabras alfanuméricas de 3+ caracteres,
+- sin stopwords.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import List
+
+_PALABRA = re.compile(r"[a-z0-9]+")
+
+MIN_LARGO = 3
+MAX_LARGO = 40
+
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun aunque bien cada casi como con
+contra cual cuales cuando de del desde donde dos el ella ellas ello ellos en entre era erais eramos eran
+eras eres es esa esas ese eso esos esta estaba estado estais estamos estan estar estas este esto estos
+estoy fue fueron fui fuimos ha hace hacen hacer hacia han has hasta hay he hemos la las le les lo los mas
+me mi mia mias mio mios mis mucho muchos muy nada ni no nos nosotras nosotros nuestra nuestras nuestro
+nuestros o os otra otras otro otros para pero poco por porque que quien quienes se sea sean ser si sido
+sin sobre sois solo somos son soy su sus tambien tanto te tenemos tener tengo ti tiene tienen todo todos
+tu tus un una uno unos usted ustedes va vamos van vosotras vosotros y ya yo
+""".split())
+
+
+def plegar(texto: str) -> str:
+    """Minúsculas y sin acentos/diacríticos."""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Términos indexables del texto, en orden de aparición (con repeticiones)."""
+    if not texto:
+        return []
+    return [
+        t for t in _PALABRA.findall(plegar(texto))
+        if MIN_LARGO <= len(t) <= MAX_LARGO and t not in STOPWORDS
+    ]
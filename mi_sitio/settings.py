@@ -35,6 +35,7 @@ INSTALLED_APPS = [
     # Apps del proyecto
     "zara",
     "zara_re",   # ← IMPORTANTE
+    "comun",     # código compartido con trabajo/ (comentarios, calentamiento)
 ]
 
 # -------------------------------------------------
@@ -67,6 +68,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "zara.apariencia.contexto",
             ],
         },
     },
@@ -84,6 +86,23 @@ DATABASES = {
     }
 }
 
+# -------------------------------------------------
+# Cache compartido entre procesos
+# -------------------------------------------------
+# Workers web, `trabajar_tareas` y comandos ven las mismas versiones,
+# invalidaciones y contadores. En archivos sirve para un host; con varios
+# hosts: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache y
+# CACHE_LOCATION=redis://…
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", str(BASE_DIR / "var" / "cache")),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+CATALOGO_REVISAR_S = 2      # cada cuánto un proceso mira la versión del catálogo (zara/catalogo.py)
+CATALOGO_TTL_S = 300        # vida máxima de un snapshot aunque la versión no cambie
+
 # -------------------------------------------------
 # Internacionalización
 # -------------------------------------------------
@@ -105,10 +124,113 @@ MEDIA_ROOT = BASE_DIR / "media"
 # -------------------------------------------------
 # Login
 # -------------------------------------------------
-LOGIN_URL = "/login/"
+LOGIN_URL = "login"  # accounts/login/ (formulario con límite de intentos)
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
 
+# Límite de intentos y costo del hash (zara/acceso.py, zara/hashers.py)
+AUTHENTICATION_BACKENDS = ["zara.acceso.BackendLimitado"]
+PASSWORD_HASHERS = [
+    "zara.hashers.PBKDF2Ajustable",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+PASSWORD_PBKDF2_ITERACIONES = int(os.getenv("PASSWORD_PBKDF2_ITERACIONES", "600000"))  # default de Django 4.2
+ACCESO_CACHE = os.getenv("ACCESO_CACHE", "default")               # compartido entre procesos en producción
+ACCESO_IP_HEADER = os.getenv("ACCESO_IP_HEADER", "REMOTE_ADDR")   # HTTP_X_REAL_IP detrás de un proxy
+ACCESO_VENTANA_S = int(os.getenv("ACCESO_VENTANA_S", "300"))
+ACCESO_MAX_POR_IP = int(os.getenv("ACCESO_MAX_POR_IP", "20"))      # fallos por ventana
+ACCESO_MAX_POR_USUARIO = int(os.getenv("ACCESO_MAX_POR_USUARIO", "5"))    # por par (usuario, IP)
+ACCESO_MAX_POR_USUARIO_GLOBAL = int(os.getenv("ACCESO_MAX_POR_USUARIO_GLOBAL", "100"))  # desde cualquier IP
+
+# -------------------------------------------------
+# Fulfilment (outbox de pedidos)
+# -------------------------------------------------
+# Vacío = webhook local de prueba (solo log). Ver zara/outbox.py
+FULFILMENT_WEBHOOK_URL = os.getenv("FULFILMENT_WEBHOOK_URL", "")
+
+# -------------------------------------------------
+# Ingesta de encuestas (zara/ingesta.py)
+# -------------------------------------------------
+ENCUESTA_SPOOL_DIR = BASE_DIR / "var" / "encuesta"
+ENCUESTA_FLUSH_FILAS = int(os.getenv("ENCUESTA_FLUSH_FILAS", "500"))
+ENCUESTA_FLUSH_MS = int(os.getenv("ENCUESTA_FLUSH_MS", "200"))
+ENCUESTA_SPOOL_FSYNC = os.getenv("ENCUESTA_SPOOL_FSYNC", "false").lower() == "true"
+
+# -------------------------------------------------
+# Barrido de carritos abandonados (zara/barrido.py)
+# -------------------------------------------------
+CARRITO_TTL_HORAS = float(os.getenv("CARRITO_TTL_HORAS", "72"))
+CARRITO_BARRIDO_MAX_LOCK_MS = float(os.getenv("CARRITO_BARRIDO_MAX_LOCK_MS", "50"))
+CARRITO_ARCHIVO_DIR = BASE_DIR / "var" / "archivo"
+
+# -------------------------------------------------
+# Libreta de direcciones (zara/direcciones.py)
+# -------------------------------------------------
+# CSV region,comuna,codigo_postal; por defecto la tabla base incluida en zara/datos
+DIRECCIONES_COMUNAS_CSV = os.getenv("DIRECCIONES_COMUNAS_CSV") or BASE_DIR / "zara" / "datos" / "comunas_cl.csv"
+
+# -------------------------------------------------
+# Envíos (zara/envios.py)
+# -------------------------------------------------
+ENVIO_HORA_CORTE = int(os.getenv("ENVIO_HORA_CORTE", "14"))        # pedidos posteriores salen al día hábil siguiente
+ENVIO_MEMO_TTL = int(os.getenv("ENVIO_MEMO_TTL", "300"))            # segundos por (zona, tramo de peso)
+ENVIO_PESO_DEFECTO_G = int(os.getenv("ENVIO_PESO_DEFECTO_G", "500"))
+
+# -------------------------------------------------
+# Canje de puntos en el checkout (zara/puntos.py)
+# -------------------------------------------------
+PUNTOS_VALOR_CLP = int(os.getenv("PUNTOS_VALOR_CLP", "10"))                 # 1 punto = $10
+CREDITOS_VALOR_CLP = int(os.getenv("CREDITOS_VALOR_CLP", "1000"))           # 1 crédito circular = $1.000
+PUNTOS_MAX_DESCUENTO = float(os.getenv("PUNTOS_MAX_DESCUENTO", "0.5"))      # fracción máxima del total
+
+# -------------------------------------------------
+# Trade-In en bodega (zara/tradein.py)
+# -------------------------------------------------
+TRADEIN_MAX_LOTE_ESCANEO = int(os.getenv("TRADEIN_MAX_LOTE_ESCANEO", "500"))  # códigos por request del handheld
+
+# -------------------------------------------------
+# Zara Re: reventa circular (zara_re/reventa.py)
+# -------------------------------------------------
+ZARA_RE_MARGEN = float(os.getenv("ZARA_RE_MARGEN", "1.6"))                     # precio = valor de canje × margen
+ZARA_RE_RESERVA_MINUTOS = int(os.getenv("ZARA_RE_RESERVA_MINUTOS", "15"))
+ZARA_RE_FACETAS_TTL = int(os.getenv("ZARA_RE_FACETAS_TTL", "300"))             # segundos; se invalida al vender/publicar
+
+# -------------------------------------------------
+# Tareas en segundo plano (zara/tareas.py · manage.py trabajar_tareas)
+# -------------------------------------------------
+TAREAS_TIMEOUT_S = int(os.getenv("TAREAS_TIMEOUT_S", "600"))            # EN_CURSO más que esto → vuelve a la cola
+TAREAS_RETENCION_DIAS = int(os.getenv("TAREAS_RETENCION_DIAS", "7"))    # HECHAS más antiguas se purgan
+TAREAS_HORA_NOCTURNA = int(os.getenv("TAREAS_HORA_NOCTURNA", "3"))      # hora local de las periódicas diarias
+EXPORTACIONES_DIR = BASE_DIR / "var" / "exportaciones"
+TRADEIN_QR_DIR = BASE_DIR / "var" / "qr"                                # PNG pre-generados por zara.qr_prendas
+
+# -------------------------------------------------
+# Correo saliente (zara/correo.py; lo envía el worker de tareas)
+# -------------------------------------------------
+# En local: `python -m aiosmtpd -n -l localhost:1025` como servidor SMTP de prueba
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "1025"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "0") == "1"
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "10"))
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "ZARA <no-responder@zara.local>")
+CORREO_LOTE = int(os.getenv("CORREO_LOTE", "50"))                          # correos por toma
+CORREO_MAX_POR_SEGUNDO = float(os.getenv("CORREO_MAX_POR_SEGUNDO", "10"))   # ritmo por worker
+CORREO_MAX_INTENTOS = int(os.getenv("CORREO_MAX_INTENTOS", "6"))
+CORREO_SMTP_IDLE_S = int(os.getenv("CORREO_SMTP_IDLE_S", "30"))             # cierra la conexión reutilizada
+CORREO_ESTADOS_PEDIDO = ("PAGADO", "ENVIADO", "CANCELADO")                  # estados que avisan al cliente
+
+# -------------------------------------------------
+# Apariencia por usuario en cada página (zara/apariencia.py)
+# -------------------------------------------------
+APARIENCIA_CACHE = os.getenv("APARIENCIA_CACHE", "default")     # compartido: la invalidación llega a todos los workers
+APARIENCIA_TTL_S = int(os.getenv("APARIENCIA_TTL_S", "600"))     # guardar el Perfil invalida antes; acota update() sin invalidar
+
 # -------------------------------------------------
 # Otros
 # -------------------------------------------------
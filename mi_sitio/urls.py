@@ -1,9 +1,12 @@
 # mi_sitio/urls.py
 from django.contrib import admin
+from django.contrib.auth import views as auth_views
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from zara.forms import LoginForm, MyPasswordResetForm
+
 urlpatterns = [
     # Sitio principal (ZARA)
     path("", include("zara.urls")),
@@ -15,6 +18,13 @@ urlpatterns = [
     path("admin/", admin.site.urls),
 
     # Autenticación estándar (login, logout, password reset, etc.)
+    # Login con límite de intentos (zara.acceso); el reset manda el correo por la cola (zara.correo)
+    path("accounts/login/", auth_views.LoginView.as_view(authentication_form=LoginForm), name="login"),
+    path(
+        "accounts/password_reset/",
+        auth_views.PasswordResetView.as_view(form_class=MyPasswordResetForm),
+        name="password_reset",
+    ),
     path("accounts/", include("django.contrib.auth.urls")),
 ]
 
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mi_sitio.settings')
 
 application = get_wsgi_application()
+
+# Servidores prefork (gunicorn --preload): precarga cachés en el master
+# antes del fork para compartirlas por copy-on-write. Ver comun/calentamiento.py
+if os.getenv('DJANGO_WARMUP', '').lower() == 'true':
+    from comun.calentamiento import calentar
+    calentar()
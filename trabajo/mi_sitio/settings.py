@@ -1,9 +1,15 @@
 from pathlib import Path
 import os
+import sys
 
 # === BASE DEL PROYECTO ===
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Paquete `comun` de la raíz del repositorio. Se agrega al final de la ruta
+# para que `zara` y `mi_sitio` sigan resolviendo a los de este proyecto.
+if str(BASE_DIR.parent) not in sys.path:
+    sys.path.append(str(BASE_DIR.parent))
+
 # === CONFIGURACIÓN GENERAL ===
 SECRET_KEY = 'django-insecure-)p&qj(254$+3vp0y3#bbw-1_o*cm7-m4_-v+2&iu1ngj+-flyv'
 DEBUG = True
@@ -37,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django.contrib.humanize',  # Filtros adicionales (por ejemplo, intcomma)
     'zara',                     # Aplicación principal del proyecto
+    'comun',                    # Código compartido con la raíz del repo (comentarios, calentamiento)
 ]
 
 # === MIDDLEWARE ===
@@ -80,6 +87,19 @@ DATABASES = {
     }
 }
 
+# === CACHÉ COMPARTIDO ===
+# La versión del catálogo (zara/carrito.py) y los totales de carrito
+# (zara/precios.py) deben verse igual en todos los workers. En archivos sirve
+# para un host; con varios: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# y CACHE_LOCATION=redis://…
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'var' / 'django-cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
 # === VALIDADORES DE CONTRASEÑA ===
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
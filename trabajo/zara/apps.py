@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class ZaraConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'zara'
+
+    def ready(self):
+        from . import carrito, precios  # noqa: F401 (registra receivers)
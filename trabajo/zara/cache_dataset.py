@@ -0,0 +1,96 @@
+# zara/cache_dataset.py
+"""
+Caché en disco del dataset limpio de la encuesta (formato Arrow/Feather).
+
+El archivo se nombra con el hash SHA-256 del CSV de origen: solo se
+reconstruye cuando el CSV cambia. Se guarda sin compresión y se lee con
+memory-map, de modo que varios workers comparten las páginas del archivo
+a través del page cache del sistema operativo en vez de parsear el CSV
+cada uno.
+
+Las columnas de texto se entregan como ``pd.ArrowDtype`` (respaldadas por
+los buffers mapeados) y no como objetos Python: convertirlas a ``object``
+copiaría cada string en la memoria privada del worker y anularía lo anterior.
+Solo las columnas numéricas se materializan en bloques de numpy.
+
+Si pyarrow no está instalado se retorna None y se usa el CSV directamente.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from django.conf import settings
+
+from .dependencias import pandas, pyarrow
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Súbelo si cambia la limpieza en views._limpiar_df: invalida los archivos previos
+VERSION_LIMPIEZA = 1
+
+
+def _directorio() -> Path:
+    return Path(getattr(settings, "ENCUESTA_CACHE_DIR", settings.BASE_DIR / "var" / "cache"))
+
+
+def hash_archivo(ruta: str, bloque: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as fh:
+        for trozo in iter(lambda: fh.read(bloque), b""):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def ruta_cache(csv_path: str) -> Path:
+    return _directorio() / f"respuestas-v{VERSION_LIMPIEZA}-{hash_archivo(csv_path)[:20]}.arrow"
+
+
+def _tipos_texto(pa):
+    """types_mapper de to_pandas: texto → ArrowDtype (sin copiar), resto por defecto."""
+    pd = pandas()
+
+    def mapear(tipo):
+        if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+            return pd.ArrowDtype(tipo)
+        return None
+
+    return mapear
+
+
+def leer(ruta: Path) -> Optional["pd.DataFrame"]:
+    pa = pyarrow()
+    if pa is None or not ruta.exists():
+        return None
+    try:
+        with pa.memory_map(str(ruta), "r") as fuente:
+            tabla = pa.ipc.open_file(fuente).read_all()
+        return tabla.to_pandas(split_blocks=True, types_mapper=_tipos_texto(pa))
+    except (OSError, pa.ArrowException) as exc:
+        logger.warning("Caché de encuesta ilegible (%s); se reconstruye desde el CSV", exc)
+        return None
+
+
+def escribir(ruta: Path, df: "pd.DataFrame") -> bool:
+    pa = pyarrow()
+    if pa is None:
+        return False
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_suffix(f".tmp{os.getpid()}")
+    try:
+        pa.feather.write_feather(df, str(tmp), compression="uncompressed")
+        os.replace(tmp, ruta)  # atómico: otro worker nunca ve un archivo a medias
+    except (OSError, pa.ArrowException, ValueError, TypeError) as exc:
+        logger.warning("No se pudo escribir la caché de encuesta: %s", exc)
+        tmp.unlink(missing_ok=True)
+        return False
+    for viejo in ruta.parent.glob("respuestas-*.arrow"):
+        if viejo != ruta:
+            viejo.unlink(missing_ok=True)
+    return True
@@ -0,0 +1,13 @@
+# zara/calentamiento.py
+"""
+Paso de calentamiento propio de esta app (ver `comun.calentamiento`):
+dataset, agregados y cubo de la encuesta.
+"""
+from comun.calentamiento import calentador
+
+
+@calentador("encuesta")
+def _encuesta():
+    from .views import _cubo, _payload_encuesta
+    _payload_encuesta()
+    _cubo()
@@ -0,0 +1,204 @@
+# zara/carrito.py
+"""
+Validación de carrito contra `Producto`.
+
+- Todas las líneas se resuelven con una sola consulta `WHERE id IN (...)`.
+- El stock se cachea por proceso con TTL corto; además cada entrada guarda
+  la versión del catálogo (contador en el caché compartido de Django que se
+  incrementa al guardar/borrar un Producto). Si otro worker cambió un
+  producto, la versión no coincide y la entrada se vuelve a leer.
+- Respuestas idempotentes: con `Idempotency-Key` el reintento del cliente se
+  responde desde `RespuestaIdempotente` en vez de revalidar. La clave es
+  única en la tabla, así que la primera respuesta gana en todos los workers
+  (un caché podría desalojarla antes de `TTL_IDEMPOTENCIA`).
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import MAX_QTY_PER_ITEM, Producto, RespuestaIdempotente
+
+TTL_STOCK = 5.0
+TTL_IDEMPOTENCIA = 24 * 3600
+CLAVE_VERSION = "zara:catalogo:version"
+MAX_LINEAS = 100
+
+_SKU = re.compile(r"^(?:SKU-)?0*(\d+)$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class FilaProducto:
+    id: int
+    nombre: str
+    precio: Decimal
+    stock: int
+
+
+# =============================
+#  CACHÉ DE STOCK
+# =============================
+
+_stock: Dict[int, Tuple[float, int, Optional[FilaProducto]]] = {}  # id → (vence, versión, fila)
+_stock_lock = threading.Lock()
+
+
+def version_catalogo() -> int:
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, 1, timeout=None)
+        version = cache.get(CLAVE_VERSION, 1)
+    return version
+
+
+@receiver([post_save, post_delete], sender=Producto)
+def _nueva_version(sender, **kwargs):
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:  # la clave no existía (o expiró)
+        cache.set(CLAVE_VERSION, 1, timeout=None)
+
+
+def productos(ids: Iterable[int]) -> Dict[int, FilaProducto]:
+    """{id: FilaProducto} de los ids existentes; los faltantes en caché se leen en una consulta."""
+    ids = set(ids)
+    version = version_catalogo()
+    ahora = time.monotonic()
+    encontrados: Dict[int, FilaProducto] = {}
+    faltan = []
+    with _stock_lock:
+        for pk in ids:
+            entrada = _stock.get(pk)
+            if entrada and entrada[0] > ahora and entrada[1] == version:
+                if entrada[2] is not None:
+                    encontrados[pk] = entrada[2]
+            else:
+                faltan.append(pk)
+    if faltan:
+        leidos = {
+            pk: FilaProducto(pk, nombre, precio, stock)
+            for pk, nombre, precio, stock in Producto.objects.filter(id__in=faltan)
+            .values_list("id", "nombre", "precio", "stock")
+        }
+        vence = ahora + TTL_STOCK
+        with _stock_lock:
+            for pk in faltan:  # también se cachean los inexistentes
+                _stock[pk] = (vence, version, leidos.get(pk))
+        encontrados.update(leidos)
+    return encontrados
+
+
+# =============================
+#  VALIDACIÓN
+# =============================
+
+def _error(linea: int, sku: str, codigo: str, mensaje: str, **extra) -> Dict[str, object]:
+    return {"linea": linea, "sku": sku, "codigo": codigo, "mensaje": mensaje, **extra}
+
+
+def sku_a_id(sku: object) -> Optional[int]:
+    """'SKU-001', '1' o 1 → 1. None si no tiene forma de SKU."""
+    m = _SKU.match(str(sku if sku is not None else "").strip())
+    return int(m.group(1)) if m else None
+
+
+def validar_items(items: object) -> Tuple[List[Dict[str, object]], List[Dict[str, object]]]:
+    """
+    Retorna (lineas, errores). Cada error indica la línea (índice en `items`),
+    el SKU, un `codigo` estable para el cliente y un mensaje legible.
+    """
+    if not isinstance(items, list) or not items:
+        return [], [_error(-1, "", "vacio", "El carrito está vacío.")]
+    if len(items) > MAX_LINEAS:
+        return [], [_error(-1, "", "demasiadas_lineas", f"Máximo {MAX_LINEAS} líneas por carrito.")]
+
+    errores: List[Dict[str, object]] = []
+    pedidas: List[Tuple[int, str, Optional[int], int]] = []
+    vistos: Dict[int, int] = {}
+    for i, it in enumerate(items):
+        it = it if isinstance(it, dict) else {}
+        sku = str(it.get("sku", "")).strip()
+        pk = sku_a_id(sku)
+        try:
+            qty = int(it.get("qty") or 0)
+        except (TypeError, ValueError):
+            qty = 0
+        if pk is None:
+            errores.append(_error(i, sku, "sku_invalido", f"{sku or '(vacío)'}: SKU inválido."))
+        elif pk in vistos:
+            errores.append(_error(i, sku, "duplicado", f"{sku}: repetido (ver línea {vistos[pk]}).", linea_original=vistos[pk]))
+            pk = None
+        else:
+            vistos[pk] = i
+        if qty < 1:
+            errores.append(_error(i, sku, "cantidad_minima", f"{sku}: cantidad mínima 1."))
+        elif qty > MAX_QTY_PER_ITEM:
+            errores.append(_error(i, sku, "cantidad_maxima", f"{sku}: excede el máximo ({MAX_QTY_PER_ITEM}).", maximo=MAX_QTY_PER_ITEM))
+        pedidas.append((i, sku, pk, qty))
+
+    catalogo = productos(pk for _, _, pk, _ in pedidas if pk is not None)
+    lineas: List[Dict[str, object]] = []
+    for i, sku, pk, qty in pedidas:
+        if pk is None:
+            continue
+        fila = catalogo.get(pk)
+        if fila is None:
+            errores.append(_error(i, sku, "no_existe", f"{sku}: producto inexistente."))
+            continue
+        if qty > fila.stock:
+            errores.append(_error(i, sku, "sin_stock", f"{sku}: sin stock suficiente (disp: {fila.stock}).", disponible=fila.stock))
+        lineas.append({
+            "linea": i, "sku": sku, "producto_id": fila.id, "nombre": fila.nombre,
+            "qty": qty, "precio": str(fila.precio), "disponible": fila.stock,
+        })
+    errores.sort(key=lambda e: e["linea"])
+    return lineas, errores
+
+
+# =============================
+#  IDEMPOTENCIA
+# =============================
+
+def _clave_idempotencia(ambito: str, clave: str) -> str:
+    return hashlib.sha256(f"{ambito}\0{clave}".encode()).hexdigest()
+
+
+def huella(cuerpo: bytes) -> str:
+    return hashlib.sha256(cuerpo).hexdigest()
+
+
+def _vigentes_desde():
+    return timezone.now() - timedelta(seconds=TTL_IDEMPOTENCIA)
+
+
+def respuesta_guardada(ambito: str, clave: str) -> Optional[Tuple[str, int, Dict[str, object]]]:
+    """(huella del cuerpo, status, json) de una respuesta previa con la misma clave."""
+    fila = (
+        RespuestaIdempotente.objects
+        .filter(clave=_clave_idempotencia(ambito, clave), creada_en__gte=_vigentes_desde())
+        .values_list("huella", "status", "datos").first()
+    )
+    return tuple(fila) if fila else None
+
+
+def guardar_respuesta(ambito: str, clave: str, huella_cuerpo: str, status: int, datos: Dict[str, object]) -> None:
+    with transaction.atomic():
+        # las vencidas se borran al escribir (índice por creada_en: casi siempre 0 filas)
+        RespuestaIdempotente.objects.filter(creada_en__lt=_vigentes_desde()).delete()
+        # ignore_conflicts: si dos reintentos corren a la vez, gana la primera respuesta
+        RespuestaIdempotente.objects.bulk_create([
+            RespuestaIdempotente(clave=_clave_idempotencia(ambito, clave), huella=huella_cuerpo,
+                                 status=status, datos=datos),
+        ], ignore_conflicts=True)
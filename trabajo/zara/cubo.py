@@ -0,0 +1,110 @@
+# zara/cubo.py
+"""
+Cubo de conteos de la encuesta para drill-down con filtros cruzados.
+
+Cada respuesta se codifica en un índice por dimensión categórica (edad,
+género, canal, …) y se cuenta en un arreglo NumPy n-dimensional. Una
+consulta con filtros es un slice + suma sobre ese arreglo, sin volver a
+recorrer el DataFrame.
+
+El cubo se construye una vez por versión de datos (ver `views._cubo`).
+Si las dimensiones darían más de `MAX_CELDAS` celdas, no se materializa:
+se guardan los códigos por respuesta y cada consulta cuenta sobre ellos
+(máscara + bincount, O(respuestas)), con el mismo resultado.
+"""
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from .dependencias import numpy
+
+SIN_DATO = "Sin respuesta"
+
+# Límite de celdas del cubo (int64): ~8 MB
+MAX_CELDAS = 1_000_000
+
+
+class CuboEncuesta:
+    def __init__(self, dims: Sequence[str], etiquetas: Mapping[str, List[str]], conteos, total: int, codigos=None):
+        self.dims = list(dims)
+        self.etiquetas = {d: list(etiquetas[d]) for d in self.dims}
+        self._pos = {d: {lab: i for i, lab in enumerate(self.etiquetas[d])} for d in self.dims}
+        self.conteos = conteos  # None = cubo no materializado (ver `codigos`)
+        self.codigos = codigos  # {dimensión: arreglo de códigos por respuesta}
+        self.total = total
+
+    @classmethod
+    def construir(cls, columnas: Mapping[str, Iterable[str]], orden: Optional[Mapping[str, List[str]]] = None):
+        """
+        `columnas`: {dimensión: valores ya normalizados, uno por respuesta}.
+        `orden`: etiquetas en orden fijo para dimensiones ordinales (p. ej. Likert).
+        """
+        np = numpy()
+        orden = orden or {}
+        dims = list(columnas)
+        codigos, etiquetas = [], {}
+        n = None
+        for d in dims:
+            valores = [v or SIN_DATO for v in columnas[d]]
+            labs = list(orden.get(d) or sorted(set(valores) - {SIN_DATO}))
+            if SIN_DATO in valores and SIN_DATO not in labs:
+                labs.append(SIN_DATO)
+            pos = {lab: i for i, lab in enumerate(labs)}
+            extra = [v for v in dict.fromkeys(valores) if v not in pos]
+            for v in extra:  # valores fuera del orden fijo
+                pos[v] = len(labs)
+                labs.append(v)
+            codigos.append(np.fromiter((pos[v] for v in valores), dtype=np.int64, count=len(valores)))
+            etiquetas[d] = labs
+            n = len(valores)
+
+        forma = tuple(len(etiquetas[d]) for d in dims)
+        celdas = math.prod(forma) if forma else 0  # int de Python: sin desborde con muchas dimensiones
+        if not n:
+            return cls(dims, etiquetas, np.zeros(forma, dtype=np.int64), 0)
+
+        if celdas > MAX_CELDAS:
+            # demasiadas combinaciones para un arreglo denso: se cuenta al consultar
+            return cls(dims, etiquetas, None, n, codigos=dict(zip(dims, codigos)))
+        plano = np.ravel_multi_index(codigos, forma)
+        conteos = np.bincount(plano, minlength=celdas).reshape(forma)
+        return cls(dims, etiquetas, conteos, n)
+
+    def contar(self, eje: str, filtros: Optional[Mapping[str, Sequence[str]]] = None) -> Tuple[List[str], List[int]]:
+        """
+        Distribución de `eje` restringida a `filtros` ({dimensión: [valores]}).
+        Dentro de una dimensión los valores se suman (OR); entre dimensiones, AND.
+        """
+        if eje not in self._pos:
+            raise KeyError(eje)
+        if self.conteos is None:
+            return self._contar_directo(eje, filtros or {})
+        arr = self.conteos
+        for d, valores in (filtros or {}).items():
+            if d not in self._pos:
+                raise KeyError(d)
+            eje_d = self.dims.index(d)
+            idx = [self._pos[d][v] for v in valores if v in self._pos[d]]
+            arr = arr.take(idx, axis=eje_d).sum(axis=eje_d, keepdims=True)
+        i = self.dims.index(eje)
+        otros = tuple(k for k in range(arr.ndim) if k != i)
+        dist = arr.sum(axis=otros) if otros else arr
+        return self.etiquetas[eje], [int(x) for x in dist]
+
+    def _contar_directo(self, eje: str, filtros: Mapping[str, Sequence[str]]) -> Tuple[List[str], List[int]]:
+        np = numpy()
+        mascara = None
+        for d, valores in filtros.items():
+            if d not in self._pos:
+                raise KeyError(d)
+            idx = [self._pos[d][v] for v in valores if v in self._pos[d]]
+            m = np.isin(self.codigos[d], idx)
+            mascara = m if mascara is None else mascara & m
+        codigos = self.codigos[eje] if mascara is None else self.codigos[eje][mascara]
+        dist = np.bincount(codigos, minlength=len(self.etiquetas[eje]))
+        return self.etiquetas[eje], [int(x) for x in dist]
+
+    def dimensiones(self) -> Dict[str, List[str]]:
+        """Valores disponibles por dimensión (para armar filtros en el cliente)."""
+        return {d: list(self.etiquetas[d]) for d in self.dims}
@@ -0,0 +1,45 @@
+# zara/dependencias.py
+"""
+Acceso diferido a dependencias pesadas.
+
+pandas (y numpy por detrás) se importan recién en la primera vista que los
+usa, no al resolver URLs. Así los workers arrancan más rápido y las páginas
+que no tocan la encuesta no cargan esas librerías.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def pandas():
+    import pandas as pd
+    return pd
+
+
+@lru_cache(maxsize=None)
+def numpy():
+    import numpy as np
+    return np
+
+
+@lru_cache(maxsize=None)
+def pyarrow():
+    """pyarrow es opcional: None si no está instalado."""
+    try:
+        import pyarrow as pa
+        import pyarrow.feather  # noqa: F401
+    except ImportError:
+        return None
+    return pa
+
+
+@lru_cache(maxsize=None)
+def matplotlib():
+    """matplotlib es opcional (PNG de gráficos): None si no está instalado."""
+    try:
+        import matplotlib as mpl
+    except ImportError:
+        return None
+    mpl.use("Agg")
+    return mpl
@@ -0,0 +1,171 @@
+# zara/graficos.py
+"""
+Render de gráficos del informe en el servidor (correo, clientes sin JS).
+
+- SVG: Python puro, siempre disponible.
+- PNG: matplotlib (opcional); `render_png` retorna None si no está instalado.
+
+Ambos reciben el mismo dict que usa Chart.js: {"type", "labels", "data"}.
+El caché por (gráfico, versión de datos) vive en `views._imagen_version`.
+"""
+from __future__ import annotations
+
+import io
+import math
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from .dependencias import matplotlib
+
+PALETA_TORTA = ["#A9BE70", "#B6A68E", "#D3A39A", "#837060", "#F1E8D9"]
+PALETA_BARRAS = ["#A9BE70", "#B6A68E", "#D3A39A", "#837060", "#a8a29e", "#94a3b8", "#c7d2fe"]
+TINTA = "#1f2328"
+GRILLA = "rgba(0,0,0,0.06)"
+
+ANCHO, ALTO = 640, 360
+
+
+def _limpiar(chart: Dict[str, object]) -> Tuple[List[str], List[float]]:
+    """Igual que `cleanData` del informe: descarta etiquetas vacías / nan / undefined."""
+    labels, data = [], []
+    for label, valor in zip(chart.get("labels") or [], chart.get("data") or []):
+        texto = str(label if label is not None else "").strip()
+        if not texto or texto.lower() in ("nan", "undefined"):
+            continue
+        labels.append(texto)
+        data.append(float(valor or 0))
+    return labels, data
+
+
+def _girar(labels: List[str]) -> bool:
+    """Etiquetas del eje X en diagonal si no caben horizontales."""
+    return len(labels) > 6 or sum(len(l) for l in labels) > 48
+
+
+def _num(v: float) -> str:
+    return f"{v:.0f}" if float(v).is_integer() else f"{v:.1f}"
+
+
+# =============================
+#  SVG
+# =============================
+
+def _svg_barras(labels: List[str], data: List[float]) -> List[str]:
+    girar = _girar(labels)
+    izq, der, arriba, abajo = 48, 16, 48, (120 if girar else 40)
+    ancho, alto = ANCHO - izq - der, ALTO - arriba - abajo
+    maximo = max(data) if data and max(data) > 0 else 1
+    partes = []
+    for i in range(5):  # grilla horizontal
+        y = arriba + alto - alto * i / 4
+        partes.append(f'<line x1="{izq}" y1="{y:.1f}" x2="{izq + ancho}" y2="{y:.1f}" stroke="{GRILLA}"/>')
+        partes.append(
+            f'<text x="{izq - 6}" y="{y + 4:.1f}" text-anchor="end" font-size="11">{_num(maximo * i / 4)}</text>'
+        )
+    paso = ancho / max(len(data), 1)
+    barra = paso * 0.7
+    for i, (label, valor) in enumerate(zip(labels, data)):
+        h = alto * valor / maximo
+        x = izq + paso * i + (paso - barra) / 2
+        y = arriba + alto - h
+        color = PALETA_BARRAS[i % len(PALETA_BARRAS)]
+        partes.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{barra:.1f}" height="{h:.1f}" rx="6" fill="{color}"/>')
+        partes.append(
+            f'<text x="{x + barra / 2:.1f}" y="{y - 4:.1f}" text-anchor="middle" font-size="11">{_num(valor)}</text>'
+        )
+        cx, cy = x + barra / 2, arriba + alto + 14
+        if girar:
+            partes.append(
+                f'<text x="{cx:.1f}" y="{cy:.1f}" text-anchor="end" font-size="11" '
+                f'transform="rotate(-35 {cx:.1f} {cy:.1f})">{escape(label[:28])}</text>'
+            )
+        else:
+            partes.append(f'<text x="{cx:.1f}" y="{cy:.1f}" text-anchor="middle" font-size="11">{escape(label[:20])}</text>')
+    return partes
+
+
+def _svg_torta(labels: List[str], data: List[float], dona: bool) -> List[str]:
+    total = sum(data)
+    cx, cy, r = 180, ALTO / 2 + 12, 130
+    partes = []
+    if total <= 0:
+        partes.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="#eee"/>')
+    angulo = -math.pi / 2
+    for i, valor in enumerate(data):
+        if valor <= 0:
+            continue
+        color = PALETA_TORTA[i % len(PALETA_TORTA)]
+        if valor >= total:
+            partes.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="{color}"/>')
+            continue
+        fin = angulo + 2 * math.pi * valor / total
+        x1, y1 = cx + r * math.cos(angulo), cy + r * math.sin(angulo)
+        x2, y2 = cx + r * math.cos(fin), cy + r * math.sin(fin)
+        grande = 1 if fin - angulo > math.pi else 0
+        partes.append(
+            f'<path d="M{cx},{cy} L{x1:.2f},{y1:.2f} A{r},{r} 0 {grande} 1 {x2:.2f},{y2:.2f} Z" '
+            f'fill="{color}" stroke="#fff" stroke-width="2"/>'
+        )
+        angulo = fin
+    if dona:
+        partes.append(f'<circle cx="{cx}" cy="{cy}" r="{r * 0.5:.1f}" fill="#fff"/>')
+    for i, (label, valor) in enumerate(zip(labels, data)):  # leyenda
+        y = 70 + i * 22
+        pct = f" ({valor * 100 / total:.1f}%)" if total else ""
+        partes.append(f'<rect x="350" y="{y - 11}" width="14" height="14" rx="3" fill="{PALETA_TORTA[i % len(PALETA_TORTA)]}"/>')
+        partes.append(f'<text x="372" y="{y}" font-size="12">{escape(label[:30])}: {_num(valor)}{pct}</text>')
+    return partes
+
+
+def render_svg(chart: Dict[str, object], titulo: str = "") -> bytes:
+    labels, data = _limpiar(chart)
+    tipo = chart.get("type") or "bar"
+    if tipo in ("pie", "doughnut"):
+        cuerpo = _svg_torta(labels, data, dona=tipo == "doughnut")
+    else:
+        cuerpo = _svg_barras(labels, data)
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{ANCHO}" height="{ALTO}" '
+        f'viewBox="0 0 {ANCHO} {ALTO}" font-family="Helvetica, Arial, sans-serif" fill="{TINTA}">'
+        f'<rect width="100%" height="100%" fill="#fff"/>'
+        f'<text x="16" y="26" font-size="15" font-weight="700">{escape(titulo)}</text>'
+        + "".join(cuerpo)
+        + "</svg>"
+    )
+    return svg.encode("utf-8")
+
+
+# =============================
+#  PNG (matplotlib opcional)
+# =============================
+
+def render_png(chart: Dict[str, object], titulo: str = "") -> Optional[bytes]:
+    mpl = matplotlib()
+    if mpl is None:
+        return None
+    from matplotlib.figure import Figure
+
+    labels, data = _limpiar(chart)
+    tipo = chart.get("type") or "bar"
+    fig = Figure(figsize=(ANCHO / 100, ALTO / 100), dpi=100)
+    ax = fig.add_subplot()
+    if tipo in ("pie", "doughnut"):
+        colores = [PALETA_TORTA[i % len(PALETA_TORTA)] for i in range(len(data))]
+        if sum(data) > 0:
+            ax.pie(
+                data, labels=labels, colors=colores, autopct="%1.1f%%", startangle=90, counterclock=False,
+                wedgeprops={"width": 0.5} if tipo == "doughnut" else None,
+            )
+        ax.axis("equal")
+    else:
+        colores = [PALETA_BARRAS[i % len(PALETA_BARRAS)] for i in range(len(data))]
+        ax.bar(range(len(data)), data, color=colores)
+        girar = _girar(labels)
+        ax.set_xticks(range(len(data)), labels, rotation=35 if girar else 0, ha="right" if girar else "center")
+        ax.grid(axis="y", alpha=0.3)
+        ax.spines[["top", "right"]].set_visible(False)
+    ax.set_title(titulo, loc="left", fontsize=12, fontweight="bold")
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
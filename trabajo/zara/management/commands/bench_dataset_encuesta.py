@@ -0,0 +1,97 @@
+# zara/management/commands/bench_dataset_encuesta.py
+"""
+Benchmark: carga del dataset de encuesta desde CSV vs. caché Arrow.
+
+Genera un CSV sintético de N filas (muestreando las respuestas reales) y
+mide cada escenario en un proceso nuevo (tiempo y RSS agregado):
+- csv:          read_csv + limpieza (lo que hacía cada worker),
+- arrow_build:  primera carga (CSV + limpieza + escritura de la caché),
+- arrow_mmap:   cargas siguientes desde la caché con memory-map.
+
+RssAnon es memoria privada del proceso; RssFile son páginas del archivo
+mapeado, compartidas entre workers vía page cache.
+"""
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from zara import cache_dataset
+from zara.dependencias import pandas, pyarrow
+from zara.views import _csv_absolute_path, _limpiar_df
+
+
+def _rss_kb():
+    campos = {}
+    with open("/proc/self/status") as fh:
+        for linea in fh:
+            clave, _, resto = linea.partition(":")
+            if clave in ("VmRSS", "RssAnon", "RssFile"):
+                campos[clave] = int(resto.split()[0])
+    return campos
+
+
+class Command(BaseCommand):
+    help = "Compara tiempo de carga y RSS del dataset: CSV vs. caché Arrow con memory-map."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=1_000_000)
+        # Uso interno: un escenario por proceso hijo
+        parser.add_argument("--escenario", help="csv | arrow (interno)")
+        parser.add_argument("--csv", help="(interno)")
+        parser.add_argument("--cache-dir", help="(interno)")
+
+    def handle(self, *args, **opts):
+        if pyarrow() is None:
+            raise CommandError("pyarrow no está instalado: la caché Arrow está deshabilitada.")
+        if opts["escenario"]:
+            return self._medir(opts)
+
+        pd = pandas()
+        base = pd.read_csv(_csv_absolute_path(), encoding="utf-8-sig")
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = Path(tmp) / "respuestas.csv"
+            base.sample(n=opts["filas"], replace=True, random_state=7).to_csv(
+                csv_path, index=False, encoding="utf-8-sig"
+            )
+            self.stdout.write(f"CSV sintético: {opts['filas']:,} filas, {csv_path.stat().st_size / 2**20:.1f} MB")
+
+            for nombre, escenario in (("csv", "csv"), ("arrow_build", "arrow"), ("arrow_mmap", "arrow")):
+                proc = subprocess.run(
+                    [sys.executable, str(Path(settings.BASE_DIR) / "manage.py"), "bench_dataset_encuesta",
+                     "--escenario", escenario, "--csv", str(csv_path), "--cache-dir", str(Path(tmp) / "cache")],
+                    capture_output=True, text=True, check=True,
+                )
+                r = json.loads(proc.stdout.strip().splitlines()[-1])
+                self.stdout.write(
+                    f"{nombre:<12} {r['s']:>7.2f} s   RSS +{r['rss']:>7.1f} MB "
+                    f"(anon +{r['anon']:.1f} MB, archivo +{r['file']:.1f} MB)"
+                )
+
+    def _medir(self, opts):
+        pd = pandas()
+        csv_path = opts["csv"]
+        antes = _rss_kb()
+        t0 = time.perf_counter()
+        if opts["escenario"] == "csv":
+            df = _limpiar_df(pd.read_csv(csv_path, encoding="utf-8-sig"))
+        else:
+            with override_settings(ENCUESTA_CACHE_DIR=opts["cache_dir"]):
+                ruta = cache_dataset.ruta_cache(csv_path)
+                df = cache_dataset.leer(ruta)
+                if df is None:
+                    df = _limpiar_df(pd.read_csv(csv_path, encoding="utf-8-sig"))
+                    cache_dataset.escribir(ruta, df)
+        segundos = time.perf_counter() - t0
+        despues = _rss_kb()
+        delta = {k: (despues.get(k, 0) - antes.get(k, 0)) / 1024 for k in ("VmRSS", "RssAnon", "RssFile")}
+        self.stdout.write(json.dumps({
+            "s": segundos, "filas": len(df),
+            "rss": delta["VmRSS"], "anon": delta["RssAnon"], "file": delta["RssFile"],
+        }))
@@ -0,0 +1,136 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:01
+
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaniaEncuesta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=120, unique=True)),
+                ('activa', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Carrito',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Cupon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=30, unique=True)),
+                ('descuento_porcentaje', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(90)])),
+                ('vigente_desde', models.DateTimeField()),
+                ('vigente_hasta', models.DateTimeField()),
+                ('activo', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ItemCarrito',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10)])),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Pedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email_cliente', models.EmailField(max_length=254, validators=[django.core.validators.EmailValidator()])),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('total_pagado', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Producto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=160, unique=True)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.0'))])),
+                ('stock', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RespuestaEncuesta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('consentimiento', models.BooleanField(default=False)),
+                ('rating_sustentabilidad', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)])),
+                ('rating_calidad', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)])),
+                ('comentario', models.TextField(blank=True)),
+                ('enviado_en', models.DateTimeField(auto_now_add=True)),
+                ('campania', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='zara.campaniaencuesta')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='producto',
+            constraint=models.CheckConstraint(check=models.Q(('precio__gte', 0)), name='precio_no_negativo'),
+        ),
+        migrations.AddConstraint(
+            model_name='producto',
+            constraint=models.CheckConstraint(check=models.Q(('stock__gte', 0)), name='stock_no_negativo'),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='carrito',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, to='zara.carrito'),
+        ),
+        migrations.AddField(
+            model_name='itemcarrito',
+            name='carrito',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='zara.carrito'),
+        ),
+        migrations.AddField(
+            model_name='itemcarrito',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='zara.producto'),
+        ),
+        migrations.AddField(
+            model_name='carrito',
+            name='cupon',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='zara.cupon'),
+        ),
+        migrations.AddConstraint(
+            model_name='respuestaencuesta',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), models.F('campania'), name='unica_respuesta_por_email_y_campania'),
+        ),
+        migrations.AddConstraint(
+            model_name='respuestaencuesta',
+            constraint=models.CheckConstraint(check=models.Q(('rating_sustentabilidad__gte', 1), ('rating_sustentabilidad__lte', 5)), name='rating_sustentabilidad_1_5'),
+        ),
+        migrations.AddConstraint(
+            model_name='respuestaencuesta',
+            constraint=models.CheckConstraint(check=models.Q(('rating_calidad__gte', 1), ('rating_calidad__lte', 5)), name='rating_calidad_1_5'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemcarrito',
+            constraint=models.CheckConstraint(check=models.Q(('cantidad__gte', 1)), name='cantidad_minima_1'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemcarrito',
+            constraint=models.CheckConstraint(check=models.Q(('cantidad__lte', 10)), name='cantidad_maxima_10'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='itemcarrito',
+            unique_together={('carrito', 'producto')},
+        ),
+    ]
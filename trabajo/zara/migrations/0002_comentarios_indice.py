@@ -0,0 +1,14 @@
+# Generated by Django 4.2.30 on 2026-10-19 20:08
+
+from django.db import migrations
+
+from comun.migraciones import indice_comentarios
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0001_initial'),
+    ]
+
+    operations = indice_comentarios()
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 20:11
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0002_comentarios_indice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespuestaIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True)),
+                ('huella', models.CharField(max_length=64)),
+                ('status', models.PositiveSmallIntegerField()),
+                ('datos', models.JSONField()),
+                ('creada_en', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator, EmailValidator
 from django.utils import timezone
@@ -51,13 +51,16 @@ class Carrito(models.Model):
         return not self.items.exists()
 
     def subtotal(self) -> Decimal:
-        return sum((it.cantidad * it.precio_unitario for it in self.items.all()), Decimal("0.00"))
+        total = sum((it.cantidad * it.precio_unitario for it in self.items.all()), Decimal("0.00"))
+        return total.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
     def total(self) -> Decimal:
+        # Misma regla que zara.precios: HALF_UP al centavo tras el descuento
         total = self.subtotal()
         if self.cupon and self.cupon.esta_vigente():
-            total = total * (Decimal("1.0") - Decimal(self.cupon.descuento_porcentaje) / Decimal("100"))
-        return total.quantize(Decimal("0.01"))
+            factor = Decimal("1.00") - (Decimal(self.cupon.descuento_porcentaje) / Decimal("100"))
+            total = (total * factor).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        return total
 
 class ItemCarrito(models.Model):
     carrito = models.ForeignKey('Carrito', related_name="items", on_delete=models.CASCADE)
@@ -72,6 +75,12 @@ class ItemCarrito(models.Model):
             models.CheckConstraint(check=models.Q(cantidad__lte=MAX_QTY_PER_ITEM), name="cantidad_maxima_10"),
         ]
 
+    def save(self, *args, **kwargs):
+        # Foto del precio vigente si no se fijó al agregar (ver zara.precios.agregar_item)
+        if self.precio_unitario is None and self.producto_id:
+            self.precio_unitario = Producto.objects.values_list("precio", flat=True).get(pk=self.producto_id)
+        super().save(*args, **kwargs)
+
     def clean(self):
         from django.core.exceptions import ValidationError
         # No superar stock ni el máximo por ítem (el máximo ya lo valida el field)
@@ -91,6 +100,14 @@ class Pedido(models.Model):
     def __str__(self) -> str:
         return f"Pedido #{self.pk} - {self.email_cliente}"
 
+class RespuestaIdempotente(models.Model):
+    """Respuesta guardada por `Idempotency-Key` (ver zara.carrito); la primera gana."""
+    clave = models.CharField(max_length=64, unique=True)  # sha256(ámbito, clave del cliente)
+    huella = models.CharField(max_length=64)              # sha256 del cuerpo
+    status = models.PositiveSmallIntegerField()
+    datos = models.JSONField()
+    creada_en = models.DateTimeField(default=timezone.now, db_index=True)
+
 # ENCUESTA
 class CampaniaEncuesta(models.Model):
     nombre = models.CharField(max_length=120, unique=True)
@@ -107,8 +124,16 @@ class RespuestaEncuesta(models.Model):
     rating_calidad = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comentario = models.TextField(blank=True)
     enviado_en = models.DateTimeField(auto_now_add=True)
+    # Lo marca comun.comentarios al pasar el comentario al índice de términos
+    comentario_indexado = models.BooleanField(default=False, editable=False)
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"], condition=models.Q(comentario_indexado=False),
+                name="respuesta_por_indexar",
+            ),
+        ]
         constraints = [
             # Un email solo una vez por campaña (case-insensitive)
             models.UniqueConstraint(
@@ -131,4 +156,49 @@ class RespuestaEncuesta(models.Model):
             raise ValidationError("Debes aceptar consentimiento para enviar la encuesta.")
 
     def __str__(self) -> str:
-        return f"{self.email} · {self.campania}"
\ No newline at end of file
+        return f"{self.email} · {self.campania}"
+
+
+class TerminoComentario(models.Model):
+    """
+    Índice invertido de `RespuestaEncuesta.comentario`: una fila por
+    (respuesta, término distinto). Lo mantiene `comun.comentarios`.
+    """
+    respuesta = models.ForeignKey("RespuestaEncuesta", on_delete=models.CASCADE, related_name="terminos")
+    campania = models.ForeignKey("CampaniaEncuesta", on_delete=models.CASCADE)
+    termino = models.CharField(max_length=40)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["termino", "respuesta"], name="termino_unico_por_respuesta"),
+        ]
+        indexes = [models.Index(fields=["campania", "termino"])]
+
+
+class FrecuenciaTermino(models.Model):
+    """Respuestas por campaña que contienen el término (df)."""
+    campania = models.ForeignKey("CampaniaEncuesta", on_delete=models.CASCADE)
+    termino = models.CharField(max_length=40)
+    documentos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["campania", "termino"], name="frecuencia_unica_por_campania"),
+        ]
+        indexes = [models.Index(fields=["campania", "-documentos"])]
+
+
+class CoocurrenciaTermino(models.Model):
+    """Respuestas por campaña donde aparecen ambos términos (termino_a < termino_b)."""
+    campania = models.ForeignKey("CampaniaEncuesta", on_delete=models.CASCADE)
+    termino_a = models.CharField(max_length=40)
+    termino_b = models.CharField(max_length=40)
+    documentos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["campania", "termino_a", "termino_b"], name="coocurrencia_unica_por_campania",
+            ),
+        ]
+        indexes = [models.Index(fields=["campania", "-documentos"])]
\ No newline at end of file
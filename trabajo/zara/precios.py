@@ -0,0 +1,171 @@
+# zara/precios.py
+"""
+Precios del carrito en centavos enteros.
+
+Regla única para todos los caminos (modelo, SQL, checkout):
+- subtotal = Σ cantidad × precio_unitario (exacto: precios con 2 decimales),
+- total = subtotal × (100 − % cupón) / 100, redondeado HALF_UP al centavo.
+
+`ItemCarrito.precio_unitario` es la foto de `Producto.precio` al agregar el
+ítem; cambios posteriores de precio no alteran carritos existentes.
+El total por carrito se cachea en el caché compartido (`CACHES["default"]`,
+el mismo para todos los workers) y se invalida al cambiar sus ítems o
+cupón: al momento y otra vez al confirmar la transacción, por si otro
+worker volvió a cachear el total viejo mientras tanto.
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, F, Sum
+from django.db.models.functions import Cast, Round
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Carrito, Cupon, ItemCarrito, Producto
+
+TTL_TOTAL = 300
+CENTAVO = Decimal("0.01")
+
+
+def a_centavos(monto: Decimal) -> int:
+    return int((Decimal(monto) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def de_centavos(centavos: int) -> Decimal:
+    return (Decimal(centavos) / 100).quantize(CENTAVO)
+
+
+def aplicar_descuento(subtotal_centavos: int, porcentaje: int) -> int:
+    """HALF_UP en enteros (montos no negativos)."""
+    if not porcentaje:
+        return subtotal_centavos
+    return (subtotal_centavos * (100 - porcentaje) + 50) // 100
+
+
+def total_centavos(lineas: Iterable[Tuple[int, int]], porcentaje: int = 0) -> Tuple[int, int]:
+    """(subtotal, total) en centavos para [(cantidad, precio_centavos)]."""
+    subtotal = sum(cantidad * precio for cantidad, precio in lineas)
+    return subtotal, aplicar_descuento(subtotal, porcentaje)
+
+
+# =============================
+#  FOTO DE PRECIO
+# =============================
+
+def agregar_item(carrito: Carrito, producto_id: int, cantidad: int = 1) -> ItemCarrito:
+    """
+    Agrega (o suma cantidad a) un ítem guardando el precio vigente del producto.
+    Si el ítem ya existía conserva su precio original.
+    """
+    precio = Producto.objects.values_list("precio", flat=True).get(pk=producto_id)
+    with transaction.atomic():
+        item, creado = ItemCarrito.objects.select_for_update().get_or_create(
+            carrito=carrito, producto_id=producto_id,
+            defaults={"cantidad": cantidad, "precio_unitario": precio},
+        )
+        if not creado:
+            item.cantidad = F("cantidad") + cantidad
+            item.save(update_fields=["cantidad"])
+            item.refresh_from_db(fields=["cantidad"])
+    return item
+
+
+# =============================
+#  TOTALES (una consulta)
+# =============================
+
+@dataclass(frozen=True)
+class Totales:
+    lineas: int
+    unidades: int
+    subtotal_centavos: int
+    descuento_porcentaje: int
+    total_centavos: int
+
+    @property
+    def subtotal(self) -> Decimal:
+        return de_centavos(self.subtotal_centavos)
+
+    @property
+    def total(self) -> Decimal:
+        return de_centavos(self.total_centavos)
+
+
+def _clave(carrito_id: int) -> str:
+    return f"zara:carrito:{carrito_id}:totales"
+
+
+def _calcular(carrito_id: int) -> Tuple[Totales, Optional[datetime]]:
+    """Subtotal y cupón en un solo SELECT agregado (centavos enteros en la BD)."""
+    precio_centavos = Cast(Round(F("items__precio_unitario") * 100), BigIntegerField())
+    fila = (
+        Carrito.objects.filter(pk=carrito_id)
+        .annotate(
+            _lineas=Count("items"),
+            _unidades=Sum("items__cantidad"),
+            _subtotal=Sum(F("items__cantidad") * precio_centavos, output_field=BigIntegerField()),
+        )
+        .values("_lineas", "_unidades", "_subtotal", "cupon__descuento_porcentaje",
+                "cupon__activo", "cupon__vigente_desde", "cupon__vigente_hasta")
+        .get()
+    )
+    porcentaje = 0
+    if fila["cupon__activo"] and fila["cupon__vigente_desde"] <= timezone.now() <= fila["cupon__vigente_hasta"]:
+        porcentaje = fila["cupon__descuento_porcentaje"]
+    subtotal = fila["_subtotal"] or 0
+    return Totales(
+        lineas=fila["_lineas"],
+        unidades=fila["_unidades"] or 0,
+        subtotal_centavos=subtotal,
+        descuento_porcentaje=porcentaje,
+        total_centavos=aplicar_descuento(subtotal, porcentaje),
+    ), fila["cupon__vigente_hasta"] if porcentaje else None
+
+
+def calcular_totales(carrito_id: int) -> Totales:
+    """Totales sin caché."""
+    return _calcular(carrito_id)[0]
+
+
+def totales(carrito_id: int) -> Totales:
+    """Totales cacheados; expiran antes si el cupón vence."""
+    datos = cache.get(_clave(carrito_id))
+    if datos is not None:
+        return Totales(**datos)
+    resultado, vence = _calcular(carrito_id)
+    ttl = TTL_TOTAL
+    if vence is not None:
+        ttl = max(1, min(ttl, int((vence - timezone.now()).total_seconds())))
+    cache.set(_clave(carrito_id), asdict(resultado), timeout=ttl)
+    return resultado
+
+
+def invalidar(carrito_id: int) -> None:
+    clave = _clave(carrito_id)
+    cache.delete(clave)
+    transaction.on_commit(lambda: cache.delete(clave))
+
+
+@receiver([post_save, post_delete], sender=ItemCarrito)
+def _invalidar_por_item(sender, instance, **kwargs):
+    invalidar(instance.carrito_id)
+
+
+@receiver(post_save, sender=Carrito)
+def _invalidar_por_cupon(sender, instance, created, **kwargs):
+    if not created:
+        invalidar(instance.pk)
+
+
+@receiver(post_save, sender=Cupon)
+def _invalidar_por_cambio_de_cupon(sender, instance, **kwargs):
+    claves = [_clave(pk) for pk in Carrito.objects.filter(cupon=instance).values_list("pk", flat=True)]
+    cache.delete_many(claves)
+    transaction.on_commit(lambda: cache.delete_many(claves))
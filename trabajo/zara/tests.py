@@ -1,3 +1,327 @@
-from django.test import TestCase
+import dataclasses
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from comun import comentarios
+
+from . import cache_dataset, cubo, precios, views
+from .models import (
+    CampaniaEncuesta, Carrito, Cupon, ItemCarrito, Producto, RespuestaEncuesta, RespuestaIdempotente,
+)
+
+# el caché de settings vive en var/: los tests usan uno en memoria para no arrastrar datos entre corridas
+CACHE_PRUEBAS = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def _total_decimal(lineas, porcentaje):
+    """Referencia: la aritmética de `Carrito.total` con Decimal."""
+    subtotal = sum((Decimal(c) * p for c, p in lineas), Decimal("0.00")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    if porcentaje:
+        factor = Decimal("1.00") - Decimal(porcentaje) / Decimal("100")
+        return subtotal, (subtotal * factor).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return subtotal, subtotal
+
+
+def _precio_al_azar(rnd):
+    return Decimal(rnd.randint(1, 99_999_99)) / 100
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class TotalesCarritoTests(TestCase):
+    """Todos los caminos de cálculo del total deben coincidir al centavo."""
+
+    def test_centavos_coincide_con_decimal(self):
+        # ZARA_PROP_CARRITOS=1000000 para la corrida larga (~15 s)
+        rnd = random.Random(20251)
+        n = int(os.getenv("ZARA_PROP_CARRITOS", 10_000))
+        for _ in range(n):
+            lineas = [(rnd.randint(1, 10), _precio_al_azar(rnd)) for _ in range(rnd.randint(0, 6))]
+            porcentaje = rnd.choice((0, 0, rnd.randint(1, 90)))
+            sub, tot = precios.total_centavos([(c, precios.a_centavos(p)) for c, p in lineas], porcentaje)
+            esperado = _total_decimal(lineas, porcentaje)
+            if (precios.de_centavos(sub), precios.de_centavos(tot)) != esperado:
+                self.fail(f"{lineas} -{porcentaje}%: {sub}/{tot} != {esperado}")
+
+    def test_modelo_sql_cache_y_checkout_coinciden(self):
+        rnd = random.Random(7)
+        productos = [
+            Producto.objects.create(nombre=f"P{i}", precio=_precio_al_azar(rnd), stock=50) for i in range(40)
+        ]
+        ahora = timezone.now()
+        cupon = Cupon.objects.create(
+            codigo="TEST15", descuento_porcentaje=15,
+            vigente_desde=ahora - timedelta(days=1), vigente_hasta=ahora + timedelta(days=1),
+        )
+        for i in range(150):
+            carrito = Carrito.objects.create(cupon=cupon if i % 3 == 0 else None)
+            elegidos = rnd.sample(productos, rnd.randint(1, 5))
+            for p in elegidos:
+                precios.agregar_item(carrito, p.pk, rnd.randint(1, 10))
+
+            modelo = carrito.total()
+            self.assertEqual(precios.calcular_totales(carrito.pk).total, modelo)
+            self.assertEqual(precios.totales(carrito.pk).total, modelo)
+            self.assertEqual(precios.totales(carrito.pk).total, modelo)  # desde caché
+
+            if carrito.cupon_id is None:
+                items = [{"sku": str(it.producto_id), "qty": it.cantidad} for it in carrito.items.all()]
+                resp = self.client.post(
+                    "/api/checkout-simulado/", json.dumps({"email": "a@b.cl", "items": items}),
+                    content_type="application/json", HTTP_HOST="localhost",
+                )
+                self.assertEqual(Decimal(resp.json()["total_final"]), modelo)
+
+    def test_sql_modelo_y_checkout_en_bordes_de_redondeo(self):
+        """Totales de la BD (agregado SQL), `Carrito.total()` y la vista contra la referencia Decimal."""
+        precios_borde = [Decimal("0.01"), Decimal("0.05"), Decimal("0.49"), Decimal("33.33"), Decimal("99999999.99")]
+        productos = [Producto.objects.create(nombre=f"B{i}", precio=p, stock=50) for i, p in enumerate(precios_borde)]
+        ahora = timezone.now()
+        for porcentaje in (0, 1, 7, 33, 90):
+            cupon = None
+            if porcentaje:
+                cupon = Cupon.objects.create(
+                    codigo=f"BORDE{porcentaje}", descuento_porcentaje=porcentaje,
+                    vigente_desde=ahora - timedelta(days=1), vigente_hasta=ahora + timedelta(days=1),
+                )
+            for cantidad in (1, 3, 10):
+                carrito = Carrito.objects.create(cupon=cupon)
+                for p in productos:
+                    precios.agregar_item(carrito, p.pk, cantidad)
+                _, esperado = _total_decimal([(cantidad, p.precio) for p in productos], porcentaje)
+                with self.subTest(porcentaje=porcentaje, cantidad=cantidad):
+                    self.assertEqual(precios.calcular_totales(carrito.pk).total, esperado)
+                    self.assertEqual(Carrito.objects.get(pk=carrito.pk).total(), esperado)
+                    if not porcentaje:
+                        items = [{"sku": str(p.pk), "qty": cantidad} for p in productos]
+                        resp = self.client.post(
+                            reverse("zara:api_checkout_simulado"), json.dumps({"email": "a@b.cl", "items": items}),
+                            content_type="application/json", HTTP_HOST="localhost",
+                        )
+                        self.assertEqual(Decimal(resp.json()["total_final"]), esperado)
+
+    def test_invalida_otra_vez_al_confirmar(self):
+        p = Producto.objects.create(nombre="Polera", precio=Decimal("5.00"), stock=10)
+        carrito = Carrito.objects.create()
+        precios.agregar_item(carrito, p.pk, 1)
+        viejo = precios.totales(carrito.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            precios.agregar_item(carrito, p.pk, 1)
+            # otro worker lee antes del commit y vuelve a cachear el total viejo
+            precios.cache.set(precios._clave(carrito.pk), dataclasses.asdict(viejo))
+        self.assertEqual(precios.totales(carrito.pk).total, Decimal("10.00"))
+
+    def test_precio_se_congela_y_cache_se_invalida(self):
+        p = Producto.objects.create(nombre="Blazer", precio=Decimal("19.99"), stock=10)
+        carrito = Carrito.objects.create()
+        precios.agregar_item(carrito, p.pk, 2)
+        self.assertEqual(precios.totales(carrito.pk).total, Decimal("39.98"))
+
+        p.precio = Decimal("29.99")
+        p.save()
+        self.assertEqual(precios.totales(carrito.pk).total, Decimal("39.98"))
+
+        precios.agregar_item(carrito, p.pk, 1)
+        item = ItemCarrito.objects.get(carrito=carrito)
+        self.assertEqual((item.cantidad, item.precio_unitario), (3, Decimal("19.99")))
+        self.assertEqual(precios.totales(carrito.pk).total, Decimal("59.97"))
+
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class CarritoValidarTests(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre="Camisa", precio=Decimal("10.00"), stock=5)
+
+    def _post(self, url, cuerpo, clave=None):
+        extra = {"HTTP_IDEMPOTENCY_KEY": clave} if clave else {}
+        return self.client.post(url, cuerpo, content_type="application/json", HTTP_HOST="localhost", **extra)
+
+    def test_idempotency_key_en_tabla(self):
+        url = reverse("zara:api_carrito_validar")
+        cuerpo = json.dumps({"items": [{"sku": str(self.producto.pk), "qty": 2}]})
+        primera = self._post(url, cuerpo, "k1")
+        self.assertEqual(primera.status_code, 200)
+
+        self.producto.stock = 0
+        self.producto.save()
+        repetida = self._post(url, cuerpo, "k1")
+        self.assertEqual((repetida.status_code, repetida["Idempotent-Replayed"]), (200, "true"))
+        self.assertEqual(repetida.json(), primera.json())
+        self.assertEqual(RespuestaIdempotente.objects.count(), 1)
+        self.assertEqual(self._post(url, cuerpo.replace('"qty": 2', '"qty": 1'), "k1").status_code, 422)
+
+        # vencida: se valida de nuevo (y la fila vieja se borra al guardar la nueva)
+        RespuestaIdempotente.objects.update(creada_en=timezone.now() - timedelta(days=2))
+        self.assertEqual(self._post(url, cuerpo, "k1").status_code, 400)
+        self.assertEqual(RespuestaIdempotente.objects.get().status, 400)
+
+    def test_cuerpo_que_no_es_objeto_es_400(self):
+        for nombre in ("api_carrito_validar", "api_checkout_simulado", "api_validar_cupon"):
+            for cuerpo in ("[1]", '"x"', "null", "no es json"):
+                with self.subTest(api=nombre, cuerpo=cuerpo):
+                    self.assertEqual(self._post(reverse(f"zara:{nombre}"), cuerpo).status_code, 400)
+
+
+class CuboEncuestaTests(TestCase):
+    """Sobre `MAX_CELDAS` el cubo no se materializa, pero responde lo mismo."""
+
+    def test_sin_materializar_coincide(self):
+        rnd = random.Random(3)
+        columnas = {
+            "genero": [rnd.choice(["F", "M", ""]) for _ in range(500)],
+            "edad": [rnd.choice(["18-24", "25-34", "35-44"]) for _ in range(500)],
+            "canal": [f"c{rnd.randint(0, 40)}" for _ in range(500)],
+        }
+        denso = cubo.CuboEncuesta.construir(columnas)
+        with mock.patch.object(cubo, "MAX_CELDAS", 10):
+            directo = cubo.CuboEncuesta.construir(columnas)
+        self.assertIsNotNone(denso.conteos)
+        self.assertIsNone(directo.conteos)
+        for eje, filtros in (("edad", {}), ("canal", {"genero": ["F"]}), ("genero", {"edad": ["18-24", "35-44"], "canal": ["c1"]})):
+            self.assertEqual(directo.contar(eje, filtros), denso.contar(eje, filtros))
+
+
+class ChartETagTests(TestCase):
+    """Los gráficos se revalidan con ETag = versión del CSV + gráfico."""
+
+    def setUp(self):
+        self.url = reverse("zara:chart_json", args=["genero"])
+
+    def test_revalida_con_304(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        etag = resp["ETag"]
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b"")
+
+    def test_nueva_version_nuevo_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        with mock.patch.object(views, "_data_version", return_value="otra-version"):
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        self.assertEqual(resp.json()["version"], "otra-version")
+
+    def test_clave_inexistente_no_recibe_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        for nombre in ("zara:chart_json", "zara:chart_svg"):
+            url = reverse(nombre, args=["no-existe"])
+            with self.subTest(url=url):
+                falso = etag.replace("genero", "no-existe")
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=falso).status_code, 404)
+
+
+class ComentariosInformeTests(TestCase):
+    """El informe trae la sección de comentarios y sus APIs responden desde el índice."""
+
+    def setUp(self):
+        campania = CampaniaEncuesta.objects.create(nombre="Otoño")
+        with self.captureOnCommitCallbacks(execute=True):  # hook post_save → índice
+            for i, texto in enumerate(["Algodón suave", "algodón y lino", "Envío lento"]):
+                RespuestaEncuesta.objects.create(
+                    campania=campania, email=f"c{i}@example.com", consentimiento=True,
+                    rating_sustentabilidad=4, rating_calidad=4, comentario=texto,
+                )
+        comentarios._graficos_cache.clear()
+
+    def test_informe_renderiza_la_seccion(self):
+        resp = self.client.get(reverse("zara:informe_encuesta"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'id="comentarios"')
+        self.assertContains(resp, reverse("zara:api_encuesta_comentarios"))
+        self.assertNotContains(resp, 'id="com-buscar"')  # búsqueda solo para staff
+
+        staff = get_user_model().objects.create_user("staff", password="x", is_staff=True)
+        self.client.force_login(staff)
+        self.assertContains(self.client.get(reverse("zara:informe_encuesta")), 'id="com-buscar"')
+
+    def test_apis(self):
+        charts = self.client.get(reverse("zara:api_encuesta_comentarios")).json()["charts"]
+        self.assertEqual((charts["terminos"]["labels"][0], charts["terminos"]["data"][0]), ("algodon", 2))
+        self.assertIn("algodon + suave", charts["pares"]["labels"])
+
+        buscar = reverse("zara:api_encuesta_comentarios_buscar")
+        self.assertEqual(self.client.get(buscar, {"q": "algodon"}).status_code, 403)
+        self.client.force_login(get_user_model().objects.create_user("staff", password="x", is_staff=True))
+        resultados = self.client.get(buscar, {"q": "ALGODÓN lino"}).json()["resultados"]
+        self.assertEqual([r["comentario"] for r in resultados], ["algodón y lino"])
+
+
+class CacheDatasetTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        ajuste = override_settings(ENCUESTA_CACHE_DIR=self.dir)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def _csv(self, texto):
+        ruta = os.path.join(self.dir, "respuestas.csv")
+        with open(ruta, "w", encoding="utf-8") as fh:
+            fh.write(texto)
+        return ruta
+
+    def test_ida_y_vuelta(self):
+        import pandas as pd
+
+        df = pd.DataFrame({"genero": ["Mujer", "Hombre", "Mujer"], "importancia": [4.0, 2.0, 5.0]})
+        ruta = cache_dataset.ruta_cache(self._csv("a"))
+        self.assertTrue(cache_dataset.escribir(ruta, df))
+
+        leido = cache_dataset.leer(ruta)
+        self.assertEqual(leido["genero"].tolist(), ["Mujer", "Hombre", "Mujer"])
+        self.assertEqual(leido["importancia"].tolist(), [4.0, 2.0, 5.0])
+        # el texto queda en los buffers mapeados, no como objetos Python
+        self.assertIsInstance(leido["genero"].dtype, pd.ArrowDtype)
+
+    def test_csv_distinto_invalida(self):
+        import pandas as pd
+
+        csv = self._csv("a")
+        vieja = cache_dataset.ruta_cache(csv)
+        cache_dataset.escribir(vieja, pd.DataFrame({"x": [1]}))
+        self._csv("b")
+        nueva = cache_dataset.ruta_cache(csv)
+        self.assertNotEqual(vieja, nueva)
+        self.assertIsNone(cache_dataset.leer(nueva))
+
+        cache_dataset.escribir(nueva, pd.DataFrame({"x": [2]}))
+        self.assertFalse(vieja.exists())  # la versión anterior se borra
+        self.assertEqual(cache_dataset.leer(nueva)["x"].tolist(), [2])
+
+    def test_faltante_o_corrupto_retorna_none(self):
+        ruta = cache_dataset.ruta_cache(self._csv("a"))
+        self.assertIsNone(cache_dataset.leer(ruta))
+        ruta.write_bytes(b"esto no es arrow")
+        with self.assertLogs("zara.cache_dataset", "WARNING"):
+            self.assertIsNone(cache_dataset.leer(ruta))
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class LoginClienteTests(TestCase):
+    def _login(self):
+        return self.client.post(reverse("zara:login_cliente"), {"username": "admin", "password": "123"},
+                                HTTP_HOST="localhost")
+
+    def test_crea_admin_la_primera_vez(self):
+        self.assertRedirects(self._login(), reverse("zara:administrativo"), fetch_redirect_response=False)
+        self.assertTrue(get_user_model().objects.get(username="admin").is_staff)
+
+    def test_admin_desactivado_no_entra(self):
+        admin = get_user_model().objects.create_user("admin", password="otra", is_staff=True, is_active=False)
+        resp = self._login()
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("_auth_user_id", self.client.session)
+        admin.refresh_from_db()
+        self.assertTrue(admin.check_password("otra"))  # ni siquiera se rehace la clave
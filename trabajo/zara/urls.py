@@ -25,6 +25,13 @@ urlpatterns = [
     # =====================
     path("informe/", views.informe_encuesta, name="informe_encuesta"),
     path("chart/<str:key>/", views.chart_detail, name="chart_detail"),
+    path("charts/<slug:key>.json", views.chart_json, name="chart_json"),
+    path("charts/<slug:key>.svg", views.chart_imagen, {"formato": "svg"}, name="chart_svg"),
+    path("charts/<slug:key>.png", views.chart_imagen, {"formato": "png"}, name="chart_png"),
+    path("api/encuesta/drilldown/<str:key>/", views.api_encuesta_drilldown, name="api_encuesta_drilldown"),
+    path("api/encuesta/comentarios/", views.api_encuesta_comentarios, name="api_encuesta_comentarios"),
+    path("api/encuesta/comentarios/buscar/", views.api_encuesta_comentarios_buscar,
+         name="api_encuesta_comentarios_buscar"),
 
     # =====================
     # LOGIN / LOGOUT
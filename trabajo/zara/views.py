@@ -1,15 +1,17 @@
 from __future__ import annotations
 
-from typing import Tuple, List, Dict, Optional
+from typing import TYPE_CHECKING, Tuple, List, Dict, Optional
 from functools import lru_cache
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
 import json
+import os
 
-import pandas as pd
 from django.http import HttpRequest, HttpResponse, Http404, JsonResponse
 from django.shortcuts import render, redirect
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_GET, require_POST
 from django.views.decorators.cache import never_cache
+from django.utils.cache import patch_cache_control
 from django.contrib.staticfiles import finders
 
 # Auth / protección
@@ -19,6 +21,16 @@ from django.contrib.auth.models import User
 from django.urls import reverse, reverse_lazy
 from django.conf import settings
 
+from comun.comentarios import buscar_comentarios, graficos_comentarios
+
+from . import cache_dataset, graficos
+from .carrito import guardar_respuesta, huella, productos, respuesta_guardada, sku_a_id, validar_items
+from .precios import a_centavos, aplicar_descuento, de_centavos, total_centavos
+from .dependencias import matplotlib, pandas
+
+if TYPE_CHECKING:  # solo para anotaciones; pandas se carga bajo demanda
+    import pandas as pd
+
 
 # =========================
 # CONSTANTES / SLUGS
@@ -83,15 +95,40 @@ def _csv_absolute_path() -> str:
         "No se encontró 'respuestas.csv'. Probados: " + ", ".join(STATIC_CSV_CANDIDATES)
     )
 
-@lru_cache(maxsize=1)
+def _data_version() -> str:
+    """Versión del dataset: cambia cuando el CSV cambia (mtime + tamaño)."""
+    try:
+        st = os.stat(_csv_absolute_path())
+    except (FileNotFoundError, OSError):
+        return "sin-csv"
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
 def _load_df() -> pd.DataFrame:
-    """Carga y limpia el CSV. Si falla, retorna DataFrame vacío."""
+    """DataFrame limpio de la versión vigente del CSV."""
+    return _load_df_version(_data_version())
+
+@lru_cache(maxsize=1)
+def _load_df_version(version: str) -> pd.DataFrame:
+    """
+    Carga el dataset limpio: desde la caché Arrow si existe para este CSV,
+    si no parsea y limpia el CSV y deja la caché escrita.
+    Si falla, retorna DataFrame vacío.
+    """
+    pd = pandas()
     try:
         csv_path = _csv_absolute_path()
-        df = pd.read_csv(csv_path, encoding="utf-8-sig")
+        destino = cache_dataset.ruta_cache(csv_path)
+        df = cache_dataset.leer(destino)
+        if df is not None:
+            return df
+        df = _limpiar_df(pd.read_csv(csv_path, encoding="utf-8-sig"))
     except Exception:
         return pd.DataFrame()
+    cache_dataset.escribir(destino, df)
+    return df
 
+def _limpiar_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Limpieza del CSV crudo (si cambia, sube cache_dataset.VERSION_LIMPIEZA)."""
     # Limpieza básica
     df.columns = [c.strip() for c in df.columns]
     for c in df.columns:
@@ -135,7 +172,7 @@ NO_WORDS  = {"no", "n", "no estoy seguro/a", "no estoy seguro", "no seguro"}
 def _series(df: pd.DataFrame, key: str) -> pd.Series:
     col = COL.get(key)
     if not col or df.empty or col not in df.columns:
-        return pd.Series([], dtype=object)
+        return pandas().Series([], dtype=object)
     return df[col]
 
 def _yes_no_counts(series: pd.Series) -> Tuple[int, int]:
@@ -166,7 +203,7 @@ def _likert_counts(series: pd.Series) -> Tuple[List[str], List[int], Optional[fl
     labels = ["1", "2", "3", "4", "5"]
     if series.empty:
         return labels, [0, 0, 0, 0, 0], None
-    s = pd.to_numeric(series, errors="coerce").dropna().astype(int)
+    s = pandas().to_numeric(series, errors="coerce").dropna().astype(int)
     data = [int((s == i).sum()) for i in range(1, 6)]
     avg = float(round(float(s.mean()), 2)) if len(s) else None
     return labels, data, avg
@@ -245,12 +282,20 @@ def _build_all_datasets(df: pd.DataFrame) -> Dict[str, Dict[str, object]]:
 
     return {"kpis": kpis, "charts": charts}
 
-def informe_encuesta(request: HttpRequest) -> HttpResponse:
-    """Dashboard principal de encuesta."""
+def _payload_encuesta() -> Dict[str, object]:
+    """Agregados de la encuesta (se calculan una vez por versión de datos)."""
+    return _payload_version(_data_version())
+
+@lru_cache(maxsize=1)
+def _payload_version(version: str) -> Dict[str, object]:
     df = _load_df()
     payload = _build_all_datasets(df)
     payload["csv_ok"] = not df.empty
-    return render(request, "encuesta_zara/informe.html", payload)
+    return payload
+
+def informe_encuesta(request: HttpRequest) -> HttpResponse:
+    """Dashboard principal de encuesta."""
+    return render(request, "encuesta_zara/informe.html", dict(_payload_encuesta()))
 
 CHART_TITLES: Dict[str, str] = {
     "conoce": "¿Ha escuchado el término “Fast Fashion”?",
@@ -265,24 +310,197 @@ CHART_TITLES: Dict[str, str] = {
 }
 
 def chart_detail(request: HttpRequest, key: str) -> HttpResponse:
-    """Detalle de un gráfico del dashboard."""
+    """Detalle de un gráfico del dashboard (la serie se pide a `chart_json`)."""
     if key not in CHART_TITLES:
         raise Http404("Gráfico no encontrado")
-    df = _load_df()
-    payload = _build_all_datasets(df)
-    chart = payload["charts"].get(key)
-    if not chart:
+    payload = _payload_encuesta()
+    if not payload["charts"].get(key):
         raise Http404("Serie no disponible")
     context = {
         "key": key,
         "title": CHART_TITLES[key],
-        "chart": chart,
         "kpis": payload["kpis"],
-        "csv_ok": not df.empty,
+        "csv_ok": payload["csv_ok"],
     }
     return render(request, "encuesta_zara/chart_detail.html", context)
 
 
+# ===========================
+# ENCUESTA: GRÁFICOS SUELTOS (JSON / SVG / PNG)
+# ===========================
+
+def _chart_etag(request: HttpRequest, key: str, formato: str = "json") -> Optional[str]:
+    # Valida antes del If-None-Match: una clave inexistente no puede recibir 304
+    _chart_o_404(key)
+    if formato == "png" and matplotlib() is None:
+        return None  # 501 sin ETag: no debe revalidarse
+    return f"{_data_version()}-{key}-{formato}"
+
+def _chart_o_404(key: str) -> Dict[str, object]:
+    if key not in CHART_TITLES:
+        raise Http404("Gráfico no encontrado")
+    chart = _payload_encuesta()["charts"].get(key)
+    if not chart:
+        raise Http404("Serie no disponible")
+    return chart
+
+def _revalidar(response: HttpResponse) -> HttpResponse:
+    # Siempre revalidar: con el ETag vigente el servidor responde 304 sin cuerpo
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+@require_GET
+@condition(etag_func=_chart_etag)
+def chart_json(request: HttpRequest, key: str) -> JsonResponse:
+    """Un solo gráfico del informe. ETag = versión del CSV + gráfico."""
+    chart = _chart_o_404(key)
+    return _revalidar(JsonResponse({"key": key, "title": CHART_TITLES[key], "version": _data_version(), **chart}))
+
+@lru_cache(maxsize=64)
+def _imagen_version(key: str, version: str, formato: str) -> Optional[bytes]:
+    chart = _payload_version(version)["charts"][key]
+    if formato == "png":
+        return graficos.render_png(chart, CHART_TITLES[key])
+    return graficos.render_svg(chart, CHART_TITLES[key])
+
+def imagen_grafico(key: str, formato: str = "svg") -> Optional[bytes]:
+    """Bytes del gráfico para correos/reportes (None si PNG no está disponible)."""
+    _chart_o_404(key)
+    return _imagen_version(key, _data_version(), formato)
+
+@require_GET
+@condition(etag_func=_chart_etag)
+def chart_imagen(request: HttpRequest, key: str, formato: str) -> HttpResponse:
+    """Gráfico renderizado en el servidor (SVG siempre; PNG si hay matplotlib)."""
+    contenido = imagen_grafico(key, formato)
+    if contenido is None:
+        return HttpResponse("Render PNG no disponible (instale matplotlib).", status=501, content_type="text/plain")
+    tipo = "image/png" if formato == "png" else "image/svg+xml"
+    return _revalidar(HttpResponse(contenido, content_type=tipo))
+
+
+# ===========================
+# ENCUESTA: DRILL-DOWN (CUBO)
+# ===========================
+
+SIN_DATO = "Sin respuesta"
+LIKERT_LABELS = ["1", "2", "3", "4", "5"]
+
+# Dimensión del cubo (= clave de gráfico) → clave en COL
+CUBO_DIMS: Dict[str, str] = {
+    "conoce": "oiste",
+    "asocia": "asocia",
+    "canal":  "canal",
+    "factor": "factor",
+    "likert": "importancia",
+    "pagar":  "compraria",
+    "edad":   "edad",
+    "genero": "genero",
+}
+
+def _norm_si_no(v: object) -> str:
+    s = str(v).strip().lower()
+    if s in ("", "nan"):
+        return SIN_DATO
+    return "Sí" if s in YES_WORDS else "No / No seguro"
+
+def _norm_likert(v: object) -> str:
+    try:
+        n = int(float(v))
+    except (TypeError, ValueError):
+        return SIN_DATO
+    return str(n) if 1 <= n <= 5 else SIN_DATO
+
+def _norm_cat(v: object) -> str:
+    s = str(v).strip()
+    return SIN_DATO if s in ("", "nan") else s
+
+def _cubo():
+    """Cubo de conteos de la versión vigente del dataset."""
+    return _cubo_version(_data_version())
+
+@lru_cache(maxsize=1)
+def _cubo_version(version: str):
+    from .cubo import CuboEncuesta
+
+    df = _load_df()
+    columnas: Dict[str, List[str]] = {}
+    for dim, col_key in CUBO_DIMS.items():
+        serie = _series(df, col_key)
+        if serie.empty and not df.empty:
+            serie = pandas().Series([""] * len(df))
+        norm = {"conoce": _norm_si_no, "asocia": _norm_si_no, "likert": _norm_likert}.get(dim, _norm_cat)
+        columnas[dim] = [norm(v) for v in serie.tolist()]
+    return CuboEncuesta.construir(columnas, orden={
+        "likert": LIKERT_LABELS,
+        "conoce": ["Sí", "No / No seguro"],
+        "asocia": ["Sí", "No / No seguro"],
+    })
+
+@require_GET
+def api_encuesta_drilldown(request: HttpRequest, key: str) -> JsonResponse:
+    """
+    Distribución de un gráfico con filtros cruzados, respondida desde el cubo.
+    Ej.: /api/encuesta/drilldown/likert/?genero=Femenino&edad=25-34&canal=Online (web/app)
+    Un parámetro repetido suma valores (OR); parámetros distintos se combinan (AND).
+    """
+    if key not in CUBO_DIMS:
+        raise Http404("Gráfico no encontrado")
+    cubo = _cubo()
+    filtros = {d: request.GET.getlist(d) for d in CUBO_DIMS if d in request.GET}
+
+    labels, data = cubo.contar(key, filtros)
+    total = sum(data)
+    pares = [(lab, n) for lab, n in zip(labels, data) if lab != SIN_DATO]
+
+    resp: Dict[str, object] = {
+        "ok": True,
+        "key": key,
+        "title": CHART_TITLES.get(key, key),
+        "filtros": filtros,
+        "total": total,
+        "labels": [lab for lab, _ in pares],
+        "data": [n for _, n in pares],
+    }
+    if key == "likert":
+        votos = sum(n for _, n in pares)
+        resp["avg"] = round(sum(int(lab) * n for lab, n in pares) / votos, 2) if votos else None
+    if request.GET.get("dims") == "1":
+        resp["dims"] = cubo.dimensiones()
+    return JsonResponse(resp, json_dumps_params={"ensure_ascii": False})
+
+
+# ===========================
+# ENCUESTA: COMENTARIOS
+# ===========================
+
+def _campania_param(request: HttpRequest) -> Optional[int]:
+    valor = request.GET.get("campania") or ""
+    return int(valor) if valor.isdigit() else None
+
+@require_GET
+def api_encuesta_comentarios(request: HttpRequest) -> JsonResponse:
+    """Términos más frecuentes y co-ocurrencias (payload Chart.js). ?campania=<id>"""
+    charts = graficos_comentarios(_campania_param(request))
+    return JsonResponse({"ok": True, "charts": charts}, json_dumps_params={"ensure_ascii": False})
+
+@require_GET
+def api_encuesta_comentarios_buscar(request: HttpRequest) -> JsonResponse:
+    """
+    Búsqueda por palabras clave en comentarios (todas deben aparecer). ?q=&campania=
+    Devuelve el texto de cada respuesta: solo staff (los gráficos son agregados y públicos).
+    """
+    if not _is_staff(request.user):
+        return JsonResponse({"ok": False, "error": "Solo staff."}, status=403)
+    q = request.GET.get("q", "")
+    try:
+        limite = min(max(int(request.GET.get("limite", 20)), 1), 100)
+    except ValueError:
+        limite = 20
+    resultados = buscar_comentarios(q, _campania_param(request), limite)
+    return JsonResponse({"ok": True, "q": q, "resultados": resultados}, json_dumps_params={"ensure_ascii": False})
+
+
 # ===========================
 # APIs (REGLAS DE NEGOCIO DEMO)
 # ===========================
@@ -294,36 +512,21 @@ CUPONES: Dict[str, Dict[str, object]] = {
     "GREEN20": {"percent": 20, "desde": datetime(2025, 11, 1, 0, 0), "hasta": datetime(2025, 11, 30, 23, 59), "activo": True},
 }
 
-STOCK: Dict[str, int] = {"SKU-001": 5, "SKU-002": 20, "SKU-003": 2}
-
 def _json_body(request: HttpRequest) -> Dict[str, object]:
+    """Cuerpo JSON; {} si no es un objeto (cada API responde entonces su 400)."""
     try:
-        return json.loads(request.body.decode("utf-8"))
+        body = json.loads(request.body.decode("utf-8"))
     except Exception:
         return {}
+    return body if isinstance(body, dict) else {}
 
 def _cupon_vigente(data: Dict[str, object]) -> bool:
     now = datetime.now()
     return bool(data.get("activo")) and data.get("desde") <= now <= data.get("hasta")
 
-def _validar_items(items: List[Dict[str, object]]) -> List[str]:
-    """Reglas: qty>=1, qty<=MAX_QTY_PER_ITEM, y <= stock si aplica."""
-    errores: List[str] = []
-    if not items:
-        return ["El carrito está vacío."]
-    for it in items:
-        sku = str(it.get("sku", "")).strip()
-        try:
-            qty = int(it.get("qty") or 0)
-        except Exception:
-            qty = 0
-        if qty < 1:
-            errores.append(f"{sku}: cantidad mínima 1.")
-        if qty > MAX_QTY_PER_ITEM:
-            errores.append(f"{sku}: excede el máximo ({MAX_QTY_PER_ITEM}).")
-        if sku in STOCK and qty > STOCK[sku]:
-            errores.append(f"{sku}: sin stock suficiente (disp: {STOCK[sku]}).")
-    return errores
+def _validar_items(items: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Reglas: qty>=1, qty<=MAX_QTY_PER_ITEM y <= stock de `Producto` (ver zara.carrito)."""
+    return validar_items(items)[1]
 
 @require_POST
 def api_validar_cupon(request: HttpRequest) -> JsonResponse:
@@ -331,27 +534,47 @@ def api_validar_cupon(request: HttpRequest) -> JsonResponse:
     body = _json_body(request)
     codigo = (body.get("codigo") or "").strip().upper()
     try:
-        subtotal = float(body.get("subtotal") or 0)
-    except Exception:
-        subtotal = 0.0
+        subtotal = a_centavos(Decimal(str(body.get("subtotal") or 0)))
+    except (InvalidOperation, ValueError):
+        subtotal = 0
 
     data = CUPONES.get(codigo)
     if not data or not _cupon_vigente(data):
         return JsonResponse({"ok": False, "error": "Cupón inválido o vencido."}, status=400)
 
     percent = int(data["percent"])
-    nuevo_total = round(subtotal * (1 - percent / 100), 2)
+    nuevo_total = de_centavos(aplicar_descuento(max(subtotal, 0), percent))
     return JsonResponse({"ok": True, "percent": percent, "nuevo_total": nuevo_total})
 
 @require_POST
 def api_carrito_validar(request: HttpRequest) -> JsonResponse:
-    """Valida cantidades y stock del carrito."""
-    body = _json_body(request)
-    items = body.get("items") or []
-    errores = _validar_items(items)
-    if errores:
-        return JsonResponse({"ok": False, "errores": errores}, status=400)
-    return JsonResponse({"ok": True})
+    """
+    Valida cantidades y stock del carrito contra `Producto`.
+    Con cabecera `Idempotency-Key` un reintento con el mismo cuerpo recibe la
+    respuesta original; la misma clave con otro cuerpo → 422.
+    """
+    clave = (request.headers.get("Idempotency-Key") or "").strip()[:200]
+    if clave:
+        firma = huella(request.body)
+        previa = respuesta_guardada("carrito-validar", clave)
+        if previa is not None:
+            firma_previa, status, datos = previa
+            if firma_previa != firma:
+                return JsonResponse(
+                    {"ok": False, "errores": [{"linea": -1, "codigo": "idempotencia",
+                                               "mensaje": "Idempotency-Key ya usada con otro carrito."}]},
+                    status=422,
+                )
+            resp = JsonResponse(datos, status=status)
+            resp["Idempotent-Replayed"] = "true"
+            return resp
+
+    lineas, errores = validar_items(_json_body(request).get("items"))
+    datos = {"ok": not errores, "lineas": lineas, "errores": errores}
+    status = 400 if errores else 200
+    if clave:
+        guardar_respuesta("carrito-validar", clave, firma, status, datos)
+    return JsonResponse(datos, status=status)
 
 @require_POST
 def api_checkout_simulado(request: HttpRequest) -> JsonResponse:
@@ -366,34 +589,26 @@ def api_checkout_simulado(request: HttpRequest) -> JsonResponse:
     if errores:
         return JsonResponse({"ok": False, "errores": errores}, status=400)
 
-    # Subtotal
-    subtotal = 0.0
-    for it in items:
-        try:
-            qty = int(it.get("qty") or 0)
-            unit = float(it.get("unit") or 0)
-        except Exception:
-            qty, unit = 0, 0.0
-        subtotal += qty * unit
-    subtotal = round(subtotal, 2)
+    # Subtotal con precios de catálogo (los `unit` enviados por el cliente se ignoran)
+    catalogo = productos(sku_a_id(it.get("sku")) for it in items)
+    lineas = [(int(it["qty"]), a_centavos(catalogo[sku_a_id(it["sku"])].precio)) for it in items]
 
     # Cupón
-    total = subtotal
     percent = 0
     if cupon:
         data = CUPONES.get(cupon)
         if not data or not _cupon_vigente(data):
             return JsonResponse({"ok": False, "error": "Cupón inválido o vencido."}, status=400)
         percent = int(data["percent"])
-        total = round(subtotal * (1 - percent / 100), 2)
+    subtotal, total = total_centavos(lineas, percent)
 
     return JsonResponse({
         "ok": True,
         "email": email,
-        "subtotal": subtotal,
+        "subtotal": de_centavos(subtotal),
         "cupon": cupon,
         "percent": percent,
-        "total_final": total
+        "total_final": de_centavos(total),
     })
 
 
@@ -441,18 +656,23 @@ def login_cliente(request: HttpRequest) -> HttpResponse:
         password = (request.POST.get("password") or "").strip()
 
         if username == "admin" and password == "123":
-            user, _ = User.objects.get_or_create(
-                username="admin",
-                defaults={"is_staff": True, "is_active": True}
-            )
-            if not user.check_password("123"):
-                user.set_password("123")
-            if not user.is_staff:
-                user.is_staff = True
-            user.save()
-
+            # camino normal: un solo PBKDF2 (el de authenticate); el hash se
+            # rehace solo si la clave demo no coincide (primera vez o cambiada)
             user = authenticate(request, username="admin", password="123")
+            if user is None:
+                admin, _ = User.objects.get_or_create(
+                    username="admin",
+                    defaults={"is_staff": True, "is_active": True}
+                )
+                # una cuenta desactivada no se reactiva por esta puerta
+                if admin.is_active:
+                    admin.set_password("123")
+                    admin.save(update_fields=["password"])
+                    user = authenticate(request, username="admin", password="123")
             if user is not None:
+                if not user.is_staff:
+                    user.is_staff = True
+                    user.save(update_fields=["is_staff"])
                 login(request, user)
                 next_url = request.POST.get("next") or request.GET.get("next") or reverse("zara:administrativo")
                 return redirect(next_url)
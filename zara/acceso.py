@@ -0,0 +1,156 @@
+# zara/acceso.py
+"""
+Límite de intentos de login (fuerza bruta) antes de calcular ningún hash.
+
+- Contadores de fallos por IP, por par (usuario, IP) y por usuario en el
+  cache de Django (`ACCESO_CACHE`), con ventana deslizante aproximada: el
+  bucket actual más el anterior ponderado por lo que queda de él. Dos
+  claves por dimensión, leídas en un solo `get_many`.
+- El límite bajo (`ACCESO_MAX_POR_USUARIO`) es por par: fallar desde una IP
+  no bloquea la cuenta desde otra, así nadie deja afuera a un usuario ajeno
+  con cinco claves malas. Por usuario, desde cualquier IP, solo rige un
+  tope mucho más alto (`ACCESO_MAX_POR_USUARIO_GLOBAL`) contra ataques
+  repartidos en muchas IPs.
+- `bloqueado` solo lee contadores: un atacante que ya pasó el límite recibe
+  el rechazo sin que el servidor corra PBKDF2.
+- Se aplica en `BackendLimitado` (todo `authenticate()`: login, admin) y en
+  el formulario de login, que además muestra cuánto esperar.
+- `ACCESO_CACHE` es por defecto `CACHES["default"]`, compartido entre
+  procesos (archivo; redis con varios hosts). Con LocMem cada worker
+  llevaría su propia cuenta y el límite real se multiplicaría por N.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import time
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _cache():
+    return caches[_config("ACCESO_CACHE", "default")]
+
+
+def ip_de(request) -> str:
+    """IP del cliente según `ACCESO_IP_HEADER` (p. ej. HTTP_X_REAL_IP detrás de nginx)."""
+    if request is None:
+        return ""
+    valor = request.META.get(_config("ACCESO_IP_HEADER", "REMOTE_ADDR"), "") or request.META.get("REMOTE_ADDR", "")
+    return valor.split(",")[0].strip()[:45]
+
+
+def _digest(usuario: str) -> str:
+    # el usuario va hasheado: la clave del cache no lo expone
+    return hashlib.sha1(usuario.strip().lower().encode()).hexdigest()[:20]
+
+
+def _dimensiones(ip: str, usuario: str) -> List[Tuple[str, int]]:
+    """[(prefijo de clave, máximo)] para IP, par (usuario, IP) y usuario."""
+    dims = []
+    if ip:
+        dims.append((f"acceso:ip:{ip}", _config("ACCESO_MAX_POR_IP", 20)))
+    if usuario:
+        digest = _digest(usuario)
+        if ip:
+            dims.append((f"acceso:u:{digest}:{ip}", _config("ACCESO_MAX_POR_USUARIO", 5)))
+        dims.append((f"acceso:u:{digest}", _config("ACCESO_MAX_POR_USUARIO_GLOBAL", 100)))
+    return dims
+
+
+def _buckets(ahora: float) -> Tuple[int, int, float]:
+    """(bucket actual, largo de la ventana, segundos que le quedan al bucket actual)."""
+    ventana = _config("ACCESO_VENTANA_S", 300)
+    return int(ahora // ventana), ventana, ventana - ahora % ventana
+
+
+def _espera(vigente: int, anterior: int, maximo: int, ventana: int, resto: float) -> int:
+    """
+    Segundos hasta que la estimación `vigente + anterior × peso` baje de
+    `maximo` sin nuevos fallos: primero decae el bucket anterior; al cambiar
+    de bucket, el vigente pasa a ser el que decae.
+    """
+    if vigente < maximo:
+        if anterior:
+            t = ventana * (resto / ventana - (maximo - vigente) / anterior)
+            if t < resto:
+                return max(1, math.ceil(t))
+        return math.ceil(resto)
+    return math.ceil(resto + ventana * (1 - maximo / vigente)) + 1
+
+
+def bloqueado(ip: str, usuario: str, ahora: Optional[float] = None) -> int:
+    """Segundos que faltan para poder reintentar (0 = permitido). Solo lee el cache."""
+    if not _config("ACCESO_ACTIVO", True):
+        return 0
+    ahora = time.time() if ahora is None else ahora
+    actual, ventana, resto = _buckets(ahora)
+    dims = _dimensiones(ip, usuario)
+    valores = _cache().get_many([f"{prefijo}:{b}" for prefijo, _ in dims for b in (actual - 1, actual)])
+    espera = 0
+    for prefijo, maximo in dims:
+        anterior = valores.get(f"{prefijo}:{actual - 1}", 0)
+        vigente = valores.get(f"{prefijo}:{actual}", 0)
+        if vigente + anterior * resto / ventana >= maximo:
+            espera = max(espera, _espera(vigente, anterior, maximo, ventana, resto))
+    return espera
+
+
+def registrar_fallo(ip: str, usuario: str, ahora: Optional[float] = None) -> None:
+    if not _config("ACCESO_ACTIVO", True):
+        return
+    ahora = time.time() if ahora is None else ahora
+    actual, ventana, _ = _buckets(ahora)
+    cache = _cache()
+    for prefijo, _ in _dimensiones(ip, usuario):
+        clave = f"{prefijo}:{actual}"
+        cache.add(clave, 0, ventana * 2)  # vive lo que dura como bucket actual + anterior
+        try:
+            cache.incr(clave)
+        except ValueError:  # expiró entre add e incr
+            cache.set(clave, 1, ventana * 2)
+
+
+def limpiar_usuario(usuario: str, ip: str) -> None:
+    """
+    Tras un login correcto: el par (usuario, IP) parte de cero. La IP y el
+    contador global del usuario no, para no premiar el acierto.
+    """
+    if not ip or not usuario:
+        return
+    actual = _buckets(time.time())[0]
+    prefijo = f"acceso:u:{_digest(usuario)}:{ip}"
+    _cache().delete_many([f"{prefijo}:{actual - 1}", f"{prefijo}:{actual}"])
+
+
+def mensaje_espera(segundos: int) -> str:
+    minutos = max(1, math.ceil(segundos / 60))
+    return f"Demasiados intentos fallidos. Prueba de nuevo en {minutos} minuto{'s' if minutos != 1 else ''}."
+
+
+class BackendLimitado(ModelBackend):
+    """
+    ModelBackend con el límite por delante: bloqueado → PermissionDenied
+    (Django corta ahí sin probar otros backends ni calcular el hash).
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        usuario = str(username if username is not None else kwargs.get(get_user_model().USERNAME_FIELD) or "")
+        ip = ip_de(request)
+        if bloqueado(ip, usuario):
+            raise PermissionDenied
+        user = super().authenticate(request, username=username, password=password, **kwargs)
+        if user is None:
+            registrar_fallo(ip, usuario)
+        else:
+            limpiar_usuario(usuario, ip)
+        return user
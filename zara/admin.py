@@ -1,24 +1,39 @@
 # zara/admin.py
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 from .models import (
     Perfil, Direccion,
-    Producto, Cupon,
+    Producto, Variante, MovimientoStock, Cupon,
     Carrito, ItemCarrito,
-    Pedido,
+    Pedido, RedencionPuntos,
     CampaniaEncuesta, RespuestaEncuesta,
-    TradeInCanje
+    TradeInCanje, PrendaTradeIn, ImpactoAcumulado, EventoPedido,
+    Tarea, TareaPeriodica, Correo,
 )
+from .pedidos import transicionar_en_bloque
+from . import tareas, tradein
+from .importacion import FeedInvalido, importar_archivo
+from .inventario import registrar
+from .admin_rendimiento import BusquedaPrefijoMixin, ListadoLigeroMixin
 
 # =============================
 #  PERFIL / USUARIO
 # =============================
 
 @admin.register(Perfil)
-class PerfilAdmin(admin.ModelAdmin):
+class PerfilAdmin(BusquedaPrefijoMixin, ListadoLigeroMixin, admin.ModelAdmin):
     list_display = ("user", "rol", "nivel", "puntos", "tema", "creditos_circulares")
     list_filter = ("rol", "tema", "nivel")
-    search_fields = ("user__username", "user__email", "nombre_mostrar")
+    # "^" = búsqueda por prefijo (istartswith); índices NOCASE / UPPER() en zara/indices.py (migración 0016)
+    search_fields = ("^user__username", "^user__email", "^nombre_mostrar")
     ordering = ("user__username",)
+    list_select_related = ("user",)
+    list_only = ("user__username", "rol", "nivel", "puntos", "tema", "creditos_circulares")
+    autocomplete_fields = ("user",)
 
 
 # =============================
@@ -26,20 +41,110 @@ class PerfilAdmin(admin.ModelAdmin):
 # =============================
 
 @admin.register(Direccion)
-class DireccionAdmin(admin.ModelAdmin):
+class DireccionAdmin(BusquedaPrefijoMixin, ListadoLigeroMixin, admin.ModelAdmin):
     list_display = ("user", "alias", "ciudad", "pais", "es_principal")
     list_filter = ("pais", "es_principal")
-    search_fields = ("user__username", "ciudad", "alias")
+    search_fields = ("^user__username", "^ciudad", "^alias")
+    list_select_related = ("user",)
+    list_only = ("user__username", "alias", "ciudad", "pais", "es_principal")
+    autocomplete_fields = ("user",)
 
 
 # =============================
 #  PRODUCTOS / CUPONES
 # =============================
 
+class VarianteInline(admin.TabularInline):
+    model = Variante
+    extra = 0
+    fields = ("sku", "talla", "color", "stock")
+    readonly_fields = ("stock",)  # se mueve con MovimientoStock
+
+
+class ImportarCatalogoForm(forms.Form):
+    archivo = forms.FileField(label="Feed (CSV o JSONL)", help_text="Columnas: nombre, precio, stock[, peso_gramos].")
+    simular = forms.BooleanField(label="Solo simular (no escribe)", required=False)
+
+
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
     list_display = ("nombre", "precio", "stock")
     search_fields = ("nombre",)
+    readonly_fields = ("stock",)  # proyección del diario: se ajusta con un MovimientoStock
+    inlines = [VarianteInline]
+    change_list_template = "admin/zara/producto/change_list.html"
+
+    def get_urls(self):
+        propias = [
+            path("importar/", self.admin_site.admin_view(self.importar_view), name="zara_producto_importar"),
+        ]
+        return propias + super().get_urls()
+
+    def importar_view(self, request):
+        if not self.has_change_permission(request) or not self.has_add_permission(request):
+            return redirect("admin:zara_producto_changelist")
+        form = ImportarCatalogoForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            archivo = form.cleaned_data["archivo"]
+            try:
+                r = importar_archivo(archivo, archivo.name, simular=form.cleaned_data["simular"])
+            except FeedInvalido as exc:
+                self.message_user(request, " ".join(exc.messages), messages.ERROR)
+                return redirect("admin:zara_producto_changelist")
+            prefijo = "[simulación] " if form.cleaned_data["simular"] else ""
+            self.message_user(request, prefijo + r.resumen(), messages.SUCCESS if not r.invalidas else messages.WARNING)
+            for error in r.errores[:10]:
+                self.message_user(request, error, messages.WARNING)
+            return redirect("admin:zara_producto_changelist")
+        contexto = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Importar catálogo",
+            "form": form,
+        }
+        return TemplateResponse(request, "admin/zara/producto/importar.html", contexto)
+
+
+@admin.register(Variante)
+class VarianteAdmin(BusquedaPrefijoMixin, admin.ModelAdmin):
+    list_display = ("sku", "producto", "talla", "color", "stock")
+    list_filter = ("talla",)
+    search_fields = ("^sku", "^producto__nombre")
+    list_select_related = ("producto",)
+    autocomplete_fields = ("producto",)
+    readonly_fields = ("stock",)
+
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(BusquedaPrefijoMixin, ListadoLigeroMixin, admin.ModelAdmin):
+    """Diario de solo inserción: los movimientos nuevos pasan por zara.inventario.registrar."""
+    list_display = ("id", "creado_en", "producto", "variante", "tipo", "cantidad", "pedido", "usuario")
+    list_filter = ("tipo",)
+    search_fields = ("^producto__nombre", "^variante__sku")
+    list_select_related = ("producto", "variante", "usuario")
+    list_only = (
+        "creado_en", "producto__nombre", "variante__sku", "variante__talla", "variante__color",
+        "tipo", "cantidad", "pedido", "usuario__username",
+    )
+    autocomplete_fields = ("producto", "variante")
+    fields = ("producto", "variante", "tipo", "cantidad", "nota")
+
+    def formfield_for_choice_field(self, db_field, request, **kwargs):
+        if db_field.name == "tipo":  # ventas y devoluciones las genera el flujo de pedidos
+            kwargs["choices"] = [
+                (v, l) for v, l in db_field.choices if v in (MovimientoStock.Tipo.AJUSTE, MovimientoStock.Tipo.TRADEIN)
+            ]
+        return super().formfield_for_choice_field(db_field, request, **kwargs)
+
+    def save_model(self, request, obj, form, change):
+        obj.usuario = request.user
+        registrar([obj])
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Cupon)
@@ -68,11 +173,64 @@ class CarritoAdmin(admin.ModelAdmin):
 #  PEDIDOS
 # =============================
 
+def _accion_estado(destino):
+    def accion(modeladmin, request, queryset):
+        r = transicionar_en_bloque(queryset.values_list("pk", flat=True), destino)
+        modeladmin.message_user(
+            request,
+            f"{r['actualizados']} pedido(s) → {destino}. Omitidos por transición inválida: {r['omitidos']}.",
+            messages.SUCCESS if not r["omitidos"] else messages.WARNING,
+        )
+    accion.__name__ = f"marcar_{destino.lower()}"
+    accion.short_description = f"Marcar como {destino}"
+    return accion
+
+
+@admin.action(description="Exportar a CSV (en segundo plano)")
+def exportar_csv(modeladmin, request, queryset):
+    nombre = f"pedidos-{request.user.pk}-{timezone.now():%Y%m%d-%H%M%S}.csv"
+    t = tareas.encolar("zara.exportar_pedidos", {"pedido_ids": list(queryset.values_list("pk", flat=True)), "nombre": nombre})
+    modeladmin.message_user(request, f"Exportación encolada (tarea #{t.pk}); quedará en exportaciones/{nombre}.")
+
+
 @admin.register(Pedido)
-class PedidoAdmin(admin.ModelAdmin):
+class PedidoAdmin(BusquedaPrefijoMixin, ListadoLigeroMixin, admin.ModelAdmin):
     list_display = ("id", "user", "estado", "total_pagado", "creado_en")
     list_filter = ("estado",)
-    search_fields = ("user__username", "email_cliente")
+    search_fields = ("^user__username", "^email_cliente")
+    list_select_related = ("user",)
+    list_only = ("user__username", "estado", "total_pagado", "creado_en")
+    autocomplete_fields = ("user",)
+    # el estado solo cambia por las acciones (zara.pedidos: transiciones válidas, stock, eventos)
+    readonly_fields = ("estado",)
+    actions = [*(_accion_estado(e) for e in ("PAGADO", "ENVIADO", "ENTREGADO", "CANCELADO")), exportar_csv]
+
+
+@admin.register(RedencionPuntos)
+class RedencionPuntosAdmin(ListadoLigeroMixin, admin.ModelAdmin):
+    list_display = ("pedido_id", "usuario", "puntos", "creditos", "descuento", "creado_en", "reembolsada_en")
+    list_filter = (("reembolsada_en", admin.EmptyFieldListFilter),)
+    search_fields = ("^usuario__username",)
+    list_select_related = ("usuario",)
+    list_only = ("pedido", "usuario__username", "puntos", "creditos", "descuento", "creado_en", "reembolsada_en")
+
+    # Débitos y reembolsos solo por zara.puntos (UPDATE condicionales sobre Perfil)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EventoPedido)
+class EventoPedidoAdmin(ListadoLigeroMixin, admin.ModelAdmin):
+    list_display = ("id", "pedido", "tipo", "creado_en", "enviado_en", "intentos", "proximo_intento")
+    list_filter = ("tipo",)
+    readonly_fields = ("creado_en",)
+    list_select_related = ("pedido",)
 
 
 # =============================
@@ -87,10 +245,11 @@ class CampaniaEncuestaAdmin(admin.ModelAdmin):
 
 
 @admin.register(RespuestaEncuesta)
-class RespuestaEncuestaAdmin(admin.ModelAdmin):
+class RespuestaEncuestaAdmin(ListadoLigeroMixin, admin.ModelAdmin):
     list_display = ("email", "campania", "rating_sustentabilidad", "rating_calidad", "enviado_en")
     list_filter = ("campania",)
-    search_fields = ("email",)
+    search_fields = ("^email",)
+    list_select_related = ("campania",)
 
 
 # =============================
@@ -98,8 +257,118 @@ class RespuestaEncuestaAdmin(admin.ModelAdmin):
 # =============================
 
 @admin.register(TradeInCanje)
-class TradeInCanjeAdmin(admin.ModelAdmin):
+class TradeInCanjeAdmin(BusquedaPrefijoMixin, ListadoLigeroMixin, admin.ModelAdmin):
     list_display = ("usuario", "prenda", "material", "impacto", "puntos_obtenidos", "fecha")
     list_filter = ("material",)
-    search_fields = ("usuario__username", "prenda")
+    search_fields = ("^usuario__username", "^prenda")
     ordering = ("-fecha",)
+    list_select_related = ("usuario",)
+    list_only = ("usuario__username", "prenda", "material", "impacto", "puntos_obtenidos", "fecha")
+    autocomplete_fields = ("usuario",)
+
+
+@admin.register(ImpactoAcumulado)
+class ImpactoAcumuladoAdmin(admin.ModelAdmin):
+    list_display = ("ambito", "clave", "canjes", "co2_kg", "agua_l", "actualizado_en")
+    list_filter = ("ambito",)
+    search_fields = ("=clave",)
+    ordering = ("ambito", "-co2_kg")
+
+    # Los mantiene zara.impacto (por canje + recalcular_impacto)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+def _accion_prenda(destino, grado=""):
+    def accion(modeladmin, request, queryset):
+        r = tradein.transicionar_en_bloque(queryset.values_list("token", flat=True), destino, grado)
+        modeladmin.message_user(
+            request,
+            f"{r['actualizadas']} prenda(s) → {destino}. Omitidas por transición inválida: {r['omitidas']}.",
+            messages.SUCCESS if not r["omitidas"] else messages.WARNING,
+        )
+    accion.__name__ = f"prenda_{destino.lower()}{grado.lower()}"
+    accion.short_description = f"Clasificar grado {grado}" if grado else f"Marcar como {destino}"
+    return accion
+
+
+@admin.register(PrendaTradeIn)
+class PrendaTradeInAdmin(BusquedaPrefijoMixin, ListadoLigeroMixin, admin.ModelAdmin):
+    list_display = ("id", "prenda", "material", "estado", "grado", "usuario", "recibida_en", "actualizada_en")
+    list_filter = ("estado", "grado")
+    search_fields = ("=token", "^prenda", "^usuario__username")
+    list_select_related = ("usuario",)
+    list_only = ("prenda", "material", "estado", "grado", "usuario__username", "recibida_en", "actualizada_en")
+    readonly_fields = ("token", "estado", "recibida_en", "actualizada_en")  # el estado se mueve con las acciones
+    raw_id_fields = ("canje",)
+    autocomplete_fields = ("usuario",)
+    actions = [
+        *(_accion_prenda(PrendaTradeIn.Estado.CLASIFICADA, g) for g in PrendaTradeIn.Grado.values),
+        _accion_prenda(PrendaTradeIn.Estado.REVENDIDA),
+        _accion_prenda(PrendaTradeIn.Estado.RECICLADA),
+    ]
+
+
+# =============================
+#  TAREAS EN SEGUNDO PLANO
+# =============================
+
+@admin.action(description="Reintentar ahora")
+def reintentar(modeladmin, request, queryset):
+    n = queryset.filter(estado=Tarea.Estado.FALLIDA).update(
+        estado=Tarea.Estado.PENDIENTE, intentos=0, ejecutar_en=timezone.now(), tomada_por="", terminada_en=None,
+    )
+    modeladmin.message_user(request, f"{n} tarea(s) fallida(s) devueltas a la cola.")
+
+
+@admin.register(Tarea)
+class TareaAdmin(ListadoLigeroMixin, admin.ModelAdmin):
+    list_display = ("id", "nombre", "estado", "prioridad", "intentos", "ejecutar_en", "tomada_en", "terminada_en")
+    list_filter = ("estado", "nombre")
+    search_fields = ("^nombre",)
+    list_only = ("nombre", "estado", "prioridad", "intentos", "ejecutar_en", "tomada_en", "terminada_en")
+    readonly_fields = ("creada_en", "tomada_en", "tomada_por", "terminada_en", "intentos", "ultimo_error")
+    ordering = ("-id",)
+    actions = [reintentar]
+    change_list_template = "admin/zara/tarea/change_list.html"
+
+    def changelist_view(self, request, extra_context=None):
+        # profundidad de la cola y latencias de la última hora sobre el listado
+        return super().changelist_view(request, {**(extra_context or {}), "metricas": tareas.metricas()})
+
+
+@admin.register(TareaPeriodica)
+class TareaPeriodicaAdmin(admin.ModelAdmin):
+    list_display = ("nombre", "proxima_en", "ultima_en")
+    readonly_fields = ("nombre", "ultima_en")  # `proxima_en` editable: adelantar una corrida
+
+
+@admin.action(description="Reintentar envío ahora")
+def reintentar_correo(modeladmin, request, queryset):
+    n = queryset.filter(estado=Correo.Estado.FALLIDO).update(
+        estado=Correo.Estado.PENDIENTE, intentos=0, proximo_intento=timezone.now(), tomado_por="",
+    )
+    modeladmin.message_user(request, f"{n} correo(s) devueltos a la cola.")
+
+
+@admin.register(Correo)
+class CorreoAdmin(ListadoLigeroMixin, admin.ModelAdmin):
+    list_display = ("id", "plantilla", "para", "estado", "intentos", "creado_en", "enviado_en", "version")
+    list_filter = ("estado", "plantilla")
+    search_fields = ("^para",)
+    list_only = ("plantilla", "para", "estado", "intentos", "creado_en", "enviado_en", "version")
+    ordering = ("-id",)
+    actions = [reintentar_correo]
+
+    # La cola la escribe zara.correo; aquí solo se mira y se reintenta
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
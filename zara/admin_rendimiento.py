@@ -0,0 +1,106 @@
+# zara/admin_rendimiento.py
+"""
+Utilidades de rendimiento para los listados del admin.
+
+- `ConteoEstimadoPaginator`: evita el COUNT(*) completo en tablas grandes
+  sin filtros, usando las estadísticas del motor (pg_class / sqlite_stat1).
+- `ListadoLigeroMixin`: select_related + only() solo en el changelist, sin
+  afectar el formulario de edición.
+- `BusquedaPrefijoMixin`: search_fields "^campo" / "=campo" como una
+  subconsulta por campo (`pk IN (…) OR pk IN (…)`), para que cada término
+  use su índice de prefijo (zara/indices.py) aunque mezcle tablas.
+"""
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
+
+# Bajo este tamaño el COUNT(*) exacto es barato y preferible
+UMBRAL_ESTIMADO = 50_000
+
+
+def estimar_filas(model) -> Optional[int]:
+    """Filas aproximadas de la tabla según las estadísticas del motor (o None)."""
+    tabla = model._meta.db_table
+    try:
+        with connection.cursor() as cur:
+            if connection.vendor == "postgresql":
+                cur.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [tabla])
+            elif connection.vendor == "sqlite":
+                # Requiere haber corrido ANALYZE; el primer número de `stat` es el total de filas
+                cur.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [tabla])
+            else:
+                return None
+            fila = cur.fetchone()
+    except DatabaseError:
+        return None
+    if not fila or fila[0] is None:
+        return None
+    try:
+        return int(str(fila[0]).split()[0])
+    except ValueError:
+        return None
+
+
+class ConteoEstimadoPaginator(Paginator):
+    """Paginador que usa un conteo estimado cuando el listado no tiene filtros."""
+
+    @cached_property
+    def count(self) -> int:
+        qs = self.object_list
+        query = getattr(qs, "query", None)
+        if query is not None and not query.where:
+            estimado = estimar_filas(qs.model)
+            if estimado is not None and estimado >= UMBRAL_ESTIMADO:
+                return estimado
+        return super().count
+
+
+class ListadoLigeroMixin:
+    """
+    Define `list_only` con los campos que necesita el listado.
+    Se aplica junto a `list_select_related` solo en la vista de cambios.
+    """
+    list_only: Sequence[str] = ()
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False  # evita un segundo COUNT(*) al filtrar
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        match = getattr(request, "resolver_match", None)
+        if self.list_only and match and (match.url_name or "").endswith("_changelist"):
+            relacionados = self.list_select_related
+            if relacionados and relacionados is not True:
+                qs = qs.select_related(*relacionados)
+            qs = qs.only(*self.list_only)
+        return qs
+
+
+class BusquedaPrefijoMixin:
+    """
+    El OR que arma Django entre columnas de tablas distintas (`user__username`
+    OR `email_cliente`) hace que SQLite recorra la tabla entera. Por separado,
+    cada campo es una subconsulta que usa su índice y el motor las une
+    (MULTI-INDEX OR). Solo aplica si todos los campos son "^" o "=".
+    """
+    LOOKUPS = {"^": "istartswith", "=": "iexact"}
+
+    def get_search_results(self, request, queryset, search_term):
+        campos = self.get_search_fields(request)
+        if not search_term or not campos or any(c[:1] not in self.LOOKUPS for c in campos):
+            return super().get_search_results(request, queryset, search_term)
+        base = self.model._default_manager.all()
+        for termino in smart_split(search_term):  # como Django: cada palabra debe coincidir
+            if len(termino) > 1 and termino[0] in "\"'" and termino[-1] == termino[0]:
+                termino = unescape_string_literal(termino)
+            alguno = Q()
+            for campo in campos:
+                filtro = {f"{campo[1:]}__{self.LOOKUPS[campo[0]]}": termino}
+                alguno |= Q(pk__in=base.filter(**filtro).values("pk"))
+            queryset = queryset.filter(alguno)
+        return queryset, False
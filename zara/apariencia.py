@@ -0,0 +1,102 @@
+# zara/apariencia.py
+"""
+Tema, color de acento y nombre a mostrar del usuario en cada página.
+
+- El context processor `contexto` expone `apariencia` a todas las
+  plantillas; `base.html` pinta el tema en el servidor (sin el parpadeo
+  de leerlo de localStorage) y el saludo del navbar.
+- Los campos de `Perfil` se leen una vez por usuario y quedan en el cache
+  (`APARIENCIA_CACHE`, `APARIENCIA_TTL_S`): con el cache caliente una
+  página no hace ninguna consulta extra. Guardar o borrar el `Perfil`
+  invalida la entrada al confirmar la transacción.
+- `APARIENCIA_CACHE` es por defecto `CACHES["default"]`, compartido entre
+  procesos: la invalidación de un worker la ven todos. Con un cache por
+  proceso (LocMem) los demás workers seguirían con el tema viejo hasta el TTL.
+- Solo cubre `save()`/`delete()`: un `Perfil.objects.update(...)` sobre
+  estos campos debe llamar a `invalidar` (los UPDATE de puntos y créditos
+  no tocan campos de apariencia). Si se olvida, el TTL corto acota cuánto
+  dura el valor viejo.
+- Es perezoso: una plantilla que no usa `apariencia` no toca el cache.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject
+
+from .models import Perfil
+
+CAMPOS = ("nombre_mostrar", "tema", "color_acento")
+COLOR_DEFECTO = "#111111"
+_HEX = re.compile(r"#[0-9a-fA-F]{6}")
+# tema del Perfil → valor de data-bs-theme en <html>
+_BS = {Perfil.Tema.CLARO: "light", Perfil.Tema.OSCURO: "dark", Perfil.Tema.SISTEMA: "auto"}
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _cache():
+    return caches[_config("APARIENCIA_CACHE", "default")]
+
+
+def _clave(usuario_id: int) -> str:
+    return f"apariencia:v1:{usuario_id}"
+
+
+@dataclass(frozen=True)
+class Apariencia:
+    nombre: str = ""
+    tema: str = Perfil.Tema.CLARO
+    color_acento: str = COLOR_DEFECTO
+
+    @property
+    def tema_bs(self) -> str:
+        """light / dark / auto (auto lo resuelve base.html con prefers-color-scheme)."""
+        return _BS.get(self.tema, "light")
+
+
+ANONIMA = Apariencia()
+
+
+def _desde_perfil(nombre: str, tema: str, color: str) -> Apariencia:
+    # el color va a un <style>: solo #RRGGBB, cualquier otra cosa cae al defecto
+    return Apariencia(nombre=nombre, tema=tema, color_acento=color if _HEX.fullmatch(color or "") else COLOR_DEFECTO)
+
+
+def de_usuario(user) -> Apariencia:
+    """Apariencia del usuario: cache → una consulta de 3 columnas si falta."""
+    if not getattr(user, "is_authenticated", False):
+        return ANONIMA
+    cache = _cache()
+    clave = _clave(user.pk)
+    valores: Optional[tuple] = cache.get(clave)
+    if valores is None:
+        fila = Perfil.objects.filter(user_id=user.pk).values_list(*CAMPOS).first()
+        valores = fila or ("", Perfil.Tema.CLARO, COLOR_DEFECTO)  # sin perfil también se guarda
+        cache.set(clave, tuple(valores), _config("APARIENCIA_TTL_S", 600))
+    nombre, tema, color = valores
+    return _desde_perfil(nombre or user.get_username(), tema, color)
+
+
+def invalidar(usuario_id: int) -> None:
+    transaction.on_commit(lambda: _cache().delete(_clave(usuario_id)))
+
+
+@receiver(post_save, sender=Perfil)
+@receiver(post_delete, sender=Perfil)
+def _perfil_cambio(sender, instance, **kwargs):
+    invalidar(instance.user_id)
+
+
+def contexto(request):
+    """Context processor (TEMPLATES → context_processors)."""
+    return {"apariencia": SimpleLazyObject(lambda: de_usuario(getattr(request, "user", None)))}
@@ -5,4 +5,4 @@ class ZaraConfig(AppConfig):
     name = 'zara'
 
     def ready(self):
-        from . import signals  
\ No newline at end of file
+        from . import signals, apariencia, catalogo, impacto, trabajos, variantes  # noqa: F401 (registran receivers y tareas)  
\ No newline at end of file
@@ -0,0 +1,202 @@
+# zara/barrido.py
+"""
+Barrido de carritos abandonados.
+
+Borra (opcionalmente archivando antes en JSONL) los carritos sin actividad
+hace más de `CARRITO_TTL_HORAS`, por lotes cortos:
+- nunca toca carritos con `Pedido` (la FK es PROTECT),
+- cada lote es una transacción; el tamaño se ajusta para que el lock de
+  escritura no supere `CARRITO_BARRIDO_MAX_LOCK_MS`, y entre lotes se cede
+  el mismo tiempo a otros escritores,
+- al final, en SQLite, `PRAGMA incremental_vacuum` devuelve páginas libres,
+  también en transacciones cortas bajo el mismo presupuesto de lock.
+
+Actividad es `Carrito.actualizado_en`: lo mueve guardar el carrito y también
+guardar o borrar uno de sus ítems (`ItemCarrito.save/delete`); un
+`bulk_create` o `update()` sobre ítems debe tocar el carrito a mano.
+
+No hay reservas de stock en el modelo actual (el stock se descuenta al
+pagar), así que borrar un carrito no tiene nada que liberar.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Carrito, ItemCarrito
+
+logger = logging.getLogger(__name__)
+
+LOTE_MIN, LOTE_MAX = 10, 5000
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+@dataclass
+class ResultadoBarrido:
+    carritos: int = 0
+    items: int = 0
+    lotes: int = 0
+    segundos: float = 0.0
+    lock_max_ms: float = 0.0
+    paginas_liberadas: int = 0
+    archivo: Optional[str] = None
+    lotes_ms: List[float] = field(default_factory=list)
+
+    @property
+    def filas_por_segundo(self) -> float:
+        return (self.carritos + self.items) / self.segundos if self.segundos else 0.0
+
+
+def candidatos(corte, limite: int) -> List[int]:
+    """Ids de carritos inactivos sin pedido, más antiguos primero."""
+    return list(
+        Carrito.objects.filter(actualizado_en__lt=corte, pedido__isnull=True)
+        .order_by("actualizado_en", "id")
+        .values_list("id", flat=True)[:limite]
+    )
+
+
+def _archivar(ids: List[int], destino) -> None:
+    items: Dict[int, list] = {}
+    for carrito_id, producto_id, cantidad, precio in ItemCarrito.objects.filter(
+        carrito_id__in=ids
+    ).values_list("carrito_id", "producto_id", "cantidad", "precio_unitario"):
+        items.setdefault(carrito_id, []).append([producto_id, cantidad, str(precio)])
+    for pk, creado, actualizado, cupon in Carrito.objects.filter(id__in=ids).values_list(
+        "id", "creado_en", "actualizado_en", "cupon_id"
+    ):
+        destino.write(json.dumps({
+            "id": pk, "creado_en": creado.isoformat(), "actualizado_en": actualizado.isoformat(),
+            "cupon_id": cupon, "items": items.get(pk, []),
+        }) + "\n")
+
+
+def _borrar_lote(ids: List[int], corte, destino) -> tuple:
+    with transaction.atomic():
+        # Se revalida dentro de la transacción: pudo crearse un Pedido o volver la actividad
+        vigentes = list(
+            Carrito.objects.select_for_update()
+            .filter(id__in=ids, actualizado_en__lt=corte, pedido__isnull=True)
+            .values_list("id", flat=True)
+        )
+        if not vigentes:
+            return 0, 0
+        if destino is not None:
+            _archivar(vigentes, destino)
+        _, por_modelo = Carrito.objects.filter(id__in=vigentes).delete()
+    return por_modelo.get(Carrito._meta.label, 0), por_modelo.get(ItemCarrito._meta.label, 0)
+
+
+def _paginas_libres(cursor) -> int:
+    cursor.execute("PRAGMA freelist_count")
+    return cursor.fetchone()[0]
+
+
+def vacuum_incremental(paginas: int = 0, max_lock_ms: Optional[float] = None) -> int:
+    """
+    SQLite: libera hasta `paginas` páginas libres (0 = todas) y retorna las liberadas.
+    Va en transacciones propias de a lo más `max_lock_ms` cada una, cediendo
+    el mismo tiempo entre ellas (como los lotes de `barrer`).
+    Requiere `auto_vacuum=INCREMENTAL` (ver `activar_auto_vacuum`); en otros motores no hace nada.
+    """
+    if connection.vendor != "sqlite":
+        return 0
+    max_lock_ms = max_lock_ms if max_lock_ms is not None else _config("CARRITO_BARRIDO_MAX_LOCK_MS", 50)
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA auto_vacuum")
+        if cursor.fetchone()[0] != 2:
+            logger.info("SQLite sin auto_vacuum=INCREMENTAL; use `barrer_carritos --activar-auto-vacuum` una vez.")
+            return 0
+        antes = _paginas_libres(cursor)
+    objetivo = min(antes, paginas) if paginas else antes
+    pasos = 0
+    while pasos < objetivo:
+        t0 = time.perf_counter()
+        with transaction.atomic(), connection.cursor() as cursor:
+            # execute() avanza el pragma una sola página: se repite hasta agotar el presupuesto
+            while pasos < objetivo and (time.perf_counter() - t0) * 1000 < max_lock_ms:
+                cursor.execute("PRAGMA incremental_vacuum(1)")
+                pasos += 1
+        time.sleep(time.perf_counter() - t0)  # cede el lock a escritores en espera
+    with connection.cursor() as cursor:
+        return max(0, antes - _paginas_libres(cursor))
+
+
+def activar_auto_vacuum() -> None:
+    """Cambia SQLite a auto_vacuum=INCREMENTAL (requiere un VACUUM completo, una sola vez)."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+
+
+def barrer(
+    ttl_horas: Optional[float] = None,
+    lote: int = 1000,
+    max_lock_ms: Optional[float] = None,
+    archivar: bool = False,
+    vacuum_paginas: int = 0,
+    max_carritos: Optional[int] = None,
+) -> ResultadoBarrido:
+    ttl_horas = ttl_horas if ttl_horas is not None else _config("CARRITO_TTL_HORAS", 72)
+    max_lock_ms = max_lock_ms if max_lock_ms is not None else _config("CARRITO_BARRIDO_MAX_LOCK_MS", 50)
+    corte = timezone.now() - timedelta(hours=ttl_horas)
+    r = ResultadoBarrido()
+    # Arranca con el lote mínimo y crece mientras el lock quede bajo el presupuesto
+    tope, lote = max(LOTE_MIN, min(lote, LOTE_MAX)), LOTE_MIN
+
+    destino = None
+    if archivar:
+        carpeta = Path(_config("CARRITO_ARCHIVO_DIR", settings.BASE_DIR / "var" / "archivo"))
+        carpeta.mkdir(parents=True, exist_ok=True)
+        ruta = carpeta / f"carritos-{timezone.now():%Y%m%d-%H%M%S}.jsonl"
+        destino = open(ruta, "a", encoding="utf-8")
+        r.archivo = str(ruta)
+
+    t0 = time.perf_counter()
+    try:
+        while max_carritos is None or r.carritos < max_carritos:
+            limite = lote if max_carritos is None else min(lote, max_carritos - r.carritos)
+            ids = candidatos(corte, limite)
+            if not ids:
+                break
+            t_lote = time.perf_counter()
+            n_carritos, n_items = _borrar_lote(ids, corte, destino)
+            ms = (time.perf_counter() - t_lote) * 1000
+            r.carritos += n_carritos
+            r.items += n_items
+            r.lotes += 1
+            r.lotes_ms.append(ms)
+            r.lock_max_ms = max(r.lock_max_ms, ms)
+
+            # Ajuste del lote al presupuesto de lock
+            if ms > max_lock_ms:
+                lote = max(LOTE_MIN, int(lote * max_lock_ms / ms * 0.8))
+            elif ms < max_lock_ms / 2:
+                lote = min(tope, lote * 2)
+            if n_carritos == 0:
+                break
+            time.sleep(ms / 1000)  # cede el lock a escritores en espera
+    finally:
+        if destino is not None:
+            destino.close()
+    r.segundos = time.perf_counter() - t0
+    r.paginas_liberadas = vacuum_incremental(vacuum_paginas, max_lock_ms)
+    logger.info(
+        "Barrido de carritos: %s carritos, %s ítems, %.0f filas/s, lock máx %.1f ms",
+        r.carritos, r.items, r.filas_por_segundo, r.lock_max_ms,
+    )
+    return r
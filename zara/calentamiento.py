@@ -0,0 +1,30 @@
+# zara/calentamiento.py
+"""
+Pasos de calentamiento propios de esta app (ver `comun.calentamiento`):
+índice del buscador y snapshots de catálogo (pesos, cupones) y comunas.
+"""
+from comun.calentamiento import calentador
+
+
+@calentador("busqueda")
+def _busqueda():
+    from .catalogo import indice_busqueda
+    return len(indice_busqueda())
+
+
+@calentador("pesos")
+def _pesos():
+    from .catalogo import snapshot_pesos
+    return len(snapshot_pesos())
+
+
+@calentador("cupones")
+def _cupones():
+    from .catalogo import snapshot_cupones
+    return len(snapshot_cupones())
+
+
+@calentador("comunas")
+def _comunas():
+    from .direcciones import tabla_comunas
+    return len(tabla_comunas())
@@ -0,0 +1,138 @@
+# zara/catalogo.py
+"""
+Snapshots en memoria de datos de catálogo de lectura frecuente.
+
+- Índice de búsqueda del buscador (lupa).
+- Pesos de `Producto` para cotizar envíos.
+- Cupones por código para el checkout (los precios no: se leen de la BD al
+  crear el pedido, un precio viejo cobraría mal).
+
+Se construyen una vez por proceso (o en el master antes del fork, ver
+`zara.calentamiento`). Guardar/borrar un producto o un cupón, o importar el catálogo
+sube una versión en el cache compartido (`CACHES["default"]`); cada proceso
+la compara cada pocos segundos y además recarga tras `CATALOGO_TTL_S`.
+"""
+from __future__ import annotations
+
+import time
+from functools import lru_cache, update_wrapper
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Cupon, Producto
+
+# =============================
+#  BUSCADOR
+# =============================
+
+CATALOGO_BUSQUEDA: List[Dict[str, str]] = [
+    {"nombre": "Conjunto formal gris", "categoria": "Mujer", "slug": "conjunto-formal-gris"},
+    {"nombre": "Trench liviano", "categoria": "Mujer", "slug": "trench-liviano"},
+    {"nombre": "Blazer Mocha", "categoria": "Hombre", "slug": "blazer-mocha"},
+    {"nombre": "Pantalón lino beige", "categoria": "Hombre", "slug": "pantalon-lino-beige"},
+    {"nombre": "Chaqueta acolchada niña", "categoria": "Niña", "slug": "chaqueta-acolchada-nina"},
+    {"nombre": "Polera niño básica", "categoria": "Niño", "slug": "polera-nino-basica"},
+    {"nombre": "Cartera Safari", "categoria": "Accesorios", "slug": "cartera-safari"},
+    {"nombre": "Perfume Rose Tan", "categoria": "Perfumes", "slug": "perfume-rose-tan"},
+]
+
+
+@lru_cache(maxsize=1)
+def indice_busqueda() -> Tuple[Tuple[str, str, Dict[str, str]], ...]:
+    """(nombre en minúsculas, categoría en minúsculas, item) por producto."""
+    return tuple(
+        (item["nombre"].lower(), item["categoria"].lower(), item) for item in CATALOGO_BUSQUEDA
+    )
+
+
+def buscar_en_catalogo(q: str) -> List[Dict[str, str]]:
+    ql = q.strip().lower()
+    if not ql:
+        return []
+    return [item for nombre, categoria, item in indice_busqueda() if ql in nombre or ql in categoria]
+
+
+# =============================
+#  PESOS Y CUPONES (snapshots versionados)
+# =============================
+
+VERSION_CLAVE = "catalogo:version"
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def version() -> int:
+    """Versión del catálogo en el cache compartido (0 si no está: obliga a recargar)."""
+    return cache.get(VERSION_CLAVE) or 0
+
+
+class _Snapshot:
+    """
+    Valor por proceso con dos límites: la versión del catálogo en el cache
+    compartido (se mira como mucho cada `CATALOGO_REVISAR_S`) y una vida
+    máxima `CATALOGO_TTL_S`, por si el cache compartido se vació o no está.
+    """
+
+    def __init__(self, cargar):
+        self.cargar = cargar
+        self.valor = None
+        self.version = None
+        self.cargado = self.revisado = 0.0
+        update_wrapper(self, cargar)
+
+    def __call__(self):
+        ahora = time.monotonic()
+        if self.valor is not None and ahora - self.cargado < _config("CATALOGO_TTL_S", 300):
+            if ahora - self.revisado < _config("CATALOGO_REVISAR_S", 2):
+                return self.valor
+            self.revisado = ahora
+            if version() == self.version:
+                return self.valor
+        v = version()  # antes de cargar: un cambio durante la carga obliga a recargar la próxima vez
+        self.valor, self.version, self.cargado, self.revisado = self.cargar(), v, ahora, ahora
+        return self.valor
+
+    def cache_clear(self) -> None:
+        self.valor = None
+
+
+@_Snapshot
+def snapshot_pesos() -> Dict[int, int]:
+    """{producto_id: peso en gramos} para cotizar envíos (zara.envios)."""
+    return dict(Producto.objects.values_list("id", "peso_gramos"))
+
+
+@_Snapshot
+def snapshot_cupones() -> Dict[str, Cupon]:
+    """{código en minúsculas: Cupon} para el checkout (zara.pedidos); la vigencia se evalúa al usarlo."""
+    return {c.codigo.lower(): c for c in Cupon.objects.all()}
+
+
+def cupon_por_codigo(codigo: str) -> Optional[Cupon]:
+    return snapshot_cupones().get(codigo.strip().lower()) if codigo else None
+
+
+def invalidar_catalogo() -> None:
+    """
+    Sube la versión compartida: todos los procesos (web, worker, comandos)
+    recargan en su próxima revisión. La llaman los signals y las escrituras
+    masivas que no los disparan (zara.importacion).
+    """
+    try:
+        cache.incr(VERSION_CLAVE)
+    except ValueError:  # no existía (cache vacío)
+        cache.set(VERSION_CLAVE, version() + 1, None)
+    snapshot_pesos.cache_clear()
+    snapshot_cupones.cache_clear()
+
+
+@receiver([post_save, post_delete], sender=Producto)
+@receiver([post_save, post_delete], sender=Cupon)
+def _invalidar_pesos(sender, **kwargs):
+    invalidar_catalogo()
@@ -0,0 +1,297 @@
+# zara/correo.py
+"""
+Correo transaccional en cola (reset de contraseña, estados de pedido).
+
+- `encolar` solo inserta un `Correo` (plantilla + contexto JSON) y despierta
+  la tarea `zara.enviar_correos` al confirmar la transacción: el request
+  vuelve sin render ni red.
+- Plantillas en `templates/correo/<nombre>/` (`asunto.txt`, `cuerpo.txt` y
+  opcional `cuerpo.html`). Se compilan una vez por versión (sha1 de las
+  fuentes); un cambio en disco crea una versión nueva en la próxima pasada.
+- Envío por lotes sobre una conexión SMTP abierta y reutilizada entre
+  lotes y pasadas del mismo worker (se cierra tras `CORREO_SMTP_IDLE_S` sin
+  uso). Ritmo máximo `CORREO_MAX_POR_SEGUNDO` por worker.
+- La toma de un lote es un UPDATE condicional que corre `proximo_intento`
+  como plazo: si el worker muere a mitad, los correos vuelven solos a estar
+  listos al vencer el plazo.
+- Para probar en local: `python -m aiosmtpd -n -l localhost:1025` con
+  `EMAIL_PORT=1025`.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import smtplib
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template import TemplateDoesNotExist, engines
+from django.template.loader import get_template
+from django.utils import timezone
+
+from . import tareas
+from .models import Correo, Pedido, Tarea
+from .outbox import backoff
+
+logger = logging.getLogger(__name__)
+
+Estado = Correo.Estado
+TAREA = "zara.enviar_correos"
+PLAZO_TOMA_S = 300
+# Destinatario rechazado: reintentar no sirve
+PERMANENTES = (smtplib.SMTPRecipientsRefused,)
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+# =============================
+#  ENCOLADO (request)
+# =============================
+
+def _despertar() -> None:
+    # basta una pendiente: si hay una en curso, esta recoge lo que llegue después de su última toma
+    if not Tarea.objects.filter(nombre=TAREA, estado=Tarea.Estado.PENDIENTE).exists():
+        tareas.encolar(TAREA)
+
+
+def encolar(plantilla: str, para: str, contexto: Optional[Dict[str, object]] = None) -> Correo:
+    """Inserta el correo; el envío lo hace el worker tras el commit."""
+    correo = Correo.objects.create(plantilla=plantilla, para=para, contexto=contexto or {})
+    transaction.on_commit(_despertar)
+    return correo
+
+
+def encolar_lote(plantilla: str, destinos: Iterable[Tuple[str, Dict[str, object]]]) -> int:
+    """Un INSERT por lote de 1000 para [(para, contexto)]."""
+    filas = Correo.objects.bulk_create(
+        [Correo(plantilla=plantilla, para=para, contexto=contexto) for para, contexto in destinos],
+        batch_size=1000,
+    )
+    if filas:
+        transaction.on_commit(_despertar)
+    return len(filas)
+
+
+def notificar_pedidos(pedido_ids: List[int], estado: str) -> int:
+    """Avisos de cambio de estado (solo los de `CORREO_ESTADOS_PEDIDO`), dentro de la transacción del cambio."""
+    if estado not in _config("CORREO_ESTADOS_PEDIDO", ("PAGADO", "ENVIADO", "CANCELADO")) or not pedido_ids:
+        return 0
+    return encolar_lote(f"pedido_{estado.lower()}", (
+        (email, {"pedido": pk, "estado": estado, "total": str(total), "nombre": username or ""})
+        for pk, email, total, username in Pedido.objects.filter(pk__in=pedido_ids).exclude(email_cliente="")
+        .values_list("pk", "email_cliente", "total_pagado", "user__username")
+    ))
+
+
+# =============================
+#  PLANTILLAS (una compilación por versión)
+# =============================
+
+@dataclass(frozen=True)
+class Plantilla:
+    version: str
+    asunto: object
+    texto: object
+    html: Optional[object]
+
+    def mensaje(self, correo: Correo, remitente: str) -> EmailMultiAlternatives:
+        contexto = correo.contexto
+        asunto = " ".join(self.asunto.render(contexto).split())  # una línea, sin saltos
+        msg = EmailMultiAlternatives(asunto, self.texto.render(contexto), remitente, [correo.para])
+        if self.html is not None:
+            msg.attach_alternative(self.html.render(contexto), "text/html")
+        return msg
+
+
+_compiladas: Dict[str, Plantilla] = {}  # version → Plantilla
+
+
+def _fuente(ruta: str, requerida: bool = True) -> Optional[str]:
+    try:
+        return get_template(ruta).template.source
+    except TemplateDoesNotExist:
+        if requerida:
+            raise
+        return None
+
+
+def plantilla(nombre: str) -> Plantilla:
+    """Compilada para la versión actual de sus fuentes (se lee el disco, no se recompila si no cambió)."""
+    fuentes = (
+        _fuente(f"correo/{nombre}/asunto.txt"),
+        _fuente(f"correo/{nombre}/cuerpo.txt"),
+        _fuente(f"correo/{nombre}/cuerpo.html", requerida=False),
+    )
+    version = hashlib.sha1("\0".join(f or "" for f in fuentes).encode()).hexdigest()[:12]
+    compilada = _compiladas.get(version)
+    if compilada is None:
+        motor = engines["django"]
+        asunto, texto, html = fuentes
+        compilada = _compiladas[version] = Plantilla(
+            version, motor.from_string(asunto), motor.from_string(texto),
+            motor.from_string(html) if html is not None else None,
+        )
+    return compilada
+
+
+# =============================
+#  CONEXIÓN SMTP REUTILIZADA
+# =============================
+
+class _Conexion:
+    """Una conexión del backend por proceso, abierta entre lotes y cerrada por inactividad."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conexion = None
+        self._ultimo_uso = 0.0
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._conexion is not None and time.monotonic() - self._ultimo_uso > _config("CORREO_SMTP_IDLE_S", 30):
+            self._cerrar()
+        if self._conexion is None:
+            try:
+                self._conexion = get_connection(fail_silently=False)
+                self._conexion.open()
+            except BaseException:
+                self._conexion = None
+                self._lock.release()
+                raise
+        return self._conexion
+
+    def __exit__(self, tipo, exc, tb):
+        try:
+            if exc is not None:
+                self._cerrar()  # estado desconocido tras un error de conexión: se abre otra
+            else:
+                self._ultimo_uso = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def _cerrar(self):
+        try:
+            if self._conexion is not None:
+                self._conexion.close()
+        except Exception:
+            pass
+        self._conexion = None
+
+
+conexion = _Conexion()
+
+
+class _Ritmo:
+    """Espacia los envíos para no pasar de `por_segundo`."""
+
+    def __init__(self, por_segundo: float):
+        self.intervalo = 1.0 / por_segundo if por_segundo > 0 else 0.0
+        self.proximo = time.monotonic()
+
+    def esperar(self) -> None:
+        ahora = time.monotonic()
+        if self.proximo > ahora:
+            time.sleep(self.proximo - ahora)
+        self.proximo = max(self.proximo, ahora) + self.intervalo
+
+
+# =============================
+#  ENVÍO (worker)
+# =============================
+
+@dataclass
+class ResultadoEnvio:
+    enviados: int = 0
+    reintentos: int = 0
+    fallidos: int = 0
+    lotes: int = 0
+
+
+def tomar(limite: int) -> List[Correo]:
+    ahora = timezone.now()
+    candidatos = list(
+        Correo.objects.filter(estado=Estado.PENDIENTE, proximo_intento__lte=ahora)
+        .order_by("proximo_intento", "id").values_list("pk", flat=True)[:limite]
+    )
+    if not candidatos:
+        return []
+    lote = f"{tareas.id_worker()}:{uuid.uuid4().hex[:8]}"
+    Correo.objects.filter(pk__in=candidatos, estado=Estado.PENDIENTE, proximo_intento__lte=ahora).update(
+        tomado_por=lote, proximo_intento=ahora + timedelta(seconds=PLAZO_TOMA_S), intentos=F("intentos") + 1,
+    )
+    return list(Correo.objects.filter(pk__in=candidatos, tomado_por=lote).order_by("id"))
+
+
+def _fallo(correo: Correo, exc: Exception, r: ResultadoEnvio) -> None:
+    error = f"{type(exc).__name__}: {exc}"[:1000]
+    filtro = Correo.objects.filter(pk=correo.pk, tomado_por=correo.tomado_por)
+    if isinstance(exc, PERMANENTES) or correo.intentos >= _config("CORREO_MAX_INTENTOS", 6):
+        filtro.update(estado=Estado.FALLIDO, ultimo_error=error)
+        r.fallidos += 1
+    else:
+        filtro.update(proximo_intento=timezone.now() + backoff(correo.intentos), ultimo_error=error)
+        r.reintentos += 1
+
+
+def enviar_lote(lote: List[Correo], ritmo: _Ritmo, r: ResultadoEnvio) -> bool:
+    """Envía el lote por la conexión compartida. False si la conexión falló (el resto se reprograma)."""
+    remitente = settings.DEFAULT_FROM_EMAIL
+    plantillas: Dict[str, Plantilla] = {}  # versión leída una vez por lote
+    pendientes = list(reversed(lote))
+    try:
+        with conexion as smtp:
+            while pendientes:
+                correo = pendientes[-1]
+                try:
+                    if correo.plantilla not in plantillas:
+                        plantillas[correo.plantilla] = plantilla(correo.plantilla)
+                    p = plantillas[correo.plantilla]
+                    msg = p.mensaje(correo, remitente)
+                except Exception as exc:  # plantilla rota o contexto inválido: no es culpa del SMTP
+                    _fallo(pendientes.pop(), exc, r)
+                    continue
+                ritmo.esperar()
+                try:
+                    smtp.send_messages([msg])
+                except PERMANENTES as exc:
+                    _fallo(pendientes.pop(), exc, r)
+                    continue
+                Correo.objects.filter(pk=correo.pk, tomado_por=correo.tomado_por).update(
+                    estado=Estado.ENVIADO, enviado_en=timezone.now(), version=p.version, contexto={}, ultimo_error="",
+                )
+                pendientes.pop()
+                r.enviados += 1
+    except (smtplib.SMTPException, OSError) as exc:
+        # conexión caída o rechazada: __exit__ la cerró; lo no enviado vuelve con backoff
+        for correo in pendientes:
+            _fallo(correo, exc, r)
+        logger.warning("Correo: conexión SMTP falló (%s); %s correo(s) reprogramados.", exc, len(pendientes))
+        return False
+    return True
+
+
+def enviar_pendientes(max_segundos: Optional[float] = None) -> ResultadoEnvio:
+    """Envía lotes de `CORREO_LOTE` hasta vaciar la cola, agotar el tiempo o perder la conexión."""
+    r = ResultadoEnvio()
+    ritmo = _Ritmo(_config("CORREO_MAX_POR_SEGUNDO", 10))
+    limite = time.monotonic() + (max_segundos if max_segundos is not None else _config("CORREO_MAX_SEGUNDOS", 60))
+    while time.monotonic() < limite:
+        lote = tomar(_config("CORREO_LOTE", 50))
+        if not lote:
+            break
+        r.lotes += 1
+        if not enviar_lote(lote, ritmo, r):
+            break
+    if r.enviados or r.fallidos or r.reintentos:
+        logger.info("Correo: enviados=%s reintentos=%s fallidos=%s", r.enviados, r.reintentos, r.fallidos)
+    return r
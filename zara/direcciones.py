@@ -0,0 +1,179 @@
+# zara/direcciones.py
+"""
+Libreta de direcciones del cliente.
+
+- Una sola dirección principal por usuario (índice único parcial en la BD);
+  los cambios de principal se hacen aquí, serializados por usuario.
+- Tabla de comunas / regiones / códigos postales de Chile en memoria para
+  autocompletar sin consultas. La tabla base (`datos/comunas_cl.csv`) se
+  puede reemplazar por el archivo completo de Correos con
+  `DIRECCIONES_COMUNAS_CSV` (mismas columnas: region, comuna, codigo_postal).
+"""
+from __future__ import annotations
+
+import bisect
+import csv
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from comun.texto import plegar
+
+from .models import Direccion
+
+COMUNAS_CSV = Path(__file__).resolve().parent / "datos" / "comunas_cl.csv"
+MAX_SUGERENCIAS = 10
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+# =============================
+#  PRINCIPAL / CRUD
+# =============================
+
+def _bloquear_usuario(user_id: int) -> None:
+    """Serializa los cambios de principal de un mismo usuario (dentro de atomic)."""
+    list(get_user_model().objects.select_for_update().filter(pk=user_id).values_list("pk"))
+
+
+def principal(user) -> Optional[Direccion]:
+    return user.direcciones.filter(es_principal=True).first()
+
+
+@transaction.atomic
+def guardar(direccion: Direccion, hacer_principal: bool = False) -> Direccion:
+    """
+    Crea o actualiza. Queda como principal si se pide o si el usuario no
+    tiene otra; la anterior se desmarca antes de guardar (el índice único
+    no admite dos principales ni siquiera dentro de la transacción).
+    """
+    _bloquear_usuario(direccion.user_id)
+    otras = Direccion.objects.filter(user_id=direccion.user_id, es_principal=True).exclude(pk=direccion.pk)
+    if hacer_principal:
+        otras.update(es_principal=False)
+        direccion.es_principal = True
+    elif not direccion.es_principal and not otras.exists():
+        direccion.es_principal = True
+    direccion.save()
+    return direccion
+
+
+@transaction.atomic
+def marcar_principal(direccion: Direccion) -> Direccion:
+    return guardar(direccion, hacer_principal=True)
+
+
+@transaction.atomic
+def eliminar(direccion: Direccion) -> None:
+    """Borra; si era la principal, promueve la más antigua que quede."""
+    _bloquear_usuario(direccion.user_id)
+    era_principal = direccion.es_principal
+    user_id = direccion.user_id
+    direccion.delete()
+    if era_principal:
+        siguiente = Direccion.objects.filter(user_id=user_id).order_by("id").values_list("pk", flat=True).first()
+        if siguiente is not None:
+            Direccion.objects.filter(pk=siguiente).update(es_principal=True)
+
+
+# =============================
+#  COMUNAS / REGIONES (memoria)
+# =============================
+
+@dataclass(frozen=True)
+class Comuna:
+    comuna: str
+    region: str
+    codigo_postal: str
+
+    def como_dict(self) -> Dict[str, str]:
+        return {"ciudad": self.comuna, "region": self.region, "codigo_postal": self.codigo_postal}
+
+
+@lru_cache(maxsize=1)
+def tabla_comunas() -> Tuple[Tuple[str, Comuna], ...]:
+    """(nombre plegado, Comuna) ordenado por nombre: búsqueda por prefijo con bisect."""
+    ruta = Path(_config("DIRECCIONES_COMUNAS_CSV", COMUNAS_CSV))
+    with open(ruta, encoding="utf-8", newline="") as f:
+        filas = [
+            Comuna(fila["comuna"].strip(), fila["region"].strip(), fila["codigo_postal"].strip())
+            for fila in csv.DictReader(f)
+        ]
+    return tuple(sorted(((plegar(c.comuna), c) for c in filas), key=lambda par: par[0]))
+
+
+@lru_cache(maxsize=1)
+def _por_nombre() -> Dict[str, Comuna]:
+    return {nombre: c for nombre, c in tabla_comunas()}
+
+
+@lru_cache(maxsize=1)
+def _por_codigo() -> Dict[str, Comuna]:
+    return {c.codigo_postal: c for _, c in tabla_comunas()}
+
+
+@lru_cache(maxsize=1)
+def regiones() -> Tuple[str, ...]:
+    return tuple(sorted({c.region for _, c in tabla_comunas()}, key=plegar))
+
+
+def comuna(nombre: str) -> Optional[Comuna]:
+    """Comuna por nombre exacto (sin importar mayúsculas ni acentos)."""
+    return _por_nombre().get(plegar(nombre.strip()))
+
+
+def por_codigo_postal(codigo: str) -> Optional[Comuna]:
+    """Comuna de un código postal: exacto, o por sus 3 primeros dígitos (zona de la comuna)."""
+    codigo = "".join(ch for ch in codigo if ch.isdigit())
+    if not codigo:
+        return None
+    exacto = _por_codigo().get(codigo)
+    if exacto is not None or len(codigo) < 3:
+        return exacto
+    return _por_codigo().get(codigo[:3] + "0000")
+
+
+def autocompletar(q: str, region: str = "", limite: int = MAX_SUGERENCIAS) -> List[Comuna]:
+    """Comunas cuyo nombre empieza con `q`; luego las que lo contienen. Filtra por región si se indica."""
+    ql = plegar(q.strip())
+    if not ql:
+        return []
+    region_pl = plegar(region.strip())
+    tabla = tabla_comunas()
+    resultado: List[Comuna] = []
+    i = bisect.bisect_left(tabla, (ql,))
+    while i < len(tabla) and tabla[i][0].startswith(ql) and len(resultado) < limite:
+        if not region_pl or plegar(tabla[i][1].region) == region_pl:
+            resultado.append(tabla[i][1])
+        i += 1
+    if len(resultado) < limite:
+        for nombre, c in tabla:
+            if ql in nombre and not nombre.startswith(ql) and (not region_pl or plegar(c.region) == region_pl):
+                resultado.append(c)
+                if len(resultado) >= limite:
+                    break
+    return resultado
+
+
+def completar(datos: Dict[str, str]) -> Dict[str, str]:
+    """
+    Normaliza la comuna a su nombre oficial y rellena región / código postal
+    vacíos (o la comuna a partir del código postal).
+    """
+    datos = dict(datos)
+    encontrada = comuna(datos.get("ciudad") or "")
+    if encontrada is None and datos.get("codigo_postal"):
+        encontrada = por_codigo_postal(datos["codigo_postal"])
+    if encontrada is not None:
+        if not datos.get("ciudad") or plegar(datos["ciudad"].strip()) == plegar(encontrada.comuna):
+            datos["ciudad"] = encontrada.comuna
+        datos["region"] = datos.get("region") or encontrada.region
+        datos["codigo_postal"] = datos.get("codigo_postal") or encontrada.codigo_postal
+    return datos
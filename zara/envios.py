@@ -0,0 +1,281 @@
+# zara/envios.py
+"""
+Costo y plazo de envío.
+
+- Zona de destino: región de la `Direccion` (o su código postal / comuna vía
+  la tabla de `zara.direcciones`) → una de las zonas de `ZONA_POR_REGION`.
+- Peso: Σ cantidad × `Producto.peso_gramos`, agrupado en tramos (`TRAMOS_G`).
+- Tarifa: matriz en memoria (zona, servicio) → precio por tramo + plazo.
+- Memo por (zona, tramo) con TTL: el resultado ya incluye las fechas
+  estimadas, así que además vence en el próximo corte diario de despacho.
+  Las zonas son fijas y los tramos sobre `MEMO_MAX_TRAMO` se calculan sin
+  memo, así que el memo no pasa de zonas × (MEMO_MAX_TRAMO + 1) entradas
+  por mucho que pese lo que pida un cliente.
+
+`cotizar_lote` resuelve varios destinos en una llamada (todas las
+direcciones del cliente en el carrito) sin tocar la BD.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from comun.texto import plegar
+
+from . import direcciones
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+# =============================
+#  TABLAS
+# =============================
+
+ZONA_POR_REGION: Dict[str, str] = {
+    "arica y parinacota": "norte", "tarapaca": "norte", "antofagasta": "norte",
+    "atacama": "norte_chico", "coquimbo": "norte_chico",
+    "valparaiso": "centro", "o'higgins": "centro",
+    "libertador general bernardo o'higgins": "centro",
+    "metropolitana": "rm", "metropolitana de santiago": "rm", "santiago": "rm",
+    "maule": "centro_sur", "nuble": "centro_sur", "biobio": "centro_sur", "bio bio": "centro_sur",
+    "la araucania": "sur", "araucania": "sur", "los rios": "sur", "los lagos": "sur",
+    "aysen": "austral", "aysen del general carlos ibanez del campo": "austral",
+    "magallanes": "austral", "magallanes y de la antartica chilena": "austral",
+}
+
+# Límites superiores (gramos) de cada tramo; sobre el último, tramos de 10 kg
+TRAMOS_G: Tuple[int, ...] = (1000, 3000, 5000, 10000, 20000)
+TRAMO_EXTRA_G = 10000
+
+SERVICIOS: Dict[str, str] = {"std": "Estándar", "express": "Express", "pickup": "Retiro en tienda"}
+
+
+@dataclass(frozen=True)
+class Tarifa:
+    precios: Tuple[int, ...]  # CLP por tramo de TRAMOS_G
+    extra: int                # CLP por cada TRAMO_EXTRA_G sobre el último tramo
+    dias_min: int
+    dias_max: int
+
+
+def _t(precios, extra, dias_min, dias_max) -> Tarifa:
+    return Tarifa(tuple(precios), extra, dias_min, dias_max)
+
+
+TARIFAS: Dict[Tuple[str, str], Tarifa] = {
+    ("rm", "std"):              _t((2990, 3490, 3990, 4990, 6990), 2500, 1, 2),
+    ("rm", "express"):          _t((4990, 5490, 6490, 7990, 9990), 3500, 0, 1),
+    ("rm", "pickup"):           _t((0, 0, 0, 0, 0), 0, 1, 2),
+    ("centro", "std"):          _t((3490, 3990, 4790, 5990, 7990), 3000, 2, 3),
+    ("centro", "express"):      _t((5990, 6490, 7490, 8990, 11490), 4000, 1, 2),
+    ("centro", "pickup"):       _t((0, 0, 0, 0, 0), 0, 2, 3),
+    ("centro_sur", "std"):      _t((3990, 4490, 5490, 6990, 8990), 3500, 2, 4),
+    ("centro_sur", "express"):  _t((6490, 7290, 8490, 9990, 12990), 4500, 1, 2),
+    ("centro_sur", "pickup"):   _t((0, 0, 0, 0, 0), 0, 3, 4),
+    ("norte_chico", "std"):     _t((4490, 4990, 5990, 7490, 9990), 4000, 3, 5),
+    ("norte_chico", "express"): _t((6990, 7990, 9490, 11490, 14490), 5000, 2, 3),
+    ("sur", "std"):             _t((4490, 4990, 5990, 7490, 9990), 4000, 3, 5),
+    ("sur", "express"):         _t((6990, 7990, 9490, 11490, 14490), 5000, 2, 3),
+    ("norte", "std"):           _t((5490, 6490, 7990, 9990, 12990), 5000, 3, 6),
+    ("norte", "express"):       _t((8490, 9490, 11490, 13990, 17990), 6500, 2, 3),
+    ("austral", "std"):         _t((6990, 7990, 9990, 12990, 16990), 6500, 5, 8),
+    ("austral", "express"):     _t((9990, 11490, 13990, 16990, 21990), 8000, 3, 4),
+}
+
+
+@lru_cache(maxsize=1)
+def servicios_por_zona() -> Dict[str, Tuple[Tuple[str, Tarifa], ...]]:
+    zonas: Dict[str, List[Tuple[str, Tarifa]]] = {}
+    for (zona, servicio), tarifa in TARIFAS.items():
+        zonas.setdefault(zona, []).append((servicio, tarifa))
+    orden = list(SERVICIOS)
+    return {z: tuple(sorted(s, key=lambda par: orden.index(par[0]))) for z, s in zonas.items()}
+
+
+def _clave_region(region: str) -> str:
+    clave = plegar(region.strip())
+    for prefijo in ("region de la ", "region del ", "region de ", "region "):
+        if clave.startswith(prefijo):
+            return clave[len(prefijo):]
+    return clave
+
+
+def zona_de(region: str = "", codigo_postal: str = "", ciudad: str = "") -> Optional[str]:
+    """Zona por región; si falta o no se reconoce, por código postal y luego por comuna."""
+    if region:
+        zona = ZONA_POR_REGION.get(_clave_region(region))
+        if zona:
+            return zona
+    for encontrada in (
+        direcciones.por_codigo_postal(codigo_postal) if codigo_postal else None,
+        direcciones.comuna(ciudad) if ciudad else None,
+    ):
+        if encontrada is not None:
+            return ZONA_POR_REGION.get(_clave_region(encontrada.region))
+    return None
+
+
+def tramo_de(peso_gramos: int) -> int:
+    peso_gramos = max(0, int(peso_gramos))
+    i = bisect.bisect_left(TRAMOS_G, peso_gramos)
+    if i < len(TRAMOS_G):
+        return i
+    return len(TRAMOS_G) - 1 + -(-(peso_gramos - TRAMOS_G[-1]) // TRAMO_EXTRA_G)
+
+
+def precio_tramo(tarifa: Tarifa, tramo: int) -> int:
+    ultimo = len(tarifa.precios) - 1
+    if tramo <= ultimo:
+        return tarifa.precios[tramo]
+    return tarifa.precios[ultimo] + (tramo - ultimo) * tarifa.extra
+
+
+# =============================
+#  PLAZOS
+# =============================
+
+def inicio_despacho(ahora: datetime) -> date:
+    """Día hábil en que sale el pedido: hoy antes del corte, si no el siguiente."""
+    local = timezone.localtime(ahora)
+    dia = local.date()
+    if local.hour >= _config("ENVIO_HORA_CORTE", 14):
+        dia += timedelta(days=1)
+    while dia.weekday() >= 5:
+        dia += timedelta(days=1)
+    return dia
+
+
+def sumar_dias_habiles(desde: date, dias: int) -> date:
+    while dias > 0:
+        desde += timedelta(days=1)
+        if desde.weekday() < 5:
+            dias -= 1
+    return desde
+
+
+def _proximo_corte(ahora: datetime) -> float:
+    """Segundos hasta que cambia `inicio_despacho` (corte de hoy o medianoche)."""
+    local = timezone.localtime(ahora)
+    corte = local.replace(hour=_config("ENVIO_HORA_CORTE", 14), minute=0, second=0, microsecond=0)
+    if local >= corte:
+        corte = local.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return max(1.0, (corte - local).total_seconds())
+
+
+# =============================
+#  COTIZACIÓN (memo por zona, tramo)
+# =============================
+
+@dataclass(frozen=True)
+class Opcion:
+    servicio: str
+    costo: int  # CLP
+    dias_min: int
+    dias_max: int
+    eta_desde: date
+    eta_hasta: date
+
+    def como_dict(self) -> Dict[str, object]:
+        return {
+            "servicio": self.servicio,
+            "nombre": SERVICIOS.get(self.servicio, self.servicio),
+            "costo": str(Decimal(self.costo).quantize(Decimal("0.01"))),
+            "dias_min": self.dias_min,
+            "dias_max": self.dias_max,
+            "eta_desde": self.eta_desde.isoformat(),
+            "eta_hasta": self.eta_hasta.isoformat(),
+        }
+
+
+# Tramo máximo que se memoriza (10 tramos extra = hasta 120 kg)
+MEMO_MAX_TRAMO = len(TRAMOS_G) - 1 + 10
+
+_memo: Dict[Tuple[str, int], Tuple[float, Tuple[Opcion, ...]]] = {}  # (zona, tramo) → (vence, opciones)
+_memo_lock = threading.Lock()
+
+
+def _opciones(zona: str, tramo: int) -> Tuple[Opcion, ...]:
+    ahora = timezone.now()
+    salida = inicio_despacho(ahora)
+    return tuple(
+        Opcion(
+            servicio=servicio,
+            costo=precio_tramo(tarifa, tramo),
+            dias_min=tarifa.dias_min,
+            dias_max=tarifa.dias_max,
+            eta_desde=sumar_dias_habiles(salida, tarifa.dias_min),
+            eta_hasta=sumar_dias_habiles(salida, tarifa.dias_max),
+        )
+        for servicio, tarifa in servicios_por_zona().get(zona, ())
+    )
+
+
+def opciones(zona: str, peso_gramos: int) -> Tuple[Opcion, ...]:
+    clave = (zona, tramo_de(peso_gramos))
+    if clave[1] > MEMO_MAX_TRAMO:
+        return _opciones(*clave)
+    entrada = _memo.get(clave)
+    reloj = time.monotonic()
+    if entrada is not None and entrada[0] > reloj:
+        return entrada[1]
+    calculadas = _opciones(*clave)
+    ttl = min(_config("ENVIO_MEMO_TTL", 300), _proximo_corte(timezone.now()))
+    with _memo_lock:
+        _memo[clave] = (reloj + ttl, calculadas)
+    return calculadas
+
+
+def limpiar_memo() -> None:
+    with _memo_lock:
+        _memo.clear()
+
+
+def cotizar(destino, peso_gramos: int) -> Tuple[Optional[str], Tuple[Opcion, ...]]:
+    """(zona, opciones) para una `Direccion` (o cualquier objeto con region/codigo_postal/ciudad)."""
+    zona = zona_de(
+        getattr(destino, "region", "") or "",
+        getattr(destino, "codigo_postal", "") or "",
+        getattr(destino, "ciudad", "") or "",
+    )
+    if zona is None:
+        return None, ()
+    return zona, opciones(zona, peso_gramos)
+
+
+def cotizar_lote(destinos: Iterable, peso_gramos: int) -> List[Tuple[Optional[str], Tuple[Opcion, ...]]]:
+    """Cotiza el mismo carrito para varios destinos; cada zona distinta se calcula una vez."""
+    return [cotizar(d, peso_gramos) for d in destinos]
+
+
+# =============================
+#  PESO DEL CARRITO
+# =============================
+
+def peso_items(items: Sequence[Tuple[object, int]]) -> int:
+    """
+    Gramos de [(producto_id, cantidad)] con el snapshot de pesos del catálogo.
+    Ids desconocidos (productos de demo sin fila) usan `ENVIO_PESO_DEFECTO_G`.
+    """
+    from .catalogo import snapshot_pesos
+
+    pesos = snapshot_pesos()
+    defecto = _config("ENVIO_PESO_DEFECTO_G", 500)
+    total = 0
+    for producto_id, cantidad in items:
+        try:
+            peso = pesos.get(int(producto_id), defecto)
+        except (TypeError, ValueError):
+            peso = defecto
+        total += peso * max(0, int(cantidad))
+    return total
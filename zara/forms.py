@@ -1,11 +1,21 @@
 # zara/forms.py
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm, PasswordResetForm, SetPasswordForm
+from django.urls import reverse
+
+from . import acceso, correo
 
 class LoginForm(AuthenticationForm):
     username = forms.CharField(label="Usuario", widget=forms.TextInput(attrs={"class": "form-control"}))
     password = forms.CharField(label="Contraseña", widget=forms.PasswordInput(attrs={"class": "form-control"}))
 
+    def clean(self):
+        # rechazo barato: si la IP o el usuario ya pasaron el límite, ni se consulta ni se hashea
+        espera = acceso.bloqueado(acceso.ip_de(self.request), self.data.get("username") or "")
+        if espera:
+            raise forms.ValidationError(acceso.mensaje_espera(espera), code="demasiados_intentos")
+        return super().clean()
+
 class MyPasswordChangeForm(PasswordChangeForm):
     old_password = forms.CharField(label="Contraseña actual", widget=forms.PasswordInput(attrs={"class":"form-control"}))
     new_password1 = forms.CharField(label="Nueva contraseña", widget=forms.PasswordInput(attrs={"class":"form-control"}))
@@ -14,6 +24,15 @@ class MyPasswordChangeForm(PasswordChangeForm):
 class MyPasswordResetForm(PasswordResetForm):
     email = forms.EmailField(label="Correo institucional", widget=forms.EmailInput(attrs={"class":"form-control"}))
 
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        # a la cola de zara.correo: el request no abre SMTP (plantillas en templates/correo/password_reset/)
+        correo.encolar("password_reset", to_email, {
+            "usuario": context["user"].get_username(),
+            "protocol": context["protocol"], "domain": context["domain"], "site_name": context["site_name"],
+            "ruta": reverse("password_reset_confirm", kwargs={"uidb64": context["uid"], "token": context["token"]}),
+        })
+
 class MySetPasswordForm(SetPasswordForm):
     new_password1 = forms.CharField(label="Nueva contraseña", widget=forms.PasswordInput(attrs={"class":"form-control"}))
     new_password2 = forms.CharField(label="Confirmar nueva contraseña", widget=forms.PasswordInput(attrs={"class":"form-control"}))
@@ -21,7 +40,7 @@ class MySetPasswordForm(SetPasswordForm):
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Perfil
+from .models import Direccion, Perfil
 
 class RegistroForm(UserCreationForm):
     rol = forms.ChoiceField(
@@ -45,3 +64,35 @@ class RegistroForm(UserCreationForm):
         if commit:
             perfil.save()
         return user
+
+
+class DireccionForm(forms.ModelForm):
+    hacer_principal = forms.BooleanField(
+        label="Usar como dirección principal", required=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+    class Meta:
+        model = Direccion
+        fields = ("alias", "linea1", "linea2", "ciudad", "region", "codigo_postal")
+        labels = {
+            "linea1": "Dirección", "linea2": "Depto / oficina (opcional)",
+            "ciudad": "Comuna", "region": "Región", "codigo_postal": "Código postal",
+        }
+        widgets = {
+            "alias": forms.TextInput(attrs={"class": "form-control"}),
+            "linea1": forms.TextInput(attrs={"class": "form-control", "placeholder": "Calle y número"}),
+            "linea2": forms.TextInput(attrs={"class": "form-control"}),
+            "ciudad": forms.TextInput(attrs={"class": "form-control", "list": "comunas-cl", "autocomplete": "off"}),
+            "region": forms.TextInput(attrs={"class": "form-control"}),
+            "codigo_postal": forms.TextInput(attrs={"class": "form-control", "inputmode": "numeric"}),
+        }
+
+    def clean(self):
+        from .direcciones import completar  # región / código postal desde la tabla en memoria
+
+        datos = super().clean()
+        for campo, valor in completar({k: datos.get(k) or "" for k in ("ciudad", "region", "codigo_postal")}).items():
+            if valor:
+                datos[campo] = valor
+        return datos
@@ -0,0 +1,17 @@
+# zara/hashers.py
+"""
+PBKDF2 con iteraciones configurables (`PASSWORD_PBKDF2_ITERACIONES`).
+
+Cada login correcto con un hash de otro costo se re-hashea solo
+(`must_update`), así que subir o bajar el costo no obliga a resetear
+contraseñas. `python manage.py bench_login --iteraciones N` mide el efecto.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class PBKDF2Ajustable(PBKDF2PasswordHasher):
+    # mismo `algorithm` que el de Django: los hashes existentes siguen validando
+    @property
+    def iterations(self):
+        return getattr(settings, "PASSWORD_PBKDF2_ITERACIONES", PBKDF2PasswordHasher.iterations)
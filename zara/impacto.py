@@ -0,0 +1,179 @@
+# zara/impacto.py
+"""
+Impacto ambiental acumulado de los canjes Trade-In (CO₂ y agua evitados).
+
+- `ImpactoAcumulado` guarda una fila por ámbito: global, por usuario y por
+  material. Leer un total es un lookup por la clave única (ambito, clave);
+  nunca un SUM() sobre `TradeInCanje`.
+- `sumar_canje` incrementa las tres filas con UPDATE … SET x = x + δ en la
+  transacción del canje (`zara.tradein.registrar_canje`). Borrar un canje
+  descuenta por signal.
+- `recalcular` (nocturno, `python manage.py recalcular_impacto`) agrupa la
+  tabla de canjes y corrige solo las filas desfasadas, con la misma guarda
+  que `zara.inventario.reconciliar`: `AND canjes = <leído>`, para no pisar
+  un canje que llegó durante la pasada (queda para la siguiente).
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from comun.texto import plegar
+
+from .models import ImpactoAcumulado, TradeInCanje
+
+logger = logging.getLogger(__name__)
+
+Ambito = ImpactoAcumulado.Ambito
+Clave = Tuple[str, str]  # (ámbito, clave)
+
+
+@dataclass(frozen=True)
+class Totales:
+    canjes: int = 0
+    co2_kg: Decimal = Decimal("0.00")
+    agua_l: int = 0
+
+
+def clave_material(material: str) -> str:
+    return plegar((material or "").strip())[:64] or "desconocido"
+
+
+def _claves(usuario_id: int, material: str) -> List[Clave]:
+    return [(Ambito.GLOBAL, ""), (Ambito.USUARIO, str(usuario_id)), (Ambito.MATERIAL, clave_material(material))]
+
+
+# =============================
+#  ESCRITURA (por canje)
+# =============================
+
+def _incrementar(claves: List[Clave], canjes: int, co2_kg: Decimal, agua_l: int) -> None:
+    ImpactoAcumulado.objects.bulk_create(
+        [ImpactoAcumulado(ambito=a, clave=c) for a, c in claves], ignore_conflicts=True,
+    )
+    ahora = timezone.now()
+    for ambito, clave in sorted(claves):  # orden fijo: sin deadlocks entre canjes concurrentes
+        ImpactoAcumulado.objects.filter(ambito=ambito, clave=clave).update(
+            canjes=F("canjes") + canjes, co2_kg=F("co2_kg") + co2_kg, agua_l=F("agua_l") + agua_l,
+            actualizado_en=ahora,
+        )
+
+
+def sumar_canje(canje: TradeInCanje) -> None:
+    """Suma el canje a sus contadores. Llamar dentro de la transacción que lo crea."""
+    _incrementar(_claves(canje.usuario_id, canje.material), 1, Decimal(canje.impacto), canje.agua_l)
+
+
+@receiver(post_delete, sender=TradeInCanje)
+def _restar_canje(sender, instance, **kwargs):
+    _incrementar(_claves(instance.usuario_id, instance.material), -1, -Decimal(instance.impacto), -instance.agua_l)
+
+
+# =============================
+#  LECTURA (O(1))
+# =============================
+
+def _totales(ambito: str, clave: str = "") -> Totales:
+    fila = ImpactoAcumulado.objects.filter(ambito=ambito, clave=clave).values_list(
+        "canjes", "co2_kg", "agua_l",
+    ).first()
+    return Totales(*fila) if fila else Totales()
+
+
+def de_usuario(usuario_id: int) -> Totales:
+    return _totales(Ambito.USUARIO, str(usuario_id))
+
+
+def global_() -> Totales:
+    return _totales(Ambito.GLOBAL)
+
+
+def por_material(limite: int = 10) -> List[Tuple[str, Totales]]:
+    """Materiales con más CO₂ evitado (una fila de contador por material)."""
+    return [
+        (clave, Totales(canjes, co2, agua))
+        for clave, canjes, co2, agua in ImpactoAcumulado.objects.filter(ambito=Ambito.MATERIAL, canjes__gt=0)
+        .order_by("-co2_kg", "clave").values_list("clave", "canjes", "co2_kg", "agua_l")[:limite]
+    ]
+
+
+# =============================
+#  RECÁLCULO NOCTURNO
+# =============================
+
+@dataclass
+class ResultadoRecalculo:
+    filas: int = 0
+    corregidas: int = 0
+    omitidas: int = 0
+    segundos: float = 0.0
+
+
+def _esperados() -> Dict[Clave, Totales]:
+    """Totales desde la tabla de canjes: tres consultas agrupadas."""
+    esperados: Dict[Clave, Totales] = {}
+    agregados = dict(n=Count("id"), co2=Sum("impacto"), agua=Sum("agua_l"))
+    fila = TradeInCanje.objects.aggregate(**agregados)
+    esperados[(Ambito.GLOBAL, "")] = Totales(fila["n"], fila["co2"] or Decimal("0.00"), fila["agua"] or 0)
+    for usuario_id, n, co2, agua in (
+        TradeInCanje.objects.order_by().values("usuario_id").annotate(**agregados)
+        .values_list("usuario_id", "n", "co2", "agua")
+    ):
+        esperados[(Ambito.USUARIO, str(usuario_id))] = Totales(n, co2 or Decimal("0.00"), agua or 0)
+    por_material: Dict[str, List] = {}
+    for material, n, co2, agua in (
+        TradeInCanje.objects.order_by().values("material").annotate(**agregados)
+        .values_list("material", "n", "co2", "agua")
+    ):
+        # varias grafías ("Algodón", "algodon ") caen en la misma clave
+        acumulado = por_material.setdefault(clave_material(material), [0, Decimal("0.00"), 0])
+        acumulado[0] += n
+        acumulado[1] += co2 or 0
+        acumulado[2] += agua or 0
+    for clave, (n, co2, agua) in por_material.items():
+        esperados[(Ambito.MATERIAL, clave)] = Totales(n, co2, agua)
+    return esperados
+
+
+def recalcular() -> ResultadoRecalculo:
+    r = ResultadoRecalculo()
+    t0 = time.perf_counter()
+    # contadores antes que canjes: un canje que entre entre ambas lecturas hace fallar la guarda
+    actuales: Dict[Clave, Tuple[int, Totales]] = {
+        (ambito, clave): (pk, Totales(canjes, co2, agua))
+        for pk, ambito, clave, canjes, co2, agua in ImpactoAcumulado.objects.values_list(
+            "pk", "ambito", "clave", "canjes", "co2_kg", "agua_l",
+        )
+    }
+    esperados = _esperados()
+    r.filas = len(actuales)
+    faltantes = [ImpactoAcumulado(ambito=a, clave=c, canjes=t.canjes, co2_kg=t.co2_kg, agua_l=t.agua_l)
+                 for (a, c), t in esperados.items() if (a, c) not in actuales]
+    ahora = timezone.now()
+    with transaction.atomic():
+        ImpactoAcumulado.objects.bulk_create(faltantes, ignore_conflicts=True)
+        for clave, (pk, actual) in actuales.items():
+            esperado = esperados.get(clave, Totales())
+            if actual == esperado:
+                continue
+            # guarda: si un canje lo movió después de la lectura, se deja para la próxima pasada
+            if ImpactoAcumulado.objects.filter(pk=pk, canjes=actual.canjes, co2_kg=actual.co2_kg).update(
+                canjes=esperado.canjes, co2_kg=esperado.co2_kg, agua_l=esperado.agua_l, actualizado_en=ahora,
+            ):
+                r.corregidas += 1
+            else:
+                r.omitidas += 1
+    r.corregidas += len(faltantes)
+    r.segundos = time.perf_counter() - t0
+    if r.corregidas:
+        logger.warning("Impacto: %s contadores corregidos (%s omitidos).", r.corregidas, r.omitidas)
+    return r
@@ -0,0 +1,256 @@
+# zara/importacion.py
+"""
+Importación / sincronización masiva del catálogo (`Producto`).
+
+Feed CSV o JSONL con columnas `nombre` (clave natural), `precio`, `stock`
+y opcional `peso_gramos`. Se procesa en streaming por lotes:
+
+1. lee LOTE filas válidas (las inválidas se cuentan y se reportan),
+2. en una transacción, trae y bloquea las existentes del lote con un
+   `WHERE nombre IN (...)`,
+3. compara y escribe precio y peso de nuevas + modificadas con un único
+   `bulk_create(update_conflicts=True)` (INSERT … ON CONFLICT DO UPDATE),
+4. pasa la diferencia de stock por `zara.inventario.registrar` como AJUSTE:
+   el stock nunca se escribe en absoluto, así una venta concurrente no se
+   pisa y el diario cuadra con la proyección.
+
+Los productos con variantes conservan su stock (lo mueven los movimientos
+de sus variantes); del feed solo se toman precio y peso.
+
+`bulk_create` no dispara signals: al final se invalida una sola vez el
+catálogo en memoria (`zara.catalogo.invalidar_catalogo`).
+
+Un archivo que no es UTF-8 es `FeedInvalido` (no cuenta como filas
+inválidas): `importar_archivo` lo detecta antes de escribir nada.
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import json
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .catalogo import invalidar_catalogo
+from .inventario import registrar
+from .models import MovimientoStock, Producto, Variante
+
+LOTE = 2000
+MAX_ERRORES_REPORTADOS = 50
+CAMPOS = ("precio", "peso_gramos")  # el stock va por el diario, no por el upsert
+MAX_ENTERO = 2_147_483_647  # tope de PositiveIntegerField en todos los motores
+
+
+class FeedInvalido(ValidationError):
+    """El archivo no se puede leer como feed (p. ej. no está en UTF-8)."""
+
+
+@dataclass
+class ResultadoImportacion:
+    leidas: int = 0
+    insertadas: int = 0
+    actualizadas: int = 0
+    sin_cambios: int = 0
+    invalidas: int = 0
+    repetidas: int = 0
+    segundos: float = 0.0
+    errores: List[str] = field(default_factory=list)
+
+    @property
+    def filas_por_segundo(self) -> float:
+        return self.leidas / self.segundos if self.segundos else 0.0
+
+    def resumen(self) -> str:
+        return (
+            f"{self.leidas} leídas · {self.insertadas} nuevas · {self.actualizadas} actualizadas · "
+            f"{self.sin_cambios} sin cambios · {self.invalidas} inválidas · {self.repetidas} repetidas · "
+            f"{self.segundos:.2f}s ({self.filas_por_segundo:,.0f} filas/s)"
+        )
+
+
+# =============================
+#  LECTURA (streaming)
+# =============================
+
+def detectar_formato(nombre_archivo: str) -> str:
+    return "jsonl" if nombre_archivo.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def leer_feed(texto: TextIO, formato: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """(número de línea, fila) sin cargar el archivo completo; fila None si no se pudo parsear."""
+    if formato == "jsonl":
+        for n, linea in enumerate(texto, start=1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                fila = None
+            yield n, fila if isinstance(fila, dict) else None
+    else:
+        lector = csv.DictReader(texto)
+        for fila in lector:
+            yield lector.line_num, fila
+
+
+def _normalizar(fila: dict) -> Tuple[str, Dict[str, object]]:
+    """(nombre, valores) o ValueError con el motivo."""
+    nombre = str(fila.get("nombre") or "").strip()
+    if not nombre or len(nombre) > 160:
+        raise ValueError("nombre vacío o de más de 160 caracteres")
+    try:
+        precio = Decimal(str(fila.get("precio")).strip())
+        if not precio.is_finite():  # NaN / Infinity pasan quantize pero no se pueden comparar
+            raise ValueError
+        precio = precio.quantize(Decimal("0.01"))
+    except (ArithmeticError, ValueError):
+        raise ValueError("precio inválido")
+    if precio < 0 or precio >= Decimal("1e8"):
+        raise ValueError("precio fuera de rango")
+    valores: Dict[str, object] = {"precio": precio}
+    for campo in ("stock", "peso_gramos"):
+        crudo = fila.get(campo)
+        if crudo in (None, "") and campo == "peso_gramos":
+            continue
+        try:
+            valores[campo] = int(str(crudo).strip())
+        except ValueError:
+            raise ValueError(f"{campo} inválido")
+        if valores[campo] < 0:
+            raise ValueError(f"{campo} negativo")
+        if valores[campo] > MAX_ENTERO:
+            raise ValueError(f"{campo} fuera de rango")
+    return nombre, valores
+
+
+# =============================
+#  DIFF + UPSERT POR LOTE
+# =============================
+
+def _aplicar_lote(lote: Dict[str, Dict[str, object]], r: ResultadoImportacion, simular: bool) -> None:
+    with transaction.atomic():
+        actuales = {
+            nombre: (pk, precio, stock, peso)
+            for nombre, pk, precio, stock, peso in Producto.objects.select_for_update()
+            .filter(nombre__in=list(lote)).order_by("pk")
+            .values_list("nombre", "id", "precio", "stock", "peso_gramos")
+        }
+        con_variantes = set(
+            Variante.objects.filter(producto__nombre__in=list(actuales))
+            .order_by().values_list("producto__nombre", flat=True).distinct()
+        ) if actuales else set()
+        cambios: List[Producto] = []
+        deltas: Dict[str, int] = {}  # nombre → diferencia de stock a registrar en el diario
+        for nombre, valores in lote.items():
+            actual = actuales.get(nombre)
+            if actual is None:
+                r.insertadas += 1
+                cambios.append(Producto(nombre=nombre, **{**valores, "stock": 0}))
+                deltas[nombre] = valores["stock"]
+                continue
+            _, precio, stock, peso = actual
+            valores.setdefault("peso_gramos", peso)  # sin columna de peso se conserva el actual
+            if nombre in con_variantes:
+                valores["stock"] = stock
+            delta = valores["stock"] - stock
+            if (valores["precio"], valores["peso_gramos"]) != (precio, peso):
+                cambios.append(Producto(nombre=nombre, **valores))
+            elif not delta:
+                r.sin_cambios += 1
+                continue
+            r.actualizadas += 1
+            deltas[nombre] = delta
+        deltas = {nombre: d for nombre, d in deltas.items() if d}
+        if simular:
+            return
+        if cambios:
+            Producto.objects.bulk_create(
+                cambios, batch_size=500,
+                update_conflicts=True, unique_fields=["nombre"], update_fields=list(CAMPOS),
+            )
+        if deltas:
+            ids = {nombre: fila[0] for nombre, fila in actuales.items()}
+            nuevos = [nombre for nombre in deltas if nombre not in ids]
+            if nuevos:
+                ids.update(Producto.objects.filter(nombre__in=nuevos).values_list("nombre", "id"))
+            registrar(
+                MovimientoStock(producto_id=ids[nombre], tipo=MovimientoStock.Tipo.AJUSTE,
+                                cantidad=d, nota="Importación de catálogo")
+                for nombre, d in deltas.items()
+            )
+
+
+def importar(texto: TextIO, formato: str = "csv", lote: int = LOTE, simular: bool = False) -> ResultadoImportacion:
+    """
+    Sincroniza el catálogo con el feed. `simular=True` solo calcula el diff.
+    FeedInvalido si el texto deja de decodificarse a mitad de camino.
+    """
+    r = ResultadoImportacion()
+    t0 = time.perf_counter()
+    pendientes: Dict[str, Dict[str, object]] = {}
+    try:
+        for linea, fila in leer_feed(texto, formato):
+            r.leidas += 1
+            try:
+                if fila is None:
+                    raise ValueError("línea no parseable")
+                nombre, valores = _normalizar(fila)
+            except ValueError as exc:
+                r.invalidas += 1
+                if len(r.errores) < MAX_ERRORES_REPORTADOS:
+                    r.errores.append(f"línea {linea}: {exc}")
+                continue
+            if nombre in pendientes:  # repetido dentro del lote: gana el último
+                r.repetidas += 1
+            pendientes[nombre] = valores
+            if len(pendientes) >= lote:
+                _aplicar_lote(pendientes, r, simular)
+                pendientes = {}
+    except UnicodeDecodeError:
+        # streaming sin validación previa (stdin): los lotes anteriores ya se escribieron
+        if not simular and (r.insertadas or r.actualizadas):
+            invalidar_catalogo()
+        raise FeedInvalido(
+            f"El archivo no está en UTF-8 (después de {r.leidas} filas; ya aplicadas: "
+            f"{r.insertadas} nuevas, {r.actualizadas} actualizadas)."
+        )
+    if pendientes:
+        _aplicar_lote(pendientes, r, simular)
+    if not simular and (r.insertadas or r.actualizadas):
+        invalidar_catalogo()
+    r.segundos = time.perf_counter() - t0
+    return r
+
+
+def _validar_utf8(binario) -> None:
+    """Una pasada de decodificación antes de escribir: un archivo mal codificado no deja el catálogo a medias."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for bloque in iter(lambda: binario.read(1 << 16), b""):
+            decoder.decode(bloque)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise FeedInvalido("El archivo no está en UTF-8; guárdelo como CSV UTF-8 y vuelva a subirlo.")
+    finally:
+        binario.seek(0)
+
+
+def importar_archivo(archivo, nombre: str = "", simular: bool = False, lote: int = LOTE) -> ResultadoImportacion:
+    """
+    Acepta un archivo binario (p. ej. `request.FILES[...]`) y lo decodifica en streaming.
+    FeedInvalido si no está en UTF-8.
+    """
+    binario = getattr(archivo, "file", archivo)
+    if binario.seekable():
+        _validar_utf8(binario)
+    texto = io.TextIOWrapper(binario, encoding="utf-8-sig", newline="")
+    try:
+        return importar(texto, detectar_formato(nombre or getattr(archivo, "name", "")), lote=lote, simular=simular)
+    finally:
+        texto.detach()
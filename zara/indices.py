@@ -0,0 +1,50 @@
+# zara/indices.py
+"""
+Índices para las búsquedas por prefijo del admin (`search_fields = ("^campo",)`).
+
+- En Django "^" es `istartswith`: en SQLite `campo LIKE 'x%' ESCAPE '\\'`
+  (LIKE ya ignora mayúsculas) y en PostgreSQL `UPPER(campo::text) LIKE
+  UPPER('x%')`. Un índice btree normal no sirve para ninguno de los dos.
+- SQLite usa el índice solo si la columna va con `COLLATE NOCASE`;
+  PostgreSQL necesita el índice sobre `UPPER(campo::text)` con
+  `text_pattern_ops` (LIKE por prefijo con cualquier locale).
+- `prefijo(tabla_columnas)` da la operación de migración; en otros motores
+  no crea nada.
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, Tuple
+
+from django.db import migrations
+
+_EXPRESION = {
+    "sqlite": "{col} COLLATE NOCASE",
+    "postgresql": "UPPER({col}::text) text_pattern_ops",
+}
+
+
+def _nombre(tabla: str, columna: str) -> str:
+    return f"{tabla}_{columna}_pfx"[:63]
+
+
+def prefijo(tabla_columnas: Iterable[Tuple[str, str]]) -> migrations.RunPython:
+    columnas: List[Tuple[str, str]] = list(tabla_columnas)
+
+    def crear(apps, schema_editor):
+        expresion = _EXPRESION.get(schema_editor.connection.vendor)
+        if expresion is None:
+            return
+        q = schema_editor.quote_name
+        for tabla, columna in columnas:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {q(_nombre(tabla, columna))} "
+                f"ON {q(tabla)} ({expresion.format(col=q(columna))})"
+            )
+
+    def borrar(apps, schema_editor):
+        if schema_editor.connection.vendor not in _EXPRESION:
+            return
+        for tabla, columna in columnas:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(_nombre(tabla, columna))}")
+
+    return migrations.RunPython(crear, borrar)
@@ -0,0 +1,371 @@
+# zara/ingesta.py
+"""
+Ingesta de respuestas de encuesta con escritura por lotes.
+
+Cada respuesta aceptada se agrega a un spool local (JSON por línea, solo
+append) y a un buffer en memoria. Un hilo de fondo vacía el buffer con
+`bulk_create(ignore_conflicts=True)` cada N filas o T milisegundos.
+
+Durabilidad: si el proceso muere antes del flush, las filas quedan en el
+spool y se reprocesan al arrancar el siguiente proceso (o con
+`manage.py reprocesar_spool`). El reproceso es idempotente gracias a la
+restricción única (email, campaña).
+
+Los spools se nombran por instancia (`spool-<pid>-<token>`, token al azar
+de cada arranque) y cada instancia mantiene un `flock` sobre su
+`spool-<pid>-<token>.lock` mientras vive. Un pid reutilizado tras un
+reinicio no confunde los archivos del proceso muerto con los propios: es
+huérfano todo spool ajeno cuyo lock nadie tiene.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: la vida de una instancia se estima por su pid
+    fcntl = None
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from comun.comentarios import indexar_sin_fallar
+
+from .models import CampaniaEncuesta, RespuestaEncuesta
+
+logger = logging.getLogger(__name__)
+
+CAMPOS = ("campania_id", "email", "consentimiento", "rating_sustentabilidad", "rating_calidad", "comentario")
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _pid_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def escribir_filas(filas: List[Dict[str, object]]) -> int:
+    """Inserta un lote; las respuestas duplicadas se ignoran."""
+    objs = [RespuestaEncuesta(**{k: f[k] for k in CAMPOS}) for f in filas]
+    with transaction.atomic():
+        RespuestaEncuesta.objects.bulk_create(objs, batch_size=500, ignore_conflicts=True)
+    # bulk_create no emite post_save: los comentarios se indexan aquí (un error
+    # no debe reprogramar el lote, que ya está confirmado)
+    indexar_sin_fallar(max_lotes=None)
+    return len(objs)
+
+
+class Instancia:
+    """`<pid>-<token>` de este arranque; su lock marca la instancia viva hasta que el proceso muere."""
+
+    def __init__(self, directorio: Path):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.nombre = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self._lock = open(self.directorio / f"spool-{self.nombre}.lock", "w")
+        if fcntl is not None:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def soltar(self) -> None:
+        self._lock.close()
+        (self.directorio / f"spool-{self.nombre}.lock").unlink(missing_ok=True)
+
+
+def _instancia_de(ruta: Path) -> Optional[str]:
+    """'<pid>-<token>' (o '<pid>' en spools anteriores al token) del nombre del archivo."""
+    nombre = ruta.name[len("spool-"):].split(".")[0]
+    return nombre if nombre.split("-")[0].isdigit() else None
+
+
+def _instancia_viva(directorio: Path, nombre: str) -> bool:
+    pid, _, token = nombre.partition("-")
+    if not token:
+        return False  # formato sin token: ningún proceso actual lo escribe
+    if fcntl is None:
+        return _pid_vivo(int(pid))
+    try:
+        fd = os.open(directorio / f"spool-{nombre}.lock", os.O_RDWR)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return True
+    finally:
+        os.close(fd)  # suelta el lock si se tomó
+    return False
+
+
+def reprocesar_spool(directorio: Optional[Path] = None, solo_huerfanos: bool = True,
+                     instancia: Optional[Instancia] = None) -> int:
+    """
+    Inserta las filas de spools que quedaron sin vaciar (proceso caído).
+    Con `solo_huerfanos` se omiten los spools de instancias que siguen vivas
+    (su lock está tomado); nunca se tocan los de `instancia`, la propia.
+
+    Varios procesos pueden arrancar a la vez sobre el mismo spool: cada uno
+    lo reclama con un `rename` atómico a un nombre de su propia instancia, y
+    el que pierde la carrera lo salta. Si este proceso muere a mitad, el
+    archivo reclamado vuelve a ser huérfano para el siguiente.
+    """
+    directorio = Path(directorio or _config("ENCUESTA_SPOOL_DIR", settings.BASE_DIR / "var" / "encuesta"))
+    if not directorio.exists():
+        return 0
+    propia = instancia or Instancia(directorio)
+    total = 0
+    muertas = set()
+    try:
+        for ruta in sorted(directorio.glob("spool-*.jsonl*")):
+            nombre = _instancia_de(ruta)
+            if nombre is None or nombre == propia.nombre:
+                continue
+            if solo_huerfanos and _instancia_viva(directorio, nombre):
+                continue
+            muertas.add(nombre)
+            reclamado = directorio / f"spool-{propia.nombre}.jsonl.reproceso-{uuid.uuid4().hex[:8]}"
+            try:
+                os.rename(ruta, reclamado)
+            except FileNotFoundError:
+                continue  # otro proceso lo reclamó primero
+            filas = []
+            with open(reclamado, encoding="utf-8") as fh:
+                for linea in fh:
+                    try:
+                        filas.append(json.loads(linea))
+                    except json.JSONDecodeError:
+                        continue  # última línea cortada por el crash
+            if filas:
+                try:
+                    total += escribir_filas(filas)
+                except Exception:
+                    # queda reclamado a nombre de esta instancia: lo retoma el próximo arranque
+                    logger.exception("No se pudo reprocesar el spool %s (%s filas)", ruta.name, len(filas))
+                    continue
+            reclamado.unlink(missing_ok=True)
+        for nombre in muertas:
+            if not any(directorio.glob(f"spool-{nombre}.jsonl*")):
+                (directorio / f"spool-{nombre}.lock").unlink(missing_ok=True)
+    finally:
+        if instancia is None:
+            propia.soltar()
+    if total:
+        logger.info("Spool de encuesta: %s filas reprocesadas", total)
+    return total
+
+
+class BufferRespuestas:
+    """Buffer + spool + hilo de vaciado. Uno por proceso (ver `buffer_respuestas`)."""
+
+    def __init__(self, directorio: Path, max_filas: int, max_ms: int, fsync: bool = False,
+                 instancia: Optional[Instancia] = None):
+        self.directorio = Path(directorio)
+        self.instancia = instancia or Instancia(self.directorio)
+        self.max_filas = max_filas
+        self.max_ms = max_ms
+        self.fsync = fsync
+
+        self._filas: List[Dict[str, object]] = []
+        self._primera_en: Optional[float] = None
+        self._cond = threading.Condition()
+        self._cerrado = False
+        self._lote = 0
+        self._spool = self._abrir_spool()
+
+        # Métricas del último tramo (usadas por el benchmark)
+        self.flushes = 0
+        self.filas_escritas = 0
+        self.latencias_ms: List[float] = []
+
+        self._hilo = threading.Thread(target=self._bucle, name="flush-encuesta", daemon=True)
+        self._hilo.start()
+
+    # ---------- spool ----------
+
+    def _ruta_spool(self, sufijo: str = "") -> Path:
+        return self.directorio / f"spool-{self.instancia.nombre}.jsonl{sufijo}"
+
+    def _abrir_spool(self):
+        return open(self._ruta_spool(), "a", encoding="utf-8")
+
+    def _rotar_spool(self) -> Path:
+        """Cierra el spool actual y lo deja aparte hasta que su lote se confirme."""
+        self._spool.close()
+        self._lote += 1
+        apartado = self._ruta_spool(f".{self._lote}")
+        os.replace(self._ruta_spool(), apartado)
+        self._spool = self._abrir_spool()
+        return apartado
+
+    # ---------- API ----------
+
+    def agregar(self, fila: Dict[str, object]) -> None:
+        linea = json.dumps(fila, ensure_ascii=False) + "\n"
+        with self._cond:
+            if self._cerrado:
+                raise RuntimeError("Buffer de encuesta cerrado.")
+            self._spool.write(linea)
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            self._filas.append(fila)
+            if self._primera_en is None:
+                self._primera_en = time.monotonic()
+            if len(self._filas) >= self.max_filas:
+                self._cond.notify()
+
+    def pendientes(self) -> int:
+        with self._cond:
+            return len(self._filas)
+
+    def vaciar(self) -> int:
+        """Escribe lo pendiente ahora (bloqueante)."""
+        with self._cond:
+            filas, apartado = self._tomar_lote()
+        return self._escribir(filas, apartado)
+
+    def cerrar(self) -> None:
+        with self._cond:
+            self._cerrado = True
+            self._cond.notify()
+        self._hilo.join(timeout=5)
+        self.vaciar_final()
+
+    def vaciar_final(self) -> None:
+        with self._cond:
+            filas, apartado = self._tomar_lote()
+            self._spool.close()
+        self._escribir(filas, apartado)
+        try:
+            self._ruta_spool().unlink()
+        except FileNotFoundError:
+            pass
+        if not any(self.directorio.glob(f"spool-{self.instancia.nombre}.jsonl*")):
+            self.instancia.soltar()  # con lotes sin confirmar, el lock cae al morir el proceso
+
+    # ---------- interno ----------
+
+    def _tomar_lote(self):
+        if not self._filas:
+            return [], None
+        filas, self._filas, self._primera_en = self._filas, [], None
+        return filas, self._rotar_spool()
+
+    def _escribir(self, filas, apartado: Optional[Path]) -> int:
+        if not filas:
+            return 0
+        t0 = time.perf_counter()
+        try:
+            escribir_filas(filas)
+        except Exception:
+            # El spool apartado queda en disco y se reprocesa en el próximo arranque
+            logger.exception("No se pudo escribir un lote de %s respuestas", len(filas))
+            return 0
+        finally:
+            close_old_connections()
+        apartado.unlink()
+        self.latencias_ms.append((time.perf_counter() - t0) * 1000)
+        self.flushes += 1
+        self.filas_escritas += len(filas)
+        return len(filas)
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                while not self._cerrado:
+                    if len(self._filas) >= self.max_filas:
+                        break
+                    if self._primera_en is not None:
+                        restante = self.max_ms / 1000 - (time.monotonic() - self._primera_en)
+                        if restante <= 0:
+                            break
+                        self._cond.wait(restante)
+                    else:
+                        self._cond.wait()
+                if self._cerrado:
+                    return
+                filas, apartado = self._tomar_lote()
+            self._escribir(filas, apartado)
+
+
+_buffer: Optional[BufferRespuestas] = None
+_buffer_lock = threading.Lock()
+
+
+def buffer_respuestas() -> BufferRespuestas:
+    """Buffer del proceso actual; al crearlo reprocesa spools huérfanos."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                directorio = _config("ENCUESTA_SPOOL_DIR", settings.BASE_DIR / "var" / "encuesta")
+                instancia = Instancia(directorio)  # nueva en cada arranque: todo lo demás es ajeno
+                reprocesar_spool(directorio, instancia=instancia)
+                _buffer = BufferRespuestas(
+                    directorio,
+                    max_filas=_config("ENCUESTA_FLUSH_FILAS", 500),
+                    max_ms=_config("ENCUESTA_FLUSH_MS", 200),
+                    fsync=_config("ENCUESTA_SPOOL_FSYNC", False),
+                    instancia=instancia,
+                )
+                atexit.register(_buffer.cerrar)
+    return _buffer
+
+
+# =============================
+#  VALIDACIÓN
+# =============================
+
+_campanias_cache: Dict[str, object] = {"en": 0.0, "datos": {}}
+
+
+def campanias_activas(ttl: float = 30.0) -> Dict[str, int]:
+    """{id o nombre en minúsculas: id} de campañas activas, cacheado `ttl` segundos."""
+    ahora = time.monotonic()
+    if ahora - _campanias_cache["en"] > ttl:
+        datos = {}
+        for pk, nombre in CampaniaEncuesta.objects.filter(activa=True).values_list("id", "nombre"):
+            datos[str(pk)] = pk
+            datos[nombre.lower()] = pk
+        _campanias_cache.update(en=ahora, datos=datos)
+    return _campanias_cache["datos"]
+
+
+def validar_respuesta(data: Dict[str, object]) -> Dict[str, object]:
+    """
+    Valida con las mismas reglas del modelo (campos + `RespuestaEncuesta.clean`).
+    Retorna la fila lista para el buffer o lanza ValidationError.
+    """
+    from django.core.exceptions import ValidationError
+
+    campania = str(data.get("campania") or "").strip().lower()
+    campania_id = campanias_activas().get(campania)
+    if campania_id is None:
+        raise ValidationError({"campania": ["Campaña inexistente o inactiva."]})
+
+    obj = RespuestaEncuesta(
+        campania_id=campania_id,
+        email=str(data.get("email") or "").strip(),
+        consentimiento=data.get("consentimiento") in (True, "true", "1", 1, "on"),
+        rating_sustentabilidad=data.get("rating_sustentabilidad"),
+        rating_calidad=data.get("rating_calidad"),
+        comentario=str(data.get("comentario") or "").strip(),
+    )
+    # Sin consultas: la unicidad la resuelve ignore_conflicts al escribir
+    obj.full_clean(exclude=["campania"], validate_unique=False, validate_constraints=False)
+    return {k: getattr(obj, k) for k in CAMPOS}
@@ -0,0 +1,286 @@
+# zara/inventario.py
+"""
+Diario de inventario (`MovimientoStock`) y sus proyecciones.
+
+- Toda variación de stock es un movimiento (venta, devolución, ingreso
+  Trade-In, ajuste manual). `registrar` inserta los movimientos y aplica el
+  delta a `Producto.stock` / `Variante.stock` en la misma transacción, con
+  un UPDATE condicional que nunca deja stock negativo.
+- `reconciliar` recalcula todas las proyecciones con una consulta agrupada
+  sobre el diario y corrige solo las que difieren.
+- `tomar_corte` guarda una foto periódica (corte anterior + movimientos
+  nuevos); `stock_en` responde el stock a una fecha desde el último corte
+  previo sumando solo los movimientos posteriores.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from .models import CorteStock, ItemCarrito, MovimientoStock, Producto, SnapshotStock, Variante
+
+logger = logging.getLogger(__name__)
+
+LOTE = 5000
+Tipo = MovimientoStock.Tipo
+
+
+class StockInsuficiente(ValidationError):
+    pass
+
+
+# =============================
+#  REGISTRO
+# =============================
+
+def _aplicar_deltas(modelo, deltas: Dict[int, int]) -> None:
+    for pk in sorted(deltas):  # orden fijo: sin deadlocks entre transacciones concurrentes
+        delta = deltas[pk]
+        if not delta:
+            continue
+        qs = modelo.objects.filter(pk=pk)
+        if delta < 0:
+            qs = qs.filter(stock__gte=-delta)
+        if not qs.update(stock=F("stock") + delta):
+            raise StockInsuficiente(f"{modelo._meta.verbose_name} #{pk}: stock insuficiente para {delta:+d}.")
+
+
+@transaction.atomic
+def registrar(movimientos: Iterable[MovimientoStock]) -> List[MovimientoStock]:
+    """Inserta los movimientos y actualiza las proyecciones. Todo o nada."""
+    movimientos = [m for m in movimientos if m.cantidad]
+    if not movimientos:
+        return []
+    por_producto: Dict[int, int] = defaultdict(int)
+    por_variante: Dict[int, int] = defaultdict(int)
+    for m in movimientos:
+        por_producto[m.producto_id] += m.cantidad
+        if m.variante_id:
+            por_variante[m.variante_id] += m.cantidad
+    _aplicar_deltas(Producto, por_producto)
+    _aplicar_deltas(Variante, por_variante)
+    creados = MovimientoStock.objects.bulk_create(movimientos, batch_size=1000)
+    if por_variante:
+        from .variantes import recalcular_disponibilidad  # update() no dispara sus signals
+
+        recalcular_disponibilidad({m.producto_id for m in movimientos if m.variante_id})
+    return creados
+
+
+def mover(producto_id: int, cantidad: int, tipo: str, variante_id: Optional[int] = None, **extra) -> MovimientoStock:
+    return registrar([MovimientoStock(
+        producto_id=producto_id, variante_id=variante_id, tipo=tipo, cantidad=cantidad, **extra,
+    )])[0]
+
+
+@transaction.atomic
+def ajustar_a(producto_id: int, stock: int, variante_id: Optional[int] = None,
+              usuario=None, nota: str = "") -> Optional[MovimientoStock]:
+    """Ajuste manual a un stock absoluto: registra la diferencia como AJUSTE."""
+    modelo, pk = (Variante, variante_id) if variante_id else (Producto, producto_id)
+    actual = modelo.objects.select_for_update().values_list("stock", flat=True).get(pk=pk)
+    if stock == actual:
+        return None
+    return mover(producto_id, stock - actual, Tipo.AJUSTE, variante_id, usuario=usuario, nota=nota)
+
+
+# =============================
+#  PEDIDOS
+# =============================
+
+def _lineas(pedido_ids: List[int]) -> Dict[int, List[Tuple[int, Optional[int], int]]]:
+    """{pedido: [(producto, variante o None, cantidad)]}"""
+    lineas: Dict[int, List[Tuple[int, Optional[int], int]]] = defaultdict(list)
+    for pedido_id, producto_id, variante_id, cantidad in ItemCarrito.objects.filter(
+        carrito__pedido__in=pedido_ids
+    ).values_list("carrito__pedido", "producto_id", "variante_id", "cantidad"):
+        lineas[pedido_id].append((producto_id, variante_id, cantidad))
+    return lineas
+
+
+def _bloquear_stock(modelo, ids) -> Dict[int, int]:
+    return dict(modelo.objects.select_for_update().filter(pk__in=ids).order_by("pk").values_list("pk", "stock"))
+
+
+def vender_pedidos(pedido_ids: Iterable[int]) -> List[int]:
+    """
+    Descuenta el stock de los pedidos (VENTA) del producto y, si la línea la
+    tiene, de su variante. Un pedido sin stock suficiente para todas sus
+    líneas no descuenta nada; retorna esos ids.
+    Debe llamarse dentro de la transacción que marca los pedidos como pagados.
+    """
+    lineas = _lineas(sorted(set(pedido_ids)))
+    disponible = {
+        Producto: _bloquear_stock(Producto, {p for filas in lineas.values() for p, _, _ in filas}),
+        Variante: _bloquear_stock(Variante, {v for filas in lineas.values() for _, v, _ in filas if v}),
+    }
+    movimientos, sin_stock = [], []
+    for pedido_id in sorted(lineas):
+        pedido_lineas = lineas[pedido_id]
+        pedido = {Producto: defaultdict(int), Variante: defaultdict(int)}
+        for producto_id, variante_id, cantidad in pedido_lineas:
+            pedido[Producto][producto_id] += cantidad
+            if variante_id:
+                pedido[Variante][variante_id] += cantidad
+        if any(disponible[m].get(pk, 0) < c for m in pedido for pk, c in pedido[m].items()):
+            sin_stock.append(pedido_id)
+            continue
+        for modelo, cantidades in pedido.items():
+            for pk, cantidad in cantidades.items():
+                disponible[modelo][pk] -= cantidad
+        movimientos.extend(
+            MovimientoStock(producto_id=producto_id, variante_id=variante_id, tipo=Tipo.VENTA,
+                            cantidad=-cantidad, pedido_id=pedido_id)
+            for producto_id, variante_id, cantidad in pedido_lineas
+        )
+    registrar(movimientos)
+    return sin_stock
+
+
+def devolver_pedidos(pedido_ids: Iterable[int]) -> int:
+    """Repone el stock (producto y variante) de pedidos pagados que se cancelan (DEVOLUCION). Retorna movimientos."""
+    lineas = _lineas(sorted(set(pedido_ids)))
+    return len(registrar(
+        MovimientoStock(producto_id=producto_id, variante_id=variante_id, tipo=Tipo.DEVOLUCION,
+                        cantidad=cantidad, pedido_id=pedido_id)
+        for pedido_id, filas in lineas.items() for producto_id, variante_id, cantidad in filas
+    ))
+
+
+# =============================
+#  RECONCILIACIÓN
+# =============================
+
+@dataclass
+class ResultadoReconciliacion:
+    productos_corregidos: int = 0
+    variantes_corregidas: int = 0
+    omitidos: int = 0
+    segundos: float = 0.0
+    muestras: List[Tuple[str, int, int, int]] = field(default_factory=list)  # (tabla, id, stock, proyección)
+
+
+def _desfasados(tabla: str, columna: str) -> List[Tuple[int, int, int]]:
+    """(id, stock, Σ diario) de las filas cuya proyección no coincide. Una consulta agrupada."""
+    diario = MovimientoStock._meta.db_table
+    filtro = f"WHERE {columna} IS NOT NULL " if columna == "variante_id" else ""
+    sql = (
+        f"SELECT t.id, t.stock, COALESCE(m.total, 0) FROM {tabla} t "
+        f"LEFT JOIN (SELECT {columna} AS ref, SUM(cantidad) AS total FROM {diario} {filtro}GROUP BY {columna}) m "
+        f"ON m.ref = t.id WHERE t.stock <> COALESCE(m.total, 0)"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchall()
+
+
+def _corregir(tabla: str, filas: List[Tuple[int, int, int]], r: ResultadoReconciliacion) -> List[int]:
+    """Ids que de verdad se corrigieron (no las que se intentaron)."""
+    corregidos: List[int] = []
+    validas = [(proy, pk, stock) for pk, stock, proy in filas if proy >= 0]
+    r.omitidos += len(filas) - len(validas)
+    for pk, stock, proy in filas:
+        if proy < 0:
+            logger.error("Diario con saldo negativo en %s #%s (%s); revisar a mano.", tabla, pk, proy)
+    for i in range(0, len(validas), LOTE):
+        lote = validas[i:i + LOTE]
+        with transaction.atomic(), connection.cursor() as cursor:
+            for proy, pk, stock in lote:
+                # `AND stock = ?`: si un movimiento llegó después de la lectura, se deja para la próxima pasada
+                cursor.execute(f"UPDATE {tabla} SET stock = %s WHERE id = %s AND stock = %s", [proy, pk, stock])
+                if cursor.rowcount:
+                    corregidos.append(pk)
+                else:
+                    r.omitidos += 1
+    return corregidos
+
+
+def reconciliar() -> ResultadoReconciliacion:
+    """Recalcula `Producto.stock` y `Variante.stock` desde el diario y corrige diferencias."""
+    r = ResultadoReconciliacion()
+    t0 = time.perf_counter()
+    for modelo, columna in ((Producto, "producto_id"), (Variante, "variante_id")):
+        tabla = modelo._meta.db_table
+        filas = _desfasados(tabla, columna)
+        r.muestras.extend((tabla, pk, stock, proy) for pk, stock, proy in filas[:20])
+        corregidos = _corregir(tabla, filas, r)
+        if modelo is Producto:
+            r.productos_corregidos = len(corregidos)
+        else:
+            r.variantes_corregidas = len(corregidos)
+            if corregidos:
+                from .variantes import recalcular_disponibilidad
+
+                recalcular_disponibilidad(
+                    Variante.objects.filter(pk__in=corregidos).values_list("producto_id", flat=True).distinct()
+                )
+    r.segundos = time.perf_counter() - t0
+    if r.productos_corregidos or r.variantes_corregidas or r.omitidos:
+        logger.warning(
+            "Reconciliación de stock: %s productos y %s variantes corregidos, %s omitidos. Ej: %s",
+            r.productos_corregidos, r.variantes_corregidas, r.omitidos, r.muestras[:5],
+        )
+    return r
+
+
+# =============================
+#  CORTES / STOCK A UNA FECHA
+# =============================
+
+@transaction.atomic
+def tomar_corte() -> CorteStock:
+    """Foto del inventario: corte anterior + movimientos desde entonces, en un INSERT … SELECT."""
+    anterior = CorteStock.objects.order_by("-hasta_movimiento", "-id").first()
+    hasta = MovimientoStock.objects.aggregate(m=Max("id"))["m"] or 0
+    corte = CorteStock.objects.create(tomado_en=timezone.now(), hasta_movimiento=hasta)
+    snap, diario = SnapshotStock._meta.db_table, MovimientoStock._meta.db_table
+    previas, params = "", [corte.pk]
+    if anterior is not None:
+        previas = f"SELECT producto_id, variante_id, stock AS c FROM {snap} WHERE corte_id = %s UNION ALL "
+        params.append(anterior.pk)
+    params += [anterior.hasta_movimiento if anterior else 0, hasta]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {snap} (corte_id, producto_id, variante_id, stock) "
+            f"SELECT %s, producto_id, variante_id, SUM(c) FROM ("
+            f"{previas}SELECT producto_id, variante_id, cantidad AS c FROM {diario} WHERE id > %s AND id <= %s"
+            f") GROUP BY producto_id, variante_id HAVING SUM(c) <> 0",
+            params,
+        )
+        corte.filas = cursor.rowcount
+    corte.save(update_fields=["filas"])
+    return corte
+
+
+def podar_cortes(conservar: int = 30) -> int:
+    """Borra los cortes más antiguos (y sus filas), dejando `conservar`."""
+    viejos = list(CorteStock.objects.order_by("-tomado_en").values_list("pk", flat=True)[conservar:])
+    if not viejos:
+        return 0
+    SnapshotStock.objects.filter(corte_id__in=viejos).delete()
+    return CorteStock.objects.filter(pk__in=viejos).delete()[0]
+
+
+def stock_en(producto_id: int, momento: datetime, variante_id: Optional[int] = None) -> int:
+    """Stock del producto (o de una variante) en `momento`: último corte previo + movimientos hasta esa fecha."""
+    corte = CorteStock.objects.filter(tomado_en__lte=momento).order_by("-tomado_en").first()
+    base, desde = 0, 0
+    if corte is not None:
+        filas = SnapshotStock.objects.filter(corte=corte, producto_id=producto_id)
+        if variante_id:
+            filas = filas.filter(variante_id=variante_id)
+        base = filas.aggregate(s=Sum("stock"))["s"] or 0
+        desde = corte.hasta_movimiento
+    movimientos = MovimientoStock.objects.filter(producto_id=producto_id, id__gt=desde, creado_en__lte=momento)
+    if variante_id:
+        movimientos = movimientos.filter(variante_id=variante_id)
+    return base + (movimientos.aggregate(s=Sum("cantidad"))["s"] or 0)
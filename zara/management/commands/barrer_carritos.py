@@ -0,0 +1,39 @@
+# zara/management/commands/barrer_carritos.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from zara import barrido
+
+
+class Command(BaseCommand):
+    help = "Borra (o archiva) carritos abandonados por lotes y compacta SQLite."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ttl-horas", type=float, help="Inactividad mínima (por defecto CARRITO_TTL_HORAS).")
+        parser.add_argument("--lote", type=int, default=1000, help="Máximo de carritos por transacción.")
+        parser.add_argument("--max-lock-ms", type=float, help="Tope de lock de escritura por lote.")
+        parser.add_argument("--archivar", action="store_true", help="Guarda los carritos en JSONL antes de borrar.")
+        parser.add_argument("--vacuum-paginas", type=int, default=0, help="Páginas a liberar (0 = todas).")
+        parser.add_argument("--activar-auto-vacuum", action="store_true",
+                            help="SQLite: pasa a auto_vacuum=INCREMENTAL (VACUUM completo, una vez).")
+        parser.add_argument("--loop", action="store_true", help="Queda corriendo como proceso de fondo.")
+        parser.add_argument("--intervalo", type=float, default=3600, help="Segundos entre pasadas (con --loop).")
+
+    def handle(self, *args, **opts):
+        if opts["activar_auto_vacuum"]:
+            barrido.activar_auto_vacuum()
+            self.stdout.write("auto_vacuum=INCREMENTAL activado.")
+        while True:
+            r = barrido.barrer(
+                ttl_horas=opts["ttl_horas"], lote=opts["lote"], max_lock_ms=opts["max_lock_ms"],
+                archivar=opts["archivar"], vacuum_paginas=opts["vacuum_paginas"],
+            )
+            self.stdout.write(
+                f"carritos={r.carritos} ítems={r.items} lotes={r.lotes} en {r.segundos:.2f}s "
+                f"→ {r.filas_por_segundo:,.0f} filas/s · lock máx {r.lock_max_ms:.1f} ms · "
+                f"páginas liberadas={r.paginas_liberadas}" + (f" · archivo {r.archivo}" if r.archivo else "")
+            )
+            if not opts["loop"]:
+                return
+            time.sleep(opts["intervalo"])
@@ -0,0 +1,95 @@
+# zara/management/commands/bench_comentarios.py
+"""
+Benchmark de la analítica de comentarios.
+
+Genera N respuestas sintéticas (vocabulario con distribución tipo Zipf)
+en una campaña temporal, las indexa de forma incremental y mide la
+latencia de: top términos, co-ocurrencias y búsqueda por 1–3 palabras.
+"""
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from comun.comentarios import buscar_comentarios, indexar_pendientes, top_coocurrencias, top_terminos
+from zara.models import (
+    CampaniaEncuesta, CoocurrenciaTermino, FrecuenciaTermino, RespuestaEncuesta, TerminoComentario,
+)
+
+PALABRAS = (
+    "calidad precio algodón tela talla envío tienda online devolución atención color diseño "
+    "sostenible reciclado materiales etiqueta huella agua durable barato caro moda rápido lento "
+    "probador cambio stock cupón descuento garantía costura botón cierre lino poliéster"
+).split()
+
+
+def _medir(fn, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos), max(tiempos)
+
+
+class Command(BaseCommand):
+    help = "Mide indexación (filas/s) y latencia de consultas sobre comentarios de encuesta."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=100_000)
+        parser.add_argument("--vocabulario", type=int, default=5000, help="Términos sintéticos extra.")
+        parser.add_argument("--repeticiones", type=int, default=20)
+        parser.add_argument("--conservar", action="store_true", help="No borra los datos generados.")
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(42)
+        vocab = PALABRAS + [f"term{i}" for i in range(opts["vocabulario"])]
+        pesos = [1 / (i + 1) for i in range(len(vocab))]
+        campania = CampaniaEncuesta.objects.create(nombre=f"bench-com-{uuid.uuid4().hex[:8]}")
+
+        try:
+            t0 = time.perf_counter()
+            n = opts["filas"]
+            for inicio in range(0, n, 10_000):
+                RespuestaEncuesta.objects.bulk_create([
+                    RespuestaEncuesta(
+                        campania=campania, email=f"c{i}@bench.cl", consentimiento=True,
+                        rating_sustentabilidad=1 + i % 5, rating_calidad=1 + (i * 3) % 5,
+                        comentario=" ".join(rnd.choices(vocab, pesos, k=rnd.randint(3, 15))),
+                    )
+                    for i in range(inicio, min(inicio + 10_000, n))
+                ])
+            t_carga = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            indexadas = indexar_pendientes()
+            t_indice = time.perf_counter() - t0
+            self.stdout.write(f"carga:       {n} respuestas en {t_carga:.1f}s")
+            self.stdout.write(f"indexación:  {indexadas} en {t_indice:.1f}s → {indexadas / max(t_indice, 1e-9):,.0f} filas/s")
+
+            rep = opts["repeticiones"]
+            casos = {
+                "top términos (campaña)": lambda: top_terminos(campania.pk),
+                "top términos (global)": lambda: top_terminos(),
+                "co-ocurrencias (campaña)": lambda: top_coocurrencias(campania.pk),
+                "buscar 'calidad'": lambda: buscar_comentarios("calidad"),
+                "buscar 'calidad precio'": lambda: buscar_comentarios("calidad precio"),
+                "buscar 'algodón term40 envío'": lambda: buscar_comentarios("algodón term40 envío"),
+                "buscar sin resultados": lambda: buscar_comentarios("inexistente"),
+            }
+            for nombre, fn in casos.items():
+                p50, maximo = _medir(fn, rep)
+                self.stdout.write(f"{nombre:<30} p50={p50:7.2f} ms  máx={maximo:7.2f} ms")
+        finally:
+            if not opts["conservar"]:
+                TerminoComentario.objects.filter(campania=campania).delete()
+                FrecuenciaTermino.objects.filter(campania=campania).delete()
+                CoocurrenciaTermino.objects.filter(campania=campania).delete()
+                # Ya sin índice: evita que post_delete descuente fila por fila
+                respuestas = RespuestaEncuesta.objects.filter(campania=campania)
+                respuestas.update(comentario_indexado=False)
+                while ids := list(respuestas.values_list("id", flat=True)[:10_000]):
+                    RespuestaEncuesta.objects.filter(id__in=ids).delete()
+                campania.delete()
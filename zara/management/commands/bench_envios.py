@@ -0,0 +1,66 @@
+# zara/management/commands/bench_envios.py
+"""
+Microbenchmark del motor de envíos.
+
+Cotiza N destinos sintéticos (región, código postal o comuna al azar) con
+pesos al azar y reporta cotizaciones/segundo con el memo frío (cada
+cotización recalcula la matriz) y caliente. No toca la BD.
+"""
+import random
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from zara import direcciones, envios
+
+
+class Command(BaseCommand):
+    help = "Mide cotizaciones de envío por segundo (memo frío y caliente)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cotizaciones", type=int, default=200_000)
+        parser.add_argument("--lote", type=int, default=5, help="Destinos por llamada a cotizar_lote.")
+        parser.add_argument("--semilla", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(opts["semilla"])
+        comunas = [c for _, c in direcciones.tabla_comunas()]
+        n, lote = opts["cotizaciones"], max(1, opts["lote"])
+
+        def destino():
+            c = rnd.choice(comunas)
+            modo = rnd.randrange(3)
+            return SimpleNamespace(
+                region=c.region if modo == 0 else "",
+                codigo_postal=c.codigo_postal if modo == 1 else "",
+                ciudad=c.comuna if modo == 2 else "",
+            )
+
+        pedidos = [
+            ([destino() for _ in range(lote)], rnd.randint(100, 45_000))
+            for _ in range(max(1, n // lote))
+        ]
+        total = len(pedidos) * lote
+
+        envios.limpiar_memo()
+        t0 = time.perf_counter()
+        for destinos, peso in pedidos[: max(1, len(pedidos) // 20)]:
+            envios.limpiar_memo()
+            envios.cotizar_lote(destinos, peso)
+        frio = (time.perf_counter() - t0) / (max(1, len(pedidos) // 20) * lote)
+
+        envios.limpiar_memo()
+        t0 = time.perf_counter()
+        sin_zona = 0
+        for destinos, peso in pedidos:
+            for zona, _ in envios.cotizar_lote(destinos, peso):
+                sin_zona += zona is None
+        caliente = time.perf_counter() - t0
+
+        self.stdout.write(f"Destinos: {len(comunas)} comunas · {total:,} cotizaciones en lotes de {lote}")
+        self.stdout.write(f"  memo frío:     {1 / frio:12,.0f} cotizaciones/s")
+        self.stdout.write(f"  memo caliente: {total / caliente:12,.0f} cotizaciones/s "
+                          f"({caliente * 1e6 / total:.2f} µs c/u, {len(envios._memo)} entradas de memo)")
+        if sin_zona:
+            self.stdout.write(self.style.WARNING(f"  {sin_zona} destinos sin zona"))
@@ -0,0 +1,68 @@
+# zara/management/commands/bench_ingesta_encuesta.py
+"""
+Benchmark de la ingesta de encuestas.
+
+Envía N respuestas por el endpoint real (cliente de test, varios hilos),
+espera el vaciado y reporta envíos/s y latencia de flush (p50/p95/máx).
+Crea una campaña temporal y la borra al terminar.
+"""
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from zara.ingesta import BufferRespuestas, buffer_respuestas
+from zara.models import CampaniaEncuesta, RespuestaEncuesta
+
+
+class Command(BaseCommand):
+    help = "Mide envíos/s y latencia de flush de la ingesta de encuestas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=5000)
+        parser.add_argument("--hilos", type=int, default=4)
+
+    def handle(self, *args, **opts):
+        campania = CampaniaEncuesta.objects.create(nombre=f"bench-{uuid.uuid4().hex[:8]}")
+        buf: BufferRespuestas = buffer_respuestas()
+        buf.flushes, buf.filas_escritas, buf.latencias_ms = 0, 0, []
+        n, hilos = opts["filas"], opts["hilos"]
+
+        def enviar(inicio):
+            cliente = Client()
+            for i in range(inicio, n, hilos):
+                cliente.post(
+                    "/api/encuesta/responder/",
+                    {
+                        "campania": campania.nombre, "email": f"u{i}@bench.cl", "consentimiento": "true",
+                        "rating_sustentabilidad": 1 + i % 5, "rating_calidad": 1 + (i * 7) % 5,
+                    },
+                    content_type="application/json", HTTP_HOST="localhost",
+                )
+
+        try:
+            t0 = time.perf_counter()
+            workers = [threading.Thread(target=enviar, args=(h,)) for h in range(hilos)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            t_envio = time.perf_counter() - t0
+            buf.vaciar()
+            t_total = time.perf_counter() - t0
+
+            escritas = RespuestaEncuesta.objects.filter(campania=campania).count()
+            lat = sorted(buf.latencias_ms) or [0.0]
+            self.stdout.write(f"envíos:            {n} en {t_envio:.2f}s → {n / t_envio:,.0f} envíos/s")
+            self.stdout.write(f"persistidas:       {escritas} en {t_total:.2f}s → {escritas / t_total:,.0f} filas/s")
+            self.stdout.write(f"flushes:           {buf.flushes} (≈{buf.filas_escritas / max(buf.flushes, 1):.0f} filas/lote)")
+            self.stdout.write(
+                f"latencia flush:    p50={statistics.median(lat):.1f} ms "
+                f"p95={lat[int(len(lat) * 0.95) - 1 if len(lat) > 1 else 0]:.1f} ms máx={lat[-1]:.1f} ms"
+            )
+        finally:
+            RespuestaEncuesta.objects.filter(campania=campania).delete()
+            campania.delete()
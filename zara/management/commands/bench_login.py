@@ -0,0 +1,88 @@
+# zara/management/commands/bench_login.py
+"""
+Benchmark del login bajo fuerza bruta.
+
+Simula N intentos con clave errónea repartidos en K IPs y M usuarios (uno
+real, temporal, y el resto inexistentes: ModelBackend también hashea para
+ellos) vía `authenticate()`, con el límite de `zara.acceso` activo e
+inactivo. Reporta intentos/s y CPU consumida, y logins legítimos/s con las
+iteraciones PBKDF2 configuradas. Cada corrida usa IPs y nombres nuevos, así
+que no pisa contadores reales; el usuario temporal se borra al final.
+"""
+import random
+import time
+import uuid
+
+from django.contrib.auth import authenticate, get_user_model
+from django.core.exceptions import PermissionDenied
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from zara import acceso
+
+
+class Command(BaseCommand):
+    help = "Mide intentos de login/s y CPU con y sin límite de intentos (zara.acceso)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--intentos", type=int, default=300)
+        parser.add_argument("--ips", type=int, default=5)
+        parser.add_argument("--usuarios", type=int, default=10)
+        parser.add_argument("--legitimos", type=int, default=20, help="Logins correctos a medir.")
+        parser.add_argument("--iteraciones", type=int, default=None,
+                            help="Iteraciones PBKDF2 (por defecto PASSWORD_PBKDF2_ITERACIONES).")
+
+    def handle(self, *args, **opts):
+        ajustes = {} if opts["iteraciones"] is None else {"PASSWORD_PBKDF2_ITERACIONES": opts["iteraciones"]}
+        with override_settings(**ajustes):
+            self._correr(opts)
+
+    def _correr(self, opts):
+        rnd = random.Random(7)
+        corrida = uuid.uuid4().hex[:8]
+        factory = RequestFactory()
+        User = get_user_model()
+        clave = f"clave-{corrida}"
+        user = User.objects.create_user(username=f"bench-login-{corrida}", password=clave)
+        try:
+            nombres = [user.username] + [f"nadie-{corrida}-{i}" for i in range(max(0, opts["usuarios"] - 1))]
+
+            def ataque(activo):
+                ips = [f"10.{activo:d}.{i // 250}.{i % 250}" for i in range(max(1, opts["ips"]))]
+                rechazos = 0
+                with override_settings(ACCESO_ACTIVO=activo):
+                    cpu0, t0 = time.process_time(), time.perf_counter()
+                    for _ in range(opts["intentos"]):
+                        request = factory.post("/accounts/login/", REMOTE_ADDR=rnd.choice(ips))
+                        usuario = rnd.choice(nombres)
+                        # como el formulario: chequeo barato antes de authenticate
+                        if acceso.bloqueado(acceso.ip_de(request), usuario):
+                            rechazos += 1
+                            continue
+                        try:
+                            authenticate(request, username=usuario, password="incorrecta")
+                        except PermissionDenied:
+                            rechazos += 1
+                    return time.perf_counter() - t0, time.process_time() - cpu0, rechazos
+
+            n = opts["intentos"]
+            self.stdout.write(f"Ataque: {n} intentos · {opts['ips']} IPs · {len(nombres)} usuarios")
+            for activo, etiqueta in ((False, "sin límite"), (True, "con límite")):
+                pared, cpu, rechazos = ataque(activo)
+                self.stdout.write(
+                    f"  {etiqueta}: {n / pared:10,.0f} intentos/s · CPU {cpu:6.2f} s "
+                    f"({cpu * 1000 / n:.2f} ms c/u) · {rechazos} rechazados sin hash"
+                )
+
+            request = factory.post("/accounts/login/", REMOTE_ADDR=f"10.9.{rnd.randrange(250)}.1")
+            acceso.limpiar_usuario(user.username, acceso.ip_de(request))
+            cpu0, t0 = time.process_time(), time.perf_counter()
+            ok = sum(authenticate(request, username=user.username, password=clave) is not None
+                     for _ in range(opts["legitimos"]))
+            pared = time.perf_counter() - t0
+            self.stdout.write(
+                f"  legítimos:  {opts['legitimos'] / pared:10,.1f} logins/s · "
+                f"{(time.process_time() - cpu0) * 1000 / max(1, opts['legitimos']):.1f} ms CPU c/u ({ok} ok)"
+            )
+        finally:
+            user.delete()
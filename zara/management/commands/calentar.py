@@ -0,0 +1,67 @@
+# zara/management/commands/calentar.py
+"""
+Calienta cachés y mide la memoria única por worker.
+
+Simula un servidor prefork: calienta en este proceso (el "master"), hace
+fork de N hijos, cada uno atiende algunas peticiones y reporta su
+RSS/PSS/USS. Con --sin-calentar se obtiene la línea base para comparar.
+"""
+import json
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from comun.calentamiento import calentar, memoria_proceso
+
+
+class Command(BaseCommand):
+    help = "Precarga cachés (URLs, plantillas, catálogo) y reporta memoria única por worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=0, help="Hijos a simular tras el fork.")
+        parser.add_argument("--url", action="append", help="Rutas que atiende cada hijo (repetible).")
+        parser.add_argument("--sin-calentar", action="store_true", help="Línea base sin calentamiento.")
+
+    def handle(self, *args, **opts):
+        if not opts["sin_calentar"]:
+            for paso, ms in calentar().items():
+                self.stdout.write(f"{paso:<12} {ms:>8.2f} ms")
+
+        master = memoria_proceso()
+        self.stdout.write(f"master: {master}")
+        if opts["workers"] < 1:
+            return
+
+        urls = opts["url"] or ["/", "/mujer/", "/buscar/?q=blazer"]
+        connections.close_all()
+        hijos = []
+        for _ in range(opts["workers"]):
+            lectura, escritura = os.pipe()
+            pid = os.fork()
+            if pid == 0:  # worker
+                os.close(lectura)
+                resultado = {}
+                try:
+                    from django.test import Client
+                    cliente = Client()
+                    resultado["status"] = [cliente.get(u, HTTP_HOST="localhost").status_code for u in urls]
+                    resultado.update(memoria_proceso())
+                finally:
+                    os.write(escritura, json.dumps(resultado).encode())
+                    os.close(escritura)
+                    os._exit(0)
+            os.close(escritura)
+            hijos.append((pid, lectura))
+
+        uss_total = 0
+        for pid, lectura in hijos:
+            with os.fdopen(lectura) as fh:
+                datos = json.loads(fh.read() or "{}")
+            os.waitpid(pid, 0)
+            uss_total += datos.get("uss_kb", 0)
+            self.stdout.write(
+                f"worker {pid}: status={datos.get('status')} "
+                f"rss={datos.get('rss_kb')} kB pss={datos.get('pss_kb')} kB uss={datos.get('uss_kb')} kB"
+            )
+        self.stdout.write(f"USS promedio por worker: {uss_total // len(hijos)} kB")
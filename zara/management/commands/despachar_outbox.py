@@ -0,0 +1,24 @@
+# zara/management/commands/despachar_outbox.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from zara import outbox
+
+
+class Command(BaseCommand):
+    help = "Drena la outbox de eventos de pedidos hacia el webhook de fulfilment."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=outbox.LOTE, help="Eventos por envío.")
+        parser.add_argument("--loop", action="store_true", help="Queda corriendo como proceso de fondo.")
+        parser.add_argument("--intervalo", type=float, default=1.0, help="Segundos entre pasadas (con --loop).")
+
+    def handle(self, *args, **opts):
+        while True:
+            r = outbox.drenar(limite=opts["lote"])
+            if r["enviados"] or r["fallidos"]:
+                self.stdout.write(f"enviados={r['enviados']} fallidos={r['fallidos']}")
+            if not opts["loop"]:
+                return
+            time.sleep(opts["intervalo"])
@@ -0,0 +1,32 @@
+# zara/management/commands/importar_catalogo.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from zara.importacion import LOTE, FeedInvalido, detectar_formato, importar
+
+
+class Command(BaseCommand):
+    help = "Sincroniza Producto con un feed CSV/JSONL (diff por nombre; solo escribe cambios)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del feed, o '-' para stdin.")
+        parser.add_argument("--formato", choices=("csv", "jsonl"), help="Por defecto según la extensión.")
+        parser.add_argument("--lote", type=int, default=LOTE, help="Filas por consulta de diff / upsert.")
+        parser.add_argument("--simular", action="store_true", help="Calcula el diff sin escribir.")
+
+    def handle(self, *args, **opts):
+        ruta = opts["archivo"]
+        formato = opts["formato"] or ("csv" if ruta == "-" else detectar_formato(ruta))
+        try:
+            texto = sys.stdin if ruta == "-" else open(ruta, encoding="utf-8-sig", newline="")
+        except OSError as exc:
+            raise CommandError(str(exc))
+        with texto:
+            try:
+                r = importar(texto, formato, lote=opts["lote"], simular=opts["simular"])
+            except FeedInvalido as exc:
+                raise CommandError(" ".join(exc.messages))
+        for error in r.errores:
+            self.stderr.write(error)
+        self.stdout.write(("[simulación] " if opts["simular"] else "") + r.resumen())
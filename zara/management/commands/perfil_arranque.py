@@ -0,0 +1,134 @@
+# zara/management/commands/perfil_arranque.py
+"""
+Perfil de arranque de un worker.
+
+Lanza un proceso hijo con `python -X importtime`, hace django.setup(),
+resuelve todas las URLs (igual que un worker de gunicorn/uvicorn) y atiende
+una primera petición. Reporta:
+- tiempo de import por módulo (propio y acumulado),
+- tiempo hasta la primera respuesta,
+- RSS del proceso tras la primera respuesta,
+- qué dependencias pesadas quedaron cargadas.
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PESADOS = ("pandas", "numpy", "qrcode", "PIL")
+
+SCRIPT_HIJO = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t1 = time.perf_counter()
+from django.test import Client
+try:
+    status = Client().get(sys.argv[1], HTTP_HOST="localhost").status_code
+except Exception as exc:
+    status = repr(exc)
+t2 = time.perf_counter()
+rss_kb = None
+try:
+    with open("/proc/self/status") as fh:
+        for linea in fh:
+            if linea.startswith("VmRSS:"):
+                rss_kb = int(linea.split()[1])
+except OSError:
+    pass
+print(json.dumps({
+    "setup_ms": (t1 - t0) * 1000,
+    "primera_ms": (t2 - t1) * 1000,
+    "status": status,
+    "rss_kb": rss_kb,
+    "modulos": sorted(sys.modules),
+}))
+"""
+
+
+def parsear_importtime(stderr: str):
+    """[(modulo, propio_us, acumulado_us, nivel)] a partir de la salida de -X importtime."""
+    filas = []
+    for linea in stderr.splitlines():
+        if not linea.startswith("import time:"):
+            continue
+        partes = linea[len("import time:"):].split("|")
+        if len(partes) != 3:
+            continue
+        propio, acumulado, nombre = partes
+        try:
+            propio_us, acumulado_us = int(propio), int(acumulado)
+        except ValueError:
+            continue  # cabecera
+        nivel = (len(nombre) - len(nombre.lstrip(" ")) - 1) // 2
+        filas.append((nombre.strip(), propio_us, acumulado_us, nivel))
+    return filas
+
+
+class Command(BaseCommand):
+    help = "Mide tiempo de import por módulo, primera respuesta y RSS de un worker nuevo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="/", help="Ruta de la primera petición.")
+        parser.add_argument("--top", type=int, default=20, help="Módulos a listar.")
+        parser.add_argument("--json", action="store_true", help="Salida en JSON.")
+
+    def handle(self, *args, **opts):
+        env = os.environ.copy()
+        env.setdefault("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE)
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT_HIJO, opts["url"]],
+            cwd=str(settings.BASE_DIR), env=env, capture_output=True, text=True,
+        )
+        salida = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not salida:
+            raise CommandError(f"El proceso hijo falló:\n{proc.stderr[-2000:]}")
+        datos = json.loads(salida[-1])
+        filas = parsear_importtime(proc.stderr)
+
+        por_paquete = defaultdict(int)
+        for nombre, _propio, acumulado, nivel in filas:
+            if nivel == 0:
+                por_paquete[nombre.split(".")[0]] += acumulado
+        top = sorted(filas, key=lambda f: f[2], reverse=True)[: opts["top"]]
+        pesados = [m for m in PESADOS if m in datos["modulos"]]
+
+        reporte = {
+            "setup_ms": round(datos["setup_ms"], 1),
+            "primera_respuesta_ms": round(datos["primera_ms"], 1),
+            "status": datos["status"],
+            "rss_mb": round(datos["rss_kb"] / 1024, 1) if datos["rss_kb"] else None,
+            "import_total_ms": round(sum(f[1] for f in filas) / 1000, 1),
+            "pesados_cargados": pesados,
+            "paquetes_ms": {
+                k: round(v / 1000, 1)
+                for k, v in sorted(por_paquete.items(), key=lambda kv: kv[1], reverse=True)[: opts["top"]]
+            },
+            "modulos_ms": [
+                {"modulo": n, "propio_ms": round(p / 1000, 2), "acumulado_ms": round(a / 1000, 2)}
+                for n, p, a, _ in top
+            ],
+        }
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(reporte, indent=2, ensure_ascii=False))
+            return
+
+        self.stdout.write(f"setup + URLs:        {reporte['setup_ms']} ms")
+        self.stdout.write(f"primera respuesta:   {reporte['primera_respuesta_ms']} ms (status {reporte['status']})")
+        self.stdout.write(f"RSS del worker:      {reporte['rss_mb']} MB")
+        self.stdout.write(f"import total:        {reporte['import_total_ms']} ms")
+        self.stdout.write(f"pesados cargados:    {', '.join(pesados) or 'ninguno'}")
+        self.stdout.write("\nPaquetes (acumulado):")
+        for nombre, ms in reporte["paquetes_ms"].items():
+            self.stdout.write(f"  {ms:>9.1f} ms  {nombre}")
+        self.stdout.write("\nMódulos más lentos (acumulado / propio):")
+        for m in reporte["modulos_ms"]:
+            self.stdout.write(f"  {m['acumulado_ms']:>9.2f} / {m['propio_ms']:>7.2f} ms  {m['modulo']}")
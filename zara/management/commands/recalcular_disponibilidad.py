@@ -0,0 +1,19 @@
+# zara/management/commands/recalcular_disponibilidad.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from zara.variantes import recalcular_disponibilidad, recalcular_todo
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen de disponibilidad por talla desde las variantes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("producto_ids", nargs="*", type=int, help="Sin ids: todos los productos con variantes.")
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        ids = opts["producto_ids"]
+        filas = recalcular_disponibilidad(ids) if ids else recalcular_todo()
+        self.stdout.write(f"{filas} fila(s) de disponibilidad en {time.perf_counter() - t0:.2f}s.")
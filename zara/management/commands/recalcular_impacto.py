@@ -0,0 +1,25 @@
+# zara/management/commands/recalcular_impacto.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from zara import impacto
+
+
+class Command(BaseCommand):
+    help = "Recalcula los contadores de impacto (CO₂ / agua) desde la tabla de canjes y corrige los desfasados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Queda corriendo como proceso de fondo.")
+        parser.add_argument("--intervalo", type=float, default=86400, help="Segundos entre pasadas (con --loop).")
+
+    def handle(self, *args, **opts):
+        while True:
+            r = impacto.recalcular()
+            self.stdout.write(
+                f"impacto recalculado en {r.segundos:.2f}s · filas={r.filas} "
+                f"corregidas={r.corregidas} omitidas={r.omitidas}"
+            )
+            if not opts["loop"]:
+                return
+            time.sleep(opts["intervalo"])
@@ -0,0 +1,37 @@
+# zara/management/commands/reconciliar_stock.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from zara import inventario
+
+
+class Command(BaseCommand):
+    help = "Recalcula Producto.stock / Variante.stock desde el diario y toma un corte para consultas a fecha."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sin-corte", action="store_true", help="Solo reconcilia; no guarda un corte.")
+        parser.add_argument("--conservar", type=int, default=30, help="Cortes a conservar (los más nuevos).")
+        parser.add_argument("--loop", action="store_true", help="Queda corriendo como proceso de fondo.")
+        parser.add_argument("--intervalo", type=float, default=86400, help="Segundos entre pasadas (con --loop).")
+
+    def handle(self, *args, **opts):
+        while True:
+            r = inventario.reconciliar()
+            self.stdout.write(
+                f"reconciliación en {r.segundos:.2f}s · productos corregidos={r.productos_corregidos} "
+                f"variantes corregidas={r.variantes_corregidas} omitidos={r.omitidos}"
+            )
+            for tabla, pk, stock, proyeccion in r.muestras[:10]:
+                self.stdout.write(f"  {tabla} #{pk}: stock {stock} → diario {proyeccion}")
+            if not opts["sin_corte"]:
+                t0 = time.perf_counter()
+                corte = inventario.tomar_corte()
+                podados = inventario.podar_cortes(opts["conservar"])
+                self.stdout.write(
+                    f"corte #{corte.pk}: {corte.filas} filas hasta movimiento {corte.hasta_movimiento} "
+                    f"en {time.perf_counter() - t0:.2f}s · cortes podados={podados}"
+                )
+            if not opts["loop"]:
+                return
+            time.sleep(opts["intervalo"])
@@ -0,0 +1,18 @@
+# zara/management/commands/reprocesar_spool.py
+from django.core.management.base import BaseCommand
+
+from zara.ingesta import reprocesar_spool
+
+
+class Command(BaseCommand):
+    help = "Inserta las respuestas de encuesta que quedaron en spools sin vaciar."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--todos", action="store_true",
+            help="Incluye spools de instancias aún vivas (solo con los workers detenidos).",
+        )
+
+    def handle(self, *args, **opts):
+        total = reprocesar_spool(solo_huerfanos=not opts["todos"])
+        self.stdout.write(f"{total} respuesta(s) reprocesadas.")
@@ -0,0 +1,50 @@
+# zara/management/commands/trabajar_tareas.py
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from zara import tareas
+
+
+def _worker(hilos, lote, intervalo, loop):
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+    return tareas.trabajar(hilos=hilos, lote=lote, intervalo=intervalo, loop=loop, parar=parar)
+
+
+class Command(BaseCommand):
+    help = "Worker de la cola de tareas en BD (zara.tareas): ejecuta pendientes, reintentos y periódicas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=1, help="Procesos worker (paralelismo de CPU).")
+        parser.add_argument("--hilos", type=int, default=4, help="Hilos por proceso para tareas de I/O.")
+        parser.add_argument("--lote", type=int, default=None, help="Tareas tomadas por pasada (por defecto 2 × hilos).")
+        parser.add_argument("--loop", action="store_true", help="Queda corriendo como proceso de fondo.")
+        parser.add_argument("--intervalo", type=float, default=1.0, help="Segundos de espera con la cola vacía (con --loop).")
+
+    def handle(self, *args, **opts):
+        argumentos = (opts["hilos"], opts["lote"], opts["intervalo"], opts["loop"])
+        if opts["procesos"] <= 1:
+            r = _worker(*argumentos)
+            self.stdout.write(f"hechas={r.hechas} fallidas={r.fallidas} pasadas={r.pasadas}")
+            return
+        # fork: los hijos no deben heredar la conexión abierta del padre
+        connections.close_all()
+        hijos = [
+            multiprocessing.get_context("fork").Process(target=_worker, args=argumentos, name=f"tareas-{i}")
+            for i in range(opts["procesos"])
+        ]
+        for hijo in hijos:
+            hijo.start()
+        signal.signal(signal.SIGTERM, lambda *_: [h.terminate() for h in hijos if h.is_alive()])
+        try:
+            for hijo in hijos:
+                hijo.join()
+        except KeyboardInterrupt:  # Ctrl-C llega también a los hijos, que terminan su pasada
+            for hijo in hijos:
+                hijo.join()
+        self.stdout.write(f"{len(hijos)} proceso(s) worker terminados.")
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0002_perfil_puntos_tradeincanje'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=40)),
+                ('payload', models.JSONField(default=dict)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('enviado_en', models.DateTimeField(blank=True, null=True)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'evento de pedido',
+                'verbose_name_plural': 'eventos de pedido (outbox)',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado'], name='zara_pedido_estado_97ecc7_idx'),
+        ),
+        migrations.AddField(
+            model_name='eventopedido',
+            name='pedido',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='zara.pedido'),
+        ),
+        migrations.AddIndex(
+            model_name='eventopedido',
+            index=models.Index(fields=['enviado_en', 'proximo_intento'], name='zara_evento_enviado_b36be2_idx'),
+        ),
+    ]
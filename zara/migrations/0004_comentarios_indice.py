@@ -0,0 +1,14 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:31
+
+from django.db import migrations
+
+from comun.migraciones import indice_comentarios
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0003_pedido_estados_outbox'),
+    ]
+
+    operations = indice_comentarios()
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0004_comentarios_indice'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carrito',
+            index=models.Index(fields=['actualizado_en'], name='zara_carrit_actuali_f07bc5_idx'),
+        ),
+    ]
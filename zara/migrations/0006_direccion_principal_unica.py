@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:08
+
+from django.db import migrations, models
+
+
+def una_principal_por_usuario(apps, schema_editor):
+    """Antes de la restricción: conserva como principal la más antigua de cada usuario."""
+    Direccion = apps.get_model("zara", "Direccion")
+    vistos = set()
+    sobran = []
+    for pk, user_id in Direccion.objects.filter(es_principal=True).order_by("user_id", "id").values_list("id", "user_id"):
+        if user_id in vistos:
+            sobran.append(pk)
+        vistos.add(user_id)
+    Direccion.objects.filter(id__in=sobran).update(es_principal=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0005_carrito_actualizado_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='direccion',
+            name='es_principal',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(una_principal_por_usuario, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='direccion',
+            index=models.Index(fields=['user', '-es_principal', 'id'], name='direccion_user_principal_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='direccion',
+            constraint=models.UniqueConstraint(condition=models.Q(('es_principal', True)), fields=('user',), name='direccion_una_principal'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0006_direccion_principal_unica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='peso_gramos',
+            field=models.PositiveIntegerField(default=500),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0007_producto_peso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Variante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=40, unique=True)),
+                ('talla', models.CharField(max_length=12)),
+                ('color', models.CharField(max_length=40)),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variantes', to='zara.producto')),
+            ],
+            options={
+                'ordering': ['producto_id', 'talla', 'color'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DisponibilidadTalla',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('talla', models.CharField(max_length=12)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('colores', models.CharField(blank=True, max_length=400)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disponibilidad', to='zara.producto')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='variante',
+            constraint=models.UniqueConstraint(fields=('producto', 'talla', 'color'), name='variante_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='variante',
+            constraint=models.CheckConstraint(check=models.Q(('stock__gte', 0)), name='variante_stock_no_negativo'),
+        ),
+        migrations.AddIndex(
+            model_name='disponibilidadtalla',
+            index=models.Index(condition=models.Q(('unidades__gt', 0)), fields=['talla', 'producto'], name='disponibilidad_con_stock'),
+        ),
+        migrations.AddConstraint(
+            model_name='disponibilidadtalla',
+            constraint=models.UniqueConstraint(fields=('producto', 'talla'), name='disponibilidad_unica'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def saldo_inicial(apps, schema_editor):
+    """Un AJUSTE de apertura por variante y por el resto de cada producto: Σ diario == stock actual."""
+    Producto = apps.get_model("zara", "Producto")
+    Variante = apps.get_model("zara", "Variante")
+    MovimientoStock = apps.get_model("zara", "MovimientoStock")
+    ahora = django.utils.timezone.now()
+    movimientos = []
+    en_variantes = {}
+    for pk, producto_id, stock in Variante.objects.filter(stock__gt=0).values_list("id", "producto_id", "stock"):
+        en_variantes[producto_id] = en_variantes.get(producto_id, 0) + stock
+        movimientos.append(MovimientoStock(
+            producto_id=producto_id, variante_id=pk, tipo="AJUSTE", cantidad=stock,
+            nota="Saldo inicial", creado_en=ahora,
+        ))
+    for pk, stock in Producto.objects.values_list("id", "stock").iterator(chunk_size=5000):
+        resto = stock - en_variantes.get(pk, 0)
+        if resto:
+            movimientos.append(MovimientoStock(
+                producto_id=pk, tipo="AJUSTE", cantidad=resto, nota="Saldo inicial", creado_en=ahora,
+            ))
+    MovimientoStock.objects.bulk_create(movimientos, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('zara', '0008_variantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorteStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tomado_en', models.DateTimeField(db_index=True)),
+                ('hasta_movimiento', models.BigIntegerField(default=0)),
+                ('filas', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-tomado_en'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_id', models.BigIntegerField()),
+                ('variante_id', models.BigIntegerField(null=True)),
+                ('stock', models.IntegerField()),
+                ('corte', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='filas_snapshot', to='zara.cortestock')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['corte', 'producto_id'], name='snapshot_corte_producto')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('VENTA', 'Venta'), ('DEVOLUCION', 'Devolución'), ('TRADEIN', 'Ingreso Trade-In'), ('AJUSTE', 'Ajuste manual')], max_length=12)),
+                ('cantidad', models.IntegerField()),
+                ('nota', models.CharField(blank=True, max_length=200)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='zara.pedido')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='zara.producto')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('variante', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='zara.variante')),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['producto', 'creado_en'], name='movimiento_producto_fecha')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='movimientostock',
+            constraint=models.CheckConstraint(check=models.Q(('cantidad', 0), _negated=True), name='movimiento_cantidad_no_cero'),
+        ),
+        migrations.RunPython(saldo_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import zara.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('zara', '0009_inventario_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrendaTradeIn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(default=zara.models._token_prenda, editable=False, max_length=22, unique=True)),
+                ('prenda', models.CharField(max_length=100)),
+                ('material', models.CharField(blank=True, max_length=50)),
+                ('estado', models.CharField(choices=[('RECIBIDA', 'Recibida'), ('CLASIFICADA', 'Clasificada'), ('REVENDIDA', 'Revendida'), ('RECICLADA', 'Reciclada')], default='RECIBIDA', max_length=12)),
+                ('grado', models.CharField(blank=True, choices=[('A', 'A · como nueva'), ('B', 'B · uso leve'), ('C', 'C · solo reciclaje')], max_length=1)),
+                ('recibida_en', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('actualizada_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('canje', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='prendas', to='zara.tradeincanje')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='prendas_tradein', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'prenda Trade-In',
+                'verbose_name_plural': 'prendas Trade-In',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['estado', 'actualizada_en'], name='prenda_tradein_estado')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0010_prendas_tradein'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prendatradein',
+            name='categoria',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
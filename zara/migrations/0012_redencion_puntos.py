@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('zara', '0011_prenda_tradein_categoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedencionPuntos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntos', models.PositiveIntegerField(default=0)),
+                ('creditos', models.PositiveIntegerField(default=0)),
+                ('descuento', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('reembolsada_en', models.DateTimeField(blank=True, null=True)),
+                ('pedido', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='redencion', to='zara.pedido')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redenciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'redención de puntos',
+                'verbose_name_plural': 'redenciones de puntos',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
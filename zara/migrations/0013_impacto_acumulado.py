@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:33
+
+from django.db import migrations, models
+import django.utils.timezone
+
+from comun.texto import plegar
+
+
+def contadores_iniciales(apps, schema_editor):
+    """Contadores desde los canjes existentes (misma clave de material que zara.impacto)."""
+    TradeInCanje = apps.get_model("zara", "TradeInCanje")
+    ImpactoAcumulado = apps.get_model("zara", "ImpactoAcumulado")
+    totales = {}
+    for usuario_id, material, co2 in TradeInCanje.objects.values_list("usuario_id", "material", "impacto").iterator():
+        material = plegar((material or "").strip())[:64] or "desconocido"
+        for clave in (("global", ""), ("usuario", str(usuario_id)), ("material", material)):
+            n, suma = totales.get(clave, (0, 0))
+            totales[clave] = (n + 1, suma + co2)
+    ImpactoAcumulado.objects.bulk_create([
+        ImpactoAcumulado(ambito=ambito, clave=clave, canjes=n, co2_kg=co2)
+        for (ambito, clave), (n, co2) in totales.items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0012_redencion_puntos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImpactoAcumulado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ambito', models.CharField(choices=[('global', 'Global'), ('usuario', 'Usuario'), ('material', 'Material')], max_length=10)),
+                ('clave', models.CharField(blank=True, max_length=64)),
+                ('canjes', models.PositiveIntegerField(default=0)),
+                ('co2_kg', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('agua_l', models.BigIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'impacto acumulado',
+                'verbose_name_plural': 'impacto acumulado',
+            },
+        ),
+        migrations.AddField(
+            model_name='tradeincanje',
+            name='agua_l',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='impactoacumulado',
+            constraint=models.UniqueConstraint(fields=('ambito', 'clave'), name='impacto_ambito_clave'),
+        ),
+        migrations.RunPython(contadores_iniciales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:41
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0013_impacto_acumulado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaPeriodica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('proxima_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultima_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'tarea periódica',
+                'verbose_name_plural': 'tareas periódicas',
+            },
+        ),
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('prioridad', models.SmallIntegerField(default=0)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_CURSO', 'En curso'), ('HECHA', 'Hecha'), ('FALLIDA', 'Fallida')], default='PENDIENTE', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=5)),
+                ('creada_en', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('ejecutar_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tomada_en', models.DateTimeField(blank=True, null=True)),
+                ('tomada_por', models.CharField(blank=True, max_length=64)),
+                ('terminada_en', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'tarea',
+                'verbose_name_plural': 'tareas',
+                'indexes': [models.Index(fields=['estado', '-prioridad', 'ejecutar_en'], name='tarea_cola'), models.Index(fields=['estado', 'terminada_en'], name='tarea_terminadas'), models.Index(fields=['nombre', 'estado'], name='tarea_nombre_estado')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0014_tareas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Correo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('para', models.EmailField(max_length=254)),
+                ('plantilla', models.CharField(max_length=60)),
+                ('contexto', models.JSONField(blank=True, default=dict)),
+                ('version', models.CharField(blank=True, max_length=12)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tomado_por', models.CharField(blank=True, max_length=64)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('enviado_en', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'correo',
+                'verbose_name_plural': 'correos (cola de salida)',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='correo_cola')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Índices para los search_fields "^campo" del admin (ver zara/indices.py)
+
+from django.conf import settings
+from django.db import migrations
+
+from zara.indices import prefijo
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('zara', '0015_correo'),
+    ]
+
+    operations = [
+        prefijo([
+            ('auth_user', 'username'),
+            ('auth_user', 'email'),
+            ('zara_perfil', 'nombre_mostrar'),
+            ('zara_direccion', 'ciudad'),
+            ('zara_direccion', 'alias'),
+            ('zara_producto', 'nombre'),
+            ('zara_variante', 'sku'),
+            ('zara_pedido', 'email_cliente'),
+            ('zara_respuestaencuesta', 'email'),
+            ('zara_tradeincanje', 'prenda'),
+            ('zara_prendatradein', 'prenda'),
+            ('zara_tarea', 'nombre'),
+            ('zara_correo', 'para'),
+        ]),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 20:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara', '0016_indices_busqueda'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='itemcarrito',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='itemcarrito',
+            name='variante',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='zara.variante'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemcarrito',
+            constraint=models.UniqueConstraint(condition=models.Q(('variante__isnull', True)), fields=('carrito', 'producto'), name='item_unico_sin_variante'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemcarrito',
+            constraint=models.UniqueConstraint(condition=models.Q(('variante__isnull', False)), fields=('carrito', 'variante'), name='item_unico_por_variante'),
+        ),
+    ]
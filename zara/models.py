@@ -80,11 +80,20 @@ class Direccion(models.Model):
     region = models.CharField(max_length=80, blank=True)
     codigo_postal = models.CharField(max_length=20, blank=True)
     pais = models.CharField(max_length=60, default="Chile")
-    es_principal = models.BooleanField(default=True)
+    es_principal = models.BooleanField(default=False)  # la primera del usuario la marca zara.direcciones
     creado_en = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-es_principal", "id"]
+        indexes = [
+            # cubre el ORDER BY de `user.direcciones.all()` sin ordenar en memoria
+            models.Index(fields=["user", "-es_principal", "id"], name="direccion_user_principal_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user"], condition=models.Q(es_principal=True), name="direccion_una_principal",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.alias} · {self.ciudad}"
@@ -101,6 +110,7 @@ class Producto(models.Model):
         validators=[MinValueValidator(Decimal("0.00"))]
     )
     stock = models.PositiveIntegerField(default=0)
+    peso_gramos = models.PositiveIntegerField(default=500)  # cotización de envío (zara.envios)
 
     class Meta:
         constraints = [
@@ -113,6 +123,119 @@ class Producto(models.Model):
         return self.nombre
 
 
+class Variante(models.Model):
+    """SKU vendible de un producto (talla × color) con su propio stock."""
+    producto = models.ForeignKey("Producto", on_delete=models.CASCADE, related_name="variantes")
+    sku = models.CharField(max_length=40, unique=True)
+    talla = models.CharField(max_length=12)
+    color = models.CharField(max_length=40)
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["producto", "talla", "color"], name="variante_unica"),
+            models.CheckConstraint(check=Q(stock__gte=0), name="variante_stock_no_negativo"),
+        ]
+        ordering = ["producto_id", "talla", "color"]
+
+    def save(self, *args, **kwargs):
+        self.talla = self.talla.strip().upper()
+        self.color = self.color.strip().lower()
+        super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return f"{self.sku} · {self.talla} / {self.color}"
+
+
+class DisponibilidadTalla(models.Model):
+    """
+    Resumen desnormalizado por (producto, talla), mantenido por zara.variantes.
+    Permite filtrar "con stock en talla M" sin agregar variantes por request.
+    """
+    producto = models.ForeignKey("Producto", on_delete=models.CASCADE, related_name="disponibilidad")
+    talla = models.CharField(max_length=12)
+    unidades = models.PositiveIntegerField(default=0)
+    colores = models.CharField(max_length=400, blank=True)  # "|negro|rojo|": colores con stock
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["producto", "talla"], name="disponibilidad_unica"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["talla", "producto"], condition=Q(unidades__gt=0), name="disponibilidad_con_stock",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.producto_id} · {self.talla}: {self.unidades}"
+
+
+class MovimientoStock(models.Model):
+    """
+    Diario de inventario, solo inserción. `Producto.stock` y `Variante.stock`
+    son su proyección (ver zara.inventario); nunca se editan directamente.
+    """
+    class Tipo(models.TextChoices):
+        VENTA = "VENTA", "Venta"
+        DEVOLUCION = "DEVOLUCION", "Devolución"
+        TRADEIN = "TRADEIN", "Ingreso Trade-In"
+        AJUSTE = "AJUSTE", "Ajuste manual"
+
+    producto = models.ForeignKey("Producto", on_delete=models.PROTECT, related_name="movimientos")
+    variante = models.ForeignKey(
+        "Variante", null=True, blank=True, on_delete=models.PROTECT, related_name="movimientos",
+    )
+    tipo = models.CharField(max_length=12, choices=Tipo.choices)
+    cantidad = models.IntegerField()  # con signo: + entra, − sale
+    pedido = models.ForeignKey("Pedido", null=True, blank=True, on_delete=models.PROTECT, related_name="movimientos")
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    nota = models.CharField(max_length=200, blank=True)
+    creado_en = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            # stock a una fecha: movimientos de un producto posteriores al último corte
+            models.Index(fields=["producto", "creado_en"], name="movimiento_producto_fecha"),
+        ]
+        constraints = [
+            models.CheckConstraint(check=~Q(cantidad=0), name="movimiento_cantidad_no_cero"),
+        ]
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.variante_id and self.producto_id and self.variante.producto_id != self.producto_id:
+            raise ValidationError("La variante no pertenece al producto.")
+
+    def __str__(self) -> str:
+        return f"{self.get_tipo_display()} {self.cantidad:+d} · {self.producto_id}"
+
+
+class CorteStock(models.Model):
+    """Foto periódica del inventario: stock de cada producto/variante hasta `hasta_movimiento`."""
+    tomado_en = models.DateTimeField(db_index=True)
+    hasta_movimiento = models.BigIntegerField(default=0)
+    filas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-tomado_en"]
+
+    def __str__(self) -> str:
+        return f"Corte {self.tomado_en:%Y-%m-%d %H:%M}"
+
+
+class SnapshotStock(models.Model):
+    """Una fila por producto/variante con stock ≠ 0 en el corte (ausente = 0)."""
+    corte = models.ForeignKey("CorteStock", on_delete=models.CASCADE, related_name="filas_snapshot")
+    producto_id = models.BigIntegerField()
+    variante_id = models.BigIntegerField(null=True)
+    stock = models.IntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=["corte", "producto_id"], name="snapshot_corte_producto")]
+
+
 # ============================================
 # CUPONES / PROMOS
 # ============================================
@@ -143,6 +266,10 @@ class Carrito(models.Model):
     actualizado_en = models.DateTimeField(auto_now=True)
     cupon = models.ForeignKey("Cupon", null=True, blank=True, on_delete=models.SET_NULL)
 
+    class Meta:
+        # Barrido de carritos abandonados (zara.barrido)
+        indexes = [models.Index(fields=["actualizado_en"])]
+
     @property
     def esta_vacio(self) -> bool:
         return not self.items.exists()
@@ -168,14 +295,22 @@ class Carrito(models.Model):
 class ItemCarrito(models.Model):
     carrito = models.ForeignKey("Carrito", related_name="items", on_delete=models.CASCADE)
     producto = models.ForeignKey("Producto", on_delete=models.PROTECT)
+    # Obligatoria si el producto tiene variantes: la venta descuenta su stock (zara.inventario)
+    variante = models.ForeignKey("Variante", null=True, blank=True, on_delete=models.PROTECT)
     cantidad = models.PositiveIntegerField(
         validators=[MinValueValidator(1), MaxValueValidator(MAX_QTY_PER_ITEM)]
     )
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
 
     class Meta:
-        unique_together = [("carrito", "producto")]
         constraints = [
+            # una línea por producto, o por variante si la tiene
+            models.UniqueConstraint(
+                fields=["carrito", "producto"], condition=Q(variante__isnull=True), name="item_unico_sin_variante",
+            ),
+            models.UniqueConstraint(
+                fields=["carrito", "variante"], condition=Q(variante__isnull=False), name="item_unico_por_variante",
+            ),
             models.CheckConstraint(check=Q(cantidad__gte=1), name="cantidad_minima_1"),
             models.CheckConstraint(check=Q(cantidad__lte=MAX_QTY_PER_ITEM), name="cantidad_maxima_10"),
         ]
@@ -185,6 +320,19 @@ class ItemCarrito(models.Model):
         if self.producto and self.cantidad > self.producto.stock:
             raise ValidationError("Cantidad supera el stock disponible.")
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._tocar_carrito()
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        self._tocar_carrito()
+        return resultado
+
+    def _tocar_carrito(self) -> None:
+        # auto_now solo cubre Carrito.save(): cambiar un ítem también es actividad (zara.barrido)
+        Carrito.objects.filter(pk=self.carrito_id).update(actualizado_en=timezone.now())
+
     def __str__(self) -> str:
         return f"{self.producto} x {self.cantidad}"
 
@@ -210,10 +358,75 @@ class Pedido(models.Model):
     total_pagado = models.DecimalField(max_digits=10, decimal_places=2)
     estado = models.CharField(max_length=10, choices=ESTADOS, default="CREADO")
 
+    # Máquina de estados: estado actual → estados destino permitidos
+    TRANSICIONES = {
+        "CREADO": {"PAGADO", "CANCELADO"},
+        "PAGADO": {"ENVIADO", "CANCELADO"},
+        "ENVIADO": {"ENTREGADO"},
+        "ENTREGADO": set(),
+        "CANCELADO": set(),
+    }
+
+    class Meta:
+        indexes = [models.Index(fields=["estado"])]
+
+    def puede_pasar_a(self, destino: str) -> bool:
+        return destino in self.TRANSICIONES.get(self.estado, set())
+
     def __str__(self) -> str:
         return f"Pedido #{self.pk}"
 
 
+class EventoPedido(models.Model):
+    """
+    Outbox transaccional de eventos de fulfilment.
+    Se escribe en la misma transacción que el cambio de estado del pedido
+    y lo drena el despachador (`python manage.py despachar_outbox`).
+    """
+    pedido = models.ForeignKey("Pedido", on_delete=models.CASCADE, related_name="eventos")
+    tipo = models.CharField(max_length=40)
+    payload = models.JSONField(default=dict)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    # Control de entrega
+    enviado_en = models.DateTimeField(null=True, blank=True)
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["enviado_en", "proximo_intento"])]
+        verbose_name = "evento de pedido"
+        verbose_name_plural = "eventos de pedido (outbox)"
+
+    def __str__(self) -> str:
+        return f"{self.tipo} · Pedido #{self.pedido_id}"
+
+
+class RedencionPuntos(models.Model):
+    """
+    Puntos / créditos circulares usados como descuento en un pedido.
+    El débito sobre `Perfil` y esta fila se escriben en la misma transacción
+    que el pedido; al cancelarlo se reembolsan una sola vez (ver zara.puntos).
+    """
+    pedido = models.OneToOneField("Pedido", on_delete=models.PROTECT, related_name="redencion")
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="redenciones")
+    puntos = models.PositiveIntegerField(default=0)
+    creditos = models.PositiveIntegerField(default=0)
+    descuento = models.DecimalField(max_digits=10, decimal_places=2)
+    creado_en = models.DateTimeField(default=timezone.now, editable=False)
+    reembolsada_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+        verbose_name = "redención de puntos"
+        verbose_name_plural = "redenciones de puntos"
+
+    def __str__(self) -> str:
+        return f"Pedido #{self.pedido_id}: {self.puntos} pts + {self.creditos} créditos (-${self.descuento})"
+
+
 # ============================================
 # ENCUESTA
 # ============================================
@@ -239,8 +452,16 @@ class RespuestaEncuesta(models.Model):
     )
     comentario = models.TextField(blank=True)
     enviado_en = models.DateTimeField(auto_now_add=True)
+    # Lo marca comun.comentarios al pasar el comentario al índice de términos
+    comentario_indexado = models.BooleanField(default=False, editable=False)
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=["id"], condition=Q(comentario_indexado=False),
+                name="respuesta_por_indexar",
+            ),
+        ]
         constraints = [
             # Un email solo una vez por campaña (case-insensitive)
             models.UniqueConstraint(
@@ -265,6 +486,52 @@ class RespuestaEncuesta(models.Model):
     def __str__(self) -> str:
         return f"{self.email} · {self.campania}"
 
+
+class TerminoComentario(models.Model):
+    """
+    Índice invertido de `RespuestaEncuesta.comentario`: una fila por
+    (respuesta, término distinto). Lo mantiene `comun.comentarios`.
+    """
+    respuesta = models.ForeignKey("RespuestaEncuesta", on_delete=models.CASCADE, related_name="terminos")
+    campania = models.ForeignKey("CampaniaEncuesta", on_delete=models.CASCADE)
+    termino = models.CharField(max_length=40)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["termino", "respuesta"], name="termino_unico_por_respuesta"),
+        ]
+        indexes = [models.Index(fields=["campania", "termino"])]
+
+
+class FrecuenciaTermino(models.Model):
+    """Respuestas por campaña que contienen el término (df)."""
+    campania = models.ForeignKey("CampaniaEncuesta", on_delete=models.CASCADE)
+    termino = models.CharField(max_length=40)
+    documentos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["campania", "termino"], name="frecuencia_unica_por_campania"),
+        ]
+        indexes = [models.Index(fields=["campania", "-documentos"])]
+
+
+class CoocurrenciaTermino(models.Model):
+    """Respuestas por campaña donde aparecen ambos términos (termino_a < termino_b)."""
+    campania = models.ForeignKey("CampaniaEncuesta", on_delete=models.CASCADE)
+    termino_a = models.CharField(max_length=40)
+    termino_b = models.CharField(max_length=40)
+    documentos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["campania", "termino_a", "termino_b"], name="coocurrencia_unica_por_campania",
+            ),
+        ]
+        indexes = [models.Index(fields=["campania", "-documentos"])]
+
+
 # ============================================
 # TRADE-IN / ECONOMÍA CIRCULAR
 # ============================================
@@ -281,7 +548,8 @@ class TradeInCanje(models.Model):
     )
     prenda = models.CharField(max_length=100)
     material = models.CharField(max_length=50)
-    impacto = models.DecimalField(max_digits=6, decimal_places=2)
+    impacto = models.DecimalField(max_digits=6, decimal_places=2)  # kg CO₂ evitados
+    agua_l = models.PositiveIntegerField(default=0)                 # litros de agua evitados
     puntos_obtenidos = models.PositiveIntegerField()
     fecha = models.DateTimeField(auto_now_add=True)
 
@@ -290,3 +558,178 @@ class TradeInCanje(models.Model):
 
     def __str__(self) -> str:
         return f"{self.usuario.username} · {self.prenda} (+{self.puntos_obtenidos} pts)"
+
+
+class ImpactoAcumulado(models.Model):
+    """
+    Totales corridos de impacto de los canjes Trade-In, por usuario, por
+    material y global (una fila por ámbito + clave). Se incrementan en la
+    transacción de cada canje y se recalculan de noche (ver zara.impacto).
+    """
+    class Ambito(models.TextChoices):
+        GLOBAL = "global", "Global"
+        USUARIO = "usuario", "Usuario"
+        MATERIAL = "material", "Material"
+
+    ambito = models.CharField(max_length=10, choices=Ambito.choices)
+    clave = models.CharField(max_length=64, blank=True)  # "" (global), id de usuario o material normalizado
+    canjes = models.PositiveIntegerField(default=0)
+    co2_kg = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    agua_l = models.BigIntegerField(default=0)
+    actualizado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["ambito", "clave"], name="impacto_ambito_clave")]
+        verbose_name = "impacto acumulado"
+        verbose_name_plural = "impacto acumulado"
+
+    def __str__(self) -> str:
+        return f"{self.ambito}:{self.clave or '*'} · {self.co2_kg} kg CO₂ · {self.agua_l} L"
+
+
+def _token_prenda() -> str:
+    import secrets
+    return secrets.token_urlsafe(12)  # 16 caracteres, 96 bits
+
+
+class PrendaTradeIn(models.Model):
+    """
+    Prenda física recibida por Trade-In, identificada en bodega por el QR
+    firmado de su `token` (ver zara.tradein).
+    Ciclo de vida: RECIBIDA → CLASIFICADA → REVENDIDA | RECICLADA.
+    """
+    class Estado(models.TextChoices):
+        RECIBIDA = "RECIBIDA", "Recibida"
+        CLASIFICADA = "CLASIFICADA", "Clasificada"
+        REVENDIDA = "REVENDIDA", "Revendida"
+        RECICLADA = "RECICLADA", "Reciclada"
+
+    class Grado(models.TextChoices):
+        A = "A", "A · como nueva"
+        B = "B", "B · uso leve"
+        C = "C", "C · solo reciclaje"
+
+    # Máquina de estados: estado actual → estados destino permitidos
+    TRANSICIONES = {
+        "RECIBIDA": {"CLASIFICADA", "RECICLADA"},
+        "CLASIFICADA": {"REVENDIDA", "RECICLADA"},
+        "REVENDIDA": set(),
+        "RECICLADA": set(),
+    }
+
+    token = models.CharField(max_length=22, unique=True, default=_token_prenda, editable=False)
+    canje = models.ForeignKey(
+        "TradeInCanje", null=True, blank=True, on_delete=models.SET_NULL, related_name="prendas",
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="prendas_tradein",
+    )
+    prenda = models.CharField(max_length=100)
+    categoria = models.CharField(max_length=20, blank=True)  # mujer / hombre / nina / nino / accesorios
+    material = models.CharField(max_length=50, blank=True)
+    estado = models.CharField(max_length=12, choices=Estado.choices, default=Estado.RECIBIDA)
+    grado = models.CharField(max_length=1, choices=Grado.choices, blank=True)
+    recibida_en = models.DateTimeField(default=timezone.now, editable=False)
+    actualizada_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [models.Index(fields=["estado", "actualizada_en"], name="prenda_tradein_estado")]
+        verbose_name = "prenda Trade-In"
+        verbose_name_plural = "prendas Trade-In"
+
+    def puede_pasar_a(self, destino: str) -> bool:
+        return destino in self.TRANSICIONES.get(self.estado, set())
+
+    def __str__(self) -> str:
+        return f"{self.prenda} · {self.get_estado_display()}"
+
+
+# ============================================
+# TAREAS EN SEGUNDO PLANO
+# ============================================
+
+class Tarea(models.Model):
+    """
+    Cola de trabajos en la propia BD (sin broker externo). La encola
+    `zara.tareas.encolar` y la consumen los workers de
+    `python manage.py trabajar_tareas`; la toma es un UPDATE condicional.
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = "PENDIENTE", "Pendiente"
+        EN_CURSO = "EN_CURSO", "En curso"
+        HECHA = "HECHA", "Hecha"
+        FALLIDA = "FALLIDA", "Fallida"
+
+    nombre = models.CharField(max_length=100)
+    parametros = models.JSONField(default=dict, blank=True)
+    prioridad = models.SmallIntegerField(default=0)  # mayor = antes
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+
+    creada_en = models.DateTimeField(default=timezone.now, editable=False)
+    ejecutar_en = models.DateTimeField(default=timezone.now)  # no antes de esta hora (programadas / backoff)
+    tomada_en = models.DateTimeField(null=True, blank=True)
+    tomada_por = models.CharField(max_length=64, blank=True)  # worker + lote que la reclamó
+    terminada_en = models.DateTimeField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # toma: pendientes listas por prioridad y antigüedad
+            models.Index(fields=["estado", "-prioridad", "ejecutar_en"], name="tarea_cola"),
+            models.Index(fields=["estado", "terminada_en"], name="tarea_terminadas"),
+            models.Index(fields=["nombre", "estado"], name="tarea_nombre_estado"),
+        ]
+        verbose_name = "tarea"
+        verbose_name_plural = "tareas"
+
+    def __str__(self) -> str:
+        return f"{self.nombre} #{self.pk} · {self.estado}"
+
+
+class Correo(models.Model):
+    """
+    Correo transaccional en cola. El request solo inserta la fila; el worker
+    (tarea `zara.enviar_correos`) la renderiza con la versión vigente de la
+    plantilla y la envía por una conexión SMTP reutilizada (ver zara.correo).
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = "PENDIENTE", "Pendiente"
+        ENVIADO = "ENVIADO", "Enviado"
+        FALLIDO = "FALLIDO", "Fallido"
+
+    para = models.EmailField()
+    plantilla = models.CharField(max_length=60)       # templates/correo/<plantilla>/
+    contexto = models.JSONField(default=dict, blank=True)  # se vacía al enviar (puede traer tokens)
+    version = models.CharField(max_length=12, blank=True)  # versión de plantilla con que salió
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)  # también plazo de la toma en curso
+    tomado_por = models.CharField(max_length=64, blank=True)
+    creado_en = models.DateTimeField(default=timezone.now, editable=False)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["estado", "proximo_intento"], name="correo_cola")]
+        verbose_name = "correo"
+        verbose_name_plural = "correos (cola de salida)"
+
+    def __str__(self) -> str:
+        return f"{self.plantilla} → {self.para} · {self.estado}"
+
+
+class TareaPeriodica(models.Model):
+    """Próxima ejecución de cada tarea periódica registrada (la reclama un solo worker)."""
+    nombre = models.CharField(max_length=100, unique=True)
+    proxima_en = models.DateTimeField(default=timezone.now)
+    ultima_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "tarea periódica"
+        verbose_name_plural = "tareas periódicas"
+
+    def __str__(self) -> str:
+        return f"{self.nombre} · próxima {self.proxima_en:%Y-%m-%d %H:%M:%S}"
@@ -0,0 +1,112 @@
+# zara/outbox.py
+"""
+Despachador de la outbox de pedidos (`EventoPedido`).
+
+Toma lotes de eventos pendientes, los entrega al webhook de fulfilment y
+marca el resultado. Si la entrega falla, reprograma con backoff exponencial.
+
+Si `FULFILMENT_WEBHOOK_URL` está vacío se usa un webhook local de prueba
+que solo registra los eventos en el log.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import urllib.request
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EventoPedido
+
+logger = logging.getLogger(__name__)
+
+LOTE = 100
+MAX_INTENTOS = 8
+BACKOFF_BASE_S = 2
+BACKOFF_MAX_S = 15 * 60
+
+Webhook = Callable[[List[Dict[str, object]]], None]
+
+
+def webhook_local(eventos: List[Dict[str, object]]) -> None:
+    """Stand-in del sistema de bodega: acepta todo y lo deja en el log."""
+    for ev in eventos:
+        logger.info("fulfilment ← %s %s", ev["tipo"], ev["payload"])
+
+
+def webhook_http(url: str, timeout: float = 5.0) -> Webhook:
+    def enviar(eventos: List[Dict[str, object]]) -> None:
+        body = json.dumps({"eventos": eventos}).encode("utf-8")
+        req = urllib.request.Request(
+            url, data=body, method="POST", headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            if resp.status >= 300:
+                raise RuntimeError(f"Webhook respondió {resp.status}")
+    return enviar
+
+
+def webhook_configurado() -> Webhook:
+    url = getattr(settings, "FULFILMENT_WEBHOOK_URL", "")
+    return webhook_http(url) if url else webhook_local
+
+
+def backoff(intentos: int) -> timedelta:
+    """2s, 4s, 8s, … con tope en BACKOFF_MAX_S."""
+    return timedelta(seconds=min(BACKOFF_BASE_S ** max(1, intentos), BACKOFF_MAX_S))
+
+
+def pendientes(limite: int = LOTE) -> List[EventoPedido]:
+    """Eventos no enviados cuyo próximo intento ya venció."""
+    return list(
+        EventoPedido.objects.filter(
+            enviado_en__isnull=True,
+            proximo_intento__lte=timezone.now(),
+            intentos__lt=MAX_INTENTOS,
+        ).order_by("id")[:limite]
+    )
+
+
+def despachar_lote(webhook: Webhook | None = None, limite: int = LOTE) -> Dict[str, int]:
+    """
+    Entrega un lote al webhook. El lote se envía completo en una llamada;
+    si falla, todos sus eventos se reprograman con el mismo backoff.
+    """
+    webhook = webhook or webhook_configurado()
+    lote = pendientes(limite)
+    if not lote:
+        return {"enviados": 0, "fallidos": 0}
+
+    ids = [ev.pk for ev in lote]
+    datos = [{"id": ev.pk, "tipo": ev.tipo, "payload": ev.payload} for ev in lote]
+    try:
+        webhook(datos)
+    except Exception as exc:  # red, timeout, 5xx…
+        intentos = max(ev.intentos for ev in lote) + 1
+        EventoPedido.objects.filter(pk__in=ids).update(
+            intentos=F("intentos") + 1,
+            proximo_intento=timezone.now() + backoff(intentos),
+            ultimo_error=str(exc)[:500],
+        )
+        logger.warning("Outbox: lote de %s eventos falló (%s)", len(ids), exc)
+        return {"enviados": 0, "fallidos": len(ids)}
+
+    EventoPedido.objects.filter(pk__in=ids).update(
+        enviado_en=timezone.now(), intentos=F("intentos") + 1, ultimo_error=""
+    )
+    return {"enviados": len(ids), "fallidos": 0}
+
+
+def drenar(webhook: Webhook | None = None, limite: int = LOTE) -> Dict[str, int]:
+    """Despacha lotes hasta que no queden eventos listos o un lote falle."""
+    total = {"enviados": 0, "fallidos": 0}
+    while True:
+        r = despachar_lote(webhook, limite)
+        total["enviados"] += r["enviados"]
+        total["fallidos"] += r["fallidos"]
+        if not r["enviados"]:
+            return total
@@ -0,0 +1,250 @@
+# zara/pedidos.py
+"""
+Servicio de estados de Pedido.
+
+- Valida transiciones según `Pedido.TRANSICIONES`.
+- Cambios masivos: un UPDATE … RETURNING por estado de origen (no un save()
+  por pedido); eventos y correos solo para las filas que ese UPDATE cambió.
+- Cada cambio deja un `EventoPedido` en la outbox dentro de la misma transacción,
+  y el aviso al cliente en la cola de correo (zara.correo).
+- Al pagar se descuenta el stock (VENTA en el diario de inventario); al
+  cancelar un pedido pagado se repone (DEVOLUCION). Un pedido sin stock
+  suficiente no pasa a PAGADO.
+- `crear` arma carrito + pedido con precios de la BD (el cupón sale del
+  snapshot de zara.catalogo) y, si se pide, canjea
+  puntos / créditos como descuento en la misma transacción (zara.puntos);
+  al cancelar el pedido se reembolsan.
+- `exportar_csv` vuelca pedidos a CSV (lo corre la tarea
+  `zara.exportar_pedidos` del worker, no el request del admin).
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from . import correo
+from . import puntos as canje_puntos
+from .catalogo import cupon_por_codigo
+from .inventario import devolver_pedidos, vender_pedidos
+from .models import MAX_QTY_PER_ITEM, Carrito, Cupon, EventoPedido, ItemCarrito, Pedido, Producto, Variante
+
+ESTADOS_VALIDOS = {codigo for codigo, _ in Pedido.ESTADOS}
+
+# Ids por sentencia (SQLite admite hasta 32766 parámetros por consulta)
+LOTE_IDS = 10_000
+
+
+def _evento(pedido_id: int, origen: str, destino: str) -> EventoPedido:
+    return EventoPedido(
+        pedido_id=pedido_id,
+        tipo=f"pedido.{destino.lower()}",
+        payload={"pedido": pedido_id, "desde": origen, "hasta": destino},
+    )
+
+
+def _efectos(origen: str, destino: str, pedido_ids: List[int]) -> List[int]:
+    """
+    Stock y saldo de la transición (dentro de su transacción).
+    Retorna los pedidos sin stock para pagarse.
+    """
+    if destino == "PAGADO":
+        return vender_pedidos(pedido_ids)
+    if destino == "CANCELADO":
+        if origen == "PAGADO":
+            devolver_pedidos(pedido_ids)
+        canje_puntos.reembolsar_pedidos(pedido_ids)
+    return []
+
+
+def crear(
+    items: Iterable[Tuple[int, ...]],
+    email: str,
+    usuario=None,
+    puntos: int = 0,
+    creditos: int = 0,
+    cupon: str = "",
+) -> Pedido:
+    """
+    Pedido CREADO a partir de [(producto_id, cantidad)] o
+    [(producto_id, cantidad, variante_id)] con precios de la BD. Un producto
+    con variantes exige la variante: la venta descuenta su stock.
+    `puntos` / `creditos` se recortan al tope de descuento y se debitan del
+    perfil en la misma transacción; sin saldo suficiente no se crea nada.
+    """
+    lineas: Dict[Tuple[int, Optional[int]], int] = defaultdict(int)
+    for producto_id, cantidad, *resto in items:
+        variante_id = int(resto[0]) if resto and resto[0] is not None else None
+        lineas[(int(producto_id), variante_id)] += int(cantidad)
+    if not lineas:
+        raise ValidationError("El carrito está vacío.")
+    cantidades: Dict[int, int] = defaultdict(int)
+    for (producto_id, _), cantidad in lineas.items():
+        cantidades[producto_id] += cantidad
+    if any(not 1 <= c <= MAX_QTY_PER_ITEM for c in [*lineas.values(), *cantidades.values()]):
+        raise ValidationError(f"Cada producto admite entre 1 y {MAX_QTY_PER_ITEM} unidades.")
+    if (puntos or creditos) and usuario is None:
+        raise ValidationError("Inicia sesión para usar tus puntos.")
+
+    precios = dict(Producto.objects.filter(pk__in=list(cantidades)).values_list("pk", "precio"))
+    faltan = sorted(set(cantidades) - set(precios))
+    if faltan:
+        raise ValidationError(f"Productos no disponibles: {', '.join(map(str, faltan))}.")
+    _validar_variantes(lineas)
+    cupon_obj: Optional[Cupon] = cupon_por_codigo(cupon)
+
+    with transaction.atomic():
+        carrito = Carrito.objects.create(cupon=cupon_obj if cupon_obj and cupon_obj.esta_vigente() else None)
+        ItemCarrito.objects.bulk_create([
+            ItemCarrito(carrito=carrito, producto_id=pk, variante_id=vid, cantidad=c, precio_unitario=precios[pk])
+            for (pk, vid), c in sorted(lineas.items(), key=lambda kv: (kv[0][0], kv[0][1] or 0))
+        ])
+        total = carrito.total()
+        usa_puntos, usa_creditos, descuento = (
+            canje_puntos.ajustar(total, puntos, creditos) if usuario is not None else (0, 0, Decimal("0.00"))
+        )
+        pedido = Pedido.objects.create(
+            carrito=carrito, user=usuario, email_cliente=email, total_pagado=total - descuento,
+        )
+        if descuento:
+            canje_puntos.redimir(pedido, usuario.pk, usa_puntos, usa_creditos, descuento)
+        _evento(pedido.pk, "", "CREADO").save()
+    return pedido
+
+
+def _validar_variantes(lineas: Dict[Tuple[int, Optional[int]], int]) -> None:
+    """Cada variante es de su producto; un producto con variantes no se vende sin elegir una."""
+    pedidas = {vid: pk for pk, vid in lineas if vid is not None}
+    propias = dict(Variante.objects.filter(pk__in=list(pedidas)).values_list("pk", "producto_id"))
+    ajenas = sorted(vid for vid, pk in pedidas.items() if propias.get(vid) != pk)
+    if ajenas:
+        raise ValidationError(f"Variantes no disponibles: {', '.join(map(str, ajenas))}.")
+    sin_variante = {pk for pk, vid in lineas if vid is None}
+    con_variantes = sorted(
+        Variante.objects.filter(producto_id__in=sin_variante).values_list("producto_id", flat=True).distinct()
+    )
+    if con_variantes:
+        raise ValidationError(f"Elige talla y color para: {', '.join(map(str, con_variantes))}.")
+
+
+def origenes_para(destino: str) -> List[str]:
+    """Estados desde los que se puede llegar a `destino`."""
+    return [origen for origen, destinos in Pedido.TRANSICIONES.items() if destino in destinos]
+
+
+def transicionar(pedido: Pedido, destino: str) -> Pedido:
+    """Cambia el estado de un pedido validando la transición."""
+    if destino not in ESTADOS_VALIDOS:
+        raise ValidationError(f"Estado desconocido: {destino}.")
+    if not pedido.puede_pasar_a(destino):
+        raise ValidationError(f"Transición no permitida: {pedido.estado} → {destino}.")
+
+    origen = pedido.estado
+    with transaction.atomic():
+        # UPDATE condicional: si otro proceso ya lo movió, no pisamos su cambio
+        filas = Pedido.objects.filter(pk=pedido.pk, estado=origen).update(estado=destino)
+        if not filas:
+            raise ValidationError(f"El pedido #{pedido.pk} cambió de estado en paralelo.")
+        if _efectos(origen, destino, [pedido.pk]):
+            raise ValidationError(f"El pedido #{pedido.pk} no tiene stock suficiente.")
+        _evento(pedido.pk, origen, destino).save()
+        correo.notificar_pedidos([pedido.pk], destino)
+    pedido.estado = destino
+    return pedido
+
+
+def transicionar_en_bloque(pedido_ids: Iterable[int], destino: str) -> Dict[str, int]:
+    """
+    Mueve muchos pedidos a `destino` en bloque.
+
+    Los pedidos cuyo estado actual no permite la transición se omiten.
+    Retorna {"actualizados": n, "omitidos": m}.
+    """
+    if destino not in ESTADOS_VALIDOS:
+        raise ValidationError(f"Estado desconocido: {destino}.")
+
+    ids = sorted({int(pk) for pk in pedido_ids})
+    origenes = origenes_para(destino)
+
+    actualizados = 0
+    for i in range(0, len(ids), LOTE_IDS):
+        actualizados += _transicionar_lote(ids[i:i + LOTE_IDS], origenes, destino)
+
+    return {"actualizados": actualizados, "omitidos": len(ids) - actualizados}
+
+
+def _update_returning() -> bool:
+    """UPDATE … RETURNING: PostgreSQL y SQLite ≥ 3.35 (MariaDB/MySQL no lo tienen)."""
+    if connection.vendor == "postgresql":
+        return True
+    return connection.vendor == "sqlite" and connection.Database.sqlite_version_info >= (3, 35)
+
+
+def _marcar(pks: List[int], origen: str, destino: str) -> List[int]:
+    """UPDATE condicional `origen → destino`; retorna solo los ids que cambió de verdad."""
+    if not pks:
+        return []
+    if _update_returning():
+        # sin ventana entre leer y escribir
+        q = connection.ops.quote_name
+        meta = Pedido._meta
+        tabla, pk, estado = q(meta.db_table), q(meta.pk.column), q(meta.get_field("estado").column)
+        marcas = ", ".join(["%s"] * len(pks))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {tabla} SET {estado} = %s WHERE {estado} = %s AND {pk} IN ({marcas}) RETURNING {pk}",
+                [destino, origen, *pks],
+            )
+            return sorted(fila[0] for fila in cursor.fetchall())
+    # sin RETURNING: bloquear las filas y actualizar exactamente las bloqueadas
+    bloqueados = list(
+        Pedido.objects.select_for_update().filter(pk__in=pks, estado=origen).order_by("pk").values_list("pk", flat=True)
+    )
+    Pedido.objects.filter(pk__in=bloqueados).update(estado=destino)
+    return bloqueados
+
+
+def _transicionar_lote(ids: List[int], origenes: List[str], destino: str) -> int:
+    with transaction.atomic():
+        # la lectura solo agrupa por origen; quién cambió lo decide el UPDATE
+        por_origen: Dict[str, List[int]] = defaultdict(list)
+        for pk, estado in Pedido.objects.filter(pk__in=ids, estado__in=origenes).values_list("pk", "estado"):
+            por_origen[estado].append(pk)
+
+        eventos: List[EventoPedido] = []
+        for origen, pks in por_origen.items():
+            cambiados = _marcar(pks, origen, destino)
+            sin_stock = set(_efectos(origen, destino, cambiados))
+            if sin_stock:
+                # quedan en su estado (ya bloqueados por el UPDATE de esta transacción); cuentan como omitidos
+                Pedido.objects.filter(pk__in=sin_stock).update(estado=origen)
+            eventos.extend(_evento(pk, origen, destino) for pk in cambiados if pk not in sin_stock)
+
+        EventoPedido.objects.bulk_create(eventos, batch_size=1000)
+        correo.notificar_pedidos([ev.pedido_id for ev in eventos], destino)
+    return len(eventos)
+
+
+COLUMNAS_EXPORTACION = ("id", "creado_en", "estado", "email_cliente", "usuario", "total_pagado")
+
+
+def exportar_csv(pedido_ids: Iterable[int], destino) -> int:
+    """Escribe los pedidos en CSV (en orden de id) sobre un archivo de texto abierto. Retorna las filas."""
+    import csv
+
+    escritor = csv.writer(destino)
+    escritor.writerow(COLUMNAS_EXPORTACION)
+    ids = sorted(set(pedido_ids))
+    filas = 0
+    for i in range(0, len(ids), LOTE_IDS):
+        for fila in (
+            Pedido.objects.filter(pk__in=ids[i:i + LOTE_IDS]).order_by("id")
+            .values_list("id", "creado_en", "estado", "email_cliente", "user__username", "total_pagado")
+            .iterator(chunk_size=2000)
+        ):
+            escritor.writerow([fila[0], fila[1].isoformat(), fila[2], fila[3], fila[4] or "", fila[5]])
+            filas += 1
+    return filas
@@ -0,0 +1,117 @@
+# zara/puntos.py
+"""
+Canje de puntos / créditos circulares como descuento en el checkout.
+
+- Conversión y tope configurables: `PUNTOS_VALOR_CLP`, `CREDITOS_VALOR_CLP`
+  y `PUNTOS_MAX_DESCUENTO` (fracción del total que se puede pagar así).
+- El débito es un único UPDATE condicional
+  (`WHERE puntos >= n AND creditos_circulares >= m`): dos checkouts
+  concurrentes sobre el mismo perfil nunca gastan el mismo saldo; el que
+  llega segundo no encuentra fila y falla con `PuntosInsuficientes`.
+- Se llama dentro de la transacción que crea el pedido, así el débito y
+  `RedencionPuntos` se confirman o revierten junto con él.
+- `reembolsar_pedidos` devuelve el saldo de pedidos cancelados; marcar la
+  redención como reembolsada es también condicional, así que reintentos o
+  cancelaciones concurrentes no reembolsan dos veces.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import ROUND_DOWN, Decimal
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Perfil, RedencionPuntos
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+class PuntosInsuficientes(ValidationError):
+    pass
+
+
+# =============================
+#  CONVERSIÓN
+# =============================
+
+def valor_punto() -> Decimal:
+    return Decimal(str(_config("PUNTOS_VALOR_CLP", 10)))
+
+
+def valor_credito() -> Decimal:
+    return Decimal(str(_config("CREDITOS_VALOR_CLP", 1000)))
+
+
+def descuento_maximo(total: Decimal) -> Decimal:
+    tope = Decimal(str(_config("PUNTOS_MAX_DESCUENTO", 0.5)))
+    return (total * tope).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+
+
+def ajustar(total: Decimal, puntos: int, creditos: int) -> Tuple[int, int, Decimal]:
+    """
+    (puntos, créditos, descuento) efectivamente usados: se recortan al tope
+    del pedido para no gastar saldo de más. Primero créditos (unidad mayor).
+    """
+    disponible = descuento_maximo(total)
+    creditos = max(0, min(int(creditos), int(disponible // valor_credito())))
+    disponible -= creditos * valor_credito()
+    puntos = max(0, min(int(puntos), int(disponible // valor_punto())))
+    return puntos, creditos, (creditos * valor_credito() + puntos * valor_punto()).quantize(Decimal("0.01"))
+
+
+# =============================
+#  DÉBITO / REEMBOLSO
+# =============================
+
+def debitar(user_id: int, puntos: int, creditos: int = 0) -> None:
+    """Descuenta del perfil en un UPDATE condicional; PuntosInsuficientes si no alcanza."""
+    if not puntos and not creditos:
+        return
+    filas = Perfil.objects.filter(
+        user_id=user_id, puntos__gte=puntos, creditos_circulares__gte=creditos,
+    ).update(puntos=F("puntos") - puntos, creditos_circulares=F("creditos_circulares") - creditos)
+    if not filas:
+        raise PuntosInsuficientes("Saldo de puntos o créditos insuficiente.")
+
+
+def redimir(pedido, user_id: int, puntos: int, creditos: int, descuento: Decimal) -> RedencionPuntos:
+    """Débito + registro ligado al pedido. Debe llamarse dentro de la transacción del pedido."""
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError("redimir() debe ejecutarse dentro de la transacción que crea el pedido.")
+    debitar(user_id, puntos, creditos)
+    return RedencionPuntos.objects.create(
+        pedido=pedido, usuario_id=user_id, puntos=puntos, creditos=creditos, descuento=descuento,
+    )
+
+
+@transaction.atomic
+def reembolsar_pedidos(pedido_ids: Iterable[int]) -> int:
+    """Devuelve el saldo de las redenciones no reembolsadas de esos pedidos. Retorna cuántas."""
+    pendientes = list(
+        RedencionPuntos.objects.filter(pedido_id__in=list(pedido_ids), reembolsada_en__isnull=True)
+        .values_list("pk", "usuario_id", "puntos", "creditos")
+    )
+    if not pendientes:
+        return 0
+    ahora = timezone.now()
+    por_usuario: Dict[int, list] = defaultdict(lambda: [0, 0])
+    reembolsadas = 0
+    for pk, user_id, puntos, creditos in pendientes:
+        # condicional: si otra cancelación ya la marcó, no se suma de nuevo
+        if RedencionPuntos.objects.filter(pk=pk, reembolsada_en__isnull=True).update(reembolsada_en=ahora):
+            por_usuario[user_id][0] += puntos
+            por_usuario[user_id][1] += creditos
+            reembolsadas += 1
+    for user_id in sorted(por_usuario):
+        puntos, creditos = por_usuario[user_id]
+        Perfil.objects.filter(user_id=user_id).update(
+            puntos=F("puntos") + puntos, creditos_circulares=F("creditos_circulares") + creditos,
+        )
+    return reembolsadas
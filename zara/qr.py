@@ -0,0 +1,26 @@
+# zara/qr.py
+"""
+Generación de códigos QR con importación diferida.
+
+`qrcode` arrastra PIL; se importa en el primer QR generado y no al cargar
+las URLs, para que los workers que nunca sirven un QR no paguen ese costo.
+"""
+from __future__ import annotations
+
+import base64
+import io
+
+
+def qr_png(data: str) -> bytes:
+    """PNG del QR para `data`."""
+    import qrcode  # diferido a propósito (ver docstring del módulo)
+
+    img = qrcode.make(data)
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def qr_base64(data: str) -> str:
+    """PNG del QR codificado en base64, listo para `data:image/png;base64,…`."""
+    return base64.b64encode(qr_png(data)).decode("utf-8")
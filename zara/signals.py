@@ -8,4 +8,5 @@ User = get_user_model()
 @receiver(post_save, sender=User)
 def crear_perfil_usuario(sender, instance, created, **kwargs):
     if created:
-        Perfil.objects.create(user=instance)  # rol por defecto: CLIENTE
+        # models.crear_perfil_automatico también escucha este signal
+        Perfil.objects.get_or_create(user=instance)  # rol por defecto: CLIENTE
@@ -0,0 +1,394 @@
+# zara/tareas.py
+"""
+Tareas en segundo plano con la propia BD como cola (sin broker externo).
+
+- `@tarea(nombre, ...)` registra una función; se encola con
+  `funcion.encolar(**parametros)` o `encolar(nombre, parametros)`. Encolar
+  dentro de una transacción la confirma o revierte junto con ella, igual
+  que la outbox de pedidos. Los parámetros viajan en JSON: ids y textos.
+- Toma: SELECT de candidatas contra el índice (estado, -prioridad,
+  ejecutar_en) y un UPDATE condicional `WHERE estado = 'PENDIENTE'` que las
+  marca con el id del lote. Dos workers nunca ejecutan la misma tarea.
+- Reintentos con el backoff de la outbox hasta `max_intentos`; luego
+  FALLIDA. Una tarea EN_CURSO más allá de `TAREAS_TIMEOUT_S` (worker caído)
+  vuelve a la cola.
+- Periódicas: `@tarea(..., cada=segundos)`. `TareaPeriodica.proxima_en` se
+  reclama con UPDATE condicional: una sola encolada por vuelta aunque haya
+  varios workers, y no se apila si la anterior sigue pendiente. Las de un
+  día o más (`cada >= 24 h`) se anclan a `TAREAS_HORA_NOCTURNA` (hora
+  local): ni la siembra ni un reinicio del worker las corren en horario
+  de tienda.
+- `io=True` corre en el ThreadPoolExecutor del worker (disco, red, SMTP);
+  el resto en su hilo principal. Paralelismo de CPU: `--procesos N` en
+  `python manage.py trabajar_tareas`.
+- Un error de BD en una pasada (base bloqueada, conexión caída) se
+  registra y el worker espera con backoff antes de reintentar; no muere.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Tarea, TareaPeriodica
+from .outbox import backoff
+
+logger = logging.getLogger(__name__)
+
+Estado = Tarea.Estado
+ACTIVAS = (Estado.PENDIENTE, Estado.EN_CURSO)
+RESCATE_CADA_S = 60
+DIA_S = 24 * 3600
+LOTE_PURGA = 5000
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+# =============================
+#  REGISTRO / ENCOLADO
+# =============================
+
+@dataclass(frozen=True)
+class Definicion:
+    nombre: str
+    funcion: Callable[..., object]
+    prioridad: int = 0
+    max_intentos: int = 5
+    io: bool = False
+    cada: Optional[float] = None  # segundos entre ejecuciones (periódica)
+
+
+REGISTRO: Dict[str, Definicion] = {}
+
+
+def tarea(nombre: str, *, prioridad: int = 0, max_intentos: int = 5, io: bool = False, cada: Optional[float] = None):
+    """Registra la función como tarea. Agrega `funcion.encolar(**parametros)`."""
+    def registrar(funcion):
+        d = Definicion(nombre, funcion, prioridad, max_intentos, io, cada)
+        REGISTRO[nombre] = d
+        funcion.encolar = lambda **parametros: encolar(nombre, parametros)
+        return funcion
+    return registrar
+
+
+def encolar(nombre: str, parametros: Optional[Dict[str, object]] = None, *,
+            prioridad: Optional[int] = None, en=None) -> Tarea:
+    """Inserta la tarea (opcionalmente programada para `en`)."""
+    d = REGISTRO.get(nombre)
+    if d is None:
+        raise LookupError(f"Tarea no registrada: {nombre}")
+    return Tarea.objects.create(
+        nombre=nombre, parametros=parametros or {},
+        prioridad=d.prioridad if prioridad is None else prioridad,
+        max_intentos=d.max_intentos, ejecutar_en=en or timezone.now(),
+    )
+
+
+def encolar_unica(nombre: str, parametros: Optional[Dict[str, object]] = None) -> Optional[Tarea]:
+    """Encola salvo que ya haya una igual pendiente o en curso (despertadores, periódicas)."""
+    if Tarea.objects.filter(nombre=nombre, estado__in=ACTIVAS).exists():
+        return None
+    return encolar(nombre, parametros)
+
+
+# =============================
+#  TOMA / EJECUCIÓN
+# =============================
+
+def tomar(worker: str, limite: int) -> List[Tarea]:
+    """Reclama hasta `limite` tareas listas: una consulta de candidatas y un UPDATE condicional."""
+    ahora = timezone.now()
+    orden = ("-prioridad", "ejecutar_en", "id")
+    candidatas = list(
+        Tarea.objects.filter(estado=Estado.PENDIENTE, ejecutar_en__lte=ahora)
+        .order_by(*orden).values_list("pk", flat=True)[:limite]
+    )
+    if not candidatas:
+        return []
+    lote = f"{worker}:{uuid.uuid4().hex[:8]}"
+    # las que otro worker tomó entre el SELECT y el UPDATE ya no están PENDIENTE: se quedan con él
+    Tarea.objects.filter(pk__in=candidatas, estado=Estado.PENDIENTE).update(
+        estado=Estado.EN_CURSO, tomada_por=lote, tomada_en=ahora, intentos=F("intentos") + 1,
+    )
+    return list(Tarea.objects.filter(pk__in=candidatas, tomada_por=lote).order_by(*orden))
+
+
+def ejecutar(t: Tarea) -> bool:
+    """Corre una tarea ya tomada y registra el resultado. True si terminó bien."""
+    d = REGISTRO.get(t.nombre)
+    try:
+        if d is None:
+            raise LookupError(f"Tarea no registrada en este worker: {t.nombre}")
+        d.funcion(**t.parametros)
+    except Exception as exc:
+        _fallo(t, exc)
+        return False
+    # condicional: si se rescató por timeout y otro worker la tomó, no pisamos su estado
+    Tarea.objects.filter(pk=t.pk, tomada_por=t.tomada_por).update(
+        estado=Estado.HECHA, terminada_en=timezone.now(), ultimo_error="",
+    )
+    return True
+
+
+def _fallo(t: Tarea, exc: Exception) -> None:
+    ahora = timezone.now()
+    error = f"{type(exc).__name__}: {exc}"[:2000]
+    filtro = Tarea.objects.filter(pk=t.pk, tomada_por=t.tomada_por)
+    if t.intentos >= t.max_intentos:
+        filtro.update(estado=Estado.FALLIDA, terminada_en=ahora, ultimo_error=error)
+        logger.error("Tarea %s #%s falló definitivamente tras %s intentos", t.nombre, t.pk, t.intentos, exc_info=exc)
+    else:
+        filtro.update(estado=Estado.PENDIENTE, tomada_por="", ejecutar_en=ahora + backoff(t.intentos), ultimo_error=error)
+        logger.warning("Tarea %s #%s falló (intento %s/%s): %s", t.nombre, t.pk, t.intentos, t.max_intentos, exc)
+
+
+def _en_hilo(t: Tarea) -> bool:
+    try:
+        return ejecutar(t)
+    finally:
+        close_old_connections()  # cada hilo del pool tiene su propia conexión
+
+
+def rescatar_colgadas() -> int:
+    """Devuelve a la cola (o da por fallidas) las EN_CURSO con más de TAREAS_TIMEOUT_S."""
+    ahora = timezone.now()
+    colgadas = Tarea.objects.filter(
+        estado=Estado.EN_CURSO, tomada_en__lt=ahora - timedelta(seconds=_config("TAREAS_TIMEOUT_S", 600)),
+    )
+    fallidas = colgadas.filter(intentos__gte=F("max_intentos")).update(
+        estado=Estado.FALLIDA, terminada_en=ahora, ultimo_error="Tiempo agotado (worker caído o tarea colgada).",
+    )
+    devueltas = colgadas.filter(intentos__lt=F("max_intentos")).update(
+        estado=Estado.PENDIENTE, tomada_por="", ejecutar_en=ahora,
+    )
+    if fallidas or devueltas:
+        logger.warning("Tareas colgadas: %s devueltas a la cola, %s fallidas.", devueltas, fallidas)
+    return fallidas + devueltas
+
+
+# =============================
+#  PERIÓDICAS
+# =============================
+
+def _periodicas() -> Dict[str, Definicion]:
+    return {nombre: d for nombre, d in REGISTRO.items() if d.cada}
+
+
+def _proxima(d: Definicion, ahora):
+    """`ahora + cada`; las de un día o más, a la siguiente `TAREAS_HORA_NOCTURNA` desde ahí."""
+    if d.cada < DIA_S:
+        return ahora + timedelta(seconds=d.cada)
+    desde = timezone.localtime(ahora + timedelta(seconds=d.cada - DIA_S))
+    proxima = desde.replace(hour=_config("TAREAS_HORA_NOCTURNA", 3), minute=0, second=0, microsecond=0)
+    return proxima if proxima > desde else proxima + timedelta(days=1)
+
+
+def sembrar_periodicas() -> None:
+    """Crea la fila de control de cada periódica nueva (primera ejecución: ya, o la próxima noche)."""
+    ahora = timezone.now()
+    TareaPeriodica.objects.bulk_create(
+        [TareaPeriodica(nombre=nombre, proxima_en=_proxima(d, ahora) if d.cada >= DIA_S else ahora)
+         for nombre, d in _periodicas().items()],
+        ignore_conflicts=True,
+    )
+
+
+def programar_periodicas() -> int:
+    """Encola las periódicas vencidas. Retorna cuántas se encolaron."""
+    periodicas = _periodicas()
+    ahora = timezone.now()
+    encoladas = 0
+    for nombre, proxima in TareaPeriodica.objects.filter(
+        nombre__in=list(periodicas), proxima_en__lte=ahora,
+    ).values_list("nombre", "proxima_en"):
+        # UPDATE condicional: solo el worker que mueve `proxima_en` la encola
+        if not TareaPeriodica.objects.filter(nombre=nombre, proxima_en=proxima).update(
+            proxima_en=_proxima(periodicas[nombre], ahora), ultima_en=ahora,
+        ):
+            continue
+        if encolar_unica(nombre):  # si la anterior sigue en la cola, no se apilan
+            encoladas += 1
+    return encoladas
+
+
+# =============================
+#  WORKER
+# =============================
+
+@dataclass
+class ResultadoWorker:
+    hechas: int = 0
+    fallidas: int = 0
+    pasadas: int = 0
+
+    def sumar(self, otro: "ResultadoWorker") -> None:
+        self.hechas += otro.hechas
+        self.fallidas += otro.fallidas
+        self.pasadas += otro.pasadas
+
+
+def id_worker() -> str:
+    return f"{socket.gethostname()[:40]}:{os.getpid()}"
+
+
+def pasada(pool: ThreadPoolExecutor, worker: str, lote: int) -> ResultadoWorker:
+    """Toma un lote y lo ejecuta: I/O en el pool, lo demás en este hilo. Espera a que termine todo."""
+    r = ResultadoWorker(pasadas=1)
+    tareas = tomar(worker, lote)
+    es_io = lambda t: t.nombre in REGISTRO and REGISTRO[t.nombre].io  # noqa: E731
+    futuros = [pool.submit(_en_hilo, t) for t in tareas if es_io(t)]
+    resultados = [ejecutar(t) for t in tareas if not es_io(t)]
+    resultados += [f.result() for f in futuros]
+    r.hechas = sum(resultados)
+    r.fallidas = len(resultados) - r.hechas
+    return r
+
+
+def trabajar(hilos: int = 4, lote: Optional[int] = None, intervalo: float = 1.0, loop: bool = True,
+             parar: Optional[threading.Event] = None) -> ResultadoWorker:
+    """
+    Bucle del worker. Sin `loop`, drena lo que esté listo y retorna.
+    `parar` (p. ej. desde un handler de SIGTERM) corta al final de la pasada en curso.
+    Un DatabaseError en la pasada se registra y se reintenta con backoff.
+    """
+    parar = parar or threading.Event()
+    worker = id_worker()
+    lote = lote or hilos * 2
+    total = ResultadoWorker()
+    sembradas = False
+    proximo_rescate = 0.0
+    errores = 0
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="tarea") as pool:
+        while not parar.is_set():
+            try:
+                if not sembradas:
+                    sembrar_periodicas()
+                    sembradas = True
+                if time.monotonic() >= proximo_rescate:
+                    rescatar_colgadas()
+                    proximo_rescate = time.monotonic() + RESCATE_CADA_S
+                programar_periodicas()
+                r = pasada(pool, worker, lote)
+            except DatabaseError:
+                errores += 1
+                espera = backoff(errores)
+                logger.exception("Worker %s: error de BD en la pasada %s; reintento en %s s.",
+                                 worker, total.pasadas + 1, espera.total_seconds())
+                close_old_connections()  # descarta la conexión si quedó inutilizable
+                parar.wait(espera.total_seconds())
+                continue
+            errores = 0
+            total.sumar(r)
+            if r.hechas or r.fallidas:
+                continue
+            if not loop:
+                break
+            parar.wait(intervalo)
+    return total
+
+
+# =============================
+#  MÉTRICAS (admin)
+# =============================
+
+@dataclass
+class MetricaTarea:
+    nombre: str
+    pendientes: int = 0
+    en_curso: int = 0
+    fallidas: int = 0
+    hechas: int = 0                 # en la ventana
+    espera_p50_s: float = 0.0       # ejecutar_en → tomada_en
+    espera_p95_s: float = 0.0
+    duracion_p50_s: float = 0.0     # tomada_en → terminada_en
+    duracion_p95_s: float = 0.0
+
+
+@dataclass
+class Metricas:
+    por_estado: Dict[str, int]
+    listas: int                     # pendientes ya vencidas (profundidad real de la cola)
+    espera_mas_antigua_s: float     # la pendiente lista que más lleva esperando
+    por_tarea: List[MetricaTarea] = field(default_factory=list)
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(p * len(valores)))]
+
+
+def metricas(ventana_s: int = 3600, muestra: int = 2000) -> Metricas:
+    """
+    Profundidad por estado y latencia de las terminadas en la ventana.
+    Solo toca tareas activas/fallidas (pocas) y una muestra acotada de HECHAS.
+    """
+    ahora = timezone.now()
+    por_tarea: Dict[str, MetricaTarea] = {}
+    por_estado = {e: 0 for e in Estado.values}
+    for nombre, estado, n in (
+        Tarea.objects.filter(estado__in=(*ACTIVAS, Estado.FALLIDA)).order_by()
+        .values_list("nombre", "estado").annotate(n=Count("id"))
+    ):
+        m = por_tarea.setdefault(nombre, MetricaTarea(nombre))
+        setattr(m, {Estado.PENDIENTE: "pendientes", Estado.EN_CURSO: "en_curso"}.get(estado, "fallidas"), n)
+        por_estado[estado] += n
+
+    esperas: Dict[str, List[float]] = {}
+    duraciones: Dict[str, List[float]] = {}
+    for nombre, ejecutar_en, tomada_en, terminada_en in (
+        Tarea.objects.filter(estado=Estado.HECHA, terminada_en__gte=ahora - timedelta(seconds=ventana_s))
+        .order_by("-terminada_en").values_list("nombre", "ejecutar_en", "tomada_en", "terminada_en")[:muestra]
+    ):
+        esperas.setdefault(nombre, []).append(max(0.0, (tomada_en - ejecutar_en).total_seconds()))
+        duraciones.setdefault(nombre, []).append((terminada_en - tomada_en).total_seconds())
+    for nombre, valores in esperas.items():
+        m = por_tarea.setdefault(nombre, MetricaTarea(nombre))
+        m.hechas = len(valores)
+        por_estado[Estado.HECHA] += len(valores)
+        m.espera_p50_s, m.espera_p95_s = _percentil(valores, 0.5), _percentil(valores, 0.95)
+        m.duracion_p50_s = _percentil(duraciones[nombre], 0.5)
+        m.duracion_p95_s = _percentil(duraciones[nombre], 0.95)
+
+    listas = Tarea.objects.filter(estado=Estado.PENDIENTE, ejecutar_en__lte=ahora)
+    mas_antigua = listas.aggregate(m=Min("ejecutar_en"))["m"]
+    return Metricas(
+        por_estado=por_estado,
+        listas=listas.count(),
+        espera_mas_antigua_s=(ahora - mas_antigua).total_seconds() if mas_antigua else 0.0,
+        por_tarea=sorted(por_tarea.values(), key=lambda m: (-m.pendientes, m.nombre)),
+    )
+
+
+# =============================
+#  MANTENCIÓN
+# =============================
+
+@tarea("zara.purgar_tareas", prioridad=-10, cada=3600)
+def purgar(dias: Optional[int] = None) -> int:
+    """Borra las HECHAS más antiguas que TAREAS_RETENCION_DIAS, por lotes (las FALLIDAS se quedan)."""
+    limite = timezone.now() - timedelta(days=dias if dias is not None else _config("TAREAS_RETENCION_DIAS", 7))
+    total = 0
+    while True:
+        ids = list(
+            Tarea.objects.filter(estado=Estado.HECHA, terminada_en__lt=limite)
+            .values_list("pk", flat=True)[:LOTE_PURGA]
+        )
+        if not ids:
+            return total
+        total += Tarea.objects.filter(pk__in=ids).delete()[0]
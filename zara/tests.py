@@ -1,3 +1,1094 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from unittest import mock
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models.sql.compiler import SQLUpdateCompiler
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from comun import calentamiento, comentarios
+
+from . import (
+    apariencia, barrido, catalogo, correo, direcciones, envios, impacto, importacion, ingesta, inventario, pedidos,
+    puntos, tareas, tradein, variantes,
+)
+from .admin import PedidoAdmin
+from .hashers import PBKDF2Ajustable
+from .models import (
+    CampaniaEncuesta, Carrito, Correo, Cupon, Direccion, DisponibilidadTalla, EventoPedido, FrecuenciaTermino,
+    ImpactoAcumulado, ItemCarrito, MovimientoStock, Pedido, Perfil, PrendaTradeIn, Producto, RedencionPuntos,
+    RespuestaEncuesta, Tarea, TareaPeriodica, TradeInCanje, Variante,
+)
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # servidor SMTP de prueba opcional
+    Controller = None
+
+User = get_user_model()
+# las pruebas que limpian el cache no tocan el cache compartido (var/cache) del entorno
+CACHE_PRUEBAS = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+# =============================
+#  ADMIN: CONSULTAS POR LISTADO
+# =============================
+
+class AdminChangelistQueriesTests(TestCase):
+    """El número de consultas de cada changelist no depende de las filas mostradas."""
+
+    URLS = [
+        "admin:zara_perfil_changelist",
+        "admin:zara_direccion_changelist",
+        "admin:zara_pedido_changelist",
+        "admin:zara_tradeincanje_changelist",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("root", "root@example.com", "clave-segura")
+
+    def _crear_filas(self, n):
+        inicio = User.objects.count()
+        for i in range(inicio, inicio + n):
+            u = User.objects.create_user(f"cliente{i}", f"c{i}@example.com", "x")
+            Direccion.objects.create(user=u, linea1="Calle 1", ciudad="Santiago")
+            Pedido.objects.create(
+                carrito=Carrito.objects.create(), user=u,
+                email_cliente=u.email, total_pagado=Decimal("9990.00"),
+            )
+            TradeInCanje.objects.create(
+                usuario=u, prenda="Polera", material="Algodón",
+                impacto=Decimal("1.50"), puntos_obtenidos=15,
+            )
+
+    def _consultas(self, url_name):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse(url_name))
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_consultas_constantes(self):
+        self.client.force_login(self.admin)
+        self._crear_filas(2)
+        pocas = {url: self._consultas(url) for url in self.URLS}
+        self._crear_filas(20)
+        muchas = {url: self._consultas(url) for url in self.URLS}
+        self.assertEqual(pocas, muchas)
+
+    def test_busqueda_por_prefijo(self):
+        self.client.force_login(self.admin)
+        self._crear_filas(3)
+        url = reverse("admin:zara_pedido_changelist")
+        por_usuario = self.client.get(url, {"q": "CLIENTE1"})  # usuario cliente1 (sin distinguir mayúsculas)
+        self.assertEqual(por_usuario.context["cl"].result_count, 1)
+        por_email = self.client.get(url, {"q": "c2@"})
+        self.assertEqual(por_email.context["cl"].result_count, 1)
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "plan de SQLite")
+    def test_busqueda_usa_indices(self):
+        qs, _ = PedidoAdmin(Pedido, admin.site).get_search_results(None, Pedido.objects.all(), "cli")
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = " | ".join(fila[-1] for fila in cursor.fetchall())
+        self.assertNotIn("SCAN zara_pedido", plan)
+        self.assertIn("zara_pedido_email_cliente_pfx", plan)
+
+
+# =============================
+#  CHECKOUT: CANJE DE PUNTOS
+# =============================
+
+class CanjePuntosConcurrenteTests(TestCase):
+    """Dos checkouts que compiten por el mismo saldo: solo uno puede gastarlo."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("cliente", "cliente@example.com", "x")
+        Perfil.objects.filter(user=self.user).update(puntos=500)
+        self.producto = Producto.objects.create(nombre="Abrigo lana", precio=Decimal("49990.00"), stock=10)
+
+    def test_sin_doble_gasto(self):
+        # Fuerza el peor orden: otro checkout gasta el saldo justo antes de la
+        # escritura de este, después de cualquier lectura previa. Un débito
+        # leer-y-guardar pasaría los dos; el UPDATE condicional rechaza el segundo.
+        original, competidor = SQLUpdateCompiler.execute_sql, []
+
+        def escribir(compilador, *args, **kwargs):
+            if compilador.query.model is Perfil and not competidor:
+                competidor.append("en curso")
+                puntos.debitar(self.user.pk, 500)
+                competidor[0] = "ok"
+            return original(compilador, *args, **kwargs)
+
+        with mock.patch.object(SQLUpdateCompiler, "execute_sql", autospec=True, side_effect=escribir):
+            with self.assertRaises(puntos.PuntosInsuficientes):
+                puntos.debitar(self.user.pk, 500)
+        self.assertEqual(competidor, ["ok"])
+        self.assertEqual(Perfil.objects.get(user=self.user).puntos, 0)
+
+        with self.assertRaises(puntos.PuntosInsuficientes):
+            pedidos.crear([(self.producto.pk, 1)], self.user.email, self.user, puntos=500)
+        self.assertFalse(Pedido.objects.exists())  # el perdedor no deja pedido a medias
+        self.assertFalse(RedencionPuntos.objects.exists())
+
+    def test_cancelar_reembolsa_una_vez(self):
+        pedido = pedidos.crear([(self.producto.pk, 1)], self.user.email, self.user, puntos=200)
+        self.assertEqual(pedido.total_pagado, Decimal("47990.00"))
+        pedidos.transicionar(pedido, "CANCELADO")
+        puntos.reembolsar_pedidos([pedido.pk])  # reintento: no suma de nuevo
+        self.assertEqual(Perfil.objects.get(user=self.user).puntos, 500)
+
+
+# =============================
+#  CORREO EN COLA
+# =============================
+
+class _Buzon:
+    """Handler de aiosmtpd: guarda cada mensaje con la sesión SMTP que lo trajo."""
+
+    def __init__(self):
+        self.recibidos = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recibidos.append((id(session), envelope.rcpt_tos, envelope.content))
+        return "250 OK"
+
+
+# Puerto sin servidor: si el request intentara SMTP, fallaría
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend", EMAIL_HOST="127.0.0.1", EMAIL_PORT=9, EMAIL_TIMEOUT=1, CORREO_MAX_POR_SEGUNDO=0)
+class CorreoEnColaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("ana", "ana@example.com", "clave-segura")
+
+    def test_reset_de_contrasena_no_abre_smtp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(reverse("password_reset"), {"email": "ana@example.com"})
+        self.assertRedirects(r, reverse("password_reset_done"))
+        c = Correo.objects.get()
+        self.assertEqual((c.plantilla, c.para, c.estado), ("password_reset", "ana@example.com", Correo.Estado.PENDIENTE))
+        self.assertIn("/accounts/reset/", c.contexto["ruta"])
+        self.assertTrue(Tarea.objects.filter(nombre=correo.TAREA, estado=Tarea.Estado.PENDIENTE).exists())
+
+    @unittest.skipUnless(Controller, "requiere aiosmtpd")
+    def test_lote_por_una_sola_conexion(self):
+        with socket.socket() as s:  # puerto libre
+            s.bind(("127.0.0.1", 0))
+            puerto = s.getsockname()[1]
+        buzon = _Buzon()
+        servidor = Controller(buzon, hostname="127.0.0.1", port=puerto)
+        servidor.start()
+        self.addCleanup(servidor.stop)
+        correo.encolar_lote("pedido_enviado", [
+            (f"c{i}@example.com", {"pedido": i, "estado": "ENVIADO", "total": "1000", "nombre": ""}) for i in range(5)
+        ])
+        correo.encolar("password_reset", "ana@example.com", {
+            "usuario": "ana", "protocol": "http", "domain": "testserver", "site_name": "ZARA", "ruta": "/r/",
+        })
+        with self.settings(EMAIL_PORT=puerto):
+            r = correo.enviar_pendientes()
+            correo.conexion._cerrar()
+        self.assertEqual((r.enviados, r.fallidos, r.lotes), (6, 0, 1))
+        self.assertEqual(len(buzon.recibidos), 6)
+        self.assertEqual(len({sesion for sesion, _, _ in buzon.recibidos}), 1)  # conexión reutilizada
+        enviados = Correo.objects.filter(estado=Correo.Estado.ENVIADO)
+        self.assertEqual(enviados.count(), 6)
+        self.assertFalse(enviados.exclude(contexto={}).exists())  # el token no queda guardado
+
+    def test_sin_servidor_se_reprograma(self):
+        correo.encolar("pedido_pagado", "ana@example.com", {"pedido": 1, "total": "10", "nombre": "ana"})
+        r = correo.enviar_pendientes()
+        self.assertEqual((r.enviados, r.reintentos), (0, 1))
+        c = Correo.objects.get()
+        self.assertEqual((c.estado, c.intentos), (Correo.Estado.PENDIENTE, 1))
+        self.assertTrue(c.ultimo_error)
+
+
+# =============================
+#  TAREAS: WORKER Y PERIÓDICAS
+# =============================
+
+@override_settings(TAREAS_HORA_NOCTURNA=3)
+class TareasWorkerTests(TestCase):
+    def test_periodicas_diarias_se_siembran_a_la_hora_nocturna(self):
+        ahora = timezone.now()
+        tareas.sembrar_periodicas()
+        proximas = dict(TareaPeriodica.objects.values_list("nombre", "proxima_en"))
+        nocturna = timezone.localtime(proximas["zara.reconciliar_stock"])
+        self.assertEqual((nocturna.hour, nocturna.minute), (3, 0))
+        self.assertTrue(ahora < nocturna <= ahora + timedelta(days=1))
+        self.assertLessEqual(proximas["zara.purgar_tareas"], timezone.now())  # las cortas: ya
+
+        # un reinicio del worker no la adelanta, y tras correr vuelve a anclarse
+        cortas = [nombre for nombre, d in tareas._periodicas().items() if d.cada < tareas.DIA_S]
+        self.assertEqual(tareas.programar_periodicas(), len(cortas))
+        self.assertFalse(Tarea.objects.filter(nombre="zara.reconciliar_stock").exists())
+        d = tareas.REGISTRO["zara.reconciliar_stock"]
+        siguiente = timezone.localtime(tareas._proxima(d, nocturna))
+        self.assertEqual((siguiente - nocturna, siguiente.hour), (timedelta(days=1), 3))
+
+    def test_error_de_bd_no_mata_el_worker(self):
+        hecha = []
+        tareas.tarea("pruebas.anotar")(lambda: hecha.append(1))
+        self.addCleanup(tareas.REGISTRO.pop, "pruebas.anotar")
+        tareas.encolar("pruebas.anotar")
+        tomar = tareas.tomar
+        fallos = iter([OperationalError("database is locked")])
+
+        def tomar_con_fallo(*args):
+            for exc in fallos:
+                raise exc
+            return tomar(*args)
+
+        with mock.patch.object(tareas, "tomar", side_effect=tomar_con_fallo), \
+                mock.patch.object(tareas, "backoff", return_value=timedelta(0)), \
+                self.assertLogs("zara.tareas", "ERROR") as logs:
+            r = tareas.trabajar(hilos=1, loop=False)
+        self.assertIn("error de BD", logs.output[0])
+        self.assertEqual(hecha, [1])
+        self.assertEqual(Tarea.objects.get(nombre="pruebas.anotar").estado, Tarea.Estado.HECHA)
+        self.assertEqual(r.fallidas, 0)
+
+
+# =============================
+#  LOGIN: LÍMITE DE INTENTOS
+# =============================
+
+@override_settings(CACHES=CACHE_PRUEBAS, ACCESO_MAX_POR_USUARIO=3,
+                   ACCESO_MAX_POR_USUARIO_GLOBAL=8, ACCESO_MAX_POR_IP=100, PASSWORD_PBKDF2_ITERACIONES=1000)
+class LimiteLoginTests(TestCase):
+    """Pasado el límite, el login se rechaza sin calcular el hash (ni con la clave correcta)."""
+
+    def setUp(self):
+        caches["default"].clear()
+        self.user = User.objects.create_user("victima", "v@example.com", "clave-correcta")
+
+    def _login(self, clave, ip="127.0.0.1"):
+        return self.client.post(reverse("login"), {"username": "victima", "password": clave},
+                                HTTP_HOST="localhost", REMOTE_ADDR=ip)
+
+    def test_bloquea_sin_hashear(self):
+        for _ in range(3):
+            self.assertEqual(self._login("mala").status_code, 200)
+        with mock.patch.object(PBKDF2Ajustable, "verify") as verify:
+            resp = self._login("clave-correcta")
+        verify.assert_not_called()
+        self.assertContains(resp, "Demasiados intentos fallidos")
+        self.assertNotIn("_auth_user_id", self.client.session)
+
+    def test_otra_ip_no_bloquea_la_cuenta(self):
+        for _ in range(3):
+            self._login("mala", ip="10.0.0.66")
+        self.assertContains(self._login("clave-correcta", ip="10.0.0.66"), "Demasiados intentos fallidos")
+        self.assertEqual(self._login("clave-correcta", ip="10.0.0.7").status_code, 302)
+
+    def test_tope_global_contra_ataque_repartido(self):
+        for i in range(8):  # 2 por IP: ninguna pasa el límite del par
+            self._login("mala", ip=f"10.0.1.{i // 2}")
+        self.assertContains(self._login("clave-correcta", ip="10.0.0.7"), "Demasiados intentos fallidos")
+
+    def test_login_correcto_limpia_el_contador(self):
+        for _ in range(2):
+            self._login("mala")
+        self.assertEqual(self._login("clave-correcta").status_code, 302)
+        self.client.logout()
+        for _ in range(2):
+            self._login("mala")
+        self.assertEqual(self._login("clave-correcta").status_code, 302)
+
+
+# =============================
+#  APARIENCIA EN CADA PÁGINA
+# =============================
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class AparienciaCacheadaTests(TestCase):
+    """Tema y saludo salen del cache: con el cache caliente, ninguna página de tienda consulta Perfil."""
+
+    URLS = [
+        "zara:home", "zara:mujer", "zara:hombre", "zara:nina", "zara:nino", "zara:accesorios",
+        "zara:carrito", "zara:buscar", "zara:tradein", "zara:wallet_view", "zara:cuenta_home",
+        "zara_re:home", "zara_re:pasaporte", "zara_re:reventa",
+    ]
+
+    def setUp(self):
+        caches["default"].clear()
+        self.user = User.objects.create_user("tema", "t@example.com", "x")
+        Perfil.objects.filter(user=self.user).update(nombre_mostrar="Ana", tema=Perfil.Tema.OSCURO)
+        self.client.force_login(self.user)
+
+    def _get(self, url_name):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse(url_name), HTTP_HOST="localhost")
+        self.assertEqual(resp.status_code, 200, url_name)
+        return resp, ctx.captured_queries
+
+    def test_sin_consultas_extra_con_cache_caliente(self):
+        for url in self.URLS:
+            self._get(url)  # calienta los demás caches de la página (facetas, catálogo)
+            with self.captureOnCommitCallbacks(execute=True):
+                apariencia.invalidar(self.user.pk)
+            _, frio = self._get(url)
+            resp, caliente = self._get(url)
+            self.assertEqual(len(frio) - len(caliente), 1, url)  # solo la lectura inicial de Perfil
+            self.assertContains(resp, 'data-bs-theme="dark"')
+            self.assertContains(resp, "Hola, Ana")
+
+    def test_guardar_perfil_invalida(self):
+        self._get("zara:home")
+        perfil = Perfil.objects.get(user=self.user)
+        perfil.tema, perfil.nombre_mostrar = Perfil.Tema.CLARO, "Bea"
+        with self.captureOnCommitCallbacks(execute=True):
+            perfil.save()
+        resp, _ = self._get("zara:home")
+        self.assertContains(resp, 'data-bs-theme="light"')
+        self.assertContains(resp, "Hola, Bea")
+
+
+# =============================
+#  PEDIDOS: TRANSICIONES
+# =============================
+
+class TransicionesPedidoTests(TestCase):
+    """Eventos, correos y stock solo para los pedidos que el UPDATE condicional cambió."""
+
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre="Camisa lino", precio=Decimal("19990.00"), stock=3)
+
+    def _pedido(self, cantidad=1):
+        return pedidos.crear([(self.producto.pk, cantidad)], "cliente@example.com")
+
+    def _eventos(self, tipo):
+        return sorted(EventoPedido.objects.filter(tipo=tipo).values_list("pedido_id", flat=True))
+
+    def test_transicion_simple(self):
+        p = self._pedido(2)
+        pedidos.transicionar(p, "PAGADO")
+        self.assertEqual(Pedido.objects.get(pk=p.pk).estado, "PAGADO")
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 1)
+        self.assertEqual(self._eventos("pedido.pagado"), [p.pk])
+        self.assertEqual(Correo.objects.filter(plantilla="pedido_pagado").count(), 1)
+        with self.assertRaises(ValidationError):
+            pedidos.transicionar(p, "ENTREGADO")
+
+    def test_transicion_simple_desfasada(self):
+        p = self._pedido()
+        Pedido.objects.filter(pk=p.pk).update(estado="CANCELADO")  # otro proceso lo movió
+        with self.assertRaises(ValidationError):
+            pedidos.transicionar(p, "PAGADO")  # la instancia aún dice CREADO
+        self.assertFalse(EventoPedido.objects.filter(tipo="pedido.pagado").exists())
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 3)
+
+    def test_bloque_solo_cuenta_lo_que_cambio(self):
+        a, b, sin_stock, ya_pagado = self._pedido(), self._pedido(), self._pedido(3), self._pedido()
+        pedidos.transicionar(ya_pagado, "PAGADO")
+        Correo.objects.all().delete()
+        r = pedidos.transicionar_en_bloque([a.pk, b.pk, sin_stock.pk, ya_pagado.pk], "PAGADO")
+        self.assertEqual(r, {"actualizados": 2, "omitidos": 2})
+        self.assertEqual(self._eventos("pedido.pagado"), sorted([a.pk, b.pk, ya_pagado.pk]))
+        self.assertEqual(Pedido.objects.get(pk=sin_stock.pk).estado, "CREADO")
+        self.assertEqual(Correo.objects.filter(plantilla="pedido_pagado").count(), 2)
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 0)
+
+    def test_marcar_ignora_filas_movidas(self):
+        a, b = self._pedido(), self._pedido()
+        Pedido.objects.filter(pk=b.pk).update(estado="CANCELADO")  # cambió entre la lectura y el UPDATE
+        self.assertEqual(pedidos._marcar([a.pk, b.pk], "CREADO", "ENVIADO"), [a.pk])
+
+    def test_marcar_sin_returning_bloquea_filas(self):
+        a, b = self._pedido(), self._pedido()
+        Pedido.objects.filter(pk=b.pk).update(estado="CANCELADO")
+        with mock.patch.object(connection, "vendor", "mysql"):  # MariaDB: RETURNING solo en INSERT
+            self.assertFalse(pedidos._update_returning())
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(pedidos._marcar([a.pk, b.pk], "CREADO", "ENVIADO"), [a.pk])
+        self.assertFalse(any("RETURNING" in q["sql"] for q in ctx.captured_queries))
+        self.assertEqual(Pedido.objects.get(pk=a.pk).estado, "ENVIADO")
+
+    def test_venta_y_devolucion_mueven_la_variante(self):
+        m = Variante.objects.create(producto=self.producto, sku="CL-M", talla="M", color="blanco", stock=2)
+        with self.assertRaises(ValidationError):
+            self._pedido()  # con variantes hay que elegir una
+        otra = Producto.objects.create(nombre="Polera", precio=Decimal("9990.00"), stock=1)
+        ajena = Variante.objects.create(producto=otra, sku="PO-S", talla="S", color="negro", stock=1)
+        with self.assertRaises(ValidationError):
+            pedidos.crear([(self.producto.pk, 1, ajena.pk)], "cliente@example.com")
+
+        p = pedidos.crear([(self.producto.pk, 2, m.pk)], "cliente@example.com")
+        sin_stock = pedidos.crear([(self.producto.pk, 1, m.pk)], "cliente@example.com")
+        pedidos.transicionar(p, "PAGADO")
+        self.assertEqual(Variante.objects.get(pk=m.pk).stock, 0)
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 1)
+        with self.assertRaises(ValidationError):  # el producto tiene 1, pero la talla M no
+            pedidos.transicionar(sin_stock, "PAGADO")
+
+        pedidos.transicionar(p, "CANCELADO")
+        self.assertEqual(Variante.objects.get(pk=m.pk).stock, 2)
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 3)
+        self.assertEqual(DisponibilidadTalla.objects.get(producto=self.producto, talla="M").unidades, 2)
+
+    def test_admin_no_edita_estado(self):
+        admin_user = User.objects.create_superuser("root", "root@example.com", "x")
+        self.client.force_login(admin_user)
+        p = self._pedido()
+        resp = self.client.get(reverse("admin:zara_pedido_change", args=[p.pk]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotContains(resp, 'name="estado"')
+
+
+# =============================
+#  CARRITOS: BARRIDO DE ABANDONADOS
+# =============================
+
+class BarridoCarritosTests(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre="Gorro", precio=Decimal("9990.00"), stock=50)
+        self.viejo = timezone.now() - timedelta(hours=100)
+
+    def _carrito(self, items=1):
+        carrito = Carrito.objects.create()
+        for i in range(items):
+            otro = Producto.objects.create(nombre=f"Extra {carrito.pk}-{i}", precio=Decimal("1.00"), stock=5) if i else self.producto
+            ItemCarrito.objects.create(carrito=carrito, producto=otro, cantidad=1, precio_unitario=otro.precio)
+        Carrito.objects.filter(pk=carrito.pk).update(actualizado_en=self.viejo)
+        return carrito
+
+    def test_borra_abandonados_y_respeta_pedidos(self):
+        abandonados = [self._carrito(2) for _ in range(3)]
+        con_pedido = pedidos.crear([(self.producto.pk, 1)], "cliente@example.com").carrito
+        Carrito.objects.filter(pk=con_pedido.pk).update(actualizado_en=self.viejo)
+        reciente = Carrito.objects.create()
+
+        r = barrido.barrer(ttl_horas=72)
+        self.assertEqual((r.carritos, r.items), (3, 6))
+        self.assertFalse(Carrito.objects.filter(pk__in=[c.pk for c in abandonados]).exists())
+        self.assertEqual(set(Carrito.objects.values_list("pk", flat=True)), {con_pedido.pk, reciente.pk})
+
+    def test_cambiar_un_item_es_actividad(self):
+        editado, agregado, quitado = self._carrito(), self._carrito(), self._carrito(2)
+        item = editado.items.get()
+        item.cantidad = 2
+        item.save()
+        ItemCarrito.objects.create(carrito=agregado, producto=Producto.objects.create(
+            nombre="Bufanda", precio=Decimal("5.00"), stock=5), cantidad=1, precio_unitario=Decimal("5.00"))
+        quitado.items.first().delete()
+
+        self.assertEqual(barrido.barrer(ttl_horas=72).carritos, 0)
+        self.assertEqual(Carrito.objects.count(), 3)
+
+    def test_archiva_antes_de_borrar(self):
+        carrito = self._carrito()
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta, True)
+        with override_settings(CARRITO_ARCHIVO_DIR=carpeta):
+            r = barrido.barrer(ttl_horas=72, archivar=True)
+        fila = json.loads(Path(r.archivo).read_text(encoding="utf-8"))
+        self.assertEqual((fila["id"], fila["items"]), (carrito.pk, [[self.producto.pk, 1, "9990.00"]]))
+
+    def test_lote_se_revalida(self):
+        carrito = self._carrito()
+        Carrito.objects.filter(pk=carrito.pk).update(actualizado_en=timezone.now())  # volvió entre lectura y borrado
+        self.assertEqual(barrido._borrar_lote([carrito.pk], timezone.now() - timedelta(hours=72), None), (0, 0))
+
+
+class VacuumIncrementalTests(TransactionTestCase):
+    """Sin executescript: no confirma transacciones ajenas y cada paso respeta el presupuesto."""
+
+    def test_libera_paginas_en_transacciones_cortas(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("solo SQLite")
+        barrido.activar_auto_vacuum()
+        Producto.objects.bulk_create([
+            Producto(nombre=f"{i:05d} " + "x" * 150, precio=Decimal("1.00"), stock=1) for i in range(5000)
+        ])
+        Producto.objects.all().delete()
+        with connection.cursor() as cursor:
+            libres = barrido._paginas_libres(cursor)
+        self.assertGreater(libres, 100)
+
+        with mock.patch.object(barrido.time, "sleep") as ceder:
+            self.assertEqual(barrido.vacuum_incremental(max_lock_ms=0.05), libres)
+        self.assertGreater(ceder.call_count, 1)  # más de una transacción
+        with connection.cursor() as cursor:
+            self.assertEqual(barrido._paginas_libres(cursor), 0)
+
+
+# =============================
+#  DIRECCIONES: PRINCIPAL Y COMUNAS
+# =============================
+
+class DireccionesTests(TestCase):
+    """Una sola principal por usuario y autocompletado de comunas en memoria."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("libreta", "libreta@example.com", "x")
+
+    def _guardar(self, alias, **kwargs):
+        return direcciones.guardar(Direccion(user=self.user, alias=alias, linea1="Calle 1", ciudad="Santiago"), **kwargs)
+
+    def _principales(self):
+        return list(self.user.direcciones.filter(es_principal=True).values_list("alias", flat=True))
+
+    def test_la_primera_queda_principal(self):
+        self._guardar("Casa")
+        self._guardar("Oficina")
+        self.assertEqual(self._principales(), ["Casa"])
+
+    def test_hacer_principal_desmarca_la_anterior(self):
+        self._guardar("Casa")
+        oficina = self._guardar("Oficina")
+        direcciones.marcar_principal(oficina)
+        self.assertEqual(self._principales(), ["Oficina"])
+        self._guardar("Playa", hacer_principal=True)
+        self.assertEqual(self._principales(), ["Playa"])
+
+    def test_borrar_la_principal_promueve_la_mas_antigua(self):
+        casa = self._guardar("Casa")
+        self._guardar("Oficina")
+        self._guardar("Playa")
+        direcciones.eliminar(casa)
+        self.assertEqual(self._principales(), ["Oficina"])
+        direcciones.eliminar(self.user.direcciones.get(alias="Playa"))  # no era principal: nada cambia
+        self.assertEqual(self._principales(), ["Oficina"])
+
+    def test_indice_unico_parcial(self):
+        Direccion.objects.create(user=self.user, linea1="Calle 1", ciudad="Santiago", es_principal=True)
+        Direccion.objects.create(user=self.user, linea1="Calle 2", ciudad="Santiago")  # no principales: sin límite
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Direccion.objects.create(user=self.user, linea1="Calle 3", ciudad="Santiago", es_principal=True)
+
+    def test_comunas(self):
+        self.assertEqual(direcciones.comuna("VINA DEL MAR").comuna, "Viña del Mar")
+        self.assertEqual(direcciones.por_codigo_postal("2520-123").comuna, "Viña del Mar")  # zona de la comuna
+        self.assertEqual(direcciones.autocompletar("viña")[0].comuna, "Viña del Mar")
+        self.assertTrue(all(c.region == "Valparaíso" for c in direcciones.autocompletar("san", region="valparaiso")))
+        self.assertEqual(
+            direcciones.completar({"ciudad": "concon", "region": "", "codigo_postal": ""}),
+            {"ciudad": "Concón", "region": "Valparaíso", "codigo_postal": "2510000"},
+        )
+
+
+# =============================
+#  TRADE-IN: PRENDAS EN BODEGA
+# =============================
+
+class PrendasTradeInTests(TestCase):
+    """QR firmado, ciclo de vida y escaneo masivo de los handhelds."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user("bodega", "bodega@example.com", "x", is_staff=True)
+
+    def _prenda(self, estado=PrendaTradeIn.Estado.RECIBIDA):
+        return PrendaTradeIn.objects.create(prenda="Chaqueta denim", material="Algodón", estado=estado)
+
+    def test_codigo_falsificado_no_consulta(self):
+        prenda = self._prenda()
+        valido = tradein.payload(prenda)
+        falsos = [
+            valido[:-1] + ("A" if valido[-1] != "A" else "B"),  # firma alterada
+            tradein.PREFIJO + signing.Signer(salt="otra").sign(prenda.token),
+            valido.replace(tradein.PREFIJO, "OTRO:"),
+            valido + "x" * tradein.LARGO_MAXIMO,
+        ]
+        with self.assertNumQueries(0):
+            for codigo in falsos:
+                self.assertIsNone(tradein.token_de(codigo))
+                self.assertIsNone(tradein.buscar(codigo))
+            self.assertEqual(tradein.escanear_lote(falsos, "CLASIFICADA", "A").invalidos, falsos)
+        self.assertEqual(tradein.buscar(valido), prenda)
+
+    def test_ciclo_de_vida(self):
+        prenda = self._prenda()
+        with self.assertRaises(ValidationError):
+            tradein.transicionar(prenda, "CLASIFICADA")  # sin grado
+        tradein.transicionar(prenda, "CLASIFICADA", "B")
+        prenda.refresh_from_db()
+        self.assertEqual((prenda.estado, prenda.grado), ("CLASIFICADA", "B"))
+        for destino in ("RECIBIDA", "NO-EXISTE"):
+            with self.subTest(destino=destino), self.assertRaises(ValidationError):
+                tradein.transicionar(prenda, destino)
+
+        vieja = PrendaTradeIn.objects.get(pk=prenda.pk)
+        tradein.transicionar(prenda, "REVENDIDA")
+        with self.assertRaisesMessage(ValidationError, "en paralelo"):
+            tradein.transicionar(vieja, "RECICLADA")  # otro handheld ya la movió
+        self.assertEqual(PrendaTradeIn.objects.get(pk=prenda.pk).estado, "REVENDIDA")
+
+    def test_lote_mixto_por_api(self):
+        recibida, otra, vendida = self._prenda(), self._prenda(), self._prenda(PrendaTradeIn.Estado.REVENDIDA)
+        desconocido = tradein.PREFIJO + signing.Signer(salt=tradein.SAL).sign("sin-prenda")
+        falso = tradein.PREFIJO + "abc:firma-falsa"
+        codigos = [
+            tradein.payload(recibida), tradein.payload(recibida),  # lectura doble: cuenta una vez
+            tradein.payload(otra), tradein.payload(vendida), desconocido, falso,
+        ]
+        url = reverse("zara:api_tradein_escanear_lote")
+        cuerpo = json.dumps({"codigos": codigos, "estado": "CLASIFICADA", "grado": "A"})
+        self.assertEqual(self.client.post(url, cuerpo, content_type="application/json").status_code, 403)
+
+        self.client.force_login(self.staff)
+        datos = self.client.post(url, cuerpo, content_type="application/json").json()
+        self.assertEqual(datos, {
+            "ok": True, "actualizadas": 2, "invalidos": [falso],
+            "desconocidos": [desconocido], "omitidos": [tradein.payload(vendida)],
+        })
+        self.assertEqual(
+            sorted(PrendaTradeIn.objects.values_list("estado", "grado")),
+            [("CLASIFICADA", "A"), ("CLASIFICADA", "A"), ("REVENDIDA", "")],
+        )
+        malo = json.dumps({"codigos": codigos, "estado": "CLASIFICADA"})  # sin grado
+        self.assertEqual(self.client.post(url, malo, content_type="application/json").status_code, 400)
+
+
+# =============================
+#  TRADE-IN: IMPACTO ACUMULADO
+# =============================
+
+class ImpactoAcumuladoTests(TestCase):
+    """Contadores global / usuario / material: incrementales, legibles en O(1) y recalculables."""
+
+    def setUp(self):
+        self.ana = User.objects.create_user("ana", "ana@example.com", "x")
+        self.beto = User.objects.create_user("beto", "beto@example.com", "x")
+
+    def _canje(self, usuario, material, co2, agua):
+        canje = TradeInCanje.objects.create(
+            usuario=usuario, prenda="Polera", material=material, impacto=Decimal(co2), agua_l=agua, puntos_obtenidos=10,
+        )
+        impacto.sumar_canje(canje)
+        return canje
+
+    def _sembrar(self):
+        return [
+            self._canje(self.ana, "Algodón", "1.50", 900),
+            self._canje(self.ana, "algodon ", "2.00", 800),  # otra grafía, misma clave
+            self._canje(self.beto, "Lino", "1.00", 500),
+        ]
+
+    def _material(self, clave):
+        return dict(impacto.por_material()).get(clave)
+
+    def test_sumar_y_restar(self):
+        primero, *_ = self._sembrar()
+        self.assertEqual(impacto.global_(), impacto.Totales(3, Decimal("4.50"), 2200))
+        self.assertEqual(impacto.de_usuario(self.ana.pk), impacto.Totales(2, Decimal("3.50"), 1700))
+        self.assertEqual(impacto.de_usuario(self.beto.pk), impacto.Totales(1, Decimal("1.00"), 500))
+        self.assertEqual(self._material("algodon"), impacto.Totales(2, Decimal("3.50"), 1700))
+        self.assertEqual([m for m, _ in impacto.por_material()], ["algodon", "lino"])
+
+        primero.delete()  # el signal descuenta
+        self.assertEqual(impacto.global_(), impacto.Totales(2, Decimal("3.00"), 1300))
+        self.assertEqual(impacto.de_usuario(self.ana.pk), impacto.Totales(1, Decimal("2.00"), 800))
+        self.assertEqual(self._material("algodon"), impacto.Totales(1, Decimal("2.00"), 800))
+        self.assertEqual(impacto.de_usuario(9999), impacto.Totales())
+
+    def test_registrar_canje_suma_contadores(self):
+        canje = tradein.registrar_canje(self.ana, "Chaqueta denim", "Algodón", impacto=Decimal("2.25"))
+        self.assertEqual(impacto.de_usuario(self.ana.pk), impacto.Totales(1, Decimal("2.25"), canje.agua_l))
+
+    def test_recalcular_corrige_desfase(self):
+        self._sembrar()
+        ImpactoAcumulado.objects.filter(ambito="usuario", clave=str(self.ana.pk)).update(canjes=7, co2_kg=0)
+        ImpactoAcumulado.objects.filter(ambito="material", clave="lino").delete()
+
+        r = impacto.recalcular()
+        self.assertEqual((r.corregidas, r.omitidas), (2, 0))
+        self.assertEqual(impacto.de_usuario(self.ana.pk), impacto.Totales(2, Decimal("3.50"), 1700))
+        self.assertEqual(self._material("lino"), impacto.Totales(1, Decimal("1.00"), 500))
+        self.assertEqual(impacto.recalcular().corregidas, 0)
+
+    def test_recalcular_omite_filas_cambiadas_durante_la_pasada(self):
+        self._sembrar()
+        fila = ImpactoAcumulado.objects.filter(ambito="usuario", clave=str(self.ana.pk))
+        fila.update(canjes=7)
+        esperados = impacto._esperados
+
+        def con_canje_concurrente():
+            resultado = esperados()
+            self._canje(self.ana, "Lino", "1.00", 500)  # llega después de ambas lecturas
+            return resultado
+
+        with mock.patch.object(impacto, "_esperados", con_canje_concurrente):
+            r = impacto.recalcular()
+        self.assertEqual(r.omitidas, 1)
+        self.assertEqual(fila.get().canjes, 8)  # no se pisó el incremento
+        impacto.recalcular()
+        self.assertEqual(impacto.de_usuario(self.ana.pk), impacto.Totales(3, Decimal("4.50"), 2200))
+
+    def test_lecturas_o1(self):
+        for _ in range(20):
+            self._sembrar()
+        for leer in (lambda: impacto.de_usuario(self.ana.pk), impacto.global_):
+            with CaptureQueriesContext(connection) as ctx:
+                leer()
+            self.assertEqual(len(ctx.captured_queries), 1)
+            sql = ctx.captured_queries[0]["sql"]
+            self.assertIn("zara_impactoacumulado", sql)
+            self.assertNotIn("zara_tradeincanje", sql)
+            self.assertNotIn("SUM(", sql.upper())
+
+
+# =============================
+#  ENVÍOS: COTIZACIÓN
+# =============================
+
+class CotizacionEnvioTests(TestCase):
+    def setUp(self):
+        envios.limpiar_memo()
+        self.addCleanup(envios.limpiar_memo)
+
+    def test_zona_por_region_codigo_postal_y_comuna(self):
+        self.assertEqual(envios.zona_de("Región de Valparaíso"), "centro")
+        self.assertEqual(envios.zona_de("Metropolitana de Santiago"), "rm")
+        self.assertEqual(envios.zona_de("", codigo_postal="2340000"), "centro")
+        self.assertEqual(envios.zona_de("Atlántida", ciudad="Iquique"), "norte")
+        self.assertIsNone(envios.zona_de("Atlántida"))
+
+    def test_tramos_y_precio_extra(self):
+        casos = {0: 0, 1000: 0, 1001: 1, 20000: 4, 20001: 5, 30000: 5, 30001: 6}
+        self.assertEqual({g: envios.tramo_de(g) for g in casos}, casos)
+        tarifa = envios.TARIFAS[("rm", "std")]
+        self.assertEqual(envios.precio_tramo(tarifa, 6), 6990 + 2 * 2500)
+
+    def test_eta_respeta_el_corte_y_fin_de_semana(self):
+        viernes = lambda hora: timezone.make_aware(datetime(2026, 10, 16, hora))
+        with override_settings(ENVIO_HORA_CORTE=14):
+            self.assertEqual(envios.inicio_despacho(viernes(13)), date(2026, 10, 16))
+            self.assertEqual(envios.inicio_despacho(viernes(15)), date(2026, 10, 19))
+            with mock.patch.object(envios.timezone, "now", return_value=viernes(15)):
+                express = dict((o.servicio, o) for o in envios.opciones("rm", 500))["express"]
+        self.assertEqual((express.eta_desde, express.eta_hasta), (date(2026, 10, 19), date(2026, 10, 20)))
+
+    def test_memo_acotado(self):
+        for kilos in range(0, 5000, 7):
+            envios.opciones("rm", kilos * 1000)
+        self.assertLessEqual(len(envios._memo), envios.MEMO_MAX_TRAMO + 1)
+
+    def _cotizar(self, cuerpo):
+        return self.client.post(reverse("zara:api_envio_cotizar"), cuerpo, content_type="application/json")
+
+    def test_endpoint(self):
+        resp = self._cotizar({"items": [{"id": 999_999, "qty": 2}],
+                              "destinos": [{"region": "Valparaíso"}, {"region": "Atlántida"}]})
+        datos = resp.json()
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(datos["peso_gramos"], 2 * envios._config("ENVIO_PESO_DEFECTO_G", 500))
+        self.assertEqual([d["zona"] for d in datos["destinos"]], ["centro", None])
+        self.assertEqual([o["servicio"] for o in datos["destinos"][0]["opciones"]], ["std", "express", "pickup"])
+        self.assertEqual(datos["destinos"][1]["opciones"], [])
+
+    def test_endpoint_rechaza_cantidades_fuera_de_rango(self):
+        for items in ([{"id": 1, "qty": 0}], [{"id": 1, "qty": 11}], [{"id": 1, "qty": "x"}],
+                      [{"id": 1, "qty": 1}] * 101):
+            with self.subTest(items=len(items)):
+                self.assertEqual(self._cotizar({"items": items, "destinos": []}).status_code, 400)
+        self.assertEqual(self._cotizar("[1]").status_code, 400)
+
+
+# =============================
+#  CATÁLOGO: DISPONIBILIDAD POR TALLA
+# =============================
+
+class DisponibilidadTallaTests(TestCase):
+    def setUp(self):
+        self.blazer = Producto.objects.create(nombre="Blazer lino", precio=Decimal("49990.00"))
+        self.polera = Producto.objects.create(nombre="Polera básica", precio=Decimal("9990.00"))
+        for producto, talla, color, stock in (
+            (self.blazer, " m", "Negro ", 2), (self.blazer, "M", "beige", 0), (self.blazer, "L", "negro", 1),
+            (self.polera, "M", "blanco", 0), (self.polera, "S", "blanco", 4),
+        ):
+            Variante.objects.create(producto=producto, sku=f"{producto.pk}-{talla.strip()}-{color.strip()}",
+                                    talla=talla, color=color, stock=stock)
+
+    def _resumen(self, producto):
+        return {d.talla: (d.unidades, d.colores) for d in DisponibilidadTalla.objects.filter(producto=producto)}
+
+    def test_resumen_por_talla(self):
+        self.assertEqual(self._resumen(self.blazer), {"M": (2, "|negro|"), "L": (1, "|negro|")})
+        self.assertEqual(self._resumen(self.polera), {"M": (0, ""), "S": (4, "|blanco|")})
+
+        Variante.objects.filter(producto=self.polera, talla="M").update(stock=3)  # escritura masiva: sin signal
+        self.assertEqual(self._resumen(self.polera)["M"], (0, ""))
+        self.assertEqual(variantes.recalcular_disponibilidad([self.polera.pk]), 2)
+        self.assertEqual(self._resumen(self.polera)["M"], (3, "|blanco|"))
+
+        Variante.objects.get(producto=self.blazer, talla="L").delete()
+        self.assertNotIn("L", self._resumen(self.blazer))
+
+    def test_variantes_se_leen_dentro_de_la_transaccion(self):
+        with CaptureQueriesContext(connection) as ctx:
+            variantes.recalcular_disponibilidad([self.blazer.pk])
+        sql = [q["sql"] for q in ctx.captured_queries]
+        borrado = next(i for i, q in enumerate(sql) if q.startswith("DELETE") and "disponibilidadtalla" in q)
+        lectura = next(i for i, q in enumerate(sql) if q.startswith("SELECT") and "zara_variante" in q)
+        self.assertLess(borrado, lectura)
+
+    def test_api_catalogo_productos(self):
+        url = reverse("zara:api_catalogo_productos")
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+        datos = self.client.get(url, {"talla": "m"}).json()["productos"]
+        self.assertEqual([(p["nombre"], p["tallas"]) for p in datos], [("Blazer lino", ["L", "M"])])
+        self.assertEqual(datos[0]["precio"], "49990.00")
+
+        self.assertEqual(self.client.get(url, {"talla": "M", "color": "beige"}).json()["productos"], [])
+        self.assertEqual(len(self.client.get(url, {"talla": "S", "q": "polera"}).json()["productos"]), 1)
+        self.assertEqual(self.client.get(url, {"talla": "S", "q": "blazer"}).json()["productos"], [])
+
+
+# =============================
+#  CATÁLOGO: IMPORTACIÓN DE FEED
+# =============================
+
+class ImportacionCatalogoTests(TestCase):
+    def test_valores_no_finitos_o_enormes_son_filas_invalidas(self):
+        feed = (
+            "nombre,precio,stock\n"
+            "Camisa,19990,5\n"
+            "Falda,NaN,1\nAbrigo,Infinity,1\nChaleco,-inf,1\nBolso,1e999999999,1\nGorro,sNaN,1\n"
+            "Cinturón,100,99999999999\n"
+            "Bufanda,7990,2\n"
+        )
+        r = importacion.importar(io.StringIO(feed))
+        self.assertEqual((r.leidas, r.insertadas, r.invalidas), (8, 2, 6))
+        self.assertEqual(sorted(Producto.objects.values_list("nombre", flat=True)), ["Bufanda", "Camisa"])
+        self.assertIn("línea 3: precio inválido", r.errores)
+        self.assertIn("línea 8: stock fuera de rango", r.errores)
+
+    def test_stock_pasa_por_el_diario(self):
+        importacion.importar(io.StringIO("nombre,precio,stock\nCamisa,19990,5\nFalda,9990,2\n"))
+        camisa = Producto.objects.get(nombre="Camisa")
+        inventario.mover(camisa.pk, -1, MovimientoStock.Tipo.VENTA)  # venta entre dos importaciones
+
+        r = importacion.importar(io.StringIO("nombre,precio,stock\nCamisa,19990,7\nFalda,8990,2\n"))
+        self.assertEqual((r.insertadas, r.actualizadas, r.sin_cambios), (0, 2, 0))
+        self.assertEqual(Producto.objects.get(nombre="Falda").precio, Decimal("8990.00"))
+        self.assertEqual(Producto.objects.get(pk=camisa.pk).stock, 7)
+        self.assertEqual(
+            list(MovimientoStock.objects.filter(producto=camisa).order_by("pk").values_list("tipo", "cantidad")),
+            [("AJUSTE", 5), ("VENTA", -1), ("AJUSTE", 3)],
+        )
+        r = inventario.reconciliar()  # diario y proyección cuadran: nada que corregir
+        self.assertEqual((r.productos_corregidos, r.omitidos), (0, 0))
+
+    def test_reconciliar_cuenta_solo_lo_corregido(self):
+        a = Producto.objects.create(nombre="Camisa", precio=Decimal("1.00"), stock=4)
+        b = Producto.objects.create(nombre="Falda", precio=Decimal("1.00"), stock=4)
+        r = inventario.ResultadoReconciliacion()
+        # la fila de `b` cambió después de leer el desfase: el UPDATE condicional no la toca
+        corregidos = inventario._corregir(Producto._meta.db_table, [(a.pk, 4, 1), (b.pk, 9, 2)], r)
+        self.assertEqual((corregidos, r.omitidos), ([a.pk], 1))
+        self.assertEqual(Producto.objects.get(pk=b.pk).stock, 4)
+
+    def test_archivo_que_no_es_utf8_no_escribe_nada(self):
+        filas = "nombre,precio,stock\n" + "".join(f"Polera {i},9990,1\n" for i in range(50)) + "Pantalón café,1,1\n"
+        archivo = io.BytesIO(filas.encode("latin-1"))
+        with self.assertRaises(importacion.FeedInvalido):
+            importacion.importar_archivo(archivo, "feed.csv", lote=10)
+        self.assertFalse(Producto.objects.exists())
+
+        admin_user = User.objects.create_superuser("root", "root@example.com", "x")
+        self.client.force_login(admin_user)
+        archivo.seek(0)
+        archivo.name = "feed.csv"
+        resp = self.client.post(reverse("admin:zara_producto_importar"), {"archivo": archivo}, follow=True)
+        self.assertContains(resp, "no está en UTF-8")
+        self.assertFalse(Producto.objects.exists())
+
+
+# =============================
+#  CATÁLOGO: SNAPSHOTS ENTRE PROCESOS
+# =============================
+
+@override_settings(CATALOGO_REVISAR_S=0)
+class SnapshotCatalogoTests(TestCase):
+    """Una invalidación hecha en otro proceso (versión en el cache compartido) llega a este."""
+
+    def setUp(self):
+        caches["default"].clear()
+        self.producto = Producto.objects.create(nombre="Parka", precio=Decimal("59990.00"), peso_gramos=900)
+        catalogo.snapshot_pesos.cache_clear()
+        catalogo.snapshot_cupones.cache_clear()
+        self.addCleanup(catalogo.snapshot_cupones.cache_clear)  # el rollback no dispara signals
+
+    def test_version_compartida(self):
+        self.assertEqual(catalogo.snapshot_pesos()[self.producto.pk], 900)
+        Producto.objects.filter(pk=self.producto.pk).update(peso_gramos=1200)  # sin signals
+        self.assertEqual(catalogo.snapshot_pesos()[self.producto.pk], 900)
+        caches["default"].incr(catalogo.VERSION_CLAVE)  # invalidar_catalogo() de otro proceso
+        self.assertEqual(catalogo.snapshot_pesos()[self.producto.pk], 1200)
+
+    def test_vida_maxima(self):
+        catalogo.snapshot_pesos()
+        Producto.objects.filter(pk=self.producto.pk).update(peso_gramos=1200)
+        with self.settings(CATALOGO_TTL_S=0):
+            self.assertEqual(catalogo.snapshot_pesos()[self.producto.pk], 1200)
+
+    def test_cupon_desde_snapshot(self):
+        ahora = timezone.now()
+        cupon = Cupon.objects.create(codigo="VERANO10", descuento_porcentaje=10,
+                                     vigente_desde=ahora - timedelta(days=1), vigente_hasta=ahora + timedelta(days=1))
+        catalogo.snapshot_cupones()
+        with CaptureQueriesContext(connection) as ctx:
+            pedido = pedidos.crear([(self.producto.pk, 1)], "cliente@example.com", cupon=" verano10 ")
+        self.assertEqual(pedido.total_pagado, Decimal("53991.00"))
+        self.assertFalse([q for q in ctx.captured_queries if "zara_cupon" in q["sql"]])
+
+        cupon.activo = False
+        cupon.save()  # el signal invalida el snapshot
+        pedido = pedidos.crear([(self.producto.pk, 1)], "cliente@example.com", cupon="VERANO10")
+        self.assertEqual(pedido.total_pagado, Decimal("59990.00"))
+
+    def test_calentar_corre_los_pasos_de_cada_app(self):
+        tiempos = calentamiento.calentar(congelar=False)
+        self.assertEqual(
+            list(tiempos), ["urls", "plantillas", "busqueda", "pesos", "cupones", "comunas"],
+        )
+
+
+# =============================
+#  ENCUESTA: INGESTA Y SPOOL
+# =============================
+
+class IngestaEncuestaTests(TestCase):
+    """API → buffer/spool → BD, y reproceso de spools huérfanos."""
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.campania = CampaniaEncuesta.objects.create(nombre="Primavera", activa=True)
+        ingesta._campanias_cache["en"] = 0.0
+        # flush solo explícito (vaciar) para escribir en la transacción del test
+        self.buffer = ingesta.BufferRespuestas(self.dir, max_filas=10_000, max_ms=60_000)
+        self.addCleanup(self.buffer.cerrar)
+        patcher = mock.patch.object(ingesta, "_buffer", self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fila(self, email):
+        return {"campania": "primavera", "email": email, "consentimiento": True,
+                "rating_sustentabilidad": 4, "rating_calidad": 5, "comentario": "buena tela"}
+
+    def _post(self, cuerpo):
+        return self.client.post(reverse("zara:api_encuesta_responder"), cuerpo, content_type="application/json")
+
+    def test_acepta_y_escribe_por_lote(self):
+        self.assertEqual(self._post(self._fila("a@example.com")).status_code, 202)
+        self.assertEqual(self._post(self._fila("a@example.com")).status_code, 202)  # duplicado: se ignora al escribir
+        self.assertFalse(RespuestaEncuesta.objects.exists())
+        self.assertEqual(self.buffer.vaciar(), 2)
+        self.assertEqual(RespuestaEncuesta.objects.filter(campania=self.campania).count(), 1)
+        nombre = self.buffer.instancia.nombre
+        self.assertTrue(nombre.startswith(f"{os.getpid()}-"))
+        self.assertEqual(sorted(p.name for p in self.dir.iterdir()), [f"spool-{nombre}.jsonl", f"spool-{nombre}.lock"])
+
+    def test_rechaza_cuerpos_invalidos(self):
+        self.assertEqual(self._post("[1]").status_code, 400)
+        self.assertEqual(self._post("no es json").status_code, 400)
+        self.assertEqual(self._post({**self._fila("b@example.com"), "campania": "otra"}).status_code, 400)
+        self.assertEqual(self.buffer.pendientes(), 0)
+
+    def _spool_huerfano(self, instancia, filas):
+        ruta = self.dir / f"spool-{instancia}.jsonl.3"
+        ruta.write_text("".join(json.dumps(f) + "\n" for f in filas) + '{"cortada', encoding="utf-8")
+        return ruta
+
+    def test_reprocesa_spool_huerfano(self):
+        filas = [ingesta.validar_respuesta(self._fila(f"h{i}@example.com")) for i in range(3)]
+        # instancia muerta con el mismo pid que este proceso (pid reutilizado tras un reinicio)
+        ruta = self._spool_huerfano(f"{os.getpid()}-0123456789ab", filas)
+        (self.dir / f"spool-{os.getpid()}-0123456789ab.lock").touch()
+        legado = self._spool_huerfano("999999", [ingesta.validar_respuesta(self._fila("l@example.com"))])
+        self.assertEqual(ingesta.reprocesar_spool(self.dir), 4)
+        self.assertEqual(ingesta.reprocesar_spool(self.dir), 0)
+        self.assertFalse(ruta.exists() or legado.exists())
+        self.assertFalse((self.dir / f"spool-{os.getpid()}-0123456789ab.lock").exists())
+        self.assertEqual(RespuestaEncuesta.objects.count(), 4)
+
+    @unittest.skipIf(ingesta.fcntl is None, "requiere flock")
+    def test_no_toca_spools_de_instancias_vivas(self):
+        otro = ingesta.BufferRespuestas(self.dir, max_filas=10_000, max_ms=60_000)  # otro worker vivo
+        self.addCleanup(otro.cerrar)
+        otro.agregar(ingesta.validar_respuesta(self._fila("viva@example.com")))
+        apartado = otro._rotar_spool()  # su lote sin confirmar
+        self.assertEqual(ingesta.reprocesar_spool(self.dir, instancia=self.buffer.instancia), 0)
+        self.assertTrue(apartado.exists() and otro._ruta_spool().exists())
+        self.assertEqual(otro.vaciar(), 1)
+
+    def test_otro_proceso_gana_el_spool(self):
+        ruta = self._spool_huerfano("999999", [ingesta.validar_respuesta(self._fila("x@example.com"))])
+        with mock.patch.object(ingesta.os, "rename", side_effect=FileNotFoundError):
+            self.assertEqual(ingesta.reprocesar_spool(self.dir), 0)  # sin excepción: lo salta
+        self.assertTrue(ruta.exists())
+        self.assertFalse(RespuestaEncuesta.objects.exists())
+
+
+# =============================
+#  ENCUESTA: ÍNDICE DE COMENTARIOS
+# =============================
+
+class IndiceComentariosTests(TestCase):
+    def setUp(self):
+        self.campania = CampaniaEncuesta.objects.create(nombre="Otoño", activa=True)
+
+    def _respuestas(self, n):
+        # bulk_create: sin post_save, quedan pendientes como tras la ingesta
+        RespuestaEncuesta.objects.bulk_create([
+            RespuestaEncuesta(campania=self.campania, email=f"c{i}@example.com", consentimiento=True,
+                              rating_sustentabilidad=4, rating_calidad=4, comentario="Algodón suave")
+            for i in range(n)
+        ])
+        return list(RespuestaEncuesta.objects.order_by("id").values_list("id", flat=True))
+
+    def _documentos(self, termino):
+        return FrecuenciaTermino.objects.get(campania=self.campania, termino=termino).documentos
+
+    def test_candidatas_viejas_no_se_cuentan_dos_veces(self):
+        ids = self._respuestas(3)
+        # dos indexadores que leyeron las mismas candidatas antes de que el otro confirmara
+        with mock.patch.object(comentarios, "_pendientes", return_value=ids):
+            self.assertEqual(comentarios.indexar_pendientes(max_lotes=1), 3)
+            self.assertEqual(comentarios.indexar_pendientes(max_lotes=1), 0)
+        self.assertEqual(self._documentos("algodon"), 3)
+
+    def test_error_en_hook_no_rompe_el_guardado(self):
+        with mock.patch.object(comentarios, "indexar_pendientes", side_effect=OperationalError("database is locked")), \
+                self.assertLogs("comun.comentarios", "ERROR"), \
+                self.captureOnCommitCallbacks(execute=True):
+            r = RespuestaEncuesta.objects.create(
+                campania=self.campania, email="hook@example.com", consentimiento=True,
+                rating_sustentabilidad=5, rating_calidad=5, comentario="algodón",
+            )
+        self.assertFalse(RespuestaEncuesta.objects.get(pk=r.pk).comentario_indexado)
+        self.assertEqual(comentarios.indexar_pendientes(), 1)  # queda para el próximo lote
+        self.assertEqual(self._documentos("algodon"), 1)
+
+    def test_buscar_solo_staff(self):
+        self._respuestas(1)
+        comentarios.indexar_pendientes()
+        url = reverse("zara:api_encuesta_comentarios_buscar")
+        self.client.force_login(User.objects.create_user("cliente", "c@example.com", "x"))
+        self.assertEqual(self.client.get(url, {"q": "algodon"}).status_code, 403)
+
+        self.client.force_login(User.objects.create_user("bodega", "b@example.com", "x", is_staff=True))
+        resp = self.client.get(url, {"q": "algodon"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()["resultados"]), 1)
@@ -0,0 +1,56 @@
+# zara/trabajos.py
+"""
+Tareas de zara para el worker (`python manage.py trabajar_tareas`).
+
+Solo envuelven funciones de dominio existentes con `@tarea`; la lógica
+sigue en su módulo. Se registran al importar este módulo desde
+`ZaraConfig.ready()`.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import correo, impacto, inventario, pedidos, tradein
+from .tareas import tarea
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+@tarea("zara.qr_prendas", prioridad=5)
+def qr_prendas(prenda_ids: List[int]) -> None:
+    tradein.generar_qrs(prenda_ids)
+
+
+@tarea("zara.exportar_pedidos", io=True)
+def exportar_pedidos(pedido_ids: List[int], nombre: str = "") -> None:
+    carpeta = Path(_config("EXPORTACIONES_DIR", settings.BASE_DIR / "var" / "exportaciones"))
+    carpeta.mkdir(parents=True, exist_ok=True)
+    ruta = carpeta / (Path(nombre).name or f"pedidos-{timezone.now():%Y%m%d-%H%M%S}.csv")
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    with open(temporal, "w", encoding="utf-8", newline="") as destino:
+        pedidos.exportar_csv(pedido_ids, destino)
+    temporal.replace(ruta)
+
+
+# Se despierta al encolar un correo; la periódica recoge los reintentos con backoff
+@tarea(correo.TAREA, prioridad=10, io=True, max_intentos=1, cada=60)
+def enviar_correos() -> None:
+    correo.enviar_pendientes()
+
+
+@tarea("zara.recalcular_impacto", prioridad=-5, cada=24 * 3600)
+def recalcular_impacto() -> None:
+    impacto.recalcular()
+
+
+@tarea("zara.reconciliar_stock", prioridad=-5, cada=24 * 3600)
+def reconciliar_stock() -> None:
+    inventario.reconciliar()
+    inventario.tomar_corte()
+    inventario.podar_cortes()
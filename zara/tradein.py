@@ -0,0 +1,298 @@
+# zara/tradein.py
+"""
+Prendas Trade-In en bodega: QR firmado, búsqueda y escaneo masivo.
+
+- El QR de cada prenda lleva `TRADEIN:<token>:<firma>`, con la firma HMAC
+  de `django.core.signing` (SECRET_KEY + sal propia). Un código falsificado
+  o mal leído se descarta al verificar la firma, sin tocar la BD.
+- La búsqueda es por `PrendaTradeIn.token` (índice único).
+- `escanear_lote` mueve de estado todo lo leído por un handheld en una
+  transacción: un SELECT por los tokens y un UPDATE por estado de origen
+  (igual que `zara.pedidos.transicionar_en_bloque`).
+- `registrar_canje` da de alta un canje completo (prenda, puntos y
+  contadores de impacto de `zara.impacto`) en una transacción, y encola la
+  generación de los QR (`TRADEIN_QR_DIR`) para que la vista solo los lea.
+- `valuar` es el motor de valuación (valor de canje, puntos, impacto); lo
+  usan el simulador del Trade-In y el precio de reventa de zara_re.
+"""
+from __future__ import annotations
+
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from comun.texto import plegar
+
+from . import tareas
+from .models import Perfil, PrendaTradeIn, TradeInCanje
+from .qr import qr_png
+
+PREFIJO = "TRADEIN:"
+SAL = "zara.tradein.qr"
+LARGO_MAXIMO = 96  # prefijo + token + firma caben de sobra; lo demás no es nuestro
+Estado = PrendaTradeIn.Estado
+ESTADOS_VALIDOS = set(Estado.values)
+
+# Tokens por sentencia (SQLite admite hasta 32766 parámetros por consulta)
+LOTE_TOKENS = 10_000
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def max_lote() -> int:
+    """Códigos por request de escaneo masivo."""
+    return _config("TRADEIN_MAX_LOTE_ESCANEO", 500)
+
+
+def _firmador() -> signing.Signer:
+    return signing.Signer(salt=SAL)
+
+
+# =============================
+#  QR FIRMADO
+# =============================
+
+def payload(prenda: PrendaTradeIn) -> str:
+    """Texto del QR de la prenda."""
+    return PREFIJO + _firmador().sign(prenda.token)
+
+
+def token_de(codigo: str) -> Optional[str]:
+    """Token de un QR leído si la firma es válida; None si no (sin consultas)."""
+    codigo = (codigo or "").strip()
+    if not codigo.startswith(PREFIJO) or len(codigo) > LARGO_MAXIMO:
+        return None
+    try:
+        return _firmador().unsign(codigo[len(PREFIJO):])
+    except signing.BadSignature:
+        return None
+
+
+def _ruta_qr(token: str) -> Path:
+    return Path(_config("TRADEIN_QR_DIR", settings.BASE_DIR / "var" / "qr")) / f"{token}.png"
+
+
+def qr_prenda_png(prenda: PrendaTradeIn) -> bytes:
+    """PNG del QR de la prenda: el pre-generado si existe; si no, se genera en el momento."""
+    try:
+        return _ruta_qr(prenda.token).read_bytes()
+    except FileNotFoundError:
+        return qr_png(payload(prenda))
+
+
+def generar_qrs(prenda_ids: Iterable[int]) -> int:
+    """Escribe los PNG que falten (tarea `zara.qr_prendas`). Retorna cuántos se generaron."""
+    generados = 0
+    for prenda in PrendaTradeIn.objects.filter(pk__in=list(prenda_ids)).only("token"):
+        ruta = _ruta_qr(prenda.token)
+        if ruta.exists():
+            continue
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_name(f"{prenda.token}.{os.getpid()}.tmp")
+        temporal.write_bytes(qr_png(payload(prenda)))
+        temporal.replace(ruta)  # atómico: la vista nunca lee un PNG a medias
+        generados += 1
+    return generados
+
+
+def buscar(codigo: str) -> Optional[PrendaTradeIn]:
+    token = token_de(codigo)
+    if token is None:
+        return None
+    return PrendaTradeIn.objects.filter(token=token).first()
+
+
+# =============================
+#  VALUACIÓN
+# =============================
+
+VALOR_BASE: Dict[str, int] = {
+    "chaqueta": 18000, "pantalon": 12000, "polera": 8000,
+    "vestido": 15000, "zapato": 16000, "cartera": 22000, "otro": 10000,
+}
+FACTOR_ESTADO: Dict[str, float] = {"nuevo": 1.00, "excelente": 0.90, "bueno": 0.75, "regular": 0.50}
+# Grado de bodega → estado de valuación (C no se revende)
+ESTADO_POR_GRADO: Dict[str, str] = {"A": "excelente", "B": "bueno", "C": "regular"}
+
+
+@dataclass(frozen=True)
+class Valuacion:
+    valor: int  # CLP pagados al cliente
+    puntos: int
+    co2_kg: float
+    agua_l: int
+
+
+def tipo_de(texto: str) -> str:
+    """Tipo de prenda de la valuación a partir de un nombre libre ("Chaqueta denim" → chaqueta)."""
+    palabras = plegar(texto or "").split()
+    for tipo in VALOR_BASE:
+        if any(p.startswith(tipo) for p in palabras):
+            return tipo
+    return "otro"
+
+
+def valuar(tipo: str, estado: str = "bueno", anio: Optional[int] = None) -> Valuacion:
+    hoy = date.today()
+    base = VALOR_BASE.get(tipo, VALOR_BASE["otro"])
+    f_estado = FACTOR_ESTADO.get(estado, 0.75)
+    anios = max(0, min(8, hoy.year - (anio or hoy.year)))
+    f_edad = max(0.55, 1 - anios * 0.06)
+    valor = int(base * f_estado * f_edad)
+    return Valuacion(
+        valor=valor,
+        puntos=int(valor * 0.10),
+        co2_kg=round((0.8 + anios * 0.05) * f_estado, 2),
+        agua_l=int((900 + anios * 30) * f_estado),
+    )
+
+
+# =============================
+#  CICLO DE VIDA
+# =============================
+
+CATEGORIAS = ("mujer", "hombre", "nina", "nino", "accesorios")
+
+
+# Estado declarado en el formulario de canje → estado de valuación
+ESTADO_POR_FORMULARIO: Dict[str, str] = {"casi_nuevo": "excelente", "con_detalles": "bueno", "muy_usado": "regular"}
+
+
+@transaction.atomic
+def registrar_canje(
+    usuario, prenda: str, material: str, categoria: str = "", estado: str = "",
+    impacto: Optional[Decimal] = None,
+) -> TradeInCanje:
+    """
+    Canje completo en una transacción: registro, prenda física para bodega,
+    puntos del perfil (UPDATE += n) y contadores de impacto (zara.impacto).
+    Sin `impacto` explícito se usa el CO₂ de la valuación de la prenda.
+    """
+    from . import impacto as contadores
+
+    v = valuar(tipo_de(prenda), ESTADO_POR_FORMULARIO.get(estado, estado or "bueno"))
+    co2 = Decimal(str(v.co2_kg)) if impacto is None else Decimal(impacto).quantize(Decimal("0.01"))
+    canje = TradeInCanje.objects.create(
+        usuario=usuario, prenda=prenda, material=material,
+        impacto=co2, agua_l=v.agua_l, puntos_obtenidos=max(0, int(co2 * 10)),  # 10 puntos por kg de CO₂
+    )
+    item = recibir(canje, categoria)
+    Perfil.objects.filter(user=usuario).update(puntos=F("puntos") + canje.puntos_obtenidos)
+    contadores.sumar_canje(canje)
+    tareas.encolar("zara.qr_prendas", {"prenda_ids": [item.pk]})
+    return canje
+
+
+def recibir(canje: TradeInCanje, categoria: str = "") -> PrendaTradeIn:
+    """Alta de la prenda física de un canje (estado RECIBIDA)."""
+    return PrendaTradeIn.objects.create(
+        canje=canje, usuario_id=canje.usuario_id, prenda=canje.prenda, material=canje.material,
+        categoria=categoria if categoria in CATEGORIAS else "",
+    )
+
+
+def _cambios(destino: str, grado: str) -> Dict[str, object]:
+    if destino not in ESTADOS_VALIDOS:
+        raise ValidationError(f"Estado desconocido: {destino}.")
+    if grado and grado not in PrendaTradeIn.Grado.values:
+        raise ValidationError(f"Grado desconocido: {grado}.")
+    if destino == Estado.CLASIFICADA and not grado:
+        raise ValidationError("Para clasificar hay que indicar el grado.")
+    cambios: Dict[str, object] = {"estado": destino, "actualizada_en": timezone.now()}
+    if grado:
+        cambios["grado"] = grado
+    return cambios
+
+
+def transicionar(prenda: PrendaTradeIn, destino: str, grado: str = "") -> PrendaTradeIn:
+    cambios = _cambios(destino, grado)
+    if not prenda.puede_pasar_a(destino):
+        raise ValidationError(f"Transición no permitida: {prenda.estado} → {destino}.")
+    # UPDATE condicional: si otro handheld ya la movió, no pisamos su cambio
+    if not PrendaTradeIn.objects.filter(pk=prenda.pk, estado=prenda.estado).update(**cambios):
+        raise ValidationError(f"La prenda {prenda.token} cambió de estado en paralelo.")
+    for campo, valor in cambios.items():
+        setattr(prenda, campo, valor)
+    return prenda
+
+
+@dataclass
+class ResultadoEscaneo:
+    actualizadas: int = 0
+    invalidos: List[str] = field(default_factory=list)     # firma inválida: ni se consultan
+    desconocidos: List[str] = field(default_factory=list)  # firma válida, token sin prenda
+    omitidos: List[str] = field(default_factory=list)      # transición no permitida desde su estado
+
+    def como_dict(self) -> Dict[str, object]:
+        return {
+            "actualizadas": self.actualizadas,
+            "invalidos": self.invalidos,
+            "desconocidos": self.desconocidos,
+            "omitidos": self.omitidos,
+        }
+
+
+def escanear_lote(codigos: Iterable[str], destino: str, grado: str = "") -> ResultadoEscaneo:
+    """
+    Pasa a `destino` todas las prendas leídas. Las lecturas repetidas del
+    mismo código cuentan una vez. Retorna qué se actualizó y qué no, por código.
+    """
+    cambios = _cambios(destino, grado)
+    r = ResultadoEscaneo()
+    tokens: Dict[str, str] = {}  # token → código leído (para reportar)
+    for codigo in codigos:
+        token = token_de(codigo)
+        if token is None:
+            r.invalidos.append(codigo)
+        else:
+            tokens.setdefault(token, codigo)
+    if tokens:
+        actualizadas, omitidos, desconocidos = _transicionar_tokens(list(tokens), cambios)
+        r.actualizadas = actualizadas
+        r.omitidos = [tokens[t] for t in omitidos]
+        r.desconocidos = [tokens[t] for t in desconocidos]
+    return r
+
+
+def transicionar_en_bloque(tokens: Iterable[str], destino: str, grado: str = "") -> Dict[str, int]:
+    """Como `escanear_lote` pero con tokens ya confiables (admin). Retorna {"actualizadas", "omitidas"}."""
+    tokens = sorted(set(tokens))
+    cambios = _cambios(destino, grado)
+    actualizadas = 0
+    for i in range(0, len(tokens), LOTE_TOKENS):
+        actualizadas += _transicionar_tokens(tokens[i:i + LOTE_TOKENS], cambios)[0]
+    return {"actualizadas": actualizadas, "omitidas": len(tokens) - actualizadas}
+
+
+def _transicionar_tokens(tokens: List[str], cambios: Dict[str, object]) -> Tuple[int, List[str], List[str]]:
+    """(actualizadas, tokens omitidos por transición, tokens inexistentes). Un UPDATE por estado de origen."""
+    destino = cambios["estado"]
+    origenes = [o for o, destinos in PrendaTradeIn.TRANSICIONES.items() if destino in destinos]
+    actualizadas, omitidos = 0, []
+    with transaction.atomic():
+        por_origen: Dict[str, List[str]] = defaultdict(list)
+        encontrados = set()
+        for token, estado in (
+            PrendaTradeIn.objects.select_for_update().filter(token__in=tokens).values_list("token", "estado")
+        ):
+            encontrados.add(token)
+            if estado in origenes:
+                por_origen[estado].append(token)
+            else:
+                omitidos.append(token)
+        for origen, lote in por_origen.items():
+            actualizadas += PrendaTradeIn.objects.filter(token__in=lote, estado=origen).update(**cambios)
+    return actualizadas, omitidos, [t for t in tokens if t not in encontrados]
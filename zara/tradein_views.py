@@ -1,11 +1,15 @@
 # zara/tradein_views.py
 from datetime import date
-from io import BytesIO
-import qrcode
+import json
 
-from django.http import JsonResponse, HttpResponse
-from django.shortcuts import render
-from django.views.decorators.http import require_GET
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse, HttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.views.decorators.http import require_GET, require_POST
+
+from . import tradein
+from .models import PrendaTradeIn
 
 
 def tradein_home(request):
@@ -29,43 +33,78 @@ def tradein_valuar_api(request):
     except (TypeError, ValueError):
         anio = date.today().year
 
-    base_map = {
-        "chaqueta": 18000, "pantalon": 12000, "polera": 8000,
-        "vestido": 15000, "zapato": 16000, "cartera": 22000, "otro": 10000
-    }
-    base = base_map.get(cat, 10000)
-
-    estado_map = {"nuevo": 1.00, "excelente": 0.90, "bueno": 0.75, "regular": 0.50}
-    f_estado = estado_map.get(estado, 0.75)
-
-    years = max(0, min(8, date.today().year - anio))
-    f_age = max(0.55, 1 - years * 0.06)
-
-    valor = int(base * f_estado * f_age)
-    puntos = int(valor * 0.10)
-
-    co2_kg = round((0.8 + years * 0.05) * f_estado, 2)
-    agua_l = int((900 + years * 30) * f_estado)
-
+    v = tradein.valuar(cat, estado, anio)
     return JsonResponse({
-        "valor": valor,
-        "puntos": puntos,
-        "impacto": {"co2_kg": co2_kg, "agua_l": agua_l}
+        "valor": v.valor,
+        "puntos": v.puntos,
+        "impacto": {"co2_kg": v.co2_kg, "agua_l": v.agua_l}
     })
 
 
+@login_required
 def tradein_qr(request, item_id: int):
-    payload = f"TRADEIN:{item_id}"
-    img = qrcode.make(payload)
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    return HttpResponse(buf.getvalue(), content_type="image/png")
+    """QR firmado de una prenda (del propio cliente, o cualquiera para el personal)."""
+    prenda = get_object_or_404(PrendaTradeIn.objects.only("token", "usuario_id"), pk=item_id)
+    if prenda.usuario_id != request.user.pk and not request.user.is_staff:
+        raise Http404
+    return HttpResponse(tradein.qr_prenda_png(prenda), content_type="image/png")
 
 
 def tradein_scan(request):
     return render(request, "encuesta_zara/tradein_scan.html")
 
 
+def _prenda_dict(prenda: PrendaTradeIn, detalle: bool) -> dict:
+    datos = {
+        "prenda": prenda.prenda,
+        "material": prenda.material,
+        "estado": prenda.estado,
+        "estado_nombre": prenda.get_estado_display(),
+        "recibida_en": prenda.recibida_en.isoformat(),
+    }
+    if detalle:  # personal de bodega
+        datos.update(
+            id=prenda.pk, token=prenda.token, grado=prenda.grado,
+            siguientes=sorted(PrendaTradeIn.TRANSICIONES.get(prenda.estado, ())),
+        )
+    return datos
+
+
+@require_GET
+def api_tradein_prenda(request):
+    """Prenda de un QR leído. ?codigo=TRADEIN:… (firma inválida → 404 sin consultar la BD)."""
+    prenda = tradein.buscar(request.GET.get("codigo") or "")
+    if prenda is None:
+        return JsonResponse({"ok": False, "errores": {"codigo": ["Código no reconocido."]}}, status=404)
+    return JsonResponse({"ok": True, "prenda": _prenda_dict(prenda, request.user.is_staff)})
+
+
+@require_POST
+def api_tradein_escanear_lote(request):
+    """
+    Escaneo masivo desde los handhelds de bodega (solo personal).
+    Body: {"codigos": ["TRADEIN:…", …], "estado": "CLASIFICADA", "grado": "A"}
+    """
+    if not request.user.is_staff:
+        return JsonResponse({"ok": False, "errores": {"__all__": ["Solo personal de bodega."]}}, status=403)
+    try:
+        data = json.loads(request.body.decode("utf-8") or "{}")
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"ok": False, "errores": {"__all__": ["JSON inválido."]}}, status=400)
+    codigos = data.get("codigos") if isinstance(data, dict) else None
+    if not isinstance(codigos, list) or not all(isinstance(c, str) for c in codigos):
+        return JsonResponse({"ok": False, "errores": {"codigos": ["Se esperaba una lista de textos."]}}, status=400)
+    if len(codigos) > tradein.max_lote():
+        return JsonResponse(
+            {"ok": False, "errores": {"codigos": [f"Máximo {tradein.max_lote()} códigos por envío."]}}, status=400,
+        )
+    try:
+        r = tradein.escanear_lote(codigos, str(data.get("estado") or ""), str(data.get("grado") or ""))
+    except ValidationError as exc:
+        return JsonResponse({"ok": False, "errores": {"estado": exc.messages}}, status=400)
+    return JsonResponse({"ok": True, **r.como_dict()})
+
+
 def wallet_home(request):
     wallet_points = request.session.get("wallet_points", 120)
     return render(request, "encuesta_zara/wallet.html", {"wallet_points": wallet_points})
@@ -1,6 +1,6 @@
 # zara/urls.py
 from django.urls import path
-from . import views
+from . import tradein_views, views
 
 app_name = "zara"
 
@@ -13,21 +13,42 @@ urlpatterns = [
     path("nino/", views.nino, name="nino"),
     path("accesorios/", views.accesorios, name="accesorios"),
     path("carrito/", views.carrito, name="carrito"),
+    path("api/envio/cotizar/", views.api_envio_cotizar, name="api_envio_cotizar"),
+    path("api/checkout/", views.api_checkout, name="api_checkout"),
 
     # ----------- TRADE-IN / QR / WALLET -----------
     path("tradein/", views.trade_in, name="tradein"),
     path("wallet/", views.wallet_view, name="wallet_view"),
     path("qr_generar/", views.qr_generar, name="qr_generar"),
     path("qr_leer/", views.qr_leer, name="qr_leer"),
+    path("tradein/escanear/", tradein_views.tradein_scan, name="tradein_scan"),
+    path("tradein/prendas/<int:item_id>/qr.png", tradein_views.tradein_qr, name="tradein_qr"),
+    path("api/tradein/valuar/", tradein_views.tradein_valuar_api, name="api_tradein_valuar"),
+    path("api/tradein/prenda/", tradein_views.api_tradein_prenda, name="api_tradein_prenda"),
+    path("api/tradein/escanear/lote/", tradein_views.api_tradein_escanear_lote,
+         name="api_tradein_escanear_lote"),
 
     # ----------- CUENTA / CONFIGURACIÓN -----------
     path("cuenta/", views.cuenta_home, name="cuenta_home"),
     path("cuenta/pedidos/", views.cuenta_pedidos, name="cuenta_pedidos"),
     path("cuenta/direcciones/", views.cuenta_direcciones, name="cuenta_direcciones"),
+    path("cuenta/direcciones/<int:pk>/", views.cuenta_direccion_editar, name="cuenta_direccion_editar"),
+    path("cuenta/direcciones/<int:pk>/eliminar/", views.cuenta_direccion_eliminar,
+         name="cuenta_direccion_eliminar"),
+    path("cuenta/direcciones/<int:pk>/principal/", views.cuenta_direccion_principal,
+         name="cuenta_direccion_principal"),
+    path("api/direcciones/comunas/", views.api_comunas, name="api_comunas"),
+
+    # ----------- ENCUESTA -----------
+    path("api/encuesta/responder/", views.api_encuesta_responder, name="api_encuesta_responder"),
+    path("api/encuesta/comentarios/", views.api_encuesta_comentarios, name="api_encuesta_comentarios"),
+    path("api/encuesta/comentarios/buscar/", views.api_encuesta_comentarios_buscar,
+         name="api_encuesta_comentarios_buscar"),
 
     # ----------- PANEL ADMINISTRATIVO -----------
     path("panel/", views.panel, name="panel"),
 
     # ----------- BUSCADOR (LUPA) -----------
     path("buscar/", views.buscar, name="buscar"),
+    path("api/catalogo/productos/", views.api_catalogo_productos, name="api_catalogo_productos"),
 ]
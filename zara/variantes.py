@@ -0,0 +1,107 @@
+# zara/variantes.py
+"""
+Variantes (SKU talla × color) y su resumen de disponibilidad.
+
+- `DisponibilidadTalla` guarda, por (producto, talla), las unidades y los
+  colores con stock. El stock de cada variante lo mueve el diario de
+  inventario (zara.inventario), que también mantiene `Producto.stock`.
+- Se recalcula por signals al guardar/borrar una `Variante`. Las escrituras
+  masivas (`bulk_create` / `bulk_update` / `update()`) no disparan signals:
+  deben llamar a `recalcular_disponibilidad(ids)` al terminar.
+- Filtrar por talla es un JOIN contra el índice parcial
+  `disponibilidad_con_stock` (talla, producto) WHERE unidades > 0.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import DisponibilidadTalla, Producto, Variante
+
+LOTE = 500
+
+
+def normalizar_talla(talla: str) -> str:
+    return (talla or "").strip().upper()
+
+
+def normalizar_color(color: str) -> str:
+    return (color or "").strip().lower()
+
+
+# =============================
+#  RESUMEN DESNORMALIZADO
+# =============================
+
+def _resumen(producto_ids: List[int]) -> List[DisponibilidadTalla]:
+    por_talla: Dict[Tuple[int, str], Tuple[int, set]] = {}
+    for producto_id, talla, color, stock in Variante.objects.filter(producto_id__in=producto_ids).values_list(
+        "producto_id", "talla", "color", "stock"
+    ):
+        unidades, colores = por_talla.get((producto_id, talla), (0, set()))
+        if stock > 0:
+            colores.add(color)
+        por_talla[(producto_id, talla)] = (unidades + stock, colores)
+    return [
+        DisponibilidadTalla(
+            producto_id=producto_id, talla=talla, unidades=unidades,
+            colores="|" + "|".join(sorted(colores)) + "|" if colores else "",
+        )
+        for (producto_id, talla), (unidades, colores) in por_talla.items()
+    ]
+
+
+def recalcular_disponibilidad(producto_ids: Iterable[int]) -> int:
+    """Reconstruye el resumen de los productos dados. Retorna filas escritas."""
+    ids = sorted(set(producto_ids))
+    escritas = 0
+    for i in range(0, len(ids), LOTE):
+        lote = ids[i:i + LOTE]
+        with transaction.atomic():
+            # Primero se bloquean los productos (PostgreSQL) y se escribe (en
+            # SQLite toma el lock de escritura): las variantes se leen después,
+            # así que un recálculo concurrente no puede dejar un resumen viejo.
+            list(Producto.objects.select_for_update().filter(pk__in=lote).order_by("pk").values_list("pk", flat=True))
+            DisponibilidadTalla.objects.filter(producto_id__in=lote).delete()
+            filas = _resumen(lote)
+            DisponibilidadTalla.objects.bulk_create(filas, batch_size=LOTE)
+        escritas += len(filas)
+    return escritas
+
+
+def recalcular_todo() -> int:
+    ids = Variante.objects.order_by().values_list("producto_id", flat=True).distinct()
+    return recalcular_disponibilidad(ids)
+
+
+@receiver([post_save, post_delete], sender=Variante)
+def _sincronizar(sender, instance, **kwargs):
+    recalcular_disponibilidad([instance.producto_id])
+
+
+# =============================
+#  CONSULTAS
+# =============================
+
+def con_stock(talla: str, color: Optional[str] = None, qs: Optional[QuerySet] = None) -> QuerySet:
+    """Productos con stock en la talla (y color) pedidos: un JOIN indexado, sin agregación."""
+    qs = Producto.objects.all() if qs is None else qs
+    filtro = {"disponibilidad__talla": normalizar_talla(talla), "disponibilidad__unidades__gt": 0}
+    if color:
+        filtro["disponibilidad__colores__contains"] = f"|{normalizar_color(color)}|"
+    return qs.filter(**filtro)
+
+
+def tallas_disponibles(producto_ids: Iterable[int]) -> Dict[int, List[str]]:
+    """{producto_id: [tallas con stock]} en una consulta."""
+    resultado: Dict[int, List[str]] = {}
+    for producto_id, talla in (
+        DisponibilidadTalla.objects.filter(producto_id__in=list(producto_ids), unidades__gt=0)
+        .order_by("producto_id", "talla").values_list("producto_id", "talla")
+    ):
+        resultado.setdefault(producto_id, []).append(talla)
+    return resultado
@@ -1,15 +1,27 @@
 # zara/views.py
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
 from types import SimpleNamespace
-import io, base64, qrcode
+import json
 
-from django.http import HttpResponse
-from django.shortcuts import render, redirect
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import update_session_auth_hash
 
-from .models import Perfil, TradeInCanje
+from comun.comentarios import buscar_comentarios, graficos_comentarios
+
+from . import acceso, direcciones, envios, impacto, pedidos, tradein, variantes
+from . import puntos as canje_puntos
+from .forms import DireccionForm
+from .models import MAX_QTY_PER_ITEM, Direccion, Perfil, TradeInCanje
+from .qr import qr_base64
+from .catalogo import buscar_en_catalogo
+from .ingesta import buffer_respuestas, validar_respuesta
 
 
 # =============================
@@ -49,29 +61,23 @@ def trade_in(request):
     if request.method == "POST":
         prenda = (request.POST.get("prenda") or "Sin nombre").strip()
         material = (request.POST.get("material") or "Desconocido").strip()
-        impacto_raw = (request.POST.get("impacto") or "0").strip()
+        impacto_raw = (request.POST.get("impacto") or "").strip()
 
         try:
-            impacto = float(impacto_raw)
-        except ValueError:
-            impacto = 0.0
-
-        # Regla simple de puntos: 10 puntos por cada unidad de "impacto"
-        puntos = max(0, int(impacto * 10))
-
-        # Guardar el registro del canje
-        TradeInCanje.objects.create(
-            usuario=request.user,
-            prenda=prenda,
-            material=material,
+            impacto = Decimal(impacto_raw) if impacto_raw else None
+            if impacto is not None and not 0 <= impacto < 10000:
+                impacto = None
+        except InvalidOperation:  # incluye NaN / Infinity
+            impacto = None
+
+        # Canje + prenda física (QR de bodega) + puntos + contadores de impacto, en una transacción
+        canje = tradein.registrar_canje(
+            request.user, prenda, material,
+            categoria=(request.POST.get("categoria") or "").strip(),
+            estado=(request.POST.get("estado") or "").strip(),
             impacto=impacto,
-            puntos_obtenidos=puntos,
         )
-
-        # Sumar puntos al perfil
-        perfil, _ = Perfil.objects.get_or_create(user=request.user)
-        perfil.puntos = (perfil.puntos or 0) + puntos
-        perfil.save(update_fields=["puntos"])
+        puntos = canje.puntos_obtenidos
 
         messages.success(request, f"Canje registrado (+{puntos} pts). ¡Gracias por reciclar!")
         return redirect("zara:wallet_view")
@@ -85,13 +91,20 @@ def wallet_view(request):
     Muestra saldo total de puntos y el historial de canjes del usuario.
     """
     perfil, _ = Perfil.objects.get_or_create(user=request.user)
-    canjes = TradeInCanje.objects.filter(usuario=request.user).order_by("-fecha")
+    canjes = (
+        TradeInCanje.objects.filter(usuario=request.user).order_by("-fecha")
+        .prefetch_related("prendas")
+    )
     total_puntos = getattr(perfil, "puntos", 0) or 0
 
     context = {
         "perfil": perfil,
         "canjes": canjes,
         "total_puntos": total_puntos,
+        "valor_punto": canje_puntos.valor_punto(),
+        # contadores mantenidos en cada canje: lookup por clave, sin SUM sobre el historial
+        "impacto_usuario": impacto.de_usuario(request.user.pk),
+        "impacto_global": impacto.global_(),
     }
     return render(request, "encuesta_zara/wallet.html", context)
 
@@ -99,10 +112,7 @@ def wallet_view(request):
 def qr_generar(request):
     """Genera un QR simple con texto recibido por GET."""
     data = request.GET.get("data", "Código vacío")
-    qr_img = qrcode.make(data)
-    buffer = io.BytesIO()
-    qr_img.save(buffer, format="PNG")
-    img_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    img_base64 = qr_base64(data)
     return render(request, "encuesta_zara/qr_generar.html", {"img_data": img_base64})
 
 
@@ -164,9 +174,8 @@ def cuenta_home(request):
                     perfil.nombre_mostrar = nombre_mostrar or perfil.nombre_mostrar
                 if fecha_dt is not None and hasattr(perfil, "fecha_nacimiento"):
                     perfil.fecha_nacimiento = fecha_dt
-                if hasattr(perfil, "preferencia_tema"):
-                    perfil.preferencia_tema = tema
-                perfil.save()
+                perfil.tema = {"dark": Perfil.Tema.OSCURO, "auto": Perfil.Tema.SISTEMA}.get(tema, Perfil.Tema.CLARO)
+                perfil.save()  # invalida la apariencia cacheada (zara.apariencia)
             else:
                 request.session["perfil_nombre_mostrar"] = nombre_mostrar or (user.get_full_name() or user.username)
                 if fecha_dt:
@@ -182,7 +191,14 @@ def cuenta_home(request):
             new1 = request.POST.get("new_password1") or ""
             new2 = request.POST.get("new_password2") or ""
 
+            # misma cuenta que el login: probar claves desde una sesión robada también tiene límite
+            ip = acceso.ip_de(request)
+            espera = acceso.bloqueado(ip, user.get_username())
+            if espera:
+                messages.error(request, acceso.mensaje_espera(espera))
+                return redirect("zara:cuenta_home")
             if not user.check_password(old_password):
+                acceso.registrar_fallo(ip, user.get_username())
                 messages.error(request, "La contraseña actual no es correcta.")
                 return redirect("zara:cuenta_home")
             if new1 != new2:
@@ -193,7 +209,7 @@ def cuenta_home(request):
                 return redirect("zara:cuenta_home")
 
             user.set_password(new1)
-            user.save()
+            user.save(update_fields=["password"])
             update_session_auth_hash(request, user)
             messages.success(request, "Contraseña actualizada correctamente.")
             return redirect("zara:cuenta_home")
@@ -208,10 +224,140 @@ def cuenta_pedidos(request):
     return render(request, "encuesta_zara/cuenta/pedidos.html")
 
 
+def _render_direcciones(request, form, editando=None, status=200):
+    return render(request, "encuesta_zara/cuenta/direcciones.html", {
+        "direcciones": request.user.direcciones.all(),  # usa direccion_user_principal_idx
+        "form": form,
+        "editando": editando,
+        "regiones": direcciones.regiones(),
+        "comunas": [c for _, c in direcciones.tabla_comunas()],
+    }, status=status)
+
+
 @login_required
 def cuenta_direcciones(request):
-    """Direcciones (demo)."""
-    return render(request, "encuesta_zara/cuenta/direcciones.html")
+    """Libreta de direcciones: listado (GET) y alta (POST)."""
+    if request.method == "POST":
+        form = DireccionForm(request.POST, instance=Direccion(user=request.user))
+        if form.is_valid():
+            direcciones.guardar(form.save(commit=False), form.cleaned_data["hacer_principal"])
+            messages.success(request, "Dirección guardada.")
+            return redirect("zara:cuenta_direcciones")
+        return _render_direcciones(request, form, status=400)
+    return _render_direcciones(request, DireccionForm())
+
+
+@login_required
+def cuenta_direccion_editar(request, pk: int):
+    direccion = get_object_or_404(Direccion, pk=pk, user=request.user)
+    if request.method == "POST":
+        form = DireccionForm(request.POST, instance=direccion)
+        if form.is_valid():
+            direcciones.guardar(form.save(commit=False), form.cleaned_data["hacer_principal"])
+            messages.success(request, "Dirección actualizada.")
+            return redirect("zara:cuenta_direcciones")
+        return _render_direcciones(request, form, editando=direccion, status=400)
+    return _render_direcciones(
+        request, DireccionForm(instance=direccion, initial={"hacer_principal": direccion.es_principal}),
+        editando=direccion,
+    )
+
+
+@login_required
+@require_POST
+def cuenta_direccion_eliminar(request, pk: int):
+    direcciones.eliminar(get_object_or_404(Direccion, pk=pk, user=request.user))
+    messages.success(request, "Dirección eliminada.")
+    return redirect("zara:cuenta_direcciones")
+
+
+@login_required
+@require_POST
+def cuenta_direccion_principal(request, pk: int):
+    direcciones.marcar_principal(get_object_or_404(Direccion, pk=pk, user=request.user))
+    messages.success(request, "Dirección principal actualizada.")
+    return redirect("zara:cuenta_direcciones")
+
+
+@require_GET
+def api_comunas(request):
+    """
+    Autocompletado de comuna / región / código postal (tabla en memoria, sin BD).
+    ?q=prov[&region=Metropolitana]  o  ?codigo_postal=7500000
+    """
+    codigo = (request.GET.get("codigo_postal") or "").strip()
+    if codigo:
+        encontrada = direcciones.por_codigo_postal(codigo)
+        resultados = [encontrada] if encontrada else []
+    else:
+        resultados = direcciones.autocompletar(request.GET.get("q") or "", request.GET.get("region") or "")
+    resp = JsonResponse({"ok": True, "resultados": [c.como_dict() for c in resultados]})
+    resp["Cache-Control"] = "public, max-age=86400"
+    return resp
+
+
+# =============================
+#  ENCUESTA: INGESTA
+# =============================
+
+@csrf_exempt  # endpoint público para tótems / formularios de campaña, sin sesión
+@require_POST
+def api_encuesta_responder(request):
+    """
+    Recibe una respuesta de encuesta (JSON o form), la valida y la encola.
+    La escritura a BD ocurre por lotes en zara.ingesta (202 = aceptada).
+    """
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body.decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
+            return JsonResponse({"ok": False, "errores": {"__all__": ["JSON inválido."]}}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({"ok": False, "errores": {"__all__": ["Se espera un objeto JSON."]}}, status=400)
+    else:
+        data = request.POST.dict()
+
+    try:
+        fila = validar_respuesta(data)
+    except ValidationError as exc:
+        return JsonResponse({"ok": False, "errores": exc.message_dict}, status=400)
+
+    buffer_respuestas().agregar(fila)
+    return JsonResponse({"ok": True}, status=202)
+
+
+# =============================
+#  ENCUESTA: COMENTARIOS
+# =============================
+
+def _campania_param(request):
+    valor = request.GET.get("campania") or ""
+    return int(valor) if valor.isdigit() else None
+
+
+@login_required
+@require_GET
+def api_encuesta_comentarios(request):
+    """Términos más frecuentes y co-ocurrencias (payload Chart.js). ?campania=<id>"""
+    return JsonResponse({"ok": True, "charts": graficos_comentarios(_campania_param(request))})
+
+
+@login_required
+@require_GET
+def api_encuesta_comentarios_buscar(request):
+    """
+    Búsqueda por palabras clave en comentarios (todas deben aparecer). ?q=&campania=
+    Devuelve el texto de cada respuesta: solo staff (los gráficos son agregados).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({"ok": False, "errores": {"__all__": ["Solo staff."]}}, status=403)
+    q = request.GET.get("q", "")
+    try:
+        limite = min(max(int(request.GET.get("limite", 20)), 1), 100)
+    except ValueError:
+        limite = 20
+    resultados = buscar_comentarios(q, _campania_param(request), limite)
+    return JsonResponse({"ok": True, "q": q, "resultados": resultados})
 
 
 # =============================
@@ -229,34 +375,145 @@ def panel(request):
 # =============================
 def carrito(request):
     """Página del carrito (usa localStorage en el cliente)."""
-    return render(request, "encuesta_zara/carrito.html")
+    saldo = None
+    if request.user.is_authenticated:
+        saldo = Perfil.objects.filter(user=request.user).values("puntos", "creditos_circulares").first()
+    return render(request, "encuesta_zara/carrito.html", {"regiones": direcciones.regiones(), "saldo": saldo})
+
+
+@require_POST
+def api_checkout(request):
+    """
+    Crea el pedido del carrito, opcionalmente pagando parte con puntos / créditos.
+    Body: {"items": [{"id", "qty", "variante"?}], "email"?, "cupon"?, "puntos"?, "creditos"?}
+    "variante" es obligatoria para productos con tallas/colores.
+    """
+    try:
+        data = json.loads(request.body.decode("utf-8") or "{}")
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"ok": False, "errores": {"__all__": ["JSON inválido."]}}, status=400)
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return JsonResponse({"ok": False, "errores": {"items": ["Se esperaba una lista."]}}, status=400)
+    usuario = request.user if request.user.is_authenticated else None
+    email = (usuario.email if usuario and usuario.email else str(data.get("email") or "")).strip()
+    if not email:
+        return JsonResponse({"ok": False, "errores": {"email": ["Requerido."]}}, status=400)
+    try:
+        lineas = [
+            (int(it.get("id")), int(it.get("qty") or 1), None if it.get("variante") is None else int(it["variante"]))
+            for it in items if isinstance(it, dict)
+        ]
+        a_canjear = max(0, int(data.get("puntos") or 0)), max(0, int(data.get("creditos") or 0))
+    except (TypeError, ValueError):
+        return JsonResponse({"ok": False, "errores": {"items": ["Producto o cantidad inválidos."]}}, status=400)
+
+    try:
+        pedido = pedidos.crear(lineas, email, usuario, *a_canjear, cupon=str(data.get("cupon") or ""))
+    except canje_puntos.PuntosInsuficientes as exc:
+        return JsonResponse({"ok": False, "errores": {"puntos": exc.messages}}, status=409)
+    except ValidationError as exc:
+        return JsonResponse({"ok": False, "errores": {"__all__": exc.messages}}, status=400)
+
+    redencion = getattr(pedido, "redencion", None)
+    respuesta = {"ok": True, "pedido": pedido.pk, "total": str(pedido.total_pagado)}
+    if redencion is not None:
+        saldo = Perfil.objects.values("puntos", "creditos_circulares").get(user=usuario)
+        respuesta.update(
+            descuento=str(redencion.descuento), puntos_usados=redencion.puntos, creditos_usados=redencion.creditos,
+            saldo=saldo,
+        )
+    return JsonResponse(respuesta)
+
+
+MAX_DESTINOS_COTIZACION = 20
+MAX_ITEMS_COTIZACION = 100
+
+
+@require_POST
+def api_envio_cotizar(request):
+    """
+    Cotiza envío del carrito para uno o varios destinos en una llamada.
+    Body: {"items": [{"id", "qty"}], "destinos": [{"region", "codigo_postal", "ciudad"}]}
+    Sin "destinos" y con sesión, cotiza todas las direcciones del cliente.
+    """
+    try:
+        data = json.loads(request.body.decode("utf-8") or "{}")
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({"ok": False, "errores": {"__all__": ["JSON inválido."]}}, status=400)
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return JsonResponse({"ok": False, "errores": {"items": ["Se esperaba una lista."]}}, status=400)
+
+    if len(items) > MAX_ITEMS_COTIZACION:
+        return JsonResponse(
+            {"ok": False, "errores": {"items": [f"Máximo {MAX_ITEMS_COTIZACION} líneas."]}}, status=400,
+        )
+    try:
+        lineas = [(it.get("id"), int(it.get("qty", 1))) for it in items if isinstance(it, dict)]
+    except (TypeError, ValueError):
+        lineas = None
+    # mismas cantidades que acepta un carrito: el peso (y el tramo) queda acotado
+    if lineas is None or any(not 1 <= qty <= MAX_QTY_PER_ITEM for _, qty in lineas):
+        return JsonResponse(
+            {"ok": False, "errores": {"items": [f"Cantidad inválida (1 a {MAX_QTY_PER_ITEM})."]}}, status=400,
+        )
+    peso = envios.peso_items(lineas)
+
+    destinos = data.get("destinos")
+    if destinos is None and request.user.is_authenticated:
+        destinos = list(request.user.direcciones.only("id", "alias", "ciudad", "region", "codigo_postal", "es_principal"))
+    elif isinstance(destinos, list):
+        destinos = [SimpleNamespace(**{k: str(d.get(k) or "") for k in ("region", "codigo_postal", "ciudad")})
+                    for d in destinos if isinstance(d, dict)]
+    else:
+        destinos = []
+    destinos = destinos[:MAX_DESTINOS_COTIZACION]
+
+    resultado = []
+    for destino, (zona, opciones) in zip(destinos, envios.cotizar_lote(destinos, peso)):
+        fila = {
+            "zona": zona,
+            "ciudad": destino.ciudad,
+            "region": destino.region,
+            "opciones": [o.como_dict() for o in opciones],
+        }
+        if isinstance(destino, Direccion):
+            fila.update(direccion_id=destino.pk, alias=destino.alias, es_principal=destino.es_principal)
+        resultado.append(fila)
+    return JsonResponse({"ok": True, "peso_gramos": peso, "destinos": resultado})
+
+MAX_PRODUCTOS_API = 60
+
+
+@require_GET
+def api_catalogo_productos(request):
+    """
+    Productos con stock, para filtros de categoría / búsqueda.
+    ?talla=M[&color=negro][&q=blazer]  (talla obligatoria: filtra contra el resumen indexado)
+    """
+    talla = (request.GET.get("talla") or "").strip()
+    if not talla:
+        return JsonResponse({"ok": False, "errores": {"talla": ["Requerida."]}}, status=400)
+    qs = variantes.con_stock(talla, request.GET.get("color") or None)
+    q = (request.GET.get("q") or "").strip()
+    if q:
+        qs = qs.filter(nombre__icontains=q)
+    filas = list(qs.order_by("nombre").values("id", "nombre", "precio")[:MAX_PRODUCTOS_API])
+    tallas = variantes.tallas_disponibles(f["id"] for f in filas)
+    return JsonResponse({"ok": True, "productos": [
+        {**f, "precio": str(f["precio"]), "tallas": tallas.get(f["id"], [])} for f in filas
+    ]})
+
 
 def buscar(request):
     """
     Vista de búsqueda de demo.
-    Filtra contra un catálogo estático (nombre, categoría). 
+    Filtra contra el índice en memoria de zara.catalogo (nombre, categoría).
     Cuando tengas BD, reemplaza por queries reales.
     """
     q = (request.GET.get("q") or "").strip()
-    catalogo = [
-        {"nombre": "Conjunto formal gris", "categoria": "Mujer", "slug": "conjunto-formal-gris"},
-        {"nombre": "Trench liviano", "categoria": "Mujer", "slug": "trench-liviano"},
-        {"nombre": "Blazer Mocha", "categoria": "Hombre", "slug": "blazer-mocha"},
-        {"nombre": "Pantalón lino beige", "categoria": "Hombre", "slug": "pantalon-lino-beige"},
-        {"nombre": "Chaqueta acolchada niña", "categoria": "Niña", "slug": "chaqueta-acolchada-nina"},
-        {"nombre": "Polera niño básica", "categoria": "Niño", "slug": "polera-nino-basica"},
-        {"nombre": "Cartera Safari", "categoria": "Accesorios", "slug": "cartera-safari"},
-        {"nombre": "Perfume Rose Tan", "categoria": "Perfumes", "slug": "perfume-rose-tan"},
-    ]
-
-    if q:
-        ql = q.lower()
-        resultados = [
-            item for item in catalogo
-            if ql in item["nombre"].lower() or ql in item["categoria"].lower()
-        ]
-    else:
-        resultados = []
+    resultados = buscar_en_catalogo(q)
 
     ctx = {
         "q": q,
@@ -1,3 +1,29 @@
-from django.contrib import admin
+# zara_re/admin.py
+from django.contrib import admin, messages
 
-# Register your models here.
+from zara.admin_rendimiento import ListadoLigeroMixin
+
+from . import reventa
+from .models import Publicacion
+
+
+@admin.register(Publicacion)
+class PublicacionAdmin(ListadoLigeroMixin, admin.ModelAdmin):
+    list_display = ("id", "titulo", "categoria", "material", "condicion", "precio", "estado",
+                    "reservada_hasta", "publicada_en")
+    list_filter = ("estado", "categoria", "condicion")
+    search_fields = ("^titulo",)
+    list_only = ("titulo", "categoria", "material", "condicion", "precio", "estado",
+                 "reservada_hasta", "publicada_en")
+    # estado / reserva / venta se mueven solo con zara_re.reventa (UPDATE condicionales)
+    readonly_fields = ("prenda", "tipo", "estado", "reservada_por", "reservada_hasta", "comprador", "vendida_en",
+                       "publicada_en")
+    actions = ["retirar"]
+
+    def has_add_permission(self, request):
+        return False  # se publican desde bodega: `python manage.py publicar_reventa`
+
+    @admin.action(description="Retirar de la venta")
+    def retirar(self, request, queryset):
+        n = reventa.retirar(queryset.values_list("pk", flat=True))
+        self.message_user(request, f"{n} publicación(es) retirada(s).", messages.SUCCESS)
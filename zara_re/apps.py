@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ZaraReConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'zara_re'
+
+    def ready(self):
+        from . import trabajos  # noqa: F401 (registra tareas periódicas)
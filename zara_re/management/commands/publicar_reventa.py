@@ -0,0 +1,29 @@
+# zara_re/management/commands/publicar_reventa.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from zara_re import reventa
+
+
+class Command(BaseCommand):
+    help = "Publica en Zara Re las prendas Trade-In clasificadas (A/B) y retira las que dejaron de estar a la venta."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limite", type=int, default=None, help="Máximo de prendas a publicar por pasada.")
+        parser.add_argument("--loop", action="store_true", help="Queda corriendo como proceso de fondo.")
+        parser.add_argument("--intervalo", type=float, default=300, help="Segundos entre pasadas (con --loop).")
+
+    def handle(self, *args, **opts):
+        while True:
+            t0 = time.perf_counter()
+            publicadas = reventa.publicar_clasificadas(opts["limite"])
+            retiradas = reventa.retirar_huerfanas()
+            liberadas = reventa.liberar_vencidas()
+            self.stdout.write(
+                f"publicadas={publicadas} retiradas={retiradas} reservas vencidas={liberadas} "
+                f"en {time.perf_counter() - t0:.2f}s"
+            )
+            if not opts["loop"]:
+                return
+            time.sleep(opts["intervalo"])
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('zara', '0011_prenda_tradein_categoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Publicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('titulo', models.CharField(max_length=100)),
+                ('tipo', models.CharField(max_length=20)),
+                ('categoria', models.CharField(max_length=20)),
+                ('material', models.CharField(max_length=50)),
+                ('condicion', models.CharField(max_length=1)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('estado', models.CharField(choices=[('PUBLICADA', 'Publicada'), ('VENDIDA', 'Vendida'), ('RETIRADA', 'Retirada')], default='PUBLICADA', max_length=10)),
+                ('publicada_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reservada_hasta', models.DateTimeField(blank=True, null=True)),
+                ('vendida_en', models.DateTimeField(blank=True, null=True)),
+                ('comprador', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='compras_re', to=settings.AUTH_USER_MODEL)),
+                ('prenda', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='publicacion', to='zara.prendatradein')),
+                ('reservada_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservas_re', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'publicación',
+                'verbose_name_plural': 'publicaciones',
+                'ordering': ['-publicada_en'],
+                'indexes': [models.Index(fields=['estado', '-publicada_en'], name='re_pub_estado_fecha'), models.Index(fields=['estado', 'categoria', '-publicada_en'], name='re_pub_categoria'), models.Index(fields=['estado', 'material', '-publicada_en'], name='re_pub_material'), models.Index(fields=['estado', 'condicion', '-publicada_en'], name='re_pub_condicion'), models.Index(fields=['estado', 'precio'], name='re_pub_precio')],
+            },
+        ),
+    ]
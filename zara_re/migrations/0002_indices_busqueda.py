@@ -0,0 +1,16 @@
+# Índice para el search_field "^titulo" del admin (ver zara/indices.py)
+
+from django.db import migrations
+
+from zara.indices import prefijo
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zara_re', '0001_initial'),
+    ]
+
+    operations = [
+        prefijo([('zara_re_publicacion', 'titulo')]),
+    ]
@@ -1,3 +1,61 @@
+# zara_re/models.py
+from __future__ import annotations
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+# ============================================
+# REVENTA CIRCULAR
+# ============================================
+
+class Publicacion(models.Model):
+    """
+    Prenda Trade-In clasificada puesta a la venta en Zara Re.
+    Tabla desnormalizada (categoría, material, condición, precio copiados de
+    la prenda) para que el listado y las facetas no hagan JOINs.
+    La reserva vive en `reservada_por` / `reservada_hasta` (ver zara_re.reventa).
+    """
+    class Estado(models.TextChoices):
+        PUBLICADA = "PUBLICADA", "Publicada"
+        VENDIDA = "VENDIDA", "Vendida"
+        RETIRADA = "RETIRADA", "Retirada"
+
+    prenda = models.OneToOneField("zara.PrendaTradeIn", on_delete=models.PROTECT, related_name="publicacion")
+    titulo = models.CharField(max_length=100)
+    tipo = models.CharField(max_length=20)        # tipo de la valuación: chaqueta, pantalon, …
+    categoria = models.CharField(max_length=20)   # mujer / hombre / nina / nino / accesorios
+    material = models.CharField(max_length=50)
+    condicion = models.CharField(max_length=1)    # grado de bodega (A / B)
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PUBLICADA)
+    publicada_en = models.DateTimeField(default=timezone.now)
+
+    reservada_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="reservas_re",
+    )
+    reservada_hasta = models.DateTimeField(null=True, blank=True)
+    comprador = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="compras_re",
+    )
+    vendida_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-publicada_en"]
+        indexes = [
+            # listado: estado + (una faceta) ordenado por fecha, sin sort en memoria
+            models.Index(fields=["estado", "-publicada_en"], name="re_pub_estado_fecha"),
+            models.Index(fields=["estado", "categoria", "-publicada_en"], name="re_pub_categoria"),
+            models.Index(fields=["estado", "material", "-publicada_en"], name="re_pub_material"),
+            models.Index(fields=["estado", "condicion", "-publicada_en"], name="re_pub_condicion"),
+            models.Index(fields=["estado", "precio"], name="re_pub_precio"),
+        ]
+        verbose_name = "publicación"
+        verbose_name_plural = "publicaciones"
+
+    def reservada(self, ahora=None) -> bool:
+        return bool(self.reservada_hasta and self.reservada_hasta > (ahora or timezone.now()))
 
-# Create your models here.
+    def __str__(self) -> str:
+        return f"{self.titulo} · ${self.precio}"
@@ -0,0 +1,255 @@
+# zara_re/reventa.py
+"""
+Reventa circular: prendas Trade-In clasificadas → `Publicacion`.
+
+- `publicar_clasificadas` crea las publicaciones de las prendas con grado
+  A/B aún sin publicar, con precio del motor de valuación
+  (`zara.tradein.valuar`) por `ZARA_RE_MARGEN`.
+- Listado y facetas leen solo `Publicacion` (desnormalizada) contra sus
+  índices compuestos (estado, faceta, fecha). Los conteos por faceta se
+  cachean bajo una versión que se renueva al confirmar una publicación,
+  venta o retiro; las reservas no cambian los conteos. Versión y conteos
+  viven en el cache compartido (`CACHES["default"]`), así la invalidación
+  de un worker la ven todos. Con un cache por proceso (LocMem) cada worker
+  serviría conteos viejos hasta `ZARA_RE_FACETAS_TTL`.
+- Reserva: un único UPDATE condicional (libre, vencida o ya mía). Dos
+  compradores concurrentes nunca obtienen la misma prenda: la BD
+  serializa la escritura de la fila y solo uno ve `filas == 1`.
+  La compra exige reserva vigente propia, también con UPDATE condicional.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import time
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from zara import tradein
+from zara.models import PrendaTradeIn
+
+from .models import Publicacion
+
+FACETAS = ("categoria", "material", "condicion")
+GRADOS_REVENTA = ("A", "B")
+POR_PAGINA = 24
+MAX_PAGINA = 200
+ORDENES = {
+    "recientes": ("-publicada_en", "-id"),
+    "precio_asc": ("precio", "id"),
+    "precio_desc": ("-precio", "-id"),
+}
+CLAVE_VERSION = "zara_re:facetas:version"
+LOTE = 500
+
+Estado = Publicacion.Estado
+
+
+def _config(nombre: str, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+class NoDisponible(ValidationError):
+    pass
+
+
+# =============================
+#  PUBLICACIÓN
+# =============================
+
+def precio_reventa(prenda: PrendaTradeIn) -> Decimal:
+    """Valor de canje × margen, redondeado al precio terminado en 990 inmediatamente superior."""
+    v = tradein.valuar(
+        tradein.tipo_de(prenda.prenda),
+        tradein.ESTADO_POR_GRADO.get(prenda.grado, "bueno"),
+        prenda.recibida_en.year,
+    )
+    bruto = v.valor * _config("ZARA_RE_MARGEN", 1.6)
+    return Decimal(max(990, math.ceil((bruto + 10) / 1000) * 1000 - 10))
+
+
+def _publicacion(prenda: PrendaTradeIn) -> Publicacion:
+    return Publicacion(
+        prenda=prenda,
+        titulo=prenda.prenda[:100],
+        tipo=tradein.tipo_de(prenda.prenda),
+        categoria=prenda.categoria or "otro",
+        material=(prenda.material or "Desconocido")[:50],
+        condicion=prenda.grado,
+        precio=precio_reventa(prenda),
+    )
+
+
+def publicar_clasificadas(limite: Optional[int] = None) -> int:
+    """Publica las prendas clasificadas A/B sin publicación. Retorna cuántas se publicaron."""
+    pendientes = (
+        PrendaTradeIn.objects.filter(
+            estado=PrendaTradeIn.Estado.CLASIFICADA, grado__in=GRADOS_REVENTA, publicacion__isnull=True,
+        )
+        .order_by("id")
+        .only("id", "prenda", "categoria", "material", "grado", "recibida_en")
+    )
+    if limite is not None:
+        pendientes = pendientes[:limite]
+    total = 0
+    lote: List[Publicacion] = []
+    for prenda in pendientes.iterator(chunk_size=LOTE):
+        lote.append(_publicacion(prenda))
+        if len(lote) >= LOTE:
+            total += _insertar(lote)
+            lote = []
+    if lote:
+        total += _insertar(lote)
+    if total:
+        invalidar_facetas()
+    return total
+
+
+def _insertar(lote: List[Publicacion]) -> int:
+    # ignore_conflicts: otra pasada concurrente ya pudo publicar la misma prenda (prenda_id es único)
+    antes = Publicacion.objects.filter(prenda_id__in=[p.prenda_id for p in lote]).count()
+    Publicacion.objects.bulk_create(lote, ignore_conflicts=True)
+    return Publicacion.objects.filter(prenda_id__in=[p.prenda_id for p in lote]).count() - antes
+
+
+def retirar_huerfanas() -> int:
+    """Retira publicaciones cuya prenda ya no está a la venta en bodega (p. ej. pasó a reciclaje)."""
+    n = Publicacion.objects.filter(estado=Estado.PUBLICADA).exclude(
+        prenda__estado=PrendaTradeIn.Estado.CLASIFICADA,
+    ).update(estado=Estado.RETIRADA, reservada_por=None, reservada_hasta=None)
+    if n:
+        invalidar_facetas()
+    return n
+
+
+def retirar(publicacion_ids) -> int:
+    n = Publicacion.objects.filter(pk__in=list(publicacion_ids), estado=Estado.PUBLICADA).update(
+        estado=Estado.RETIRADA, reservada_por=None, reservada_hasta=None,
+    )
+    if n:
+        invalidar_facetas()
+    return n
+
+
+# =============================
+#  RESERVA / COMPRA
+# =============================
+
+def reservar(publicacion_id: int, usuario) -> Publicacion:
+    """
+    Reserva por `ZARA_RE_RESERVA_MINUTOS` (o renueva la propia).
+    Lanza NoDisponible si otro la tiene reservada o ya no está publicada.
+    """
+    ahora = timezone.now()
+    hasta = ahora + timedelta(minutes=_config("ZARA_RE_RESERVA_MINUTOS", 15))
+    filas = Publicacion.objects.filter(
+        Q(reservada_hasta__isnull=True) | Q(reservada_hasta__lte=ahora) | Q(reservada_por=usuario),
+        pk=publicacion_id, estado=Estado.PUBLICADA,
+    ).update(reservada_por=usuario, reservada_hasta=hasta)
+    if not filas:
+        raise NoDisponible("La prenda ya no está disponible.")
+    return Publicacion.objects.get(pk=publicacion_id)
+
+
+def liberar(publicacion_id: int, usuario) -> bool:
+    return bool(Publicacion.objects.filter(
+        pk=publicacion_id, estado=Estado.PUBLICADA, reservada_por=usuario,
+    ).update(reservada_por=None, reservada_hasta=None))
+
+
+def comprar(publicacion_id: int, usuario) -> Publicacion:
+    """Cierra la venta de una reserva vigente propia y marca la prenda como REVENDIDA."""
+    ahora = timezone.now()
+    with transaction.atomic():
+        filas = Publicacion.objects.filter(
+            pk=publicacion_id, estado=Estado.PUBLICADA, reservada_por=usuario, reservada_hasta__gt=ahora,
+        ).update(
+            estado=Estado.VENDIDA, comprador=usuario, vendida_en=ahora, reservada_por=None, reservada_hasta=None,
+        )
+        if not filas:
+            raise NoDisponible("La reserva venció o no es tuya; vuelve a reservar.")
+        publicacion = Publicacion.objects.select_related("prenda").get(pk=publicacion_id)
+        tradein.transicionar(publicacion.prenda, PrendaTradeIn.Estado.REVENDIDA)
+    invalidar_facetas()
+    return publicacion
+
+
+def liberar_vencidas() -> int:
+    """Limpia reservas vencidas (no es necesario para reservar: la condición ya las ignora)."""
+    return Publicacion.objects.filter(estado=Estado.PUBLICADA, reservada_hasta__lte=timezone.now()).update(
+        reservada_por=None, reservada_hasta=None,
+    )
+
+
+# =============================
+#  LISTADO / FACETAS
+# =============================
+
+def limpiar_filtros(datos) -> Dict[str, str]:
+    """Filtros de faceta válidos de un QueryDict / dict (un valor por faceta)."""
+    return {f: str(datos.get(f)).strip()[:50] for f in FACETAS if (datos.get(f) or "").strip()}
+
+
+def listar(filtros: Dict[str, str], orden: str = "recientes", pagina: int = 1) -> Tuple[List[Publicacion], bool]:
+    """(publicaciones de la página, hay_mas). Las reservadas se listan y se marcan como tales."""
+    pagina = max(1, min(MAX_PAGINA, pagina))
+    desde = (pagina - 1) * POR_PAGINA
+    filas = list(
+        Publicacion.objects.filter(estado=Estado.PUBLICADA, **filtros)
+        .order_by(*ORDENES.get(orden, ORDENES["recientes"]))
+        .only("id", "titulo", "tipo", "categoria", "material", "condicion", "precio",
+              "publicada_en", "reservada_por_id", "reservada_hasta")
+        [desde:desde + POR_PAGINA + 1]
+    )
+    return filas[:POR_PAGINA], len(filas) > POR_PAGINA
+
+
+def _version() -> int:
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        version = time.time_ns()
+        cache.add(CLAVE_VERSION, version, None)
+    return version
+
+
+def invalidar_facetas() -> None:
+    """
+    Nueva versión al confirmar: las entradas anteriores quedan huérfanas y
+    vencen solas. Antes del commit otro worker podría recontar sin el cambio
+    y cachearlo bajo la versión nueva.
+    """
+    transaction.on_commit(lambda: cache.set(CLAVE_VERSION, time.time_ns(), None))
+
+
+def _contar(filtros: Dict[str, str]) -> Dict[str, object]:
+    conteos: Dict[str, List[Tuple[str, int]]] = {}
+    for faceta in FACETAS:
+        # cada faceta se cuenta con los demás filtros, no con el suyo (se puede cambiar de valor)
+        otros = {f: v for f, v in filtros.items() if f != faceta}
+        conteos[faceta] = list(
+            Publicacion.objects.filter(estado=Estado.PUBLICADA, **otros)
+            .values_list(faceta).annotate(n=Count("id")).order_by(faceta)
+        )
+    # total con todos los filtros: sale de cualquier faceta, sin otra consulta
+    primera = FACETAS[0]
+    total = sum(n for valor, n in conteos[primera] if primera not in filtros or valor == filtros[primera])
+    return {"total": total, "facetas": conteos}
+
+
+def facetas(filtros: Dict[str, str]) -> Dict[str, object]:
+    """{"total": n, "facetas": {faceta: [(valor, n), …]}} desde el cache si está vigente."""
+    firma = hashlib.sha1("|".join(f"{f}={filtros.get(f, '')}" for f in FACETAS).encode()).hexdigest()
+    clave = f"zara_re:facetas:{_version()}:{firma}"
+    datos = cache.get(clave)
+    if datos is None:
+        datos = _contar(filtros)
+        cache.set(clave, datos, _config("ZARA_RE_FACETAS_TTL", 300))
+    return datos
@@ -1,3 +1,91 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from zara.models import PrendaTradeIn
+
+from . import reventa
+from .models import Publicacion
+
+User = get_user_model()
+
+# el caché de settings vive en var/: los tests usan uno en memoria para no arrastrar datos entre corridas
+CACHE_PRUEBAS = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+# =============================
+#  RESERVA / COMPRA
+# =============================
+
+@override_settings(CACHES=CACHE_PRUEBAS)
+class ReservaCompraTests(TestCase):
+    """Una prenda, un comprador: reserva y compra con UPDATE condicional."""
+
+    def setUp(self):
+        caches["default"].clear()
+        self.ana = User.objects.create_user("ana", "ana@example.com", "x")
+        self.beto = User.objects.create_user("beto", "beto@example.com", "x")
+        for prenda, categoria in (("Chaqueta denim", "mujer"), ("Pantalón lino", "hombre")):
+            PrendaTradeIn.objects.create(
+                prenda=prenda, material="Algodón", categoria=categoria,
+                estado=PrendaTradeIn.Estado.CLASIFICADA, grado="A",
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reventa.publicar_clasificadas(), 2)
+        self.pub = Publicacion.objects.get(categoria="mujer")
+
+    def _vencer(self):
+        Publicacion.objects.filter(pk=self.pub.pk).update(reservada_hasta=timezone.now() - timedelta(seconds=1))
+
+    def test_segundo_comprador_no_puede_reservar(self):
+        reventa.reservar(self.pub.pk, self.ana)
+        with self.assertRaises(reventa.NoDisponible):
+            reventa.reservar(self.pub.pk, self.beto)
+        renovada = reventa.reservar(self.pub.pk, self.ana)  # la propia se renueva
+        self.assertEqual(renovada.reservada_por, self.ana)
+
+    def test_reserva_vencida_la_toma_otro(self):
+        reventa.reservar(self.pub.pk, self.ana)
+        self._vencer()
+        self.assertEqual(reventa.reservar(self.pub.pk, self.beto).reservada_por, self.beto)
+        with self.assertRaises(reventa.NoDisponible):
+            reventa.reservar(self.pub.pk, self.ana)
+
+    def test_comprar_exige_reserva_vigente_propia(self):
+        with self.assertRaises(reventa.NoDisponible):
+            reventa.comprar(self.pub.pk, self.ana)  # sin reserva
+        reventa.reservar(self.pub.pk, self.ana)
+        with self.assertRaises(reventa.NoDisponible):
+            reventa.comprar(self.pub.pk, self.beto)  # reserva ajena
+        self._vencer()
+        with self.assertRaises(reventa.NoDisponible):
+            reventa.comprar(self.pub.pk, self.ana)  # reserva vencida
+        self.pub.refresh_from_db()
+        self.assertEqual(self.pub.estado, Publicacion.Estado.PUBLICADA)
+        self.assertEqual(self.pub.prenda.estado, PrendaTradeIn.Estado.CLASIFICADA)
+
+    def test_comprar_revende_la_prenda(self):
+        reventa.reservar(self.pub.pk, self.ana)
+        vendida = reventa.comprar(self.pub.pk, self.ana)
+        self.assertEqual((vendida.estado, vendida.comprador), (Publicacion.Estado.VENDIDA, self.ana))
+        self.assertIsNone(vendida.reservada_por)
+        self.assertEqual(PrendaTradeIn.objects.get(pk=self.pub.prenda_id).estado, PrendaTradeIn.Estado.REVENDIDA)
+        with self.assertRaises(reventa.NoDisponible):
+            reventa.reservar(self.pub.pk, self.beto)
+
+    def test_facetas_cambian_al_confirmar_la_compra(self):
+        antes = reventa.facetas({})
+        self.assertEqual(antes["total"], 2)
+        self.assertEqual(antes["facetas"]["categoria"], [("hombre", 1), ("mujer", 1)])
+
+        reventa.reservar(self.pub.pk, self.ana)
+        self.assertEqual(reventa.facetas({}), antes)  # las reservas no cambian los conteos
+        with self.captureOnCommitCallbacks(execute=True):
+            reventa.comprar(self.pub.pk, self.ana)
+            self.assertEqual(reventa.facetas({})["total"], 2)  # hasta el commit sigue la versión anterior
+        despues = reventa.facetas({})
+        self.assertEqual(despues["total"], 1)
+        self.assertEqual(despues["facetas"]["categoria"], [("hombre", 1)])
@@ -0,0 +1,18 @@
+# zara_re/trabajos.py
+"""Tareas periódicas de Zara Re para el worker de `zara.tareas`."""
+from __future__ import annotations
+
+from zara.tareas import tarea
+
+from . import reventa
+
+
+@tarea("zara_re.publicar_reventa", cada=300)
+def publicar_reventa() -> None:
+    reventa.publicar_clasificadas()
+    reventa.retirar_huerfanas()
+
+
+@tarea("zara_re.liberar_reservas", cada=60)
+def liberar_reservas() -> None:
+    reventa.liberar_vencidas()
@@ -7,5 +7,11 @@ app_name = "zara_re"
 urlpatterns = [
     path("", views.home, name="home"),
     path("pasaporte/", views.pasaporte, name="pasaporte"),
-    # si tienes más vistas de zara_re, agrégalas aquí
-]
\ No newline at end of file
+
+    # ----------- REVENTA CIRCULAR -----------
+    path("reventa/", views.reventa_lista, name="reventa"),
+    path("api/reventa/", views.api_reventa, name="api_reventa"),
+    path("api/reventa/<int:pk>/reservar/", views.api_reventa_reservar, name="api_reventa_reservar"),
+    path("api/reventa/<int:pk>/liberar/", views.api_reventa_liberar, name="api_reventa_liberar"),
+    path("api/reventa/<int:pk>/comprar/", views.api_reventa_comprar, name="api_reventa_comprar"),
+]
@@ -1,10 +1,18 @@
 # zara_re/views.py
 from types import SimpleNamespace
-import io
-import base64
-import qrcode
+from urllib.parse import urlencode
 
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.views.decorators.http import require_GET, require_POST
+
+from zara import impacto
+from zara.qr import qr_base64
+
+from . import reventa
 
 # ============================================================
 #  DATOS DEMO PARA PASAPORTE DIGITAL
@@ -46,9 +54,12 @@ DEFAULT_SLUG = "conjunto-formal-gris"
 
 def home(request):
     """
-    Página principal de Zara_Re.
+    Página principal de Zara_Re, con el impacto acumulado de la comunidad.
     """
-    return render(request, "zara_re/home.html")
+    return render(request, "zara_re/home.html", {
+        "impacto_global": impacto.global_(),
+        "impacto_materiales": impacto.por_material(5),
+    })
 
 
 # ============================================================
@@ -70,11 +81,114 @@ def pasaporte(request):
         f"Agua total estimada: {data['agua_total']} L"
     )
 
-    qr_img = qrcode.make(qr_text)
-    buffer = io.BytesIO()
-    qr_img.save(buffer, format="PNG")
-    qr_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    p = SimpleNamespace(**data, qr_base64=qr_base64(qr_text))
+
+    return render(request, "zara_re/pasaporte.html", {"p": p})
+
+
+# ============================================================
+#  REVENTA CIRCULAR
+# ============================================================
+
+NOMBRES_CONDICION = {"A": "Como nueva", "B": "Uso leve"}
+TITULOS_FACETA = {"categoria": "Categoría", "material": "Material", "condicion": "Condición"}
+
+
+def _enlaces_facetas(datos, filtros, orden):
+    """[(título, [(etiqueta, n, activo, querystring)])]: cada valor alterna su filtro."""
+    bloques = []
+    for faceta, valores in datos["facetas"].items():
+        enlaces = []
+        for valor, n in valores:
+            activo = filtros.get(faceta) == valor
+            nuevos = {k: v for k, v in filtros.items() if k != faceta}
+            if not activo:
+                nuevos[faceta] = valor
+            etiqueta = NOMBRES_CONDICION.get(valor, valor) if faceta == "condicion" else valor
+            enlaces.append((etiqueta, n, activo, urlencode({**nuevos, "orden": orden})))
+        bloques.append((TITULOS_FACETA[faceta], enlaces))
+    return bloques
+
+
+def _parametros(request):
+    filtros = reventa.limpiar_filtros(request.GET)
+    orden = request.GET.get("orden") if request.GET.get("orden") in reventa.ORDENES else "recientes"
+    try:
+        pagina = int(request.GET.get("pagina") or 1)
+    except ValueError:
+        pagina = 1
+    return filtros, orden, pagina
+
+
+def _publicacion_dict(p, ahora, usuario_id) -> dict:
+    return {
+        "id": p.pk,
+        "titulo": p.titulo,
+        "tipo": p.tipo,
+        "categoria": p.categoria,
+        "material": p.material,
+        "condicion": p.condicion,
+        "precio": str(p.precio),
+        "reservada": p.reservada(ahora),
+        "mia": p.reservada(ahora) and p.reservada_por_id == usuario_id,
+    }
+
+
+def reventa_lista(request):
+    """Listado de reventa con facetas (categoría / material / condición)."""
+    filtros, orden, pagina = _parametros(request)
+    publicaciones, hay_mas = reventa.listar(filtros, orden, pagina)
+    ahora = timezone.now()
+    for p in publicaciones:
+        p.esta_reservada = p.reservada(ahora)
+        p.es_mia = p.esta_reservada and p.reservada_por_id == request.user.pk
+        p.condicion_nombre = NOMBRES_CONDICION.get(p.condicion, p.condicion)
+    datos = reventa.facetas(filtros)
+    return render(request, "zara_re/reventa.html", {
+        "publicaciones": publicaciones,
+        "total": datos["total"],
+        "facetas": _enlaces_facetas(datos, filtros, orden),
+        "filtros_qs": urlencode(filtros),
+        "orden": orden,
+        "ordenes": reventa.ORDENES,
+        "pagina": pagina,
+        "hay_mas": hay_mas,
+    })
+
+
+@require_GET
+def api_reventa(request):
+    filtros, orden, pagina = _parametros(request)
+    publicaciones, hay_mas = reventa.listar(filtros, orden, pagina)
+    ahora = timezone.now()
+    return JsonResponse({
+        "ok": True,
+        **reventa.facetas(filtros),
+        "pagina": pagina,
+        "hay_mas": hay_mas,
+        "publicaciones": [_publicacion_dict(p, ahora, request.user.pk) for p in publicaciones],
+    })
+
+
+def _accion_reserva(funcion):
+    @login_required
+    @require_POST
+    def vista(request, pk: int):
+        try:
+            resultado = funcion(pk, request.user)
+        except ValidationError as exc:
+            return JsonResponse({"ok": False, "errores": {"__all__": exc.messages}}, status=409)
+        if resultado is False:
+            return JsonResponse({"ok": False, "errores": {"__all__": ["No tenías esta prenda reservada."]}}, status=409)
+        datos = {"ok": True}
+        if hasattr(resultado, "reservada_hasta"):
+            datos["reservada_hasta"] = resultado.reservada_hasta.isoformat() if resultado.reservada_hasta else None
+        return JsonResponse(datos)
+    vista.__name__ = f"api_reventa_{funcion.__name__}"
+    return vista
+
 
-    p = SimpleNamespace(**data, qr_base64=qr_base64)
+api_reventa_reservar = _accion_reserva(reventa.reservar)
+api_reventa_liberar = _accion_reserva(reventa.liberar)
+api_reventa_comprar = _accion_reserva(reventa.comprar)
 
-    return render(request, "zara_re/pasaporte.html", {"p": p})
\ No newline at end of file